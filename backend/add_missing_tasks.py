@@ -32,6 +32,20 @@ def add_missing_tasks():
                 'status': 'active',
                 'max_concurrent_runs': 2
             },
+            {
+                'name': 'Broadcast Precompute',
+                'task_type': 'broadcast_precompute',
+                'schedule_pattern': '*/5 * * * *',
+                'status': 'active',
+                'max_concurrent_runs': 1
+            },
+            {
+                'name': 'Caption Precompute',
+                'task_type': 'caption_precompute',
+                'schedule_pattern': '*/5 * * * *',
+                'status': 'active',
+                'max_concurrent_runs': 1
+            },
             {
                 'name': 'Reel Generation',
                 'task_type': 'reel_generation',
@@ -16,6 +16,7 @@ from typing import Optional
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, status
 
+from app.api.media.upload_stream import ingest_upload
 from app.services.processing.audio_input_processor import AudioInputProcessor
 
 router = APIRouter()
@@ -104,59 +105,40 @@ async def upload_audio(
     processor = AudioInputProcessor()
 
     try:
-        # Read file content
-        file.file.seek(0)
-        audio_bytes = file.file.read()
-        file_size = len(audio_bytes)
-        
-        original_filename = file.filename
         mime_type = file.content_type or 'audio/mpeg'
         
-        # Upload to S3
-        from io import BytesIO
-        file.file = BytesIO(audio_bytes)
-        
-        upload_result = processor._upload_to_s3(file)
-        
-        if not upload_result['success']:
-            processor.close()
-            return _build_error_response(
-                message=f"فشل رفع الملف: {upload_result.get('error')}",
-                step="upload"
-            )
-        
-        audio_url = upload_result['url']
-        stored_filename = upload_result['s3_key'].split('/')[-1]
-        
-        # Save metadata with 'pending' status
-        uploaded_file_id = processor._save_uploaded_file_metadata(
-            original_filename=original_filename,
-            stored_filename=stored_filename,
-            file_path=audio_url,
-            file_size=file_size,
-            file_type='audio',
-            mime_type=mime_type
-        )
+        # Hash + dedup, then stream new content to S3 (bounded memory)
+        result = await ingest_upload(file, 'audio', processor, mime_type)
         
         processor.close()
         
-        if not uploaded_file_id:
+        if not result['success']:
             return _build_error_response(
-                message="فشل حفظ metadata",
-                step="metadata"
+                message=result['error'],
+                step=result['step']
             )
         
+        if result['duplicate']:
+            message = "Same audio was already uploaded. Returning the existing file."
+        else:
+            message = "File uploaded successfully. Processing will happen in background."
+        
         # Return success - background job will process it
         return {
             "success": True,
             "data": {
-                "uploaded_file_id": uploaded_file_id,
-                "audio_url": audio_url,
-                "message": "File uploaded successfully. Processing will happen in background."
+                "uploaded_file_id": result['uploaded_file_id'],
+                "audio_url": result['url'],
+                "duplicate": result['duplicate'],
+                "processing_status": result['processing_status'],
+                "message": message
             },
             "error": None
         }
 
+    except HTTPException:
+        processor.close()
+        raise
     except Exception as e:
         processor.close()
         return _build_error_response(
@@ -188,59 +170,40 @@ async def record_audio(
     processor = AudioInputProcessor()
 
     try:
-        # Read file content
-        file.file.seek(0)
-        audio_bytes = file.file.read()
-        file_size = len(audio_bytes)
-        
-        original_filename = file.filename
         mime_type = file.content_type or 'audio/webm'  # Usually webm for recordings
         
-        # Upload to S3
-        from io import BytesIO
-        file.file = BytesIO(audio_bytes)
-        
-        upload_result = processor._upload_to_s3(file)
-        
-        if not upload_result['success']:
-            processor.close()
-            return _build_error_response(
-                message=f"فشل رفع الملف: {upload_result.get('error')}",
-                step="upload"
-            )
-        
-        audio_url = upload_result['url']
-        stored_filename = upload_result['s3_key'].split('/')[-1]
-        
-        # Save metadata with 'pending' status
-        uploaded_file_id = processor._save_uploaded_file_metadata(
-            original_filename=original_filename,
-            stored_filename=stored_filename,
-            file_path=audio_url,
-            file_size=file_size,
-            file_type='audio',
-            mime_type=mime_type
-        )
+        # Hash + dedup, then stream new content to S3 (bounded memory)
+        result = await ingest_upload(file, 'audio', processor, mime_type)
         
         processor.close()
         
-        if not uploaded_file_id:
+        if not result['success']:
             return _build_error_response(
-                message="فشل حفظ metadata",
-                step="metadata"
+                message=result['error'],
+                step=result['step']
             )
         
+        if result['duplicate']:
+            message = "Same audio was already uploaded. Returning the existing file."
+        else:
+            message = "Recording uploaded successfully. Processing will happen in background."
+        
         # Return success - background job will process it
         return {
             "success": True,
             "data": {
-                "uploaded_file_id": uploaded_file_id,
-                "audio_url": audio_url,
-                "message": "Recording uploaded successfully. Processing will happen in background."
+                "uploaded_file_id": result['uploaded_file_id'],
+                "audio_url": result['url'],
+                "duplicate": result['duplicate'],
+                "processing_status": result['processing_status'],
+                "message": message
             },
             "error": None
         }
 
+    except HTTPException:
+        processor.close()
+        raise
     except Exception as e:
         processor.close()
         return _build_error_response(
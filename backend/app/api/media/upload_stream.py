@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+📥 Streaming Upload Ingest
+رفع ملفات الصوت/الفيديو من الـ request لـ S3 بأجزاء، بذاكرة ثابتة
+
+قبل: file.file.read() + BytesIO + قراءة تانية بالمعالج = عدة نسخ من الملف بالـ RAM
+هلأ:
+- القراءة بأجزاء (UPLOAD_PART_MB) من ملف Starlette المؤقت
+- الحجم بيتفحص مع كل جزء (413 أول ما يتجاوز الحد، بدون ما نكمل)
+- النوع بيتفحص من أول bytes (magic) مش بس من content-type
+- SHA-256 بيتحسب أثناء القراءة
+- كل جزء بيترفع S3 multipart عبر S3Uploader، وقراءة الجزء التالي بتتداخل مع رفع الحالي
+- حد للرفعات بنفس الوقت (UPLOAD_MAX_CONCURRENT)، فأقصى ذاكرة ≈ 2 × الجزء × الحد
+
+Dedup (ingest_upload): الـ hash بينحسب من الملف المحلي قبل أي رفع، وإذا نفس المحتوى
+موجود بـ uploaded_files بنرجع نفس الصف (بدون S3 وبدون STT/Gemini من جديد)؛
+الرفع بعدها بيستعمل نفس الـ hash والفحص (قراءة وحدة للـ hash مش اثنتين)
+"""
+
+import asyncio
+import hashlib
+import os
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.s3_uploader import S3Uploader
+from settings import (
+    ALLOWED_AUDIO_FORMATS,
+    ALLOWED_VIDEO_FORMATS,
+    MAX_AUDIO_SIZE_MB,
+    MAX_VIDEO_SIZE_MB,
+)
+
+
+# S3: كل جزء (ما عدا الأخير) لازم يكون >= 5MB
+UPLOAD_PART_MB = max(5, int(os.getenv('UPLOAD_PART_MB', 8)))
+UPLOAD_MAX_CONCURRENT = int(os.getenv('UPLOAD_MAX_CONCURRENT', 4))
+
+PART_SIZE = UPLOAD_PART_MB * 1024 * 1024
+
+# الحاويات حسب أول bytes، والامتدادات اللي بتنتمي إلها
+CONTAINER_EXTENSIONS = {
+    'mpeg_audio': ('mp3', 'aac'),
+    'wave': ('wav',),
+    'avi': ('avi',),
+    'ogg': ('ogg', 'oga', 'opus'),
+    'flac': ('flac',),
+    'iso_bmff': ('mp4', 'm4a', 'mov', '3gp'),
+    'matroska': ('webm', 'mkv'),
+}
+
+_upload_slots = asyncio.Semaphore(UPLOAD_MAX_CONCURRENT)
+
+
+def sniff_container(head: bytes) -> Optional[str]:
+    """نوع الحاوية من أول bytes بالملف (None = مش ملف صوت/فيديو معروف)"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wave'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'avi'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'matroska'
+    if head[4:8] in (b'ftyp', b'moov', b'mdat', b'wide', b'free'):
+        return 'iso_bmff'
+    if head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'mpeg_audio'
+    return None
+
+
+def allowed_containers(formats: Iterable[str]) -> Set[str]:
+    formats = {f.strip().lower() for f in formats}
+    return {
+        container for container, extensions in CONTAINER_EXTENSIONS.items()
+        if formats.intersection(extensions)
+    }
+
+
+def _limits(file_type: str):
+    if file_type == 'video':
+        return MAX_VIDEO_SIZE_MB * 1024 * 1024, ALLOWED_VIDEO_FORMATS
+    return MAX_AUDIO_SIZE_MB * 1024 * 1024, ALLOWED_AUDIO_FORMATS
+
+
+def _extension(filename: str, container: str, allowed_formats: Iterable[str]) -> str:
+    """امتداد الملف إذا مسموح ومتوافق مع الحاوية، وإلا الامتداد الافتراضي للحاوية"""
+    extension = (filename or '').rsplit('.', 1)[-1].lower() if '.' in (filename or '') else ''
+    allowed = {f.strip().lower() for f in allowed_formats}
+    if extension in allowed and extension in CONTAINER_EXTENSIONS[container]:
+        return extension
+    for candidate in CONTAINER_EXTENSIONS[container]:
+        if candidate in allowed:
+            return candidate
+    return CONTAINER_EXTENSIONS[container][0]
+
+
+async def _read_part(file: UploadFile, size: int) -> bytes:
+    """قراءة لحد size bytes (read ممكن يرجع أقل)"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = await file.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def _check_type(head: bytes, file_type: str, allowed_formats: Iterable[str]) -> str:
+    container = sniff_container(head[:16])
+    if not head or container not in allowed_containers(allowed_formats):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported {file_type} format. Allowed: {', '.join(allowed_formats)}"
+        )
+    return container
+
+
+def _check_size(size: int, max_bytes: int):
+    if size > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large. Max {max_bytes // (1024 * 1024)}MB"
+        )
+
+
+async def hash_upload(file: UploadFile, file_type: str = 'audio') -> Dict:
+    """
+    فحص الحجم/النوع + SHA-256 من ملف الـ upload المحلي (بدون أي رفع)
+
+    Raises:
+        HTTPException 413 / 415
+
+    Returns:
+        {'sha256', 'file_size', 'extension'}
+    """
+    max_bytes, allowed_formats = _limits(file_type)
+
+    async with _upload_slots:
+        await file.seek(0)
+        part = await _read_part(file, PART_SIZE)
+        container = _check_type(part, file_type, allowed_formats)
+
+        digest = hashlib.sha256()
+        total = 0
+        while part:
+            total += len(part)
+            _check_size(total, max_bytes)
+            digest.update(part)
+            part = await _read_part(file, PART_SIZE)
+
+        await file.seek(0)
+
+    return {
+        'sha256': digest.hexdigest(),
+        'file_size': total,
+        'extension': _extension(file.filename, container, allowed_formats)
+    }
+
+
+async def ingest_upload(file: UploadFile, file_type: str, processor, mime_type: str) -> Dict:
+    """
+    hash → dedup → رفع S3 (للمحتوى الجديد بس) → صف uploaded_files
+
+    Args:
+        processor: AudioInputProcessor (S3 + قاعدة البيانات)
+
+    Returns:
+        {'success', 'uploaded_file_id', 'url', 'duplicate', 'processing_status'}
+        أو {'success': False, 'step', 'error'}
+    """
+    info = await hash_upload(file, file_type)
+    duplicate = processor.find_duplicate_upload(info['sha256'], file_type)
+
+    # نفس المحتوى موجود ولسا شغال/خلص: نفس الصف
+    if duplicate and not duplicate['retry_exhausted']:
+        print(f"♻️ Duplicate {file_type} upload → uploaded_file #{duplicate['id']}")
+        return {
+            'success': True,
+            'uploaded_file_id': duplicate['id'],
+            'url': duplicate['file_path'],
+            'duplicate': True,
+            'processing_status': duplicate['processing_status']
+        }
+
+    # نسخة فشلت كل محاولاتها: صف جديد للمعالجة، بس نفس ملف S3
+    if duplicate:
+        url = duplicate['file_path']
+        stored_filename = duplicate['stored_filename']
+    else:
+        upload = await stream_upload_to_s3(file, file_type, processor.s3_uploader, checked=info)
+        if not upload['success']:
+            noun = 'الفيديو' if file_type == 'video' else 'الملف'
+            return {'success': False, 'step': 'upload', 'error': f"فشل رفع {noun}: {upload.get('error')}"}
+        url = upload['url']
+        stored_filename = upload['filename']
+
+    # Save metadata with 'pending' status
+    uploaded_file_id = processor._save_uploaded_file_metadata(
+        original_filename=file.filename,
+        stored_filename=stored_filename,
+        file_path=url,
+        file_size=info['file_size'],
+        file_type=file_type,
+        mime_type=mime_type,
+        content_hash=info['sha256']
+    )
+
+    if not uploaded_file_id:
+        return {'success': False, 'step': 'metadata', 'error': "فشل حفظ metadata"}
+
+    return {
+        'success': True,
+        'uploaded_file_id': uploaded_file_id,
+        'url': url,
+        'duplicate': False,
+        'processing_status': 'pending'
+    }
+
+
+async def stream_upload_to_s3(
+    file: UploadFile,
+    file_type: str = 'audio',
+    uploader: Optional[S3Uploader] = None,
+    checked: Optional[Dict] = None
+) -> Dict:
+    """
+    رفع UploadFile لـ S3 بأجزاء مع فحص الحجم/النوع وحساب SHA-256
+
+    Args:
+        checked: نتيجة hash_upload لنفس الملف - الفحص والـ hash ما بيتعادوا
+
+    Raises:
+        HTTPException 413 (أكبر من الحد) / 415 (نوع غير مدعوم)
+
+    Returns:
+        {'success', 'url', 's3_key', 'filename', 'original_filename',
+         'file_size', 'sha256', 'content_type', 'extension'}
+        أو {'success': False, 'error'} إذا فشل S3
+    """
+    max_bytes, allowed_formats = _limits(file_type)
+    uploader = uploader or S3Uploader()
+
+    async with _upload_slots:
+        await file.seek(0)
+        part = await _read_part(file, PART_SIZE)
+
+        if checked:
+            extension = checked['extension']
+            digest = None
+        else:
+            container = _check_type(part, file_type, allowed_formats)
+            extension = _extension(file.filename, container, allowed_formats)
+            digest = hashlib.sha256()
+
+        content_type = uploader.content_type_for(file_type, extension)
+        s3_key, unique_filename = uploader.new_media_key(file_type, extension)
+
+        total = 0
+        upload_id = None
+        parts = []
+        in_flight = None
+
+        try:
+            next_part = None
+            while part:
+                total += len(part)
+                if digest:
+                    _check_size(total, max_bytes)
+                    digest.update(part)
+
+                if upload_id is None:
+                    # ملف بجزء واحد: طلب واحد بدون multipart
+                    next_part = await _read_part(file, PART_SIZE)
+                    if not next_part:
+                        await run_in_threadpool(uploader.put_bytes, s3_key, part, content_type)
+                        break
+                    upload_id = await run_in_threadpool(uploader.create_multipart, s3_key, content_type)
+
+                # الجزء السابق لازم يخلص قبل ما نبعت الحالي (حد الذاكرة)
+                if in_flight:
+                    parts.append(await in_flight)
+                in_flight = asyncio.ensure_future(run_in_threadpool(
+                    uploader.upload_part, s3_key, upload_id, len(parts) + 1, part
+                ))
+
+                # قراءة الجزء التالي بتتداخل مع رفع الحالي (ما في جزء تالت بالذاكرة)
+                if next_part is not None:
+                    part, next_part = next_part, None
+                else:
+                    part = await _read_part(file, PART_SIZE)
+
+            if upload_id:
+                parts.append(await in_flight)
+                in_flight = None
+                await run_in_threadpool(uploader.complete_multipart, s3_key, upload_id, parts)
+
+        except HTTPException:
+            await _abort(uploader, s3_key, upload_id, in_flight)
+            raise
+        except Exception as e:
+            await _abort(uploader, s3_key, upload_id, in_flight)
+            print(f"❌ Streaming upload failed: {e}")
+            return {'success': False, 'error': str(e)}
+
+    print(f"✅ Streamed {file_type}: {unique_filename} ({total / 1024 / 1024:.1f} MB, {len(parts) or 1} parts)")
+
+    return {
+        'success': True,
+        'url': uploader.url_for(s3_key),
+        's3_key': s3_key,
+        'filename': unique_filename,
+        'original_filename': file.filename,
+        'file_size': total,
+        'sha256': digest.hexdigest() if digest else checked['sha256'],
+        'content_type': content_type,
+        'extension': extension
+    }
+
+
+async def _abort(uploader: S3Uploader, s3_key: str, upload_id: Optional[str], in_flight):
+    if in_flight:
+        try:
+            await in_flight
+        except Exception:
+            pass
+    if upload_id:
+        await run_in_threadpool(uploader.abort_multipart, s3_key, upload_id)
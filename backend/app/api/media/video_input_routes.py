@@ -9,8 +9,8 @@ Endpoints:
 - POST /media/input/video/record
 
 Pipeline:
-Video → S3 (video)
-      → Extract Audio (WAV 16k mono)
+Video → S3 (video) → uploaded_files (pending)
+      → audio_transcription_job: Extract Audio (WAV 16k mono)
       → STT → Refiner → Classifier
       → raw_news (linked to video)
 """
@@ -19,6 +19,7 @@ from typing import Optional
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, status
 
+from app.api.media.upload_stream import ingest_upload
 from app.services.processing.video_input_processor import VideoInputProcessor
 
 router = APIRouter()
@@ -92,7 +93,6 @@ async def upload_video(
     """
     Video Upload Endpoint (Async)
     - Saves video to S3
-    - Extracts audio and saves to S3
     - Saves metadata to database
     - Returns 200 immediately
     - Background job will process it later
@@ -102,60 +102,23 @@ async def upload_video(
     processor = VideoInputProcessor()
 
     try:
-        # Read file content
-        file.file.seek(0)
-        video_bytes = file.file.read()
-        video_size = len(video_bytes)
-        
-        original_filename = file.filename
         mime_type = file.content_type or 'video/mp4'
         
-        # Upload video to S3
-        from io import BytesIO
-        file.file = BytesIO(video_bytes)
-        
-        video_upload_result = processor.audio_processor._upload_to_s3(file, file_type="video")
+        # Hash + dedup, then stream new content to S3 (bounded memory)
+        result = await ingest_upload(file, 'video', processor.audio_processor, mime_type)
         
-        if not video_upload_result['success']:
+        if not result['success']:
             processor.close()
             return _build_error_response(
-                message=f"فشل رفع الفيديو: {video_upload_result.get('error')}",
-                step="upload"
+                message=result['error'],
+                step=result['step']
             )
         
-        video_url = video_upload_result['url']
-        video_s3_key = video_upload_result['s3_key']
-        stored_filename = video_s3_key.split('/')[-1]
-        
-        # Save video metadata with 'pending' status
-        video_file_id = processor.audio_processor._save_uploaded_file_metadata(
-            original_filename=original_filename,
-            stored_filename=stored_filename,
-            file_path=video_url,
-            file_size=video_size,
-            file_type='video',
-            mime_type=mime_type
-        )
-        
-        if not video_file_id:
-            processor.close()
-            return _build_error_response(
-                message="فشل حفظ metadata",
-                step="metadata"
-            )
-        
-        # Extract audio from video
-        print("🎵 Extracting audio from video...")
-        temp_upload_file = UploadFile(filename=original_filename, file=BytesIO(video_bytes))
-        audio_upload_file = processor._extract_audio_from_video(temp_upload_file)
-        
-        audio_url = None
-        if audio_upload_file:
-            # Upload extracted audio to S3
-            audio_upload_result = processor.audio_processor._upload_to_s3(audio_upload_file)
-            if audio_upload_result['success']:
-                audio_url = audio_upload_result['url']
-                print(f"✅ Audio extracted and uploaded: {audio_url}")
+        # الصوت بينسحب من الفيديو بـ audio_transcription_job (مش بالـ request)
+        if result['duplicate']:
+            message = "Same video was already uploaded. Returning the existing file."
+        else:
+            message = "Video uploaded successfully. Processing will happen in background."
         
         processor.close()
         
@@ -163,14 +126,18 @@ async def upload_video(
         return {
             "success": True,
             "data": {
-                "uploaded_file_id": video_file_id,
-                "video_url": video_url,
-                "audio_url": audio_url,
-                "message": "Video uploaded successfully. Processing will happen in background."
+                "uploaded_file_id": result['uploaded_file_id'],
+                "video_url": result['url'],
+                "duplicate": result['duplicate'],
+                "processing_status": result['processing_status'],
+                "message": message
             },
             "error": None
         }
 
+    except HTTPException:
+        processor.close()
+        raise
     except Exception as e:
         processor.close()
         return _build_error_response(
@@ -192,7 +159,6 @@ async def record_video(
     """
     Video Record Endpoint
     - Saves recorded video to S3
-    - Extracts audio and saves to S3
     - Saves metadata to database
     - Returns 200 immediately
     - Background job will process it later
@@ -203,60 +169,23 @@ async def record_video(
     processor = VideoInputProcessor()
 
     try:
-        # Read file content
-        file.file.seek(0)
-        video_bytes = file.file.read()
-        video_size = len(video_bytes)
-        
-        original_filename = file.filename
         mime_type = file.content_type or 'video/webm'  # Usually webm for recordings
         
-        # Upload video to S3
-        from io import BytesIO
-        file.file = BytesIO(video_bytes)
-        
-        video_upload_result = processor.audio_processor._upload_to_s3(file, file_type="video")
+        # Hash + dedup, then stream new content to S3 (bounded memory)
+        result = await ingest_upload(file, 'video', processor.audio_processor, mime_type)
         
-        if not video_upload_result['success']:
+        if not result['success']:
             processor.close()
             return _build_error_response(
-                message=f"فشل رفع الفيديو: {video_upload_result.get('error')}",
-                step="upload"
+                message=result['error'],
+                step=result['step']
             )
         
-        video_url = video_upload_result['url']
-        video_s3_key = video_upload_result['s3_key']
-        stored_filename = video_s3_key.split('/')[-1]
-        
-        # Save video metadata with 'pending' status
-        video_file_id = processor.audio_processor._save_uploaded_file_metadata(
-            original_filename=original_filename,
-            stored_filename=stored_filename,
-            file_path=video_url,
-            file_size=video_size,
-            file_type='video',
-            mime_type=mime_type
-        )
-        
-        if not video_file_id:
-            processor.close()
-            return _build_error_response(
-                message="فشل حفظ metadata",
-                step="metadata"
-            )
-        
-        # Extract audio from video
-        print("🎵 Extracting audio from recorded video...")
-        temp_upload_file = UploadFile(filename=original_filename, file=BytesIO(video_bytes))
-        audio_upload_file = processor._extract_audio_from_video(temp_upload_file)
-        
-        audio_url = None
-        if audio_upload_file:
-            # Upload extracted audio to S3
-            audio_upload_result = processor.audio_processor._upload_to_s3(audio_upload_file)
-            if audio_upload_result['success']:
-                audio_url = audio_upload_result['url']
-                print(f"✅ Audio extracted and uploaded: {audio_url}")
+        # الصوت بينسحب من الفيديو بـ audio_transcription_job (مش بالـ request)
+        if result['duplicate']:
+            message = "Same video was already uploaded. Returning the existing file."
+        else:
+            message = "Recording uploaded successfully. Processing will happen in background."
         
         processor.close()
         
@@ -264,14 +193,18 @@ async def record_video(
         return {
             "success": True,
             "data": {
-                "uploaded_file_id": video_file_id,
-                "video_url": video_url,
-                "audio_url": audio_url,
-                "message": "Recording uploaded successfully. Processing will happen in background."
+                "uploaded_file_id": result['uploaded_file_id'],
+                "video_url": result['url'],
+                "duplicate": result['duplicate'],
+                "processing_status": result['processing_status'],
+                "message": message
             },
             "error": None
         }
 
+    except HTTPException:
+        processor.close()
+        raise
     except Exception as e:
         processor.close()
         return _build_error_response(
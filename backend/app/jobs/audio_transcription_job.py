@@ -7,13 +7,24 @@
 
 Pipeline:
 uploaded_files (pending/failed) → STT → Refiner → Classifier → raw_news
+
+التوازي:
+- الملفات بتنحجز (claim) بـ UPDATE ... RETURNING مع FOR UPDATE SKIP LOCKED
+  → processing_status = 'processing'، فـ workers تانية ما بتاخد نفس الملف
+- التنزيل + ffmpeg بـ threads لحال، و STT + Gemini بـ threads لحال (overlap)
+- قاعدة البيانات من الـ thread الرئيسي بس
+- ملفات بنفس المحتوى (content_hash): بنعيد استخدام خبر/نص النسخة الأولى
+- إذا الـ worker وقف بنص ملف، الحجز بيخلص بعد AUDIO_JOB_CLAIM_TIMEOUT_MINUTES
+  وبينحسب محاولة فاشلة (retry_count + 1) وبيرجع للطابور
 """
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
+from typing import Dict, List, Optional
 import psycopg2
 from settings import DB_CONFIG, S3_BUCKET_NAME, AWS_REGION
 
@@ -34,6 +45,15 @@ logger = logging.getLogger(__name__)
 # Max retries before giving up
 MAX_RETRIES = 3
 
+# عدد الملفات اللي بتنحجز بكل تشغيل
+AUDIO_JOB_BATCH_SIZE = int(os.getenv('AUDIO_JOB_BATCH_SIZE', 10))
+# ملفات بمرحلة STT/Gemini بنفس الوقت
+AUDIO_JOB_WORKERS = int(os.getenv('AUDIO_JOB_WORKERS', 3))
+# تنزيل + ffmpeg بنفس الوقت
+AUDIO_JOB_PREPARE_WORKERS = int(os.getenv('AUDIO_JOB_PREPARE_WORKERS', 2))
+# حجز أقدم من هيك = الـ worker وقف بنص الملف
+AUDIO_JOB_CLAIM_TIMEOUT_MINUTES = int(os.getenv('AUDIO_JOB_CLAIM_TIMEOUT_MINUTES', 30))
+
 # S3 URL base
 S3_BASE_URL = f"https://{S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/"
 
@@ -96,6 +116,114 @@ def get_pending_audio_files():
         return []
 
 
+def claim_pending_files(limit: int = None) -> List[Dict]:
+    """
+    حجز ملفات للمعالجة (pending/failed → processing) بخطوة وحدة
+    
+    SKIP LOCKED: الصفوف اللي worker تاني عم يحجزها بنفس اللحظة بتنتخطى،
+    والمحجوزة صارت 'processing' فما بترجع بـ get_pending_audio_files
+    """
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE uploaded_files
+            SET processing_status = 'processing',
+                updated_at = NOW()
+            WHERE id IN (
+                SELECT id
+                FROM uploaded_files
+                WHERE file_type IN ('audio', 'video')
+                AND (processing_status = 'pending' OR processing_status = 'failed')
+                AND retry_count < %s
+                ORDER BY created_at ASC
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, original_filename, file_path, file_type, retry_count, created_at
+        """, (MAX_RETRIES, limit or AUDIO_JOB_BATCH_SIZE))
+        
+        rows = sorted(cursor.fetchall(), key=lambda row: row[5])
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+        return [
+            {
+                'id': row[0],
+                'original_filename': row[1],
+                'file_path': row[2],
+                'file_type': row[3],
+                'retry_count': row[4] or 0
+            }
+            for row in rows
+        ]
+        
+    except Exception as e:
+        logger.error(f"Error claiming pending files: {e}")
+        return []
+
+
+def release_stale_claims() -> int:
+    """
+    ملفات علقت بـ 'processing' (الـ worker وقف بنص الملف)
+    → 'failed' مع retry_count + 1، فبترجع للطابور لحد MAX_RETRIES
+    """
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE uploaded_files
+            SET processing_status = 'failed',
+                error_message = 'Processing interrupted (worker stopped mid-file)',
+                retry_count = retry_count + 1,
+                updated_at = NOW()
+            WHERE id IN (
+                SELECT id
+                FROM uploaded_files
+                WHERE file_type IN ('audio', 'video')
+                AND processing_status = 'processing'
+                AND updated_at < NOW() - make_interval(mins => %s)
+                FOR UPDATE SKIP LOCKED
+            )
+        """, (AUDIO_JOB_CLAIM_TIMEOUT_MINUTES,))
+        
+        released = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+        if released > 0:
+            logger.warning(f"Released {released} stale claims (counted as failed attempts)")
+        return released
+        
+    except Exception as e:
+        logger.error(f"Error releasing stale claims: {e}")
+        return 0
+
+
+def touch_claim(file_id: int):
+    """تجديد الحجز بين المراحل (عشان ما ينحسب عالق)"""
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE uploaded_files
+            SET updated_at = NOW()
+            WHERE id = %s AND processing_status = 'processing'
+        """, (file_id,))
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+    except Exception as e:
+        logger.error(f"Error renewing claim for file {file_id}: {e}")
+
+
 def update_file_status(file_id: int, status: str, error_msg: str = None, transcription: str = None, confidence: float = None):
     """
     تحديث status الملف
@@ -164,6 +292,49 @@ def check_news_exists(uploaded_file_id: int) -> bool:
         return False
 
 
+def find_duplicate_result(uploaded_file_id: int) -> Optional[Dict]:
+    """
+    ملف تاني بنفس المحتوى (content_hash) عنده خبر بـ raw_news أو نص جاهز
+    
+    الأولوية للي عنده خبر (بنعيد استخدامه بدل خبر مكرر)، بعدين اللي عنده transcription
+    (بنتخطى STT)
+    """
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT u.id, r.id, u.transcription, u.transcription_confidence
+            FROM uploaded_files me
+            JOIN uploaded_files u
+                ON u.content_hash = me.content_hash AND u.id <> me.id
+            LEFT JOIN raw_news r ON r.uploaded_file_id = u.id
+            WHERE me.id = %s
+            AND me.content_hash IS NOT NULL
+            AND (r.id IS NOT NULL OR (u.transcription IS NOT NULL AND u.transcription != ''))
+            ORDER BY (r.id IS NULL), u.created_at ASC
+            LIMIT 1
+        """, (uploaded_file_id,))
+        
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        
+        if not row:
+            return None
+        
+        return {
+            'file_id': row[0],
+            'news_id': row[1],
+            'transcription': row[2],
+            'confidence': row[3] or 0
+        }
+        
+    except Exception as e:
+        logger.error(f"Error finding duplicate for file {uploaded_file_id}: {e}")
+        return None
+
+
 def save_news(title: str, content: str, tags: str, category: str, uploaded_file_id: int, original_text: str, source_type_id: int = 6):
     """
     حفظ الخبر في raw_news
@@ -203,93 +374,145 @@ def save_news(title: str, content: str, tags: str, category: str, uploaded_file_
         return None
 
 
-def process_audio_file(file_info: dict) -> bool:
+# ============================================
+# Stages
+# ============================================
+
+def _start_file(file_info: dict) -> Optional[str]:
     """
-    معالجة ملف صوتي واحد
+    فحوصات قبل المعالجة (main thread)
+    
+    Returns:
+        الـ URL الكامل، أو None إذا الملف خلص هون (موجود مسبقاً أو بدون مسار)
     """
     file_id = file_info['id']
-    file_path = file_info['file_path']
-    retry_count = file_info['retry_count']
     
-    logger.info(f"Processing file {file_id}: {file_info['original_filename']} (attempt {retry_count + 1})")
+    logger.info(f"Processing file {file_id}: {file_info['original_filename']} (attempt {file_info['retry_count'] + 1})")
     
     # تحقق إذا الخبر موجود مسبقاً
     if check_news_exists(file_id):
         logger.info(f"News already exists for file {file_id}, marking as completed")
         update_file_status(file_id, 'completed')
-        return True
+        file_info['already_done'] = True
+        return None
+    
+    # نفس المحتوى انعالج قبل (content_hash)
+    duplicate = find_duplicate_result(file_id)
+    if duplicate and duplicate['news_id']:
+        logger.info(f"File {file_id} has the same content as file {duplicate['file_id']} "
+                    f"→ reusing news_id: {duplicate['news_id']}")
+        update_file_status(file_id, 'completed', transcription=duplicate['transcription'],
+                           confidence=duplicate['confidence'])
+        file_info['already_done'] = True
+        return None
+    
+    if duplicate:
+        logger.info(f"File {file_id} has the same content as file {duplicate['file_id']} → skipping STT")
+        file_info['stt_result'] = {
+            'success': True,
+            'text': duplicate['transcription'],
+            'confidence': duplicate['confidence']
+        }
     
     # بناء الـ URL الكامل
-    full_url = build_full_url(file_path)
+    full_url = build_full_url(file_info['file_path'])
     logger.info(f"Full URL: {full_url}")
     
     if not full_url:
         logger.error(f"No file path for file {file_id}")
         update_file_status(file_id, 'failed', 'No file path available')
+        return None
+    
+    return full_url
+
+
+def _transcribe_stage(stt_service, prepared: Dict) -> Dict:
+    """Step 1: Transcribe (any thread)"""
+    stt_result = stt_service.transcribe_prepared(prepared)
+    
+    if not stt_result.get('success'):
+        raise RuntimeError(stt_result.get('error', 'STT failed'))
+    
+    logger.info(f"Transcription successful: {len(stt_result['text'])} chars, "
+                f"confidence: {stt_result.get('confidence', 0):.2%}")
+    return stt_result
+
+
+def _refine_stage(refiner, transcription: str) -> Dict:
+    """Step 2 + 3: Refine + Classify (any thread)"""
+    from app.services.processing.classifier import classify_with_gemini
+    
+    refine_result = refiner.refine_to_news(transcription)
+    
+    if not refine_result.get('success'):
+        raise RuntimeError('Refiner failed')
+    
+    title = refine_result['title']
+    content = refine_result['content']
+    logger.info(f"Refined: {title[:50]}...")
+    
+    category, tags_str, _, _ = classify_with_gemini(title, content)
+    logger.info(f"Category: {category}")
+    
+    return {'title': title, 'content': content, 'category': category, 'tags': tags_str}
+
+
+def _save_stage(file_info: dict, stt_result: Dict, refined: Dict) -> bool:
+    """Step 4: Save news (main thread)"""
+    file_id = file_info['id']
+    transcription = stt_result['text']
+    
+    news_id = save_news(
+        title=refined['title'],
+        content=refined['content'],
+        tags=refined['tags'],
+        category=refined['category'],
+        uploaded_file_id=file_id,
+        original_text=transcription,
+        source_type_id=6  # Audio Upload
+    )
+    
+    if not news_id:
+        update_file_status(file_id, 'failed', 'Failed to save news')
         return False
     
+    # Update file status
+    update_file_status(file_id, 'completed', transcription=transcription,
+                       confidence=stt_result.get('confidence', 0))
+    
+    logger.info(f"✅ Successfully processed file {file_id} → news_id: {news_id}")
+    return True
+
+
+def process_audio_file(file_info: dict) -> bool:
+    """
+    معالجة ملف صوتي واحد (بالتسلسل - للمعالجة اليدوية لملف محدد)
+    """
+    full_url = _start_file(file_info)
+    if not full_url:
+        return bool(file_info.get('already_done'))
+    
+    file_id = file_info['id']
+    prepared = None
+    
     try:
         # Import services
         from app.services.generators.stt_service import STTService
         from app.services.processing.news_refiner import NewsRefiner
-        from app.services.processing.classifier import classify_with_gemini
-        
-        # Step 1: Transcribe
-        logger.info(f"Step 1: Transcribing audio...")
-        stt_service = STTService()
-        stt_result = stt_service.transcribe_audio(full_url)
-        
-        if not stt_result.get('success'):
-            error_msg = stt_result.get('error', 'STT failed')
-            logger.error(f"STT failed for file {file_id}: {error_msg}")
-            update_file_status(file_id, 'failed', error_msg)
-            return False
-        
-        transcription = stt_result['text']
-        confidence = stt_result.get('confidence', 0)
-        logger.info(f"Transcription successful: {len(transcription)} chars, confidence: {confidence:.2%}")
-        
-        # Step 2: Refine
-        logger.info(f"Step 2: Refining text...")
-        refiner = NewsRefiner()
-        refine_result = refiner.refine_to_news(transcription)
-        
-        if not refine_result.get('success'):
-            error_msg = 'Refiner failed'
-            logger.error(f"Refiner failed for file {file_id}")
-            update_file_status(file_id, 'failed', error_msg)
-            return False
-        
-        title = refine_result['title']
-        content = refine_result['content']
-        logger.info(f"Refined: {title[:50]}...")
-        
-        # Step 3: Classify
-        logger.info(f"Step 3: Classifying...")
-        category, tags_str, _, _ = classify_with_gemini(title, content)
-        logger.info(f"Category: {category}")
-        
-        # Step 4: Save news
-        logger.info(f"Step 4: Saving news...")
-        news_id = save_news(
-            title=title,
-            content=content,
-            tags=tags_str,
-            category=category,
-            uploaded_file_id=file_id,
-            original_text=transcription,
-            source_type_id=6  # Audio Upload
-        )
-        
-        if not news_id:
-            update_file_status(file_id, 'failed', 'Failed to save news')
-            return False
-        
-        # Update file status
-        update_file_status(file_id, 'completed', transcription=transcription, confidence=confidence)
-        
-        logger.info(f"✅ Successfully processed file {file_id} → news_id: {news_id}")
-        return True
+        
+        stt_result = file_info.get('stt_result')
+        if not stt_result:
+            stt_service = STTService()
+            
+            logger.info("Step 1: Transcribing audio...")
+            prepared = stt_service.prepare_audio(full_url)
+            stt_result = _transcribe_stage(stt_service, prepared)
+        
+        logger.info("Step 2: Refining + classifying...")
+        refined = _refine_stage(NewsRefiner(), stt_result['text'])
+        
+        logger.info("Step 4: Saving news...")
+        return _save_stage(file_info, stt_result, refined)
         
     except Exception as e:
         logger.error(f"Error processing file {file_id}: {e}")
@@ -297,6 +520,83 @@ def process_audio_file(file_info: dict) -> bool:
         traceback.print_exc()
         update_file_status(file_id, 'failed', str(e))
         return False
+        
+    finally:
+        if prepared:
+            stt_service.release(prepared)
+
+
+def _process_claimed_files(claimed: List[Dict]) -> Dict:
+    """
+    Pipeline للملفات المحجوزة:
+    prepare (تنزيل + ffmpeg) → STT → Refine/Classify → save
+    
+    كل مرحلة بتبلش أول ما تخلص اللي قبلها للملف نفسه، فتنزيل الملف التالي
+    بيتداخل مع STT/Gemini للملف الحالي
+    """
+    from app.services.generators.stt_service import STTService
+    from app.services.processing.news_refiner import NewsRefiner
+    
+    stats = {'success': 0, 'failed': 0}
+    
+    stt_service = STTService()
+    refiner = NewsRefiner()
+    
+    with ThreadPoolExecutor(max_workers=AUDIO_JOB_PREPARE_WORKERS) as prepare_pool, \
+            ThreadPoolExecutor(max_workers=AUDIO_JOB_WORKERS) as work_pool:
+        
+        pending = {}
+        for file_info in claimed:
+            full_url = _start_file(file_info)
+            if not full_url:
+                stats['success' if file_info.get('already_done') else 'failed'] += 1
+                continue
+            
+            # نص جاهز من نسخة مطابقة: مباشرة للـ refine
+            if file_info.get('stt_result'):
+                future = work_pool.submit(_refine_stage, refiner, file_info['stt_result']['text'])
+                pending[future] = ('refine', file_info, {'stt': file_info['stt_result']})
+                continue
+            
+            future = prepare_pool.submit(stt_service.prepare_audio, full_url)
+            pending[future] = ('prepare', file_info, {})
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                stage, file_info, state = pending.pop(future)
+                file_id = file_info['id']
+                
+                try:
+                    value = future.result()
+                except Exception as e:
+                    logger.error(f"{stage} failed for file {file_id}: {e}")
+                    stt_service.release(state.get('prepared'))
+                    update_file_status(file_id, 'failed', str(e))
+                    stats['failed'] += 1
+                    continue
+                
+                touch_claim(file_id)
+                
+                if stage == 'prepare':
+                    state['prepared'] = value
+                    future = work_pool.submit(_transcribe_stage, stt_service, value)
+                    pending[future] = ('stt', file_info, state)
+                
+                elif stage == 'stt':
+                    stt_service.release(state.pop('prepared'))
+                    state['stt'] = value
+                    future = work_pool.submit(_refine_stage, refiner, value['text'])
+                    pending[future] = ('refine', file_info, state)
+                
+                else:
+                    if _save_stage(file_info, state['stt'], value):
+                        stats['success'] += 1
+                    else:
+                        stats['failed'] += 1
+    
+    return stats
 
 
 def run_audio_transcription_job():
@@ -310,39 +610,37 @@ def run_audio_transcription_job():
     # Fix old records with relative paths
     fix_relative_paths()
     
-    # Get pending files
-    pending_files = get_pending_audio_files()
+    # Files left in 'processing' by a crashed worker go back to the queue
+    release_stale_claims()
     
-    if not pending_files:
+    # Claim files (other workers skip them)
+    claimed = claim_pending_files(AUDIO_JOB_BATCH_SIZE)
+    
+    if not claimed:
         logger.info("No pending audio files to process")
         return {'processed': 0, 'success': 0, 'failed': 0}
     
-    logger.info(f"Found {len(pending_files)} files to process")
-    
-    success_count = 0
-    failed_count = 0
+    logger.info(f"Claimed {len(claimed)} files "
+                f"({AUDIO_JOB_PREPARE_WORKERS} prepare / {AUDIO_JOB_WORKERS} STT workers)")
     
-    for file_info in pending_files:
-        try:
-            if process_audio_file(file_info):
-                success_count += 1
-            else:
-                failed_count += 1
-        except Exception as e:
-            logger.error(f"Unexpected error processing file {file_info['id']}: {e}")
-            failed_count += 1
+    try:
+        stats = _process_claimed_files(claimed)
+    except Exception as e:
+        # الملفات اللي ما خلصت بتضل 'processing' وبترجع بعد انتهاء الحجز
+        logger.error(f"Unexpected error in transcription pipeline: {e}")
+        stats = {'success': 0, 'failed': len(claimed)}
     
     logger.info("=" * 60)
-    logger.info(f"🎙️ Audio Transcription Job Complete")
-    logger.info(f"   Processed: {len(pending_files)}")
-    logger.info(f"   Success: {success_count}")
-    logger.info(f"   Failed: {failed_count}")
+    logger.info("🎙️ Audio Transcription Job Complete")
+    logger.info(f"   Processed: {len(claimed)}")
+    logger.info(f"   Success: {stats['success']}")
+    logger.info(f"   Failed: {stats['failed']}")
     logger.info("=" * 60)
     
     return {
-        'processed': len(pending_files),
-        'success': success_count,
-        'failed': failed_count
+        'processed': len(claimed),
+        'success': stats['success'],
+        'failed': stats['failed']
     }
 
 
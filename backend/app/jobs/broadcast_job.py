@@ -113,14 +113,10 @@ def generate_broadcast(config_code: str = None) -> Dict:
                 # توليد الصوت
                 _generate_audio_for_broadcast(result)
         else:
-            # توليد كل المستحق
+            # توليد كل المستحق (بالتوازي)، والصوت لكل بث جديد
+            # يشتغل داخل نفس الـ worker فيتداخل مع توليد باقي البثات
             logger.info("🔄 Checking all due broadcasts...")
-            results = generator.generate_all_due()
-            
-            # توليد الصوت لكل بث جديد
-            for code, result in results.items():
-                if result.success and not result.skipped:
-                    _generate_audio_for_broadcast(result)
+            results = generator.generate_all_due(on_generated=_generate_audio_for_broadcast)
         
         # تحديث next_run_at بعد التوليد الناجح
         if results and any(r.success and not r.skipped for r in results.values()):
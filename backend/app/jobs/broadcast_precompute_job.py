@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+⚡ Broadcast Precompute Job (Condition-Based)
+
+Condition: يشتغل فقط إذا في تقارير بدون مقاطع نشرة محدثة
+Tables: generated_report, report_broadcast_segments
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from datetime import datetime
+import psycopg2
+from settings import DB_CONFIG
+from app.services.generators.broadcast_segments import SEGMENT_KINDS, SEGMENT_MAX_FAILURES
+
+# Logging setup
+log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
+os.makedirs(log_dir, exist_ok=True)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'broadcast_precompute_job.log'), encoding='utf-8'),
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONDITION CHECK
+# =============================================================================
+
+def has_reports_without_segments(hours: int = 48) -> tuple:
+    """
+    ✅ Condition: هل في تقارير جديدة أو معدلة بدون مقاطع؟
+    Tables: generated_report, report_broadcast_segments, report_broadcast_segment_failures
+
+    المقارنة بالبصمة (نفس compute_content_hash) مش بـ updated_at:
+    تحديث الحالة وقت النشر بيغير updated_at بدون ما يتغير النص.
+    التقارير اللي وصلت SEGMENT_MAX_FAILURES بنفس البصمة ما بتنحسب
+    """
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+
+        # أول تشغيل: الجدول لسا ما انعمل → في شغل
+        cursor.execute("""
+            SELECT to_regclass('report_broadcast_segments'), to_regclass('report_broadcast_segment_failures')
+        """)
+        if None in cursor.fetchone():
+            cursor.close()
+            conn.close()
+            return True, 0
+
+        cursor.execute("""
+            WITH recent AS (
+                SELECT gr.id, encode(sha256(convert_to(
+                    COALESCE(gr.title, '') || E'\\n' || COALESCE(gr.content, ''), 'UTF8'
+                )), 'hex') AS content_hash
+                FROM generated_report gr
+                WHERE gr.created_at >= NOW() - INTERVAL '%s hours'
+                AND gr.content IS NOT NULL
+                AND LENGTH(gr.content) > 100
+            )
+            SELECT COUNT(*) FROM recent r
+            WHERE (
+                SELECT COUNT(*) FROM report_broadcast_segments s
+                WHERE s.report_id = r.id
+                AND s.segment_kind = ANY(%s)
+                AND s.content_hash = r.content_hash
+            ) < %s
+            AND NOT EXISTS (
+                SELECT 1 FROM report_broadcast_segment_failures f
+                WHERE f.report_id = r.id
+                AND f.content_hash = r.content_hash
+                AND f.failure_count >= %s
+            )
+        """, (hours, list(SEGMENT_KINDS), len(SEGMENT_KINDS), SEGMENT_MAX_FAILURES))
+
+        count = cursor.fetchone()[0]
+        cursor.close()
+        conn.close()
+
+        return count > 0, count
+
+    except Exception as e:
+        logger.error(f"Error checking reports without segments: {e}")
+        return False, 0
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def precompute_broadcast_segments() -> dict:
+    """Main broadcast precompute function"""
+    start_time = datetime.now()
+
+    logger.info("=" * 60)
+    logger.info(f"⚡ Broadcast Precompute Job started at {start_time}")
+
+    # ✅ Condition Check
+    has_work, reports_count = has_reports_without_segments(hours=48)
+
+    if not has_work:
+        logger.info("⏭️ All reports have broadcast segments, skipping")
+        logger.info("=" * 60)
+        return {'skipped': True, 'reason': 'no_new_data'}
+
+    logger.info(f"📊 Found {reports_count} reports needing segments")
+
+    precomputer = None
+    try:
+        from app.services.generators.broadcast_precompute import BroadcastPrecomputer
+
+        precomputer = BroadcastPrecomputer()
+
+        stats = precomputer.precompute_recent(hours_back=48, limit=20)
+
+        duration = (datetime.now() - start_time).total_seconds()
+
+        logger.info(f"✅ Broadcast precompute completed in {duration:.2f}s")
+        logger.info(f"📊 Reports processed: {stats.get('total_reports', 0)}")
+        logger.info(f"📊 Segments saved: {stats.get('segments', 0)}")
+        logger.info(f"📊 Segment audio: {stats.get('audio', 0)}")
+        logger.info(f"📊 Failed: {stats.get('failed', 0)}")
+        logger.info(f"📊 Skipped after {SEGMENT_MAX_FAILURES} failures: {stats.get('gave_up', 0)}")
+        logger.info("=" * 60)
+
+        return {
+            'skipped': False,
+            'duration': duration,
+            'processed': stats.get('total_reports', 0),
+            'stats': stats
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Broadcast precompute failed: {e}")
+        import traceback
+        traceback.print_exc()
+        logger.info("=" * 60)
+        return {'skipped': False, 'error': str(e)}
+
+    finally:
+        if precomputer:
+            try:
+                precomputer.close()
+            except:
+                pass
+
+
+if __name__ == "__main__":
+    precompute_broadcast_segments()
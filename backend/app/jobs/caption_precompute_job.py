@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+✍️ Caption Precompute Job (Condition-Based)
+
+Condition: يشتغل فقط إذا في محتوى سوشال/ريل أحدث من الـ caption الجاهز للنشر
+Tables: generated_report, generated_content, report_publish_captions
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from datetime import datetime
+import psycopg2
+from settings import DB_CONFIG
+from app.services.publishers.publish_captions import missing_caption_kinds
+from app.services.publishers.publish_data import (
+    REEL_CONTENT_TYPE_ID,
+    SOCIAL_CONTENT_TYPE_ID,
+    DBPublishDataProvider,
+)
+
+# Logging setup
+log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
+os.makedirs(log_dir, exist_ok=True)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'caption_precompute_job.log'), encoding='utf-8'),
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONDITION CHECK
+# =============================================================================
+
+def has_reports_without_captions(hours: int = 48) -> tuple:
+    """
+    ✅ Condition: هل في محتوى سوشال/ريل جديد بدون caption جاهز؟
+    Tables: generated_report, generated_content, report_publish_captions
+
+    نفس فحص CaptionPrecomputer (بصمة + نسخة لكل نوع): إذا نوع واحد فشل
+    (مثلاً انستغرام) والباقي انحفظ، التقرير بيضل بالشغل
+    """
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+
+        # أول تشغيل: الجدول لسا ما انعمل → في شغل
+        cursor.execute("SELECT to_regclass('report_publish_captions')")
+        if cursor.fetchone()[0] is None:
+            cursor.close()
+            conn.close()
+            return True, 0
+
+        cursor.execute("""
+            SELECT DISTINCT gr.id FROM generated_report gr
+            JOIN generated_content gc ON gc.report_id = gr.id AND gc.content_type_id IN (%s, %s)
+            WHERE gr.created_at >= NOW() - INTERVAL '%s hours'
+        """, (SOCIAL_CONTENT_TYPE_ID, REEL_CONTENT_TYPE_ID, hours))
+        report_ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+
+        bundles = DBPublishDataProvider(conn).load_many(report_ids)
+        count = sum(1 for data in bundles.values() if missing_caption_kinds(data))
+        conn.close()
+
+        return count > 0, count
+
+    except Exception as e:
+        logger.error(f"Error checking reports without captions: {e}")
+        return False, 0
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def precompute_publish_captions() -> dict:
+    """Main caption precompute function"""
+    start_time = datetime.now()
+
+    logger.info("=" * 60)
+    logger.info(f"✍️ Caption Precompute Job started at {start_time}")
+
+    # ✅ Condition Check
+    has_work, reports_count = has_reports_without_captions(hours=48)
+
+    if not has_work:
+        logger.info("⏭️ All reports have publish captions, skipping")
+        logger.info("=" * 60)
+        return {'skipped': True, 'reason': 'no_new_data'}
+
+    logger.info(f"📊 Found {reports_count} reports needing captions")
+
+    precomputer = None
+    try:
+        from app.services.generators.caption_precompute import CaptionPrecomputer
+
+        precomputer = CaptionPrecomputer()
+
+        stats = precomputer.precompute_recent(hours_back=48, limit=20)
+
+        duration = (datetime.now() - start_time).total_seconds()
+
+        logger.info(f"✅ Caption precompute completed in {duration:.2f}s")
+        logger.info(f"📊 Reports processed: {stats.get('total_reports', 0)}")
+        logger.info(f"📊 Captions saved: {stats.get('captions', 0)}")
+        logger.info(f"📊 Failed: {stats.get('failed', 0)}")
+        logger.info("=" * 60)
+
+        return {
+            'skipped': False,
+            'duration': duration,
+            'processed': stats.get('total_reports', 0),
+            'stats': stats
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Caption precompute failed: {e}")
+        import traceback
+        traceback.print_exc()
+        logger.info("=" * 60)
+        return {'skipped': False, 'error': str(e)}
+
+    finally:
+        if precomputer:
+            try:
+                precomputer.close()
+            except:
+                pass
+
+
+if __name__ == "__main__":
+    precompute_publish_captions()
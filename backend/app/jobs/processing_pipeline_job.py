@@ -5,9 +5,11 @@
 يشتغل كل 20 دقيقة ويعمل كل المراحل بالترتيب:
 1. Clustering
 2. Report Generation  
-3. Social Media
-4. Image Generation
-5. Audio Generation
+3. Broadcast Segments (تجهيز مسبق للنشرة)
+4. Social Media
+5. Publish Captions (تجهيز مسبق لنص النشر)
+6. Image Generation
+7. Audio Generation
 
 كل مرحلة تشتغل بس إذا اللي قبلها خلص
 """
@@ -173,7 +175,9 @@ def run_processing_pipeline() -> dict:
         stages = [
             ('clustering', 'Clustering'),
             ('reports', 'Report Generation'),
+            ('broadcast_segments', 'Broadcast Segments'),
             ('social_media', 'Social Media'),
+            ('captions', 'Publish Captions'),
             ('images', 'Image Generation'),
             ('audio', 'Audio Generation')
         ]
@@ -259,10 +263,18 @@ def run_stage(stage: str) -> dict:
             from app.jobs.reports_job import generate_reports
             return generate_reports()
             
+        elif stage == 'broadcast_segments':
+            from app.jobs.broadcast_precompute_job import precompute_broadcast_segments
+            return precompute_broadcast_segments()
+            
         elif stage == 'social_media':
             from app.jobs.social_media_job import generate_social_media_content
             return generate_social_media_content()
             
+        elif stage == 'captions':
+            from app.jobs.caption_precompute_job import precompute_publish_captions
+            return precompute_publish_captions()
+            
         elif stage == 'images':
             from app.jobs.image_generation_job import generate_images
             return generate_images()
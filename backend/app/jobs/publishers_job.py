@@ -13,12 +13,14 @@
 Publishing Limits:
 - Social Media (FB + IG): 1 تقرير/دورة (بوست + ريل لكل منصة)
 - Telegram: 3 تقارير/دورة
+
+التقارير بتنضاف لطابور النشر (publish_queue) والمنصات بتنشر بالتوازي،
+والفواصل بين المنشورات من الـ token buckets (publish_limits) بدل sleep ثابت
 ═══════════════════════════════════════════════════════════════
 """
 
 import os
 import sys
-import time
 import logging
 import psycopg2
 import json
@@ -33,7 +35,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from settings import DB_CONFIG
 from app.services.publishers.facebook_publisher import FacebookPublisher
 from app.services.publishers.instagram_publisher import InstagramPublisher
+from app.services.publishers.instagram_container_poller import IG_CONTAINER_DRAIN_TIMEOUT
 from app.services.publishers.publish_telegram import TelegramPublisher
+from app.services.publishers.publish_limits import get_publish_limits
+from app.services.publishers.publish_scheduler import PublishScheduler
+from app.utils.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -496,9 +502,6 @@ class PublishersJob:
                     else:
                         logger.error(f"❌ {platform.title()} failed: {result.get('message', 'Unknown error')}")
                 
-                # Longer delay between platforms to avoid rate limiting
-                time.sleep(5)  # زيادة من 2 إلى 5 ثواني
-                
             except Exception as e:
                 error_msg = str(e)
                 results[platform] = {'success': False, 'message': error_msg}
@@ -971,51 +974,47 @@ class PublishersJob:
         logger.info(f"{'='*70}")
         
         start_time = datetime.now()
-        all_results = []
+        scheduler = PublishScheduler(self)
         
         # ═══════════════════════════════════════════════════════════
-        # 1. نشر على Social Media (Facebook + Instagram) - 1 تقرير فقط
+        # 1. طابور Social Media (Facebook + Instagram) - 1 تقرير فقط
         # ═══════════════════════════════════════════════════════════
         logger.info(f"\n{'─'*70}")
-        logger.info(f"📘 Phase 1: Social Media Publishing (FB + IG)")
+        logger.info("📘 Phase 1: Queue Social Media (FB + IG)")
         logger.info(f"{'─'*70}")
         
         social_reports = self.get_reports_ready_for_publishing('social_media')
         
         if social_reports:
-            logger.info(f"📊 Publishing {len(social_reports)} report(s) to Social Media...")
-            
-            for report_id, status, created_at in social_reports:
-                result = self.publish_to_social_media_only(report_id, status)
-                all_results.append(result)
-                
-                # تأخير بين التقارير لتجنب rate limiting
-                if len(social_reports) > 1:
-                    time.sleep(60)  # دقيقة بين كل تقرير
+            for platform in ('facebook', 'instagram'):
+                scheduler.enqueue(platform, social_reports)
+            logger.info(f"📊 Queued {len(social_reports)} report(s) for Social Media")
         else:
-            logger.info("📭 No reports for Social Media")
+            logger.info("📭 No new reports for Social Media")
         
         # ═══════════════════════════════════════════════════════════
-        # 2. نشر على Telegram - 3 تقارير
+        # 2. طابور Telegram - 3 تقارير
         # ═══════════════════════════════════════════════════════════
         logger.info(f"\n{'─'*70}")
-        logger.info(f"📱 Phase 2: Telegram Publishing")
+        logger.info("📱 Phase 2: Queue Telegram")
         logger.info(f"{'─'*70}")
         
         telegram_reports = self.get_reports_ready_for_publishing('telegram')
         
         if telegram_reports:
-            logger.info(f"📊 Publishing {len(telegram_reports)} report(s) to Telegram...")
-            
-            for report_id, status, created_at in telegram_reports:
-                result = self.publish_to_telegram_only(report_id, status)
-                all_results.append(result)
-                
-                # تأخير صغير بين التقارير
-                if len(telegram_reports) > 1:
-                    time.sleep(5)  # 5 ثواني بين كل تقرير
+            scheduler.enqueue('telegram', telegram_reports)
+            logger.info(f"📊 Queued {len(telegram_reports)} report(s) for Telegram")
         else:
-            logger.info("📭 No reports for Telegram")
+            logger.info("📭 No new reports for Telegram")
+        
+        # ═══════════════════════════════════════════════════════════
+        # 3. نشر كل المنصات بالتوازي حسب الـ buckets (ومعها retries الدورات السابقة)
+        # ═══════════════════════════════════════════════════════════
+        logger.info(f"\n{'─'*70}")
+        logger.info("🚀 Phase 3: Publishing (platforms in parallel)")
+        logger.info(f"{'─'*70}")
+        
+        all_results = self._collect_results(scheduler.run())
         
         # ═══════════════════════════════════════════════════════════
         # 3. حساب الملخص
@@ -1043,6 +1042,9 @@ class PublishersJob:
         logger.info(f"Platform stats:")
         for platform, count in platform_stats.items():
             logger.info(f"  {platform.title()}: {count}/{total_reports}")
+        logger.info(f"HTTP: {get_http_client().summary()}")
+        logger.info(f"Rate limits: {get_publish_limits().summary()}")
+        logger.info(f"Queue: {scheduler.queue_stats()}")
         
         # Facebook detailed stats (post vs video)
         fb_post_success = sum(1 for r in all_results if (r.get('facebook_post') or {}).get('success', False))
@@ -1075,6 +1077,31 @@ class PublishersJob:
             'results': results
         }
     
+    def _collect_results(self, items: List[Dict]) -> List[Dict]:
+        """نتائج الطابور (تقرير، منصة) → نتيجة لكل تقرير بنفس شكل publish_to_*_only"""
+        reports: Dict[int, Dict] = {}
+        
+        for item in items:
+            entry = reports.setdefault(item['report_id'], {
+                'report_id': item['report_id'],
+                'overall_success': False,
+                'published_platforms': []
+            })
+            result = item['result']
+            platform = item['platform']
+            
+            if platform == 'facebook':
+                entry['facebook_post'] = result.get('post') or result
+                entry['facebook_video'] = result.get('video') or {'success': False, 'message': 'Not attempted'}
+            else:
+                entry[platform] = result
+            
+            if item['success']:
+                entry['published_platforms'].append(platform)
+                entry['overall_success'] = True
+        
+        return list(reports.values())
+    
     def _update_report_status(self, report_id: int, new_status: str):
         """Update report status in database"""
         
@@ -1178,26 +1205,16 @@ def run_facebook_cycle(limit: int = 1) -> Dict:
         
         # Get reports ready for Facebook
         reports = job.get_reports_ready_for_publishing('facebook', limit=limit)
+        scheduler = PublishScheduler(job)
         
-        if not reports:
-            logger.info("📭 No reports ready for Facebook publishing")
-            return {
-                'success': True,
-                'platform': 'facebook',
-                'reports_processed': 0,
-                'reports_published': 0,
-                'results': []
-            }
-        
-        logger.info(f"📊 Found {len(reports)} report(s) for Facebook")
+        if reports:
+            scheduler.enqueue('facebook', reports)
+            logger.info(f"📊 Found {len(reports)} report(s) for Facebook")
+        else:
+            logger.info("📭 No new reports ready for Facebook publishing")
         
-        for report_id, status, created_at in reports:
-            result = job.publish_to_facebook_only(report_id, status)
-            results.append(result)
-            
-            # Delay between reports
-            if len(reports) > 1:
-                time.sleep(30)
+        # الجديد + retries الدورات السابقة، بسرعة الـ buckets
+        results = job._collect_results(scheduler.run(['facebook']))
         
         # Calculate stats
         successful = sum(1 for r in results if r.get('overall_success', False))
@@ -1229,6 +1246,28 @@ def run_facebook_cycle(limit: int = 1) -> Dict:
         }
 
 
+def _drain_instagram_containers(job: 'PublishersJob', timeout: float = IG_CONTAINER_DRAIN_TIMEOUT) -> Dict:
+    """
+    نشر containers الريلز المعلقة (من هالدورة أو من قبل restart) لحد timeout
+
+    اللي ما خلص بيضل محفوظ بالـ DB للدورة الجاية
+    """
+    publisher = job.publishers.get('instagram')
+    if not publisher or is_publishing_paused('instagram'):
+        return {}
+    
+    try:
+        containers = publisher.drain_pending_containers(timeout=timeout)
+    except Exception as e:
+        logger.error(f"❌ Instagram container polling failed: {e}")
+        return {}
+    
+    if containers['published'] or containers['failed'] or containers['pending']:
+        logger.info(f"🎬 Instagram containers: {containers['published']} published, "
+                    f"{containers['failed']} failed, {containers['pending']} still processing")
+    return containers
+
+
 def run_instagram_cycle(limit: int = 1) -> Dict:
     """
     دورة نشر منفصلة للانستغرام فقط
@@ -1252,26 +1291,19 @@ def run_instagram_cycle(limit: int = 1) -> Dict:
         
         # Get reports ready for Instagram
         reports = job.get_reports_ready_for_publishing('instagram', limit=limit)
+        scheduler = PublishScheduler(job)
         
-        if not reports:
-            logger.info("📭 No reports ready for Instagram publishing")
-            return {
-                'success': True,
-                'platform': 'instagram',
-                'reports_processed': 0,
-                'reports_published': 0,
-                'results': []
-            }
-        
-        logger.info(f"📊 Found {len(reports)} report(s) for Instagram")
+        if reports:
+            scheduler.enqueue('instagram', reports)
+            logger.info(f"📊 Found {len(reports)} report(s) for Instagram")
+        else:
+            logger.info("📭 No new reports ready for Instagram publishing")
         
-        for report_id, status, created_at in reports:
-            result = job.publish_to_instagram_only(report_id, status)
-            results.append(result)
-            
-            # Delay between reports
-            if len(reports) > 1:
-                time.sleep(30)
+        # الجديد + retries الدورات السابقة، بسرعة الـ buckets
+        results = job._collect_results(scheduler.run(['instagram']))
+
+        # الريلز اللي لسا بتتعالج بتنشر سوا
+        containers = _drain_instagram_containers(job)
         
         # Calculate stats
         successful = sum(1 for r in results if r.get('overall_success', False))
@@ -1288,6 +1320,7 @@ def run_instagram_cycle(limit: int = 1) -> Dict:
             'platform': 'instagram',
             'reports_processed': len(results),
             'reports_published': successful,
+            'containers': containers,
             'duration_seconds': duration,
             'results': results
         }
@@ -1326,26 +1359,16 @@ def run_telegram_cycle(limit: int = 10) -> Dict:
         
         # Get reports ready for Telegram
         reports = job.get_reports_ready_for_publishing('telegram', limit=limit)
+        scheduler = PublishScheduler(job)
         
-        if not reports:
-            logger.info("📭 No reports ready for Telegram publishing")
-            return {
-                'success': True,
-                'platform': 'telegram',
-                'reports_processed': 0,
-                'reports_published': 0,
-                'results': []
-            }
-        
-        logger.info(f"📊 Found {len(reports)} report(s) for Telegram")
+        if reports:
+            scheduler.enqueue('telegram', reports)
+            logger.info(f"📊 Found {len(reports)} report(s) for Telegram")
+        else:
+            logger.info("📭 No new reports ready for Telegram publishing")
         
-        for report_id, status, created_at in reports:
-            result = job.publish_to_telegram_only(report_id, status)
-            results.append(result)
-            
-            # Delay between reports
-            if len(reports) > 1:
-                time.sleep(5)
+        # الجديد + retries الدورات السابقة، بسرعة الـ buckets
+        results = job._collect_results(scheduler.run(['telegram']))
         
         # Calculate stats
         successful = sum(1 for r in results if r.get('overall_success', False))
@@ -1390,14 +1413,15 @@ def run_separate_cycles() -> Dict:
     
     start_time = datetime.now()
     
-    # Run each platform separately
-    facebook_result = run_facebook_cycle(limit=1)
-    time.sleep(10)  # Delay between platforms
-    
-    instagram_result = run_instagram_cycle(limit=1)
-    time.sleep(10)
+    # كل منصة بدورتها بالتوازي - الفواصل من الـ buckets (graph مشترك بين FB و IG)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        facebook_future = executor.submit(run_facebook_cycle, limit=1)
+        instagram_future = executor.submit(run_instagram_cycle, limit=1)
+        telegram_future = executor.submit(run_telegram_cycle, limit=10)
     
-    telegram_result = run_telegram_cycle(limit=10)
+    facebook_result = facebook_future.result()
+    instagram_result = instagram_future.result()
+    telegram_result = telegram_future.result()
     
     duration = (datetime.now() - start_time).total_seconds()
     
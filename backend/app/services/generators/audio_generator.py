@@ -11,6 +11,7 @@ import os
 import sys
 import time
 import psycopg2
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 from typing import Dict, Optional
 from dataclasses import dataclass
@@ -26,6 +27,21 @@ except ImportError:
     print("   Run: pip install google-cloud-texttospeech")
     sys.exit(1)
 
+from app.services.generators.audio_stitcher import is_stitching_available, stitch_linear16_to_mp3
+from app.services.generators.tts_cache import (
+    TTS_CACHE_ENABLED,
+    TTSCache,
+    synthesize_sentences,
+)
+from app.services.generators.tts_rate_limiter import get_tts_rate_limiter, is_rate_limit_error
+from app.services.generators.tts_segmenter import split_cacheable_sentences
+
+
+# عدد التقارير اللي بتتولد بنفس الوقت (1 = بالترتيب)
+# عدد الطلبات الفعلي على Google محكوم بـ TTS_REQUESTS_PER_MINUTE
+AUDIO_MAX_WORKERS = int(os.getenv('AUDIO_MAX_WORKERS', 3))
+AUDIO_UPLOAD_WORKERS = int(os.getenv('AUDIO_UPLOAD_WORKERS', 2))
+
 
 @dataclass
 class AudioGenerationResult:
@@ -68,6 +84,15 @@ class AudioGenerator:
             print(f"❌ S3 client initialization failed: {e}")
             raise
         
+        # كاش صوت الجمل (disk + S3) - بيحتاج ffmpeg للدمج
+        self.tts_cache = None
+        if TTS_CACHE_ENABLED and is_stitching_available():
+            try:
+                self.tts_cache = TTSCache(self.s3_client, self.bucket_name)
+                print("✅ TTS sentence cache enabled")
+            except Exception as e:
+                print(f"⚠️ TTS cache disabled: {e}")
+        
         # تهيئة Google Text-to-Speech Client
         try:
             credentials_json = os.getenv('GOOGLE_CREDENTIALS_JSON')
@@ -101,6 +126,9 @@ class AudioGenerator:
             print(f"❌ Google TTS client failed: {e}")
             raise
         
+        # حد طلبات TTS مشترك بين كل الـ threads
+        self.rate_limiter = get_tts_rate_limiter()
+        
         # Content Type ID for Generated Audio
         self.content_type_id = 7
     
@@ -153,21 +181,7 @@ class AudioGenerator:
         s3_url = generation_result.audio_url
         
         # حفظ في قاعدة البيانات
-        if existing_audio:
-            success = self._update_audio_record(
-                content_id=existing_audio['id'],
-                report_id=report_id,
-                s3_url=s3_url,
-                text_content=broadcast_text
-            )
-            action = "Updated"
-        else:
-            success = self._save_audio_record(
-                report_id=report_id,
-                s3_url=s3_url,
-                text_content=broadcast_text
-            )
-            action = "Created"
+        success, action = self._save_result(report_id, existing_audio, s3_url, broadcast_text)
         
         if success:
             print(f"✅ {action} database record")
@@ -182,12 +196,42 @@ class AudioGenerator:
                 error_message=f"Failed to {action.lower()} database record"
             )
     
+    def _save_result(
+        self,
+        report_id: int,
+        existing_audio: Optional[Dict],
+        s3_url: str,
+        text_content: str
+    ):
+        """حفظ/تحديث سجل الصوت → (نجاح, Created/Updated)"""
+        if existing_audio:
+            success = self._update_audio_record(
+                content_id=existing_audio['id'],
+                report_id=report_id,
+                s3_url=s3_url,
+                text_content=text_content
+            )
+            return success, "Updated"
+        
+        success = self._save_audio_record(
+            report_id=report_id,
+            s3_url=s3_url,
+            text_content=text_content
+        )
+        return success, "Created"
+    
     def generate_for_all_reports(
         self,
         force_update: bool = False,
-        limit: int = 10
+        limit: int = 10,
+        max_workers: int = None
     ) -> Dict:
-        """توليد صوت لكل التقارير"""
+        """
+        توليد صوت لكل التقارير
+        
+        Args:
+            max_workers: تقارير بنفس الوقت (افتراضي AUDIO_MAX_WORKERS، 1 = بالترتيب)
+        """
         print(f"\n{'='*70}")
         print(f"🎙️ Generating Audio for All Reports")
         print(f"{'='*70}")
@@ -216,37 +260,114 @@ class AudioGenerator:
             'updated': 0
         }
         
-        for i, report in enumerate(reports, 1):
-            print(f"\n[{i}/{len(reports)}] Report #{report['id']}")
-            
-            result = self.generate_for_report(
-                report_id=report['id'],
-                force_update=force_update
-            )
-            
-            if result.success:
-                if force_update:
-                    stats['updated'] += 1
-                else:
-                    stats['success'] += 1
-            else:
-                stats['failed'] += 1
-            
-            # تأخير بين الطلبات
-            if i < len(reports):
-                print("   ⏳ Waiting 5 seconds...")
-                time.sleep(5)
+        workers = max_workers or AUDIO_MAX_WORKERS
+        
+        if workers > 1 and len(reports) > 1:
+            self._generate_concurrently(reports, force_update, workers, stats)
+        else:
+            # بالترتيب - الـ rate limiter بيحدد الإيقاع بدل sleep ثابت
+            for i, report in enumerate(reports, 1):
+                print(f"\n[{i}/{len(reports)}] Report #{report['id']}")
+                
+                result = self.generate_for_report(
+                    report_id=report['id'],
+                    force_update=force_update
+                )
+                self._count_result(stats, result.success, force_update)
         
+        limiter_stats = self.rate_limiter.stats
         print(f"\n{'='*70}")
         print(f"📊 Final Results:")
         print(f"   • Reports: {stats['total_reports']}")
         print(f"   • Success: {stats['success']}")
         print(f"   • Updated: {stats['updated']}")
         print(f"   • Failed: {stats['failed']}")
+        print(f"   • TTS requests: {limiter_stats['requests']} "
+              f"(rate limited: {limiter_stats['rate_limited']}, "
+              f"waited: {limiter_stats['waited_seconds']:.1f}s)")
         print(f"{'='*70}")
         
         return stats
     
+    @staticmethod
+    def _count_result(stats: Dict, success: bool, force_update: bool):
+        if success:
+            if force_update:
+                stats['updated'] += 1
+            else:
+                stats['success'] += 1
+        else:
+            stats['failed'] += 1
+    
+    def _generate_concurrently(
+        self,
+        reports: list,
+        force_update: bool,
+        workers: int,
+        stats: Dict
+    ):
+        """
+        توليد الصوت لعدة تقارير بنفس الوقت:
+        - التوليد بـ pool (محكوم بالـ rate limiter المشترك)
+        - الرفع على S3 بـ pool ثاني، فبيتداخل مع توليد التقارير الباقية
+        - قاعدة البيانات من الـ thread الرئيسي بس (connection واحد)
+        """
+        jobs = []
+        for report in reports:
+            existing_audio = self._get_existing_audio(report['id'])
+            
+            if existing_audio and not force_update:
+                print(f"⏭️  Report #{report['id']}: audio already exists (ID: {existing_audio['id']})")
+                self._count_result(stats, True, force_update)
+                continue
+            
+            jobs.append({
+                'report': report,
+                'existing_audio': existing_audio,
+                'text': self._create_broadcast_text(report)
+            })
+        
+        if not jobs:
+            return
+        
+        print(f"⚡ Generating {len(jobs)} reports ({workers} at once, "
+              f"{AUDIO_UPLOAD_WORKERS} uploads)")
+        
+        with ThreadPoolExecutor(max_workers=workers) as synth_pool, \
+             ThreadPoolExecutor(max_workers=AUDIO_UPLOAD_WORKERS) as upload_pool:
+            
+            pending = {
+                synth_pool.submit(self._synthesize_with_retries, job['text']): ('synthesize', job)
+                for job in jobs
+            }
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    stage, job = pending.pop(future)
+                    report_id = job['report']['id']
+                    
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        print(f"❌ Report #{report_id}: {stage} failed: {str(e)[:200]}")
+                        self._count_result(stats, False, force_update)
+                        continue
+                    
+                    if stage == 'synthesize':
+                        print(f"   ✅ Report #{report_id}: audio generated ({len(value):,} bytes)")
+                        upload = upload_pool.submit(self._upload_audio, value, report_id)
+                        pending[upload] = ('upload', job)
+                        continue
+                    
+                    success, action = self._save_result(
+                        report_id, job['existing_audio'], value, job['text']
+                    )
+                    if success:
+                        print(f"   ✅ Report #{report_id}: {action} database record")
+                    self._count_result(stats, success, force_update)
+    
     def _create_broadcast_text(self, report: Dict) -> str:
         """إنشاء نص بصيغة إذاعية"""
         title = report['title']
@@ -268,83 +389,130 @@ class AudioGenerator:
     ) -> AudioGenerationResult:
         """توليد الصوت ورفعه على S3"""
         
+        try:
+            audio_bytes = self._synthesize_with_retries(text, retries)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                return AudioGenerationResult(
+                    success=False,
+                    error_message="Rate limit exceeded"
+                )
+            return AudioGenerationResult(
+                success=False,
+                error_message=f"Generation failed: {str(e)[:300]}"
+            )
+        
+        print(f"   ✅ Audio generated ({len(audio_bytes):,} bytes)")
+        
+        try:
+            s3_url = self._upload_audio(audio_bytes, report_id)
+        except Exception as e:
+            return AudioGenerationResult(
+                success=False,
+                error_message=f"Upload failed: {str(e)[:300]}"
+            )
+        
+        return AudioGenerationResult(
+            success=True,
+            audio_url=s3_url
+        )
+    
+    def _synthesize_with_retries(self, text: str, retries: int = 3) -> bytes:
+        """
+        توليد الصوت مع إعادة المحاولة للأخطاء العادية
+        (الـ 429 بيتعامل معها الـ rate limiter بـ backoff مشترك)
+        
+        Raises:
+            آخر خطأ بعد المحاولات
+        """
         for attempt in range(retries):
             try:
                 print(f"   🎙️ Generating audio (attempt {attempt + 1}/{retries})...")
+                return self._synthesize_audio(text)
                 
-                input_text = texttospeech.SynthesisInput(text=text)
-                
-                voice = texttospeech.VoiceSelectionParams(
-                    language_code="ar-XA",
-                    name="ar-XA-Chirp3-HD-Achernar",
-                    ssml_gender=texttospeech.SsmlVoiceGender.MALE
-                )
+            except Exception as e:
+                print(f"   ⚠️  Error: {str(e)[:300]}")
                 
-                audio_config = texttospeech.AudioConfig(
-                    audio_encoding=texttospeech.AudioEncoding.MP3
-                )
+                # الـ limiter استنفد محاولاته → ما في فايدة نعيد هون
+                if is_rate_limit_error(e) or attempt >= retries - 1:
+                    raise
                 
-                response = self.tts_client.synthesize_speech(
-                    input=input_text,
+                print(f"   🔄 Retrying in 10 seconds...")
+                time.sleep(10)
+    
+    def _synthesize_audio(self, text: str) -> bytes:
+        """طلب TTS واحد (أو جمل من الكاش) → MP3 bytes"""
+        voice = texttospeech.VoiceSelectionParams(
+            language_code="ar-XA",
+            name="ar-XA-Chirp3-HD-Achernar",
+            ssml_gender=texttospeech.SsmlVoiceGender.MALE
+        )
+        
+        if self.tts_cache:
+            return self._synthesize_with_cache(text, voice)
+        
+        input_text = texttospeech.SynthesisInput(text=text)
+        
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.MP3
+        )
+        
+        response = self.rate_limiter.call(
+            lambda: self.tts_client.synthesize_speech(
+                input=input_text,
+                voice=voice,
+                audio_config=audio_config
+            )
+        )
+        
+        return response.audio_content
+    
+    def _upload_audio(self, audio_bytes: bytes, report_id: int) -> str:
+        """رفع MP3 على S3 → الرابط"""
+        # ✅ Upload to S3: generated/audios/
+        timestamp = int(time.time())
+        file_name = f"report_{report_id}_{timestamp}.mp3"
+        s3_key = f"{self.s3_folder}{file_name}"
+        
+        print(f"   📤 Uploading to S3: {s3_key}")
+        
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            Body=audio_bytes,
+            ContentType='audio/mpeg'
+        )
+        
+        s3_url = f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
+        print(f"   ✅ Uploaded successfully: {s3_url}")
+        return s3_url
+    
+    def _synthesize_with_cache(self, text: str, voice) -> bytes:
+        """
+        توليد على مستوى الجملة: الجمل المحفوظة من الكاش والجديدة من Google TTS
+        (عند إعادة التوليد بعد تعديل التقرير، الجمل اللي ما تغيرت ما بتتولد من جديد)
+        الأخطاء بترجع للـ retry loop في _synthesize_with_retries
+        """
+        units = split_cacheable_sentences(text)
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.LINEAR16
+        )
+        
+        def synthesize(sentence: str) -> bytes:
+            response = self.rate_limiter.call(
+                lambda: self.tts_client.synthesize_speech(
+                    input=texttospeech.SynthesisInput(text=sentence),
                     voice=voice,
                     audio_config=audio_config
                 )
-                
-                audio_bytes = response.audio_content
-                print(f"   ✅ Audio generated ({len(audio_bytes):,} bytes)")
-                
-                # ✅ Upload to S3: generated/audios/
-                timestamp = int(time.time())
-                file_name = f"report_{report_id}_{timestamp}.mp3"
-                s3_key = f"{self.s3_folder}{file_name}"
-                
-                print(f"   📤 Uploading to S3: {s3_key}")
-                
-                self.s3_client.put_object(
-                    Bucket=self.bucket_name,
-                    Key=s3_key,
-                    Body=audio_bytes,
-                    ContentType='audio/mpeg'
-                )
-                
-                s3_url = f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
-                print(f"   ✅ Uploaded successfully: {s3_url}")
-                
-                return AudioGenerationResult(
-                    success=True,
-                    audio_url=s3_url
-                )
-                
-            except Exception as e:
-                error_msg = str(e)
-                print(f"   ⚠️  Error: {error_msg[:300]}")
-                
-                if "RESOURCE_EXHAUSTED" in error_msg or "429" in error_msg:
-                    if attempt < retries - 1:
-                        wait_time = 60
-                        print(f"   ⏳ Rate limit hit. Waiting {wait_time} seconds...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        return AudioGenerationResult(
-                            success=False,
-                            error_message="Rate limit exceeded"
-                        )
-                
-                if attempt < retries - 1:
-                    print(f"   🔄 Retrying in 10 seconds...")
-                    time.sleep(10)
-                    continue
-                else:
-                    return AudioGenerationResult(
-                        success=False,
-                        error_message=f"Generation failed: {error_msg[:300]}"
-                    )
+            )
+            return response.audio_content
         
-        return AudioGenerationResult(
-            success=False,
-            error_message="Max retries exceeded"
-        )
+        parts, hits = synthesize_sentences(units, voice.name, 'LINEAR16', synthesize, self.tts_cache)
+        print(f"   🗂️ {len(units)} sentences: {hits} from cache, {len(units) - hits} synthesized")
+        
+        audio_bytes, _ = stitch_linear16_to_mp3(parts)
+        return audio_bytes
     
     def _fetch_report(self, report_id: int) -> Optional[Dict]:
         """جلب تقرير"""
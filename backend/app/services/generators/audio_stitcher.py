@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🔗 Audio Stitcher
+دمج أجزاء TTS بشكل صحيح بدل b''.join لملفات MP3
+
+المشكلة: لصق ملفات MP3 ببعض يعطي ID3/frame headers بالنص ومدة غلط
+الحل:
+- نطلب الأجزاء من Google TTS بصيغة LINEAR16 (WAV header + PCM 16-bit)
+- نفك كل جزء ونلصق الـ PCM (نفس الـ sample rate / channels)
+- نعمل encode لمرة وحدة لـ MP3 عبر ffmpeg (ملف مؤقت حتى ينكتب Xing header بالمدة الصحيحة)
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+from typing import List, Tuple
+
+
+MP3_BITRATE = os.getenv('TTS_MP3_BITRATE', '64k')
+
+_FFMPEG_PATH = shutil.which('ffmpeg')
+
+
+def is_stitching_available() -> bool:
+    """هل ffmpeg موجود للـ encode؟"""
+    return _FFMPEG_PATH is not None
+
+
+def decode_linear16(audio_bytes: bytes) -> Tuple[Tuple[int, int, int], bytes]:
+    """
+    فك جزء LINEAR16 من Google TTS (فيه WAV header)
+
+    Returns:
+        ((channels, sample_width, sample_rate), pcm_bytes)
+    """
+    with wave.open(io.BytesIO(audio_bytes), 'rb') as wav:
+        params = (wav.getnchannels(), wav.getsampwidth(), wav.getframerate())
+        pcm = wav.readframes(wav.getnframes())
+    return params, pcm
+
+
+def join_pcm(chunks: List[bytes]) -> Tuple[Tuple[int, int, int], bytes]:
+    """فك ولصق كل الأجزاء بالترتيب (لازم نفس الـ format)"""
+    params = None
+    pcm_parts = []
+
+    for i, chunk in enumerate(chunks):
+        chunk_params, pcm = decode_linear16(chunk)
+        if params is None:
+            params = chunk_params
+        elif chunk_params != params:
+            raise ValueError(f"Chunk {i} format {chunk_params} differs from {params}")
+        pcm_parts.append(pcm)
+
+    return params, b''.join(pcm_parts)
+
+
+def encode_pcm_to_mp3(pcm: bytes, params: Tuple[int, int, int], bitrate: str = None) -> bytes:
+    """encode واحد لـ MP3 (ffmpeg يكتب لملف مؤقت حتى يحدّث Xing header بالمدة)"""
+    channels, sample_width, sample_rate = params
+    if sample_width != 2:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+
+    fd, output_path = tempfile.mkstemp(suffix='.mp3')
+    os.close(fd)
+
+    try:
+        result = subprocess.run(
+            [
+                _FFMPEG_PATH, '-hide_banner', '-loglevel', 'error',
+                '-f', 's16le', '-ar', str(sample_rate), '-ac', str(channels),
+                '-i', 'pipe:0',
+                '-codec:a', 'libmp3lame', '-b:a', bitrate or MP3_BITRATE,
+                '-y', output_path
+            ],
+            input=pcm,
+            capture_output=True,
+            timeout=300
+        )
+
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'ignore')[:300]}")
+
+        with open(output_path, 'rb') as f:
+            return f.read()
+
+    finally:
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+
+
+def stitch_linear16_to_mp3(chunks: List[bytes], bitrate: str = None) -> Tuple[bytes, float]:
+    """
+    دمج أجزاء LINEAR16 وإخراج MP3 واحد
+
+    Returns:
+        (mp3_bytes, duration_seconds)
+    """
+    if not is_stitching_available():
+        raise RuntimeError("ffmpeg not available for audio stitching")
+
+    params, pcm = join_pcm(chunks)
+    channels, sample_width, sample_rate = params
+    duration = len(pcm) / float(channels * sample_width * sample_rate)
+
+    return encode_pcm_to_mp3(pcm, params, bitrate), duration
+
@@ -19,14 +19,22 @@ import os
 import json
 import re
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+from typing import List, Dict, Optional, Tuple, Callable
+from dataclasses import dataclass, replace
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import psycopg2
 from google import genai
 from dotenv import load_dotenv
 
+from app.utils.title_dedup import BROADCAST_RULE, remove_duplicate_titles
+from app.services.generators.rewrite_cache import (
+    load_cached_rewrites,
+    prepare_rewrite_cache,
+    store_rewrite,
+)
+
 load_dotenv()
 
 # ============================================
@@ -44,6 +52,10 @@ DB_CONFIG = {
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
 
+# توليد البثات المستحقة بالتوازي (كل بث باتصال مستقل)
+BROADCAST_PARALLEL = os.getenv('BROADCAST_PARALLEL', 'true').lower() == 'true'
+BROADCAST_MAX_WORKERS = int(os.getenv('BROADCAST_MAX_WORKERS', 3))
+
 # أولويات العناوين
 HEADLINE_PRIORITIES = [
     ('غزة', 1), ('شهيد', 1), ('شهداء', 1), ('استشهاد', 1), ('مجزرة', 1),
@@ -121,6 +133,72 @@ class BroadcastResult:
     is_morning: bool = True  # صباحي أو مسائي
 
 
+# ============================================
+# Per-Report Rewrites
+# ============================================
+# دوال مستقلة عن الـ generator حتى يستخدمها التجهيز المسبق
+# (broadcast_precompute) بنفس البرومبت بالضبط
+
+def rewrite_headline(client, title: str) -> str:
+    """تحويل عنوان واحد لجملة اسمية قصيرة (يرمي Exception عند فشل Gemini)"""
+    prompt = f"""حوّل هذا العنوان الإخباري إلى جملة اسمية قصيرة للموجز الإذاعي.
+
+العنوان الأصلي: {title}
+
+القواعد:
+1. ابدأ بجملة اسمية (اسم أو مصدر، ليس فعل)
+2. قصير جداً (10-15 كلمة كحد أقصى)
+3. لا تضف معلومات جديدة
+4. أزل أي أقواس أو رموز
+
+أمثلة:
+- "استشهد 10 فلسطينيين في غارة" ← "استشهاد 10 فلسطينيين في غارة إسرائيلية"
+- "أعلنت الوزارة عن خطة جديدة" ← "إعلان وزاري عن خطة جديدة"
+- "تصاعدت الغارات على غزة" ← "تصاعد الغارات الإسرائيلية على غزة"
+
+أعطني العنوان المحوّل فقط بدون أي شرح:"""
+
+    response = client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config={'temperature': 0.2, 'max_output_tokens': 100}
+    )
+    
+    headline = response.text.strip()
+    # تنظيف
+    headline = re.sub(r'^["\'"]|["\'"]$', '', headline)
+    headline = re.sub(r'^\[|\]$', '', headline)
+    headline = re.sub(r'^\(|\)$', '', headline)
+    return headline.strip()
+
+
+def rewrite_broadcast_summary(client, title: str, content: str) -> str:
+    """إعادة صياغة خبر واحد كفقرة إذاعية (يرمي Exception عند فشل Gemini)"""
+    prompt = f"""أعد صياغة هذا الخبر كفقرة إذاعية.
+
+العنوان: {title}
+المحتوى: {content}
+
+التعليمات:
+1. فقرة واحدة متماسكة (4-8 جمل)
+2. لغة عربية فصحى واضحة
+3. ابدأ بالمعلومة الأهم
+4. حافظ على الأرقام والأسماء
+5. لا تضف معلومات
+
+الفقرة:"""
+
+    response = client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config={'temperature': 0.3, 'max_output_tokens': 1000}
+    )
+    summary = response.text.strip()
+    summary = re.sub(r'^#+\s*', '', summary)
+    summary = re.sub(r'\*\*|\*', '', summary)
+    return summary
+
+
 # ============================================
 # Main Generator Class
 # ============================================
@@ -134,6 +212,7 @@ class BroadcastGenerator:
     def __init__(self):
         self.conn = psycopg2.connect(**DB_CONFIG)
         self.cursor = self.conn.cursor()
+        prepare_rewrite_cache(self.conn, self.cursor)
         self.client = genai.Client(api_key=GEMINI_API_KEY)
         print("✅ BroadcastGenerator initialized")
     
@@ -221,12 +300,18 @@ class BroadcastGenerator:
     # 🎯 التوليد الرئيسي
     # ════════════════════════════════════════════════════════════
     
-    def generate(self, config_code: str) -> BroadcastResult:
+    def generate(
+        self,
+        config_code: str,
+        prepared_reports: Optional[List[ReportItem]] = None
+    ) -> BroadcastResult:
         """
         توليد بث حسب الكود
         
         Args:
             config_code: كود الإعدادات ('digest', 'bulletin', etc.)
+            prepared_reports: أخبار مجلوبة ومرتبة مسبقاً لهذه الدورة
+                (من generate_all_due) بدل الجلب والترتيب من جديد
         """
         print("\n" + "="*70)
         print(f"📻 Generating: {config_code}")
@@ -252,8 +337,12 @@ class BroadcastGenerator:
         print(f"   • 🕐 الفترة: {time_period}")
         
         # 2. جلب الأخبار
-        print(f"\n📥 جلب {config.news_count} خبر من آخر {config.hours_back} ساعة...")
-        reports = self._fetch_reports(config.news_count, config.hours_back)
+        if prepared_reports is not None:
+            print(f"\n📥 {len(prepared_reports)} خبر من جلب الدورة المشترك")
+            reports = prepared_reports
+        else:
+            print(f"\n📥 جلب {config.news_count} خبر من آخر {config.hours_back} ساعة...")
+            reports = self._fetch_reports(config.news_count, config.hours_back)
         
         if len(reports) < 3:
             return BroadcastResult(
@@ -271,9 +360,10 @@ class BroadcastGenerator:
         if skip_result:
             return skip_result
         
-        # 4. ترتيب وتصنيف
-        print(f"\n📊 ترتيب وتصنيف الأخبار...")
-        reports = self._prioritize_and_classify(reports)
+        # 4. ترتيب وتصنيف (الجلب المشترك مرتب مسبقاً)
+        if prepared_reports is None:
+            print(f"\n📊 ترتيب وتصنيف الأخبار...")
+            reports = self._prioritize_and_classify(reports)
         
         # 5. معالجة حسب النوع
         if config.content_style == 'headlines':
@@ -307,6 +397,14 @@ class BroadcastGenerator:
     
     def _fetch_reports(self, limit: int, hours_back: int) -> List[ReportItem]:
         """جلب التقارير الأخيرة"""
+        reports = self._query_reports(limit + 5, hours_back)
+        
+        # إزالة التكرار
+        return self._remove_duplicates(reports)[:limit]
+    
+    
+    def _query_reports(self, row_limit: int, hours_back: int) -> List[ReportItem]:
+        """آخر row_limit تقرير من نافذة hours_back (قبل إزالة التكرار)"""
         try:
             self.cursor.execute("""
                 SELECT id, title, content
@@ -316,16 +414,13 @@ class BroadcastGenerator:
                   AND LENGTH(content) > 100
                 ORDER BY created_at DESC
                 LIMIT %s
-            """, (hours_back, limit + 5))
+            """, (hours_back, row_limit))
             
-            reports = [
+            return [
                 ReportItem(id=r[0], title=r[1], content=r[2] or '')
                 for r in self.cursor.fetchall()
             ]
             
-            # إزالة التكرار
-            return self._remove_duplicates(reports)[:limit]
-            
         except Exception as e:
             print(f"❌ Error fetching reports: {e}")
             return []
@@ -333,28 +428,7 @@ class BroadcastGenerator:
     
     def _remove_duplicates(self, reports: List[ReportItem]) -> List[ReportItem]:
         """إزالة الأخبار المكررة"""
-        unique = []
-        seen_titles = []
-        stop_words = {'في', 'من', 'على', 'إلى', 'عن', 'مع', 'أن', 'هذا', 'هذه'}
-        
-        for report in reports:
-            clean = re.sub(r'[^\w\s]', '', report.title.lower())
-            words = [w for w in clean.split() if w not in stop_words and len(w) > 2]
-            
-            is_dup = False
-            for seen in seen_titles:
-                if not words or not seen:
-                    continue
-                common = len(set(words) & set(seen))
-                if common / min(len(words), len(seen)) > 0.5:
-                    is_dup = True
-                    break
-            
-            if not is_dup:
-                unique.append(report)
-                seen_titles.append(words)
-        
-        return unique
+        return remove_duplicate_titles(reports, BROADCAST_RULE)
     
     
     # ════════════════════════════════════════════════════════════
@@ -449,42 +523,23 @@ class BroadcastGenerator:
     def _convert_to_headlines(self, reports: List[ReportItem]) -> List[ReportItem]:
         """تحويل العناوين لجمل اسمية قصيرة"""
         
+        cached = load_cached_rewrites(self.cursor, reports, 'headline_broadcast')
+        if cached:
+            print(f"   ⚡ {len(cached)} عنوان جاهز مسبقاً")
+        
         for i, report in enumerate(reports):
+            if report.id in cached:
+                report.headline = cached[report.id]
+                continue
+            
             print(f"   [{i+1}/{len(reports)}] تحويل: {report.title[:40]}...")
             
-            prompt = f"""حوّل هذا العنوان الإخباري إلى جملة اسمية قصيرة للموجز الإذاعي.
-
-العنوان الأصلي: {report.title}
-
-القواعد:
-1. ابدأ بجملة اسمية (اسم أو مصدر، ليس فعل)
-2. قصير جداً (10-15 كلمة كحد أقصى)
-3. لا تضف معلومات جديدة
-4. أزل أي أقواس أو رموز
-
-أمثلة:
-- "استشهد 10 فلسطينيين في غارة" ← "استشهاد 10 فلسطينيين في غارة إسرائيلية"
-- "أعلنت الوزارة عن خطة جديدة" ← "إعلان وزاري عن خطة جديدة"
-- "تصاعدت الغارات على غزة" ← "تصاعد الغارات الإسرائيلية على غزة"
-
-أعطني العنوان المحوّل فقط بدون أي شرح:"""
-
             try:
-                response = self.client.models.generate_content(
-                    model=GEMINI_MODEL,
-                    contents=prompt,
-                    config={'temperature': 0.2, 'max_output_tokens': 100}
-                )
-                
-                headline = response.text.strip()
-                # تنظيف
-                headline = re.sub(r'^["\'"]|["\'"]$', '', headline)
-                headline = re.sub(r'^\[|\]$', '', headline)
-                headline = re.sub(r'^\(|\)$', '', headline)
-                headline = headline.strip()
+                headline = rewrite_headline(self.client, report.title)
                 
                 if headline and len(headline) > 10:
                     report.headline = headline
+                    store_rewrite(self.conn, self.cursor, report, 'headline_broadcast', headline)
                 else:
                     report.headline = report.title
                     
@@ -506,32 +561,20 @@ class BroadcastGenerator:
     ) -> List[ReportItem]:
         """إعادة صياغة الأخبار للنشرة المفصلة"""
         
+        cached = load_cached_rewrites(self.cursor, reports, 'broadcast_summary')
+        if cached:
+            print(f"   ⚡ {len(cached)} فقرة جاهزة مسبقاً")
+        
         for i, report in enumerate(reports, 1):
+            if report.id in cached:
+                report.summary = cached[report.id]
+                continue
+            
             print(f"   [{i}/{len(reports)}] {report.title[:40]}...")
             
-            prompt = f"""أعد صياغة هذا الخبر كفقرة إذاعية.
-
-العنوان: {report.title}
-المحتوى: {report.content}
-
-التعليمات:
-1. فقرة واحدة متماسكة (4-8 جمل)
-2. لغة عربية فصحى واضحة
-3. ابدأ بالمعلومة الأهم
-4. حافظ على الأرقام والأسماء
-5. لا تضف معلومات
-
-الفقرة:"""
-
             try:
-                response = self.client.models.generate_content(
-                    model=GEMINI_MODEL,
-                    contents=prompt,
-                    config={'temperature': 0.3, 'max_output_tokens': 1000}
-                )
-                report.summary = response.text.strip()
-                report.summary = re.sub(r'^#+\s*', '', report.summary)
-                report.summary = re.sub(r'\*\*|\*', '', report.summary)
+                report.summary = rewrite_broadcast_summary(self.client, report.title, report.content)
+                store_rewrite(self.conn, self.cursor, report, 'broadcast_summary', report.summary)
                 
             except Exception as e:
                 print(f"      ⚠️ خطأ: {e}")
@@ -748,25 +791,121 @@ class BroadcastGenerator:
     # 🔄 تشغيل الكل
     # ════════════════════════════════════════════════════════════
     
-    def generate_all_due(self) -> Dict[str, BroadcastResult]:
-        """توليد كل البثات المستحقة"""
+    def generate_all_due(
+        self,
+        on_generated: Optional[Callable[[BroadcastResult], None]] = None,
+        parallel: bool = None,
+        max_workers: int = None
+    ) -> Dict[str, BroadcastResult]:
+        """
+        توليد كل البثات المستحقة
+        
+        Args:
+            on_generated: يُستدعى بعد كل بث جديد (مثلاً توليد الصوت)،
+                بالوضع المتوازي يشتغل داخل نفس الـ worker فيتداخل مع توليد باقي البثات
+            parallel: توليد متوازي (الافتراضي BROADCAST_PARALLEL)
+            max_workers: حد الـ pool (الافتراضي BROADCAST_MAX_WORKERS)
+        """
         results = {}
         configs = self.get_all_active_configs()
+        parallel = BROADCAST_PARALLEL if parallel is None else parallel
+        max_workers = max_workers or BROADCAST_MAX_WORKERS
         
         print(f"\n{'='*70}")
         print(f"🔄 Checking {len(configs)} broadcast configs...")
         print(f"{'='*70}")
         
+        due_configs = []
         for config in configs:
             if self._is_due(config):
                 print(f"\n⏰ {config.name} مستحق - بدء التوليد...")
-                results[config.code] = self.generate(config.code)
+                due_configs.append(config)
             else:
                 print(f"⏭️ {config.name} - ليس بعد")
         
+        if not due_configs:
+            return results
+        
+        # جلب + إزالة تكرار + ترتيب مرة وحدة لكل hours_back
+        shared = self._prepare_shared_reports(due_configs)
+        
+        if not parallel or len(due_configs) == 1:
+            for config in due_configs:
+                result = self.generate(config.code, shared.get(config.code))
+                results[config.code] = result
+                _run_on_generated(config.code, result, on_generated)
+            return results
+        
+        workers = min(max_workers, len(due_configs))
+        print(f"\n🚀 Generating {len(due_configs)} broadcasts concurrently (max {workers} at once)")
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            future_to_code = {
+                executor.submit(
+                    _generate_in_worker, config.code, shared.get(config.code), on_generated
+                ): config.code
+                for config in due_configs
+            }
+            
+            for future in as_completed(future_to_code):
+                code = future_to_code[future]
+                try:
+                    results[code] = future.result()
+                except Exception as e:
+                    print(f"❌ {code} exception: {e}")
+                    results[code] = BroadcastResult(
+                        success=False,
+                        config_code=code,
+                        message=f"خطأ في التوليد: {str(e)}"
+                    )
+        
         return results
     
     
+    def _prepare_shared_reports(
+        self,
+        configs: List[BroadcastConfig]
+    ) -> Dict[str, List[ReportItem]]:
+        """
+        جلب أخبار الدورة مرة وحدة لكل hours_back ومشاركتها بين الإعدادات
+        
+        - استعلام واحد بأكبر news_count بالمجموعة
+        - إزالة التكرار والترتيب مرة وحدة
+        - كل إعداد ياخد نفس النتيجة اللي كان _fetch_reports(news_count) رح يرجعها:
+          الأخبار الفريدة من أول news_count + 5 صف، أول news_count منها
+        
+        Returns:
+            Dict: {config_code: نسخة مرتبة من الأخبار خاصة بالإعداد}
+        """
+        prepared = {}
+        
+        for hours_back in sorted({c.hours_back for c in configs}):
+            group = [c for c in configs if c.hours_back == hours_back]
+            max_limit = max(c.news_count for c in group)
+            
+            rows = self._query_reports(max_limit + 5, hours_back)
+            row_index = {id(r): i for i, r in enumerate(rows)}
+            unique = self._remove_duplicates(rows)
+            
+            # الأولوية والقسم يعتمدوا على الخبر نفسه فقط → حساب واحد للكل
+            self._prioritize_and_classify(list(unique))
+            
+            print(f"📥 {len(unique)} خبر فريد من آخر {hours_back} ساعة لـ {len(group)} إعداد")
+            
+            for config in group:
+                selected = [
+                    r for r in unique
+                    if row_index[id(r)] < config.news_count + 5
+                ][:config.news_count]
+                
+                # نسخ مستقلة لأن إعادة الصياغة تعدل العناصر
+                copies = [replace(r) for r in selected]
+                copies.sort(key=lambda x: x.priority)
+                prepared[config.code] = copies
+        
+        return prepared
+    
+    
     def _is_due(self, config: BroadcastConfig) -> bool:
         """فحص إذا حان وقت التوليد"""
         try:
@@ -805,6 +944,36 @@ class BroadcastGenerator:
         print("🔒 Connection closed")
 
 
+def _generate_in_worker(
+    config_code: str,
+    prepared_reports: Optional[List[ReportItem]],
+    on_generated: Optional[Callable[[BroadcastResult], None]]
+) -> BroadcastResult:
+    """توليد بث واحد داخل worker باتصال DB و Gemini مستقلين"""
+    generator = BroadcastGenerator()
+    try:
+        result = generator.generate(config_code, prepared_reports)
+    finally:
+        generator.close()
+    
+    _run_on_generated(config_code, result, on_generated)
+    return result
+
+
+def _run_on_generated(
+    config_code: str,
+    result: BroadcastResult,
+    on_generated: Optional[Callable[[BroadcastResult], None]]
+):
+    """خطوة ما بعد التوليد (الصوت) - فشلها ما بيوقف باقي الـ configs"""
+    if on_generated and result.success and not result.skipped:
+        try:
+            on_generated(result)
+        except Exception as e:
+            # فشل الصوت لا يلغي البث المحفوظ
+            print(f"⚠️ {config_code} post-generation step failed: {e}")
+
+
 # ============================================
 # 🧪 Test
 # ============================================
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+⚡ Broadcast Precompute Service
+تجهيز مقاطع النشرة والموجز مسبقاً لكل تقرير فور إنشائه
+
+المبدأ:
+- بدل ما نعيد صياغة كل تقرير بـ Gemini وقت البث،
+  نجهز لكل تقرير جديد: العنوان الاسمي (للبث وللموجز) + فقرة البث + فقرة النشرة (+ الصوت)
+- النصوص تنحفظ في report_rewrite_cache (rewrite_cache.py) اللي
+  BroadcastGenerator / BulletinGenerator / DigestGenerator يقرؤوا منه وقت البث
+  ويستدعوا Gemini فقط للتقارير الناقصة
+- صوت كل مقطع بينحفظ بكاش جمل TTS (tts_cache.py)؛ وقت البث BulletinAudioGenerator
+  بياخد جمل المقاطع من الكاش ويولد بس المقدمة والفواصل والخاتمة، ثم يدمج
+- إذا تغير محتوى التقرير، تتغير البصمة (content_hash) ويُعاد التجهيز
+
+الجداول: report_broadcast_segments (حالة التجهيز)، report_rewrite_cache (النصوص)
+"""
+
+import os
+import time
+from typing import Dict, List, Optional
+
+import psycopg2
+from google import genai
+
+from settings import DB_CONFIG, GEMINI_API_KEY
+from app.services.generators.broadcast_segments import (
+    SEGMENT_KINDS,
+    SEGMENT_MAX_FAILURES,
+    clear_segment_failure,
+    compute_content_hash,
+    ensure_segments_table,
+    load_segment_failures,
+    load_segment_hashes,
+    record_segment_failure,
+    save_segment,
+)
+from app.services.generators.rewrite_cache import (
+    ensure_rewrite_cache_table,
+    load_cached_rewrite,
+    save_rewrite,
+)
+from app.services.generators.broadcast_generator import (
+    rewrite_headline,
+    rewrite_broadcast_summary,
+)
+from app.services.generators.bulletin_generator import rewrite_bulletin_summary
+from app.services.generators.digest_generator import (
+    clean_digest_headline,
+    convert_digest_headlines,
+)
+
+
+# تجهيز صوت جمل كل مقطع بكاش TTS (يحتاج TTS_CACHE_ENABLED + ffmpeg)
+PRECOMPUTE_AUDIO = os.getenv('BROADCAST_PRECOMPUTE_AUDIO', 'true').lower() == 'true'
+
+
+class BroadcastPrecomputer:
+    """مجهز مقاطع النشرة المسبق"""
+
+    def __init__(self, with_audio: bool = None):
+        """تهيئة المجهز"""
+        self.conn = None
+        self.cursor = None
+        self.audio_generator = None
+        self.with_audio = PRECOMPUTE_AUDIO if with_audio is None else with_audio
+
+        try:
+            self.conn = psycopg2.connect(**DB_CONFIG)
+            self.cursor = self.conn.cursor()
+            ensure_segments_table(self.cursor)
+            ensure_rewrite_cache_table(self.cursor)
+            self.conn.commit()
+            print("✅ BroadcastPrecomputer initialized")
+        except Exception as e:
+            print(f"❌ Database connection failed: {e}")
+            raise
+
+        self.client = genai.Client(api_key=GEMINI_API_KEY)
+
+
+    # ==========================================
+    # PUBLIC METHODS
+    # ==========================================
+
+    def precompute_recent(self, hours_back: int = 48, limit: int = 20) -> Dict:
+        """
+        تجهيز المقاطع للتقارير الأخيرة اللي ما عندها مقاطع محدثة
+
+        Args:
+            hours_back: نفس نافذة النشرة/الموجز
+            limit: أقصى عدد تقارير بكل تشغيل
+
+        Returns:
+            Dict: إحصائيات
+        """
+        print(f"\n{'='*70}")
+        print(f"⚡ Precomputing broadcast segments (last {hours_back}h)")
+        print(f"{'='*70}")
+
+        stats = {'total_reports': 0, 'segments': 0, 'audio': 0, 'failed': 0, 'up_to_date': 0, 'gave_up': 0}
+
+        reports = self._fetch_recent_reports(hours_back)
+        if not reports:
+            print("📭 No reports in window")
+            return stats
+
+        report_ids = [r['id'] for r in reports]
+        existing = load_segment_hashes(self.cursor, report_ids)
+        failures = load_segment_failures(self.cursor, report_ids)
+
+        pending = []
+        for report in reports:
+            content_hash = compute_content_hash(report['title'], report['content'])
+            missing = [
+                kind for kind in SEGMENT_KINDS
+                if existing.get((report['id'], kind), {}).get('content_hash') != content_hash
+            ]
+            if not missing:
+                stats['up_to_date'] += 1
+                continue
+
+            failure = failures.get(report['id'], {})
+            failed_before = failure.get('failure_count', 0) if failure.get('content_hash') == content_hash else 0
+            if failed_before >= SEGMENT_MAX_FAILURES:
+                stats['gave_up'] += 1
+                continue
+
+            report['content_hash'] = content_hash
+            report['missing_kinds'] = missing
+            report['failed_before'] = failed_before
+            pending.append(report)
+
+        # التقارير اللي فشلت قبل بآخر الطابور (ما بتسد الطريق على الجديدة)
+        pending.sort(key=lambda r: r['failed_before'])
+        pending = pending[:limit]
+        stats['total_reports'] = len(pending)
+
+        if not pending:
+            print("✅ All segments up to date")
+            return stats
+
+        print(f"📋 {len(pending)} reports need segments")
+
+        for i, report in enumerate(pending, 1):
+            print(f"\n[{i}/{len(pending)}] Report #{report['id']}: {report['title'][:50]}...")
+            result = self.precompute_report(report)
+            stats['segments'] += result['segments']
+            stats['audio'] += result['audio']
+            stats['failed'] += result['failed']
+
+        print(f"\n{'='*70}")
+        print(f"📊 Segments: {stats['segments']}, Audio: {stats['audio']}, Failed: {stats['failed']}")
+        print(f"{'='*70}")
+
+        return stats
+
+
+    def precompute_report(self, report: Dict) -> Dict:
+        """
+        تجهيز المقاطع الناقصة لتقرير واحد
+
+        Args:
+            report: {'id', 'title', 'content', 'content_hash'?, 'missing_kinds'?}
+        """
+        result = {'segments': 0, 'audio': 0, 'failed': 0}
+
+        content_hash = report.get('content_hash') or compute_content_hash(report['title'], report['content'])
+        kinds = report.get('missing_kinds') or list(SEGMENT_KINDS)
+
+        for kind in kinds:
+            text = self._get_text(report['id'], content_hash, kind, report['title'], report['content'])
+            if not text:
+                result['failed'] += 1
+                continue
+
+            cached_audio = self._precache_audio(text) if self.with_audio else False
+            if cached_audio:
+                result['audio'] += 1
+
+            try:
+                save_segment(self.cursor, report['id'], kind, content_hash)
+                self.conn.commit()
+                result['segments'] += 1
+                print(f"   ✅ {kind}" + (" + 🔊" if cached_audio else ""))
+            except Exception as e:
+                print(f"   ❌ Error saving {kind}: {e}")
+                self.conn.rollback()
+                result['failed'] += 1
+
+        try:
+            if result['failed']:
+                record_segment_failure(self.cursor, report['id'], content_hash)
+            else:
+                clear_segment_failure(self.cursor, report['id'])
+            self.conn.commit()
+        except Exception as e:
+            print(f"   ⚠️ Failure count save failed: {str(e)[:100]}")
+            self.conn.rollback()
+
+        return result
+
+
+    def close(self):
+        """إغلاق الاتصالات"""
+        if self.audio_generator:
+            try:
+                self.audio_generator.close()
+            except Exception:
+                pass
+        if self.cursor:
+            self.cursor.close()
+        if self.conn:
+            self.conn.close()
+        print("🔒 Connection closed")
+
+
+    # ==========================================
+    # PRIVATE METHODS
+    # ==========================================
+
+    def _fetch_recent_reports(self, hours_back: int) -> List[Dict]:
+        """جلب تقارير النافذة (نفس شروط مولدات البث)"""
+        try:
+            self.cursor.execute("""
+                SELECT id, title, content
+                FROM generated_report
+                WHERE created_at >= NOW() - INTERVAL '%s hours'
+                  AND content IS NOT NULL
+                  AND LENGTH(content) > 100
+                ORDER BY created_at DESC
+            """, (hours_back,))
+
+            return [
+                {'id': row[0], 'title': row[1], 'content': row[2] or ''}
+                for row in self.cursor.fetchall()
+            ]
+        except Exception as e:
+            print(f"❌ Error fetching reports: {e}")
+            self.conn.rollback()
+            return []
+
+
+    def _get_text(self, report_id: int, content_hash: str, kind: str, title: str, content: str) -> Optional[str]:
+        """نص المقطع من report_rewrite_cache، أو توليده وحفظه بالكاش"""
+        text = load_cached_rewrite(self.cursor, report_id, content_hash, kind)
+        if text:
+            return text
+
+        text = self._generate_text(kind, title, content)
+        if text:
+            try:
+                save_rewrite(self.cursor, report_id, content_hash, kind, text)
+                self.conn.commit()
+            except Exception as e:
+                print(f"   ⚠️ Rewrite cache save failed: {str(e)[:100]}")
+                self.conn.rollback()
+
+        return text
+
+
+    def _generate_text(self, kind: str, title: str, content: str) -> Optional[str]:
+        """توليد نص المقطع بنفس برومبت المولد المعني"""
+        try:
+            if kind == 'headline_broadcast':
+                text = rewrite_headline(self.client, title)
+                # نفس شرط BroadcastGenerator._convert_to_headlines
+                return text if text and len(text) > 10 else None
+
+            if kind == 'headline_digest':
+                text = convert_digest_headlines(self.client, [title]).get(0)
+                text = clean_digest_headline(text) if text else None
+                # نفس شرط DigestGenerator._convert_to_nominal_sentences
+                return text if text and len(text) > 10 else None
+
+            if kind == 'broadcast_summary':
+                text = rewrite_broadcast_summary(self.client, title, content)
+            else:
+                text = rewrite_bulletin_summary(self.client, title, content)
+
+            return text or None
+
+        except Exception as e:
+            error_msg = str(e)
+            print(f"   ⚠️ {kind}: {error_msg[:150]}")
+            if "RESOURCE_EXHAUSTED" in error_msg or "429" in error_msg:
+                time.sleep(10)
+            return None
+
+
+    def _precache_audio(self, text: str) -> bool:
+        """صوت جمل المقطع بكاش TTS (lazy init لـ TTS)"""
+        if self.audio_generator is None:
+            try:
+                from app.services.generators.bulletin_audio_generator import BulletinAudioGenerator
+                self.audio_generator = BulletinAudioGenerator()
+            except Exception as e:
+                print(f"   ⚠️ TTS unavailable, text-only precompute: {e}")
+                self.with_audio = False
+                return False
+
+            if not self.audio_generator.tts_cache:
+                print("   ⚠️ TTS sentence cache disabled, text-only precompute")
+                self.with_audio = False
+                return False
+
+        result = self.audio_generator.precache_segment(text)
+        if not result['success']:
+            print(f"   ⚠️ Segment audio failed: {result['error']}")
+            return False
+
+        return True
+
+
+def precompute_broadcast_segments(hours_back: int = 48, limit: int = 20) -> Dict:
+    """تشغيل التجهيز المسبق مرة واحدة"""
+    precomputer = BroadcastPrecomputer()
+    try:
+        return precomputer.precompute_recent(hours_back=hours_back, limit=limit)
+    finally:
+        precomputer.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    hours = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+    stats = precompute_broadcast_segments(hours_back=hours)
+    print(f"\n✅ Done: {stats}")
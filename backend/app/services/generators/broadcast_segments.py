@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🧩 Broadcast Segments Store
+حالة تجهيز مقاطع النشرة المسبق لكل تقرير
+
+الجدول: report_broadcast_segments
+- report_id + segment_kind = مفتاح فريد
+- content_hash = بصمة (العنوان + المحتوى) وقت التجهيز
+  إذا تغير التقرير، تتغير البصمة ويُعتبر المقطع قديماً
+- علامة اكتمال فقط: النص نفسه بـ report_rewrite_cache (rewrite_cache.py)
+  والصوت بكاش جمل TTS (tts_cache.py)
+
+أنواع المقاطع:
+- headline_broadcast → جملة اسمية قصيرة (البث بنمط headlines)
+- broadcast_summary  → فقرة إذاعية 4-8 جمل (BroadcastGenerator)
+- bulletin_summary   → فقرة إذاعية كاملة 6-10 جمل (BulletinGenerator)
+- headline_digest    → جملة اسمية قصيرة (DigestGenerator)
+
+الجدول: report_broadcast_segment_failures
+- عدد المحاولات الفاشلة لكل تقرير بنفس البصمة؛ بعد SEGMENT_MAX_FAILURES
+  ما بنرجعله (المولدات بتستدعي Gemini له وقت البث متل قبل)
+"""
+
+import hashlib
+from typing import Dict, List
+
+
+SEGMENT_KINDS = ('headline_broadcast', 'broadcast_summary', 'bulletin_summary', 'headline_digest')
+
+SEGMENT_MAX_FAILURES = 3
+
+
+def compute_content_hash(title: str, content: str) -> str:
+    """بصمة التقرير (SHA-256 للعنوان + المحتوى)"""
+    raw = f"{title or ''}\n{content or ''}".encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+def ensure_segments_table(cursor):
+    """إنشاء جدول المقاطع إذا ما كان موجود (الـ commit على المستدعي)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS report_broadcast_segments (
+            id SERIAL PRIMARY KEY,
+            report_id INTEGER NOT NULL,
+            segment_kind VARCHAR(50) NOT NULL,
+            content_hash VARCHAR(64) NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW(),
+            UNIQUE(report_id, segment_kind)
+        )
+    """)
+    # جداول قديمة كانت تنسخ النص (مكرر بـ report_rewrite_cache) ورابط صوت ما عاد ينكتب
+    # ALTER بياخد قفل على الجدول حتى لو العمود موجود، فبنفحص أول
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'report_broadcast_segments' AND column_name IN ('text', 'audio_url')
+    """)
+    if cursor.fetchone():
+        cursor.execute("""
+            ALTER TABLE report_broadcast_segments
+            DROP COLUMN IF EXISTS text,
+            DROP COLUMN IF EXISTS audio_url
+        """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS report_broadcast_segment_failures (
+            report_id INTEGER PRIMARY KEY,
+            content_hash VARCHAR(64) NOT NULL,
+            failure_count INTEGER NOT NULL DEFAULT 0,
+            last_failed_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+
+
+def load_segment_hashes(cursor, report_ids: List[int]) -> Dict[tuple, Dict]:
+    """
+    جلب حالة المقاطع الموجودة
+
+    Returns:
+        Dict: {(report_id, segment_kind): {'content_hash': ...}}
+    """
+    if not report_ids:
+        return {}
+
+    cursor.execute("""
+        SELECT report_id, segment_kind, content_hash
+        FROM report_broadcast_segments
+        WHERE report_id = ANY(%s)
+    """, (list(report_ids),))
+
+    return {
+        (row[0], row[1]): {'content_hash': row[2]}
+        for row in cursor.fetchall()
+    }
+
+
+def save_segment(cursor, report_id: int, segment_kind: str, content_hash: str):
+    """تعليم المقطع جاهز بالبصمة الحالية (الـ commit على المستدعي)"""
+    cursor.execute("""
+        INSERT INTO report_broadcast_segments
+            (report_id, segment_kind, content_hash, created_at, updated_at)
+        VALUES (%s, %s, %s, NOW(), NOW())
+        ON CONFLICT (report_id, segment_kind) DO UPDATE SET
+            content_hash = EXCLUDED.content_hash,
+            updated_at = NOW()
+    """, (report_id, segment_kind, content_hash))
+
+
+def load_segment_failures(cursor, report_ids: List[int]) -> Dict[int, Dict]:
+    """
+    جلب المحاولات الفاشلة
+
+    Returns:
+        Dict: {report_id: {'content_hash': ..., 'failure_count': ...}}
+    """
+    if not report_ids:
+        return {}
+
+    cursor.execute("""
+        SELECT report_id, content_hash, failure_count
+        FROM report_broadcast_segment_failures
+        WHERE report_id = ANY(%s)
+    """, (list(report_ids),))
+
+    return {
+        row[0]: {'content_hash': row[1], 'failure_count': row[2]}
+        for row in cursor.fetchall()
+    }
+
+
+def record_segment_failure(cursor, report_id: int, content_hash: str):
+    """محاولة فاشلة (العداد بيرجع لـ 1 إذا تغيرت البصمة) - الـ commit على المستدعي"""
+    cursor.execute("""
+        INSERT INTO report_broadcast_segment_failures (report_id, content_hash, failure_count, last_failed_at)
+        VALUES (%s, %s, 1, NOW())
+        ON CONFLICT (report_id) DO UPDATE SET
+            failure_count = CASE
+                WHEN report_broadcast_segment_failures.content_hash = EXCLUDED.content_hash
+                THEN report_broadcast_segment_failures.failure_count + 1
+                ELSE 1
+            END,
+            content_hash = EXCLUDED.content_hash,
+            last_failed_at = NOW()
+    """, (report_id, content_hash))
+
+
+def clear_segment_failure(cursor, report_id: int):
+    """كل المقاطع انحفظت - الـ commit على المستدعي"""
+    cursor.execute("DELETE FROM report_broadcast_segment_failures WHERE report_id = %s", (report_id,))
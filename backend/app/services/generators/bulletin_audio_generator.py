@@ -12,8 +12,9 @@ import sys
 import time
 import psycopg2
 from datetime import datetime
-from typing import Dict, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import boto3
 
 # تحميل environment variables
@@ -28,6 +29,25 @@ except ImportError:
     print("   Run: pip install google-cloud-texttospeech")
     sys.exit(1)
 
+from app.services.generators.audio_stitcher import is_stitching_available, stitch_linear16_to_mp3
+from app.services.generators.tts_cache import (
+    TTS_CACHE_ENABLED,
+    TTS_MAX_CONCURRENCY,
+    TTSCache,
+    synthesize_sentences,
+)
+from app.services.generators.tts_rate_limiter import get_tts_rate_limiter, is_rate_limit_error
+from app.services.generators.tts_segmenter import (
+    TTS_MAX_INPUT_BYTES,
+    add_punctuation,
+    pack_chunks,
+    split_cacheable_sentences,
+    split_segment_sentences,
+    split_sentences,
+    split_text_into_chunks,
+    utf8_len,
+)
+
 
 # ============================================
 # Database Configuration
@@ -40,6 +60,8 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 5432))
 }
 
+TTS_VOICE_NAME = "ar-XA-Chirp3-HD-Achernar"
+
 
 @dataclass
 class AudioResult:
@@ -85,6 +107,18 @@ class BulletinAudioGenerator:
             print(f"❌ S3 client failed: {e}")
             raise
         
+        # كاش صوت الجمل (disk + S3) - بيحتاج ffmpeg للدمج
+        self.tts_cache = None
+        if TTS_CACHE_ENABLED and is_stitching_available():
+            try:
+                self.tts_cache = TTSCache(self.s3_client, self.bucket_name)
+                print("✅ TTS sentence cache enabled")
+            except Exception as e:
+                print(f"⚠️ TTS cache disabled: {e}")
+        
+        # حد طلبات TTS مشترك مع باقي مولدات الصوت
+        self.rate_limiter = get_tts_rate_limiter()
+        
         # ==========================================
         # 3. تهيئة Google Text-to-Speech
         # ==========================================
@@ -229,6 +263,36 @@ class BulletinAudioGenerator:
         return self.generate_for_digest(digest['id'], force_update)
     
     
+    def precache_segment(self, text: str) -> Dict:
+        """
+        تجهيز صوت مقطع تقرير مسبقاً بكاش الجمل (من التجهيز المسبق للنشرة)
+        وقت البث، _text_to_speech_cached بياخد جمل المقطع من الكاش ويولد
+        بس المقدمة والفواصل والخاتمة، وبعدين بيدمج الكل
+        
+        Args:
+            text: نص المقطع (نفس النص اللي بيدخل على full_script)
+            
+        Returns:
+            {'success', 'sentences', 'synthesized'} أو {'success': False, 'error'}
+        """
+        if not self.tts_cache:
+            return {'success': False, 'error': 'TTS sentence cache disabled'}
+        
+        if not text or len(text.strip()) < 10:
+            return {'success': False, 'error': 'No segment text'}
+        
+        # نفس جمل المقطع داخل السكريبت (مكان النقاط المضافة بيعتمد على اللي قبله)
+        units = split_segment_sentences(text)
+        try:
+            _, hits = synthesize_sentences(
+                units, TTS_VOICE_NAME, 'LINEAR16', self._synthesize_linear16, self.tts_cache
+            )
+        except Exception as e:
+            return {'success': False, 'error': str(e)[:200]}
+        
+        return {'success': True, 'sentences': len(units), 'synthesized': len(units) - hits}
+    
+    
     def close(self):
         """إغلاق الاتصالات"""
         if self.cursor:
@@ -291,6 +355,8 @@ class BulletinAudioGenerator:
         
         audio_bytes = audio_result['audio_bytes']
         print(f"✅ Audio generated: {len(audio_bytes):,} bytes")
+        if audio_result.get('duration_seconds'):
+            print(f"⏱️  Duration: {audio_result['duration_seconds']:.1f}s")
         
         # 5. رفع على S3
         s3_url = self._upload_to_s3(
@@ -317,10 +383,12 @@ class BulletinAudioGenerator:
         
         print(f"✅ Saved to database")
         
+        duration = audio_result.get('duration_seconds')
+        
         return AudioResult(
             success=True,
             audio_url=s3_url,
-            duration_seconds=item.get('estimated_duration_seconds')
+            duration_seconds=int(round(duration)) if duration else item.get('estimated_duration_seconds')
         )
     
     
@@ -397,160 +465,161 @@ class BulletinAudioGenerator:
     def _text_to_speech(self, text: str, retries: int = 3) -> Dict:
         """تحويل النص لصوت - مع دعم النصوص الطويلة"""
         
-        # Google TTS limit = 5000 bytes
-        # العربي = ~2-3 bytes per character
-        # نستخدم 1500 حرف كحد آمن
-        MAX_CHUNK_SIZE = 1500
-        
         # ════════════════════════════════════════════════════════
         # 🔧 دائماً نضيف نقاط للنص (حتى لو قصير)
         # ════════════════════════════════════════════════════════
         text = self._add_punctuation(text)
         
-        # إذا النص قصير، نعالجه مباشرة
-        if len(text) <= MAX_CHUNK_SIZE:
+        # جمل من الكاش + توليد الجمل الجديدة فقط
+        if self.tts_cache:
+            return self._text_to_speech_cached(text, retries)
+        
+        # إذا النص ضمن حد Google TTS (5000 byte)، نعالجه مباشرة
+        text_bytes = utf8_len(text)
+        if text_bytes <= TTS_MAX_INPUT_BYTES:
             return self._synthesize_single_chunk(text, retries)
         
         # النص طويل - نقسمه لأجزاء
-        print(f"   📄 Text too long ({len(text)} chars), splitting into chunks...")
-        chunks = self._split_text_into_chunks(text, MAX_CHUNK_SIZE)
+        print(f"   📄 Text too long ({text_bytes} bytes), splitting into chunks...")
+        # النص منقّط فوق، فبنقسم مباشرة (split_for_tts بيعيد add_punctuation)
+        chunks = pack_chunks(split_sentences(text), TTS_MAX_INPUT_BYTES, size=utf8_len)
         print(f"   📄 Split into {len(chunks)} chunks")
         
-        # توليد صوت لكل جزء
-        all_audio_bytes = []
+        # LINEAR16 للأجزاء حتى ندمجها PCM ونعمل encode مرة وحدة
+        # (بدون ffmpeg نرجع لـ MP3 ولصق البايتات)
+        stitch = is_stitching_available()
+        encoding = texttospeech.AudioEncoding.LINEAR16 if stitch else texttospeech.AudioEncoding.MP3
         
-        for i, chunk in enumerate(chunks, 1):
-            print(f"   🎙️ Processing chunk {i}/{len(chunks)} ({len(chunk)} chars)...")
-            
-            result = self._synthesize_single_chunk(chunk, retries)
-            
-            if not result['success']:
-                return result
-            
-            all_audio_bytes.append(result['audio_bytes'])
-            
-            # تأخير بسيط بين الأجزاء
-            if i < len(chunks):
-                time.sleep(1)
+        result = self._synthesize_chunks(chunks, retries, encoding)
+        if not result['success']:
+            return result
+        
+        all_audio_bytes = result['parts']
         
         # دمج كل الأجزاء
         print(f"   🔗 Combining {len(all_audio_bytes)} audio parts...")
-        combined_audio = b''.join(all_audio_bytes)
+        
+        if not stitch:
+            print("   ⚠️ ffmpeg not available - concatenating MP3 parts")
+            return {
+                'success': True,
+                'audio_bytes': b''.join(all_audio_bytes)
+            }
+        
+        try:
+            combined_audio, duration = stitch_linear16_to_mp3(all_audio_bytes)
+        except Exception as e:
+            print(f"   ❌ Audio stitching failed: {e}")
+            return {
+                'success': False,
+                'error': f'Audio stitching failed: {str(e)[:200]}'
+            }
         
         return {
             'success': True,
-            'audio_bytes': combined_audio
+            'audio_bytes': combined_audio,
+            'duration_seconds': duration
         }
     
     
-    def _split_text_into_chunks(self, text: str, max_size: int) -> list:
-        """تقسيم النص لأجزاء عند نقاط مناسبة"""
+    def _text_to_speech_cached(self, text: str, retries: int = 3) -> Dict:
+        """
+        توليد على مستوى الجملة مع الكاش:
+        الجمل المكررة (مقدمة، طقس، عناوين متكررة) من الكاش، الجديدة من Google TTS
+        ثم دمج PCM و encode واحد
+        """
+        units = split_cacheable_sentences(text)
+        if not units:
+            return {'success': False, 'error': 'No text to synthesize'}
         
-        # أولاً: نضيف نقاط للجمل الطويلة
-        text = self._add_punctuation(text)
+        def synthesize(sentence: str) -> bytes:
+            return self._synthesize_linear16(sentence, retries)
         
-        chunks = []
-        current_chunk = ""
-        
-        # نقسم على أساس الجمل
-        sentences = []
-        temp = ""
-        
-        for char in text:
-            temp += char
-            # نقطة نهاية الجملة
-            if char in '.،؟!\n' and len(temp.strip()) > 0:
-                sentences.append(temp)
-                temp = ""
-        
-        # إضافة أي نص متبقي
-        if temp.strip():
-            sentences.append(temp)
-        
-        # تجميع الجمل في chunks
-        for sentence in sentences:
-            # إذا الجملة لوحدها أطول من الحد
-            if len(sentence) > max_size:
-                # نحفظ الـ chunk الحالي
-                if current_chunk:
-                    chunks.append(current_chunk)
-                    current_chunk = ""
-                
-                # نقسم الجملة الطويلة بالقوة
-                words = sentence.split()
-                temp_chunk = ""
-                for word in words:
-                    if len(temp_chunk) + len(word) + 1 <= max_size:
-                        temp_chunk += word + " "
-                    else:
-                        if temp_chunk:
-                            chunks.append(temp_chunk.strip() + ".")
-                        temp_chunk = word + " "
-                if temp_chunk:
-                    chunks.append(temp_chunk.strip())
-                    
-            # إذا إضافة الجملة تتجاوز الحد
-            elif len(current_chunk) + len(sentence) > max_size:
-                chunks.append(current_chunk)
-                current_chunk = sentence
-            else:
-                current_chunk += sentence
+        try:
+            parts, hits = synthesize_sentences(
+                units, TTS_VOICE_NAME, 'LINEAR16', synthesize, self.tts_cache
+            )
+        except Exception as e:
+            return {'success': False, 'error': str(e)[:200]}
         
-        # إضافة آخر chunk
-        if current_chunk:
-            chunks.append(current_chunk)
+        print(f"   🗂️ {len(units)} sentences: {hits} from cache, {len(units) - hits} synthesized")
         
-        return chunks
+        try:
+            combined_audio, duration = stitch_linear16_to_mp3(parts)
+        except Exception as e:
+            print(f"   ❌ Audio stitching failed: {e}")
+            return {
+                'success': False,
+                'error': f'Audio stitching failed: {str(e)[:200]}'
+            }
+        
+        return {
+            'success': True,
+            'audio_bytes': combined_audio,
+            'duration_seconds': duration
+        }
     
     
-    def _add_punctuation(self, text: str) -> str:
-        """إضافة نقاط للنص لتسهيل القراءة على TTS"""
-        
-        # استبدال السطور الجديدة بنقاط
-        text = text.replace('\n\n', '. ')
-        text = text.replace('\n', '. ')
-        
-        # استبدال الشرطات والنقطتين بنقاط
-        text = text.replace(' - ', '. ')
-        text = text.replace(' – ', '. ')
-        text = text.replace(' : ', '. ')
-        text = text.replace(':', '. ')
+    def _synthesize_linear16(self, sentence: str, retries: int = 3) -> bytes:
+        """صوت جملة واحدة LINEAR16 لكاش الجمل (exception عند الفشل)"""
+        result = self._synthesize_single_chunk(
+            sentence, retries, texttospeech.AudioEncoding.LINEAR16
+        )
+        if not result['success']:
+            raise RuntimeError(result.get('error', 'TTS failed'))
+        return result['audio_bytes']
+    
+    
+    def _synthesize_chunks(self, chunks: List[str], retries: int, audio_encoding) -> Dict:
+        """
+        توليد الأجزاء بالتوازي (حد أقصى TTS_MAX_CONCURRENCY)
+        كل جزء عنده retry خاص فيه، والنتيجة مرتبة حسب ترتيب الأجزاء
+        """
+        parts: List[Optional[bytes]] = [None] * len(chunks)
+        workers = max(1, min(TTS_MAX_CONCURRENCY, len(chunks)))
         
-        # إضافة نقاط بعد كل 150 حرف إذا ما في نقطة (أقل من قبل)
-        result = ""
-        chars_since_punct = 0
+        print(f"   🎙️ Synthesizing {len(chunks)} chunks ({workers} at once)...")
         
-        for char in text:
-            result += char
-            
-            if char in '.،؟!':
-                chars_since_punct = 0
-            else:
-                chars_since_punct += 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            future_to_index = {
+                executor.submit(self._synthesize_single_chunk, chunk, retries, audio_encoding): i
+                for i, chunk in enumerate(chunks)
+            }
             
-            # إذا مر 150 حرف بدون نقطة، نضيف نقطة عند أول فراغ
-            if chars_since_punct > 150 and char == ' ':
-                result = result.rstrip() + '. '
-                chars_since_punct = 0
-        
-        # تنظيف النقاط المتكررة
-        while '..' in result:
-            result = result.replace('..', '.')
-        while '. .' in result:
-            result = result.replace('. .', '.')
-        while '  ' in result:
-            result = result.replace('  ', ' ')
-        
-        # التأكد من وجود نقطة في النهاية
-        result = result.strip()
-        if result and result[-1] not in '.،؟!':
-            result += '.'
+            for future in as_completed(future_to_index):
+                i = future_to_index[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'success': False, 'error': str(e)}
+                
+                if not result['success']:
+                    print(f"   ❌ Chunk {i + 1}/{len(chunks)} failed")
+                    for pending in future_to_index:
+                        pending.cancel()
+                    return result
+                
+                parts[i] = result['audio_bytes']
+                print(f"   ✅ Chunk {i + 1}/{len(chunks)} ({utf8_len(chunks[i])} bytes)")
         
-        return result
+        return {
+            'success': True,
+            'parts': parts
+        }
+    
+    
+    def _split_text_into_chunks(self, text: str, max_size: int) -> list:
+        """تقسيم النص لأجزاء عند نقاط مناسبة (max_size بالحروف)"""
+        return split_text_into_chunks(text, max_size)
+    
+    
+    def _add_punctuation(self, text: str) -> str:
+        """إضافة نقاط للنص لتسهيل القراءة على TTS"""
+        return add_punctuation(text)
     
     
-    def _synthesize_single_chunk(self, text: str, retries: int = 3) -> Dict:
-        """توليد صوت لجزء واحد من النص"""
+    def _synthesize_single_chunk(self, text: str, retries: int = 3, audio_encoding=None) -> Dict:
+        """توليد صوت لجزء واحد من النص (MP3 افتراضياً)"""
         
         for attempt in range(retries):
             try:
@@ -560,20 +629,22 @@ class BulletinAudioGenerator:
                 # إعداد الصوت (عربي)
                 voice = texttospeech.VoiceSelectionParams(
                     language_code="ar-XA",
-                    name="ar-XA-Chirp3-HD-Achernar",
+                    name=TTS_VOICE_NAME,
                     ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
                 )
                 
                 # إعداد الصوت
                 audio_config = texttospeech.AudioConfig(
-                    audio_encoding=texttospeech.AudioEncoding.MP3
+                    audio_encoding=audio_encoding or texttospeech.AudioEncoding.MP3
                 )
                 
-                # توليد الصوت
-                response = self.tts_client.synthesize_speech(
-                    input=input_text,
-                    voice=voice,
-                    audio_config=audio_config
+                # توليد الصوت (محكوم بالـ rate limiter المشترك، الـ 429 بـ backoff)
+                response = self.rate_limiter.call(
+                    lambda: self.tts_client.synthesize_speech(
+                        input=input_text,
+                        voice=voice,
+                        audio_config=audio_config
+                    )
                 )
                 
                 return {
@@ -585,12 +656,9 @@ class BulletinAudioGenerator:
                 error_msg = str(e)
                 print(f"      ⚠️ Error: {error_msg[:150]}")
                 
-                # Rate limit handling
-                if "RESOURCE_EXHAUSTED" in error_msg or "429" in error_msg:
-                    if attempt < retries - 1:
-                        print(f"      ⏳ Rate limit - waiting 60 seconds...")
-                        time.sleep(60)
-                        continue
+                # Rate limit: الـ limiter استنفد محاولاته
+                if is_rate_limit_error(e):
+                    break
                 
                 if attempt < retries - 1:
                     print(f"      🔄 Retrying in 5 seconds...")
@@ -607,7 +675,7 @@ class BulletinAudioGenerator:
         self, 
         audio_bytes: bytes, 
         item_id: int,
-        item_type: Literal['bulletin', 'digest']
+        item_type: Literal['bulletin', 'digest', 'segment']
     ) -> Optional[str]:
         """رفع الصوت على S3"""
         try:
@@ -24,6 +24,12 @@ import psycopg2
 from google import genai
 from dotenv import load_dotenv
 
+from app.services.generators.rewrite_cache import (
+    load_cached_rewrites,
+    prepare_rewrite_cache,
+    store_rewrite,
+)
+
 load_dotenv()
 
 # ============================================
@@ -87,6 +93,56 @@ class BulletinResult:
     skipped: bool = False
 
 
+def rewrite_bulletin_summary(client, title: str, content: str) -> str:
+    """
+    إعادة صياغة تقرير واحد كفقرة إذاعية كاملة
+    مستقلة عن BulletinGenerator حتى يستخدمها التجهيز المسبق (broadcast_precompute)
+    ترمي Exception عند فشل Gemini
+    """
+    prompt = f"""أعد صياغة هذا التقرير الإخباري كفقرة إذاعية كاملة للنشرة.
+
+العنوان: {title}
+
+التقرير الأصلي:
+{content}
+
+التعليمات المهمة:
+1. اكتب فقرة واحدة كاملة ومتماسكة (6-10 جمل على الأقل)
+2. يجب أن تكون الفقرة كاملة وغير مقطوعة
+3. ابدأ بالمعلومة الأهم ثم التفاصيل
+4. استخدم لغة عربية فصحى واضحة للقراءة الإذاعية
+5. حافظ على جميع الأرقام والأسماء والتواريخ
+6. لا تضف معلومات غير موجودة في التقرير الأصلي
+7. لا تكتب عنواناً، فقط الفقرة
+
+الفقرة الإذاعية الكاملة:"""
+
+    response = client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config={'temperature': 0.3, 'max_output_tokens': 3000}
+    )
+    summary = response.text.strip()
+    
+    summary = re.sub(r'^#+\s*', '', summary)
+    summary = re.sub(r'\*\*|\*', '', summary)
+    summary = re.sub(r'^الفقرة الإذاعية:?\s*', '', summary)
+    summary = re.sub(r'^الفقرة:?\s*', '', summary)
+    
+    if summary and not summary.rstrip().endswith(('.', '؟', '!', '،')):
+        last_period = max(
+            summary.rfind('.'),
+            summary.rfind('؟'),
+            summary.rfind('!')
+        )
+        if last_period > len(summary) * 0.7:
+            summary = summary[:last_period + 1]
+        else:
+            summary = summary.rstrip() + '.'
+    
+    return summary
+
+
 class BulletinGenerator:
     
     def __init__(self):
@@ -98,6 +154,7 @@ class BulletinGenerator:
         self.conn = psycopg2.connect(**db_config)
         self.conn.set_client_encoding('UTF8')
         self.cursor = self.conn.cursor()
+        prepare_rewrite_cache(self.conn, self.cursor)
         
         self.client = genai.Client(api_key=GEMINI_API_KEY)
         print("✅ Connected to DB and Gemini with UTF-8 support")
@@ -291,51 +348,21 @@ class BulletinGenerator:
     
     
     def _rewrite_reports_for_bulletin(self, reports: List[ReportItem]) -> List[ReportItem]:
+        cached = load_cached_rewrites(self.cursor, reports, 'bulletin_summary')
+        if cached:
+            print(f"   ⚡ {len(cached)} فقرة جاهزة مسبقاً")
+        
         for i, report in enumerate(reports, 1):
+            if report.id in cached:
+                report.summary = cached[report.id]
+                self._update_report_summary(report.id, report.summary)
+                continue
+            
             print(f"   [{i}/{len(reports)}] {report.title[:50]}...")
             
-            prompt = f"""أعد صياغة هذا التقرير الإخباري كفقرة إذاعية كاملة للنشرة.
-
-العنوان: {report.title}
-
-التقرير الأصلي:
-{report.content}
-
-التعليمات المهمة:
-1. اكتب فقرة واحدة كاملة ومتماسكة (6-10 جمل على الأقل)
-2. يجب أن تكون الفقرة كاملة وغير مقطوعة
-3. ابدأ بالمعلومة الأهم ثم التفاصيل
-4. استخدم لغة عربية فصحى واضحة للقراءة الإذاعية
-5. حافظ على جميع الأرقام والأسماء والتواريخ
-6. لا تضف معلومات غير موجودة في التقرير الأصلي
-7. لا تكتب عنواناً، فقط الفقرة
-
-الفقرة الإذاعية الكاملة:"""
-
             try:
-                response = self.client.models.generate_content(
-                    model=GEMINI_MODEL,
-                    contents=prompt,
-                    config={'temperature': 0.3, 'max_output_tokens': 3000}
-                )
-                report.summary = response.text.strip()
-                
-                report.summary = re.sub(r'^#+\s*', '', report.summary)
-                report.summary = re.sub(r'\*\*|\*', '', report.summary)
-                report.summary = re.sub(r'^الفقرة الإذاعية:?\s*', '', report.summary)
-                report.summary = re.sub(r'^الفقرة:?\s*', '', report.summary)
-                
-                if report.summary and not report.summary.rstrip().endswith(('.', '؟', '!', '،')):
-                    last_period = max(
-                        report.summary.rfind('.'),
-                        report.summary.rfind('؟'),
-                        report.summary.rfind('!')
-                    )
-                    if last_period > len(report.summary) * 0.7:
-                        report.summary = report.summary[:last_period + 1]
-                    else:
-                        report.summary = report.summary.rstrip() + '.'
-                
+                report.summary = rewrite_bulletin_summary(self.client, report.title, report.content)
+                store_rewrite(self.conn, self.cursor, report, 'bulletin_summary', report.summary)
             except Exception as e:
                 print(f"      ⚠️ خطأ: {e}")
                 report.summary = report.content[:800]
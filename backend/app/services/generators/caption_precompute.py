@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+✍️ Caption Precompute Service
+تجهيز نص النشر (فيسبوك + انستغرام + ريل) لكل تقرير مسبقاً بعد توليد محتوى السوشال
+
+المبدأ:
+- بدل ما الـ publishers يصححوا الهاشتاجات ويصلحوا المسافات ويولدوا هاشتاجات بـ Gemini
+  وقت النشر، نجهزها هون ونحفظها في report_publish_captions (publish_captions.py)
+- المفتاح: بصمة النص الخام (content_hash) + CAPTION_PROMPT_VERSION، إذا انولد
+  محتوى سوشال جديد أو تغير البرومبت يُعاد التجهيز
+- نفس الطلب (نفس الهاشتاجات أو نفس النص) بيتنفذ مرة وحدة لكل المنصات بالتشغيل
+- إذا فشل Gemini لنوع، ما بينحفظ (الـ publisher بيستعمل التنسيق المحلي)
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import psycopg2
+from google import genai
+
+from settings import DB_CONFIG, GEMINI_API_KEY, GEMINI_MODEL
+from app.services.publishers.publish_captions import (
+    CAPTION_PROMPT_VERSION,
+    basic_spacing_fix,
+    caption_source,
+    ensure_captions_table,
+    missing_caption_kinds,
+    prepare_caption,
+    save_caption,
+    source_hash,
+)
+from app.services.publishers.publish_data import (
+    REEL_CONTENT_TYPE_ID,
+    SOCIAL_CONTENT_TYPE_ID,
+    DBPublishDataProvider,
+)
+
+
+class CaptionGenerationError(Exception):
+    """فشل طلب Gemini - النوع ما بينحفظ"""
+
+
+class CaptionPrecomputer:
+    """مجهز نصوص النشر المسبق"""
+
+    def __init__(self):
+        """تهيئة المجهز"""
+        self.conn = None
+        self.cursor = None
+
+        try:
+            self.conn = psycopg2.connect(**DB_CONFIG)
+            self.cursor = self.conn.cursor()
+            ensure_captions_table(self.cursor)
+            self.conn.commit()
+            print("✅ CaptionPrecomputer initialized")
+        except Exception as e:
+            print(f"❌ Database connection failed: {e}")
+            raise
+
+        self.client = genai.Client(api_key=GEMINI_API_KEY)
+        self.publish_data = DBPublishDataProvider(self.conn)
+
+        # نفس الطلب لأكثر من منصة/تقرير بنفس التشغيل
+        self._memo: Dict[tuple, object] = {}
+
+
+    # ==========================================
+    # PUBLIC METHODS
+    # ==========================================
+
+    def precompute_recent(self, hours_back: int = 48, limit: int = 20) -> Dict:
+        """
+        تجهيز النصوص للتقارير الأخيرة اللي عندها محتوى سوشال/ريل بدون caption محدث
+
+        Args:
+            hours_back: نفس نافذة social_media_job
+            limit: أقصى عدد تقارير بكل تشغيل
+
+        Returns:
+            Dict: إحصائيات
+        """
+        print(f"\n{'='*70}")
+        print(f"✍️ Precomputing publish captions (last {hours_back}h)")
+        print(f"{'='*70}")
+
+        stats = {'total_reports': 0, 'captions': 0, 'failed': 0, 'up_to_date': 0}
+
+        report_ids = self._fetch_recent_report_ids(hours_back)
+        if not report_ids:
+            print("📭 No reports with social content in window")
+            return stats
+
+        bundles = self.publish_data.load_many(report_ids)
+
+        pending = []
+        for report_id in report_ids:
+            data = bundles.get(report_id)
+            if not data:
+                continue
+            missing = missing_caption_kinds(data)
+            if missing:
+                pending.append((data, missing))
+            else:
+                stats['up_to_date'] += 1
+
+        pending = pending[:limit]
+        stats['total_reports'] = len(pending)
+
+        if not pending:
+            print("✅ All captions up to date")
+            return stats
+
+        print(f"📋 {len(pending)} reports need captions")
+
+        for i, (data, kinds) in enumerate(pending, 1):
+            print(f"\n[{i}/{len(pending)}] Report #{data.report_id}: {data.title[:50]}...")
+            result = self.precompute_report(data, kinds)
+            stats['captions'] += result['captions']
+            stats['failed'] += result['failed']
+
+        print(f"\n{'='*70}")
+        print(f"📊 Captions: {stats['captions']}, Failed: {stats['failed']}")
+        print(f"{'='*70}")
+
+        return stats
+
+
+    def precompute_report(self, data, kinds: List[str] = None) -> Dict:
+        """
+        تجهيز الأنواع الناقصة لتقرير واحد
+
+        Args:
+            data: PublishData (من publish_data)
+            kinds: الأنواع المطلوبة (None = الناقص)
+        """
+        result = {'captions': 0, 'failed': 0}
+
+        for kind in kinds or missing_caption_kinds(data):
+            source = caption_source(data, kind)
+            if source is None:
+                continue
+
+            try:
+                caption = prepare_caption(
+                    kind,
+                    source,
+                    fix_spacing=self._fix_spacing,
+                    correct_hashtags=self._correct_hashtags,
+                    generate_hashtags=self._generate_hashtags
+                )
+            except CaptionGenerationError as e:
+                print(f"   ⚠️ {kind}: {str(e)[:150]}")
+                result['failed'] += 1
+                continue
+
+            try:
+                save_caption(self.cursor, data.report_id, kind, source_hash(source), caption)
+                self.conn.commit()
+                result['captions'] += 1
+                print(f"   ✅ {kind}")
+            except Exception as e:
+                print(f"   ❌ Error saving {kind}: {e}")
+                self.conn.rollback()
+                result['failed'] += 1
+
+        return result
+
+
+    def close(self):
+        """إغلاق الاتصالات"""
+        if self.cursor:
+            self.cursor.close()
+        if self.conn:
+            self.conn.close()
+        print("🔒 Connection closed")
+
+
+    # ==========================================
+    # PRIVATE METHODS
+    # ==========================================
+
+    def _fetch_recent_report_ids(self, hours_back: int) -> List[int]:
+        """تقارير النافذة اللي إلها محتوى سوشال أو ريل"""
+        try:
+            self.cursor.execute("""
+                SELECT gr.id
+                FROM generated_report gr
+                WHERE gr.created_at >= NOW() - INTERVAL '%s hours'
+                  AND EXISTS (
+                      SELECT 1 FROM generated_content gc
+                      WHERE gc.report_id = gr.id AND gc.content_type_id IN (%s, %s)
+                  )
+                ORDER BY gr.created_at DESC
+            """, (hours_back, SOCIAL_CONTENT_TYPE_ID, REEL_CONTENT_TYPE_ID))
+            return [row[0] for row in self.cursor.fetchall()]
+        except Exception as e:
+            print(f"❌ Error fetching reports: {e}")
+            self.conn.rollback()
+            return []
+
+
+    def _generate(self, prompt: str, key: tuple) -> str:
+        """طلب Gemini (مرة وحدة لنفس المفتاح بالتشغيل)"""
+        if key in self._memo:
+            return self._memo[key]
+
+        try:
+            response = self.client.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=prompt,
+                config={'temperature': 0.2}
+            )
+            text = (response.text or '').strip()
+        except Exception as e:
+            error_msg = str(e)
+            if "RESOURCE_EXHAUSTED" in error_msg or "429" in error_msg:
+                time.sleep(10)
+            raise CaptionGenerationError(error_msg)
+
+        self._memo[key] = text
+        return text
+
+
+    def _fix_spacing(self, text: str) -> str:
+        """إصلاح المسافات بـ Gemini (regex إذا الرد مش منطقي)"""
+        prompt = f"""أنت خبير في تنسيق النصوص العربية.
+
+المهمة: أصلح المسافات في هذا النص. الكلمات ملتصقة ببعضها ومحتاجة مسافات.
+
+القواعد:
+1. ضع مسافة بين كل كلمتين
+2. ضع مسافة قبل وبعد علامات الترقيم
+3. لا تغير أي كلمة أو حرف - فقط أضف مسافات
+4. احترم الأرقام والإيموجي - لا تغيرهم
+5. أرجع النص المصلح فقط بدون أي شرح أو مقدمات
+
+النص الأصلي:
+{text}
+
+النص المصلح (فقط النص، بدون مقدمات):"""
+
+        fixed_text = self._generate(prompt, ('spacing', CAPTION_PROMPT_VERSION, text))
+
+        # تنظيف أي مقدمات
+        unwanted_starts = ['النص المصلح:', 'إليك النص:', 'هنا النص:', 'التصحيح:']
+        for prefix in unwanted_starts:
+            if fixed_text.startswith(prefix):
+                fixed_text = fixed_text[len(prefix):].strip()
+                break
+
+        # إزالة أي backticks
+        fixed_text = fixed_text.replace('```', '').strip()
+
+        # Sanity check
+        if fixed_text and len(fixed_text) > len(text) * 0.8:
+            return fixed_text
+        return basic_spacing_fix(text)
+
+
+    def _correct_hashtags(self, hashtags: list) -> list:
+        """فصل الكلمات الملتصقة بالهاشتاجات بـ _"""
+        hashtags_str = '\n'.join(hashtags)
+
+        prompt = f"""أنت خبير في الهاشتاجات العربية.
+
+افصل الكلمات الملتصقة بـ _
+
+مثال:
+#قواتحفظالسلام → #قوات_حفظ_السلام
+#انتهاكصارخ → #انتهاك_صارخ
+
+الهاشتاجات:
+{hashtags_str}
+
+النتيجة (هاشتاج في كل سطر):"""
+
+        corrected_text = self._generate(prompt, ('hashtags', CAPTION_PROMPT_VERSION, hashtags_str))
+
+        corrected = [line.strip() for line in corrected_text.split('\n') if line.strip().startswith('#')]
+        return corrected if len(corrected) == len(hashtags) else hashtags
+
+
+    def _generate_hashtags(self, text: str) -> Optional[str]:
+        """توليد 5-8 هاشتاجات للمحتوى (انستغرام بدون هاشتاجات)"""
+        # نأخذ أول 500 حرف من المحتوى للسياق
+        context = text[:500]
+
+        prompt = f"""أنت خبير في السوشيال ميديا والهاشتاجات.
+
+المهمة: ولّد 5-8 هاشتاجات عربية مناسبة لهذا المحتوى.
+
+القواعد:
+1. الهاشتاجات يجب أن تكون ذات صلة بالمحتوى
+2. استخدم كلمات شائعة ومطلوبة في البحث
+3. الهاشتاجات يجب أن تكون قصيرة (كلمة-3 كلمات)
+4. افصل الكلمات بـ _ للقراءة
+5. أرجع الهاشتاجات فقط (كل واحد في سطر)
+
+المحتوى:
+{context}
+
+الهاشتاجات (فقط الهاشتاجات، بدون شرح):"""
+
+        hashtags_text = self._generate(prompt, ('generate', CAPTION_PROMPT_VERSION, context))
+
+        hashtags = [line.strip() for line in hashtags_text.split('\n') if line.strip().startswith('#')]
+        return ' '.join(hashtags[:8])  # أقصى 8 هاشتاجات
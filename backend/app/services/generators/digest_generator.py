@@ -24,6 +24,13 @@ import psycopg2
 from google import genai
 from dotenv import load_dotenv
 
+from app.utils.title_dedup import DIGEST_RULE, remove_duplicate_titles
+from app.services.generators.rewrite_cache import (
+    load_cached_rewrites,
+    prepare_rewrite_cache,
+    store_rewrite,
+)
+
 load_dotenv()
 
 # ============================================
@@ -72,11 +79,75 @@ class DigestResult:
     skipped: bool = False
 
 
+# ============================================
+# Per-Report Rewrites
+# ============================================
+# دوال مستقلة عن الـ generator حتى يستخدمها التجهيز المسبق
+# (broadcast_precompute) بنفس البرومبت بالضبط
+
+def convert_digest_headlines(client, titles: List[str]) -> Dict[int, str]:
+    """تحويل دفعة عناوين لجمل اسمية بطلب واحد، يرجع {index: العنوان المحوّل} (يرمي Exception عند فشل Gemini)"""
+    titles_text = "\n".join([
+        f"{i+1}. {title}"
+        for i, title in enumerate(titles)
+    ])
+    
+    prompt = f"""حوّل هذه العناوين الإخبارية إلى جمل اسمية قصيرة للموجز الإذاعي.
+
+القواعد المهمة:
+1. كل عنوان يبدأ بجملة اسمية (اسم أو مصدر، ليس فعل)
+2. العنوان قصير جداً (10-15 كلمة كحد أقصى)
+3. لا تضف معلومات جديدة
+4. أزل أي أقواس أو رموز
+
+أمثلة:
+- "تصاعدت الغارات على غزة" ← "تصاعد الغارات الإسرائيلية على غزة"
+- "أعلنت الوزارة عن خطة جديدة" ← "إعلان وزاري عن خطة جديدة"
+- "استشهد 10 فلسطينيين في غارة" ← "استشهاد 10 فلسطينيين في غارة إسرائيلية"
+
+العناوين:
+{titles_text}
+
+أجب بـ JSON فقط (بدون أي نص آخر):
+{{"headlines": [
+    {{"num": 1, "headline": "العنوان المحوّل"}},
+    {{"num": 2, "headline": "العنوان المحوّل"}}
+]}}"""
+
+    response = client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config={'temperature': 0.3, 'max_output_tokens': 2000}
+    )
+    
+    headlines = {}
+    text = response.text.strip()
+    json_match = re.search(r'\{.*\}', text, re.DOTALL)
+    if json_match:
+        data = json.loads(json_match.group())
+        for item in data.get('headlines', []):
+            idx = item.get('num', item.get('original_num', 0)) - 1
+            if 0 <= idx < len(titles) and item.get('headline'):
+                headlines[idx] = item['headline']
+    
+    return headlines
+
+
+def clean_digest_headline(headline: str) -> str:
+    """إزالة الأقواس وعلامات التنصيص من أطراف العنوان"""
+    headline = headline.strip()
+    headline = re.sub(r'^\[|\]$', '', headline)
+    headline = re.sub(r'^\(|\)$', '', headline)
+    headline = re.sub(r'^["\'"]|["\'"]$', '', headline)
+    return headline.strip()
+
+
 class DigestGenerator:
     
     def __init__(self):
         self.conn = psycopg2.connect(**DB_CONFIG)
         self.cursor = self.conn.cursor()
+        prepare_rewrite_cache(self.conn, self.cursor)
         self.client = genai.Client(api_key=GEMINI_API_KEY)
         print("✅ Connected to DB and Gemini")
     
@@ -230,38 +301,7 @@ class DigestGenerator:
         return reports[:limit]
     
     def _remove_duplicates(self, reports: List[ReportItem]) -> List[ReportItem]:
-        unique_reports = []
-        seen_titles = []
-        
-        stop_words = {'في', 'من', 'على', 'إلى', 'عن', 'مع', 'أن', 'ان', 'هذا', 'هذه', 'التي', 'الذي', 'بعد', 'قبل', 'خلال', 'حول', 'ضد', 'بين'}
-        
-        for report in reports:
-            clean_title = report.title.lower().strip()
-            clean_title = re.sub(r'[^\w\s]', '', clean_title)
-            
-            words = [w for w in clean_title.split() if w not in stop_words and len(w) > 2]
-            
-            is_duplicate = False
-            for seen_words in seen_titles:
-                if not words or not seen_words:
-                    continue
-                
-                common = len(set(words) & set(seen_words))
-                similarity = common / min(len(words), len(seen_words))
-                
-                key_words = [w for w in words if len(w) > 4]
-                seen_key = [w for w in seen_words if len(w) > 4]
-                key_common = len(set(key_words) & set(seen_key))
-                
-                if similarity > 0.5 or (key_common >= 3):
-                    is_duplicate = True
-                    break
-            
-            if not is_duplicate:
-                unique_reports.append(report)
-                seen_titles.append(words)
-        
-        return unique_reports
+        return remove_duplicate_titles(reports, DIGEST_RULE)
     
     def _fetch_reports_by_ids(self, ids: List[int]) -> List[ReportItem]:
         query = """
@@ -288,67 +328,46 @@ class DigestGenerator:
     
     
     def _convert_to_nominal_sentences(self, reports: List[ReportItem]) -> List[ReportItem]:
-        titles_text = "\n".join([
-            f"{i+1}. {report.title}"
-            for i, report in enumerate(reports)
-        ])
+        # العناوين المخزنة من موجز سابق لا تحتاج Gemini
+        cached = load_cached_rewrites(self.cursor, reports, 'headline_digest')
+        for report in reports:
+            if report.id in cached:
+                report.headline = cached[report.id]
         
-        prompt = f"""حوّل هذه العناوين الإخبارية إلى جمل اسمية قصيرة للموجز الإذاعي.
-
-القواعد المهمة:
-1. كل عنوان يبدأ بجملة اسمية (اسم أو مصدر، ليس فعل)
-2. العنوان قصير جداً (10-15 كلمة كحد أقصى)
-3. لا تضف معلومات جديدة
-4. أزل أي أقواس أو رموز
-
-أمثلة:
-- "تصاعدت الغارات على غزة" ← "تصاعد الغارات الإسرائيلية على غزة"
-- "أعلنت الوزارة عن خطة جديدة" ← "إعلان وزاري عن خطة جديدة"
-- "استشهد 10 فلسطينيين في غارة" ← "استشهاد 10 فلسطينيين في غارة إسرائيلية"
-
-العناوين:
-{titles_text}
-
-أجب بـ JSON فقط (بدون أي نص آخر):
-{{"headlines": [
-    {{"num": 1, "headline": "العنوان المحوّل"}},
-    {{"num": 2, "headline": "العنوان المحوّل"}}
-]}}"""
-
-        try:
-            response = self.client.models.generate_content(
-                model=GEMINI_MODEL,
-                contents=prompt,
-                config={'temperature': 0.3, 'max_output_tokens': 2000}
-            )
-            
-            text = response.text.strip()
-            json_match = re.search(r'\{.*\}', text, re.DOTALL)
-            if json_match:
-                data = json.loads(json_match.group())
-                headlines = data.get('headlines', [])
-                
-                for item in headlines:
-                    idx = item.get('num', item.get('original_num', 0)) - 1
-                    if 0 <= idx < len(reports):
-                        reports[idx].headline = item.get('headline', reports[idx].title)
+        pending = [r for r in reports if r.id not in cached]
+        if cached:
+            print(f"   ⚡ {len(cached)} عنوان جاهز مسبقاً، {len(pending)} للتحويل")
         
-        except Exception as e:
-            print(f"   ⚠️ خطأ في التحويل: {e}")
+        converted = self._convert_titles_with_gemini(pending) if pending else set()
         
         for report in reports:
             if not report.headline:
                 report.headline = report.title
             
-            report.headline = report.headline.strip()
-            report.headline = re.sub(r'^\[|\]$', '', report.headline)
-            report.headline = re.sub(r'^\(|\)$', '', report.headline)
-            report.headline = re.sub(r'^["\'"]|["\'"]$', '', report.headline)
-            report.headline = report.headline.strip()
+            report.headline = clean_digest_headline(report.headline)
+            
+            if report.id in converted and len(report.headline) > 10:
+                store_rewrite(self.conn, self.cursor, report, 'headline_digest', report.headline)
         
         return reports
     
     
+    def _convert_titles_with_gemini(self, reports: List[ReportItem]) -> set:
+        """تحويل دفعة عناوين بطلب واحد، يرجع ids التقارير اللي تحولت فعلاً"""
+        converted = set()
+        
+        try:
+            headlines = convert_digest_headlines(self.client, [report.title for report in reports])
+            for idx, headline in headlines.items():
+                reports[idx].headline = headline
+                converted.add(reports[idx].id)
+        
+        except Exception as e:
+            print(f"   ⚠️ خطأ في التحويل: {e}")
+        
+        return converted
+    
+    
     def _build_digest_script(
         self,
         broadcast_hour: int,
@@ -13,12 +13,11 @@ import time
 import tempfile
 import json
 import psycopg2
-import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 from typing import Dict, List, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import boto3
-from urllib.parse import urlparse
 
 from settings import DB_CONFIG, GEMINI_API_KEY, GEMINI_MODEL
 
@@ -26,8 +25,24 @@ from settings import DB_CONFIG, GEMINI_API_KEY, GEMINI_MODEL
 from dotenv import load_dotenv
 load_dotenv()
 
-from moviepy.editor import ImageClip, AudioFileClip, CompositeVideoClip
-from PIL import Image
+from app.services.generators.reel_renderer import (
+    RenderSettings,
+    TextOverlay,
+    get_media_duration,
+    render_reel,
+)
+from app.services.generators.reel_render_pool import (
+    REEL_RENDER_PROCESSES,
+    ReelRenderService,
+    RenderJob,
+)
+from app.services.generators.render_assets import get_asset_registry
+from app.utils.media_cache import (
+    MEDIA_CACHE_ENABLED,
+    fetch_to_temp,
+    get_media_cache,
+)
+from app.utils.s3_transfer import upload_file_multipart
 
 # Google Text-to-Speech for temporary audio generation
 from google.cloud import texttospeech
@@ -36,6 +51,13 @@ from google.cloud import texttospeech
 from google import genai
 
 
+# نص فوق الفيديو (معطل افتراضياً - فيديو بدون كتابة)
+REEL_TEXT_OVERLAYS = os.getenv('REEL_TEXT_OVERLAYS', 'false').lower() == 'true'
+
+# threads للتنزيل/التلخيص/الرفع (الـ encode بعمليات منفصلة، شوف reel_render_pool)
+REEL_IO_WORKERS = int(os.getenv('REEL_IO_WORKERS', 3))
+
+
 @dataclass
 class ReelGenerationResult:
     """Result of reel generation"""
@@ -46,6 +68,36 @@ class ReelGenerationResult:
     duration_seconds: Optional[float] = None
 
 
+@dataclass
+class _ReelInputs:
+    """What the DB says about one report (read on the main thread)"""
+    report_id: int
+    existing_reel: Optional[Dict]
+    image_urls: List[str]
+    audio_url: str
+    audio_text: Optional[str] = None
+    report: Optional[Dict] = None
+
+
+@dataclass
+class _PreparedReel:
+    """Local files ready to render (built on an I/O thread)"""
+    inputs: _ReelInputs
+    image_paths: List[str]
+    audio_path: Optional[str]
+    duration: float
+    overlays: List[TextOverlay] = field(default_factory=list)
+    
+    def cleanup(self):
+        paths = self.image_paths + [self.audio_path] + [o.image_path for o in self.overlays]
+        for path in paths:
+            try:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                pass
+
+
 class ReelGenerator:
     """Generator for Instagram Reels from images and audio"""
     
@@ -131,6 +183,10 @@ class ReelGenerator:
         except Exception as e:
             print(f"⚠️  Google TTS initialization failed: {e}")
             raise
+        
+        # Overlay font resolved up front, not inside the first render
+        if REEL_TEXT_OVERLAYS:
+            get_asset_registry().warm_up(fonts={'arabic': [55]})
     
     def _get_news_images_for_report(self, report_id: int) -> List[str]:
         """Get all image URLs from news articles in the report's cluster"""
@@ -161,11 +217,197 @@ class ReelGenerator:
         report_id: int,
         force_update: bool = False
     ) -> ReelGenerationResult:
-        """Generate a reel for a single report"""
+        """Generate a reel for a single report (renders in this process)"""
         print(f"\n{'='*70}")
         print(f"🎬 Generating Reel for Report #{report_id}")
         print(f"{'='*70}")
         
+        inputs = self._collect_inputs(report_id, force_update)
+        if isinstance(inputs, ReelGenerationResult):
+            return inputs
+        
+        prepared = None
+        try:
+            prepared = self._download_inputs(inputs)
+            
+            generation_result = self._create_reel(prepared)
+            
+            if not generation_result.success:
+                print(f"❌ Reel generation failed: {generation_result.error_message}")
+                return generation_result
+            
+            print(f"✅ Reel generated successfully")
+            return self._save_result(inputs, generation_result.reel_url, prepared.duration)
+        
+        except Exception as e:
+            return ReelGenerationResult(success=False, error_message=str(e)[:300])
+        
+        finally:
+            # Cleanup temporary files
+            if prepared:
+                prepared.cleanup()
+    
+    def generate_for_all_reports(
+        self,
+        force_update: bool = False,
+        limit: int = 10,
+        processes: int = None
+    ) -> Dict:
+        """Generate reels for all reports with images and audio"""
+        print(f"\n{'='*70}")
+        print(f"🎬 Generating Reels for All Reports")
+        print(f"{'='*70}")
+        
+        if force_update:
+            reports = self._fetch_recent_reports(limit)
+        else:
+            reports = self._fetch_reports_without_reels(limit)
+        
+        if not reports:
+            print("📭 No reports need reel generation")
+            return {
+                'total_reports': 0,
+                'success': 0,
+                'failed': 0,
+                'skipped': 0
+            }
+        
+        print(f"📋 Found {len(reports)} reports to process")
+        
+        stats = {
+            'total_reports': len(reports),
+            'success': 0,
+            'failed': 0,
+            'skipped': 0,
+            'updated': 0
+        }
+        
+        self._generate_pipelined(reports, force_update, processes, stats)
+        
+        print(f"\n{'='*70}")
+        print(f"📊 Final Results:")
+        print(f"   • Reports: {stats['total_reports']}")
+        print(f"   • Success: {stats['success']}")
+        print(f"   • Updated: {stats['updated']}")
+        print(f"   • Failed: {stats['failed']}")
+        if MEDIA_CACHE_ENABLED:
+            print(f"   • Media cache: {get_media_cache().summary()}")
+        print(f"{'='*70}")
+        
+        return stats
+    
+    @staticmethod
+    def _count_result(stats: Dict, success: bool, force_update: bool):
+        if success:
+            if force_update:
+                stats['updated'] += 1
+            else:
+                stats['success'] += 1
+        else:
+            stats['failed'] += 1
+    
+    def _generate_pipelined(
+        self,
+        reports: list,
+        force_update: bool,
+        processes: Optional[int],
+        stats: Dict
+    ):
+        """
+        توليد الريلز كـ pipeline:
+        - قاعدة البيانات من الـ thread الرئيسي بس (connection واحد)
+        - التنزيل والتلخيص والرفع بـ I/O threads
+        - الـ encode بعمليات منفصلة (ReelRenderService) على cores مخصصة،
+          فالريل التالي بيتنزل وهو الحالي بيترندر
+        """
+        jobs = []
+        for i, report in enumerate(reports, 1):
+            print(f"\n[{i}/{len(reports)}] Report #{report['id']}")
+            inputs = self._collect_inputs(report['id'], force_update)
+            if isinstance(inputs, ReelGenerationResult):
+                if not inputs.success:
+                    print(f"   ⚠️  Error: {inputs.error_message}")
+                self._count_result(stats, inputs.success, force_update)
+                continue
+            jobs.append(inputs)
+        
+        if not jobs:
+            return
+        
+        print(f"\n⚡ Rendering {len(jobs)} reels "
+              f"({processes or REEL_RENDER_PROCESSES} render processes, {REEL_IO_WORKERS} I/O threads)")
+        
+        with ThreadPoolExecutor(max_workers=REEL_IO_WORKERS) as io_pool, \
+             ReelRenderService(processes=processes) as render_service:
+            
+            pending = {
+                io_pool.submit(self._download_inputs, inputs): ('download', inputs, None, None)
+                for inputs in jobs
+            }
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    stage, inputs, prepared, video_path = pending.pop(future)
+                    report_id = inputs.report_id
+                    
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        print(f"   ❌ Report #{report_id}: {stage} failed: {str(e)[:300]}")
+                        if video_path and os.path.exists(video_path):
+                            os.remove(video_path)
+                        if prepared:
+                            prepared.cleanup()
+                        self._count_result(stats, False, force_update)
+                        continue
+                    
+                    if stage == 'download':
+                        prepared = value
+                        video_path = tempfile.mktemp(suffix='.mp4')
+                        render = render_service.submit(RenderJob(
+                            job_id=str(report_id),
+                            image_paths=prepared.image_paths,
+                            audio_path=prepared.audio_path,
+                            output_path=video_path,
+                            duration=prepared.duration,
+                            overlays=prepared.overlays,
+                            settings=self._render_settings()
+                        ))
+                        pending[render] = ('render', inputs, prepared, video_path)
+                        continue
+                    
+                    if stage == 'render':
+                        prepared.cleanup()
+                        if not value.success:
+                            print(f"   ❌ Report #{report_id}: render failed: {value.error}")
+                            if os.path.exists(video_path):
+                                os.remove(video_path)
+                            self._count_result(stats, False, force_update)
+                            continue
+                        
+                        print(f"   ✅ Report #{report_id}: rendered with {value.backend} "
+                              f"in {value.render_seconds:.1f}s")
+                        upload = io_pool.submit(self._upload_reel, report_id, video_path)
+                        pending[upload] = ('upload', inputs, prepared, video_path)
+                        continue
+                    
+                    if os.path.exists(video_path):
+                        os.remove(video_path)
+                    
+                    result = self._save_result(inputs, value, prepared.duration)
+                    if not result.success:
+                        print(f"   ⚠️  Error: {result.error_message}")
+                    self._count_result(stats, result.success, force_update)
+    
+    def _collect_inputs(self, report_id: int, force_update: bool):
+        """
+        كل قراءات قاعدة البيانات لتقرير واحد (من الـ thread الرئيسي)
+        
+        Returns:
+            _ReelInputs، أو ReelGenerationResult إذا ما في داعي/ما في إمكانية للتوليد
+        """
         # Check if reel already exists
         existing_reel = self._get_existing_reel(report_id)
         
@@ -205,48 +447,56 @@ class ReelGenerator:
         print(f"📸 Found {len(news_images)} images from news articles")
         print(f"🎵 Audio found: {audio_content['file_url'][:60]}...")
         
-        # Download images and audio
-        image_paths = []
-        audio_path = None
-        temp_audio_path = None  # For temporary summarized audio
+        return _ReelInputs(
+            report_id=report_id,
+            existing_reel=existing_reel,
+            image_urls=news_images,
+            audio_url=audio_content['file_url'],
+            audio_text=audio_content.get('content'),
+            # Needed only if the audio turns out too long, but the I/O threads can't use the cursor
+            report=self._fetch_report_content(report_id)
+        )
+    
+    def _download_inputs(self, inputs: _ReelInputs) -> _PreparedReel:
+        """
+        تنزيل الصور والصوت وتجهيز الريل للرندر (I/O thread، بدون قاعدة بيانات)
+        
+        Raises:
+            ValueError إذا ما في صور/صوت
+        """
+        report_id = inputs.report_id
+        prepared = _PreparedReel(inputs=inputs, image_paths=[], audio_path=None, duration=0.0)
         
         try:
             # Download all images
-            for i, img_url in enumerate(news_images, 1):
+            for i, img_url in enumerate(inputs.image_urls, 1):
                 try:
                     img_path = self._download_from_url(img_url)
                     if img_path:
-                        image_paths.append(img_path)
-                        print(f"   ✅ Downloaded image {i}/{len(news_images)}")
+                        prepared.image_paths.append(img_path)
+                        print(f"   ✅ Report #{report_id}: downloaded image {i}/{len(inputs.image_urls)}")
                 except Exception as e:
-                    print(f"   ⚠️  Failed to download image {i}: {e}")
+                    print(f"   ⚠️  Report #{report_id}: failed to download image {i}: {e}")
             
-            if not image_paths:
-                return ReelGenerationResult(
-                    success=False,
-                    error_message="Failed to download any images"
-                )
+            if not prepared.image_paths:
+                raise ValueError("Failed to download any images")
             
-            audio_path = self._download_from_s3_url(audio_content['file_url'])
+            prepared.audio_path = self._download_from_s3_url(inputs.audio_url)
             
-            print(f"✅ Downloaded {len(image_paths)} images and audio file")
+            print(f"✅ Downloaded {len(prepared.image_paths)} images and audio file")
             
             # Check audio duration and summarize if needed
-            from moviepy.editor import AudioFileClip as CheckAudioClip
-            check_audio = CheckAudioClip(audio_path)
-            audio_duration = check_audio.duration
-            check_audio.close()
+            audio_duration = get_media_duration(prepared.audio_path)
+            summarized_text = None
             
             if audio_duration > self.MAX_DURATION:
                 print(f"⚠️  Audio duration ({audio_duration:.1f}s) exceeds max duration ({self.MAX_DURATION}s)")
                 print(f"   📝 Summarizing content and generating new audio...")
                 
-                # Fetch report content
-                report = self._fetch_report_content(report_id)
+                report = inputs.report
                 if not report or not report.get('content'):
                     print(f"   ⚠️  Could not fetch report content, using trimmed audio")
                 else:
-                    # Summarize the content
                     summarized_text = self._summarize_text(
                         title=report.get('title', ''),
                         content=report.get('content', ''),
@@ -262,321 +512,77 @@ class ReelGenerator:
                         
                         if temp_audio_path:
                             print(f"   ✅ Generated temporary audio from summary")
-                            # Use the temporary audio instead
-                            if audio_path and os.path.exists(audio_path):
-                                os.remove(audio_path)
-                            audio_path = temp_audio_path
+                            os.remove(prepared.audio_path)
+                            prepared.audio_path = temp_audio_path
+                            audio_duration = get_media_duration(temp_audio_path)
                         else:
                             print(f"   ⚠️  Failed to generate temporary audio, using trimmed original")
-            
-            # Get text content for comment/description (not for video overlay)
-            text_content = None
-            if audio_content and audio_content.get('content'):
-                text_content = audio_content['content']
-            elif temp_audio_path:
-                # If we used summarized text, get it from the report
-                report = self._fetch_report_content(report_id)
-                if report:
-                    summarized_text = self._summarize_text(
-                        title=report.get('title', ''),
-                        content=report.get('content', ''),
-                        target_duration=self.MAX_DURATION
-                    )
-                    if summarized_text:
-                        text_content = summarized_text
-            
-            # Generate the reel with multiple images (without text overlays)
-            generation_result = self._create_reel(
-                image_paths=image_paths,
-                audio_path=audio_path,
-                report_id=report_id
-            )
-            
-            if not generation_result.success:
-                print(f"❌ Reel generation failed: {generation_result.error_message}")
-                return generation_result
-            
-            print(f"✅ Reel generated successfully")
-            s3_url = generation_result.reel_url
-            
-            # Save to database
-            if existing_reel:
-                success = self._update_reel_record(
-                    content_id=existing_reel['id'],
-                    report_id=report_id,
-                    s3_url=s3_url,
-                    duration=generation_result.duration_seconds
-                )
-                action = "Updated"
-            else:
-                success = self._save_reel_record(
-                    report_id=report_id,
-                    s3_url=s3_url,
-                    duration=generation_result.duration_seconds
+                            summarized_text = None
+            
+            # Ensure duration is within Instagram Reel limits
+            if audio_duration < self.MIN_DURATION:
+                print(f"   ⚠️  Audio too short ({audio_duration:.1f}s), extending to {self.MIN_DURATION}s")
+                audio_duration = self.MIN_DURATION
+            elif audio_duration > self.MAX_DURATION:
+                print(f"   ⚠️  Audio too long ({audio_duration:.1f}s), trimming to {self.MAX_DURATION}s")
+                audio_duration = self.MAX_DURATION
+            prepared.duration = audio_duration
+            
+            # Text overlays only if REEL_TEXT_OVERLAYS (the summary is reused, not requested twice)
+            text_content = inputs.audio_text or summarized_text
+            if text_content and REEL_TEXT_OVERLAYS:
+                print(f"   📝 Adding text overlays to video...")
+                prepared.overlays = self._build_text_overlays(
+                    text_content, prepared.duration, prepared.audio_path
                 )
-                action = "Created"
             
-            if success:
-                print(f"✅ {action} database record")
-                return ReelGenerationResult(
-                    success=True,
-                    reel_url=s3_url,
-                    s3_path=s3_url,
-                    duration_seconds=generation_result.duration_seconds
-                )
-            else:
-                return ReelGenerationResult(
-                    success=False,
-                    error_message=f"Failed to {action.lower()} database record"
-                )
+            return prepared
         
-        finally:
-            # Cleanup temporary files
-            for img_path in image_paths:
-                if img_path and os.path.exists(img_path):
-                    os.remove(img_path)
-            if audio_path and os.path.exists(audio_path):
-                os.remove(audio_path)
-            # temp_audio_path is the same as audio_path if it was created, so already cleaned up
+        except Exception:
+            prepared.cleanup()
+            raise
     
-    def generate_for_all_reports(
-        self,
-        force_update: bool = False,
-        limit: int = 10
-    ) -> Dict:
-        """Generate reels for all reports with images and audio"""
-        print(f"\n{'='*70}")
-        print(f"🎬 Generating Reels for All Reports")
-        print(f"{'='*70}")
-        
-        if force_update:
-            reports = self._fetch_recent_reports(limit)
-        else:
-            reports = self._fetch_reports_without_reels(limit)
-        
-        if not reports:
-            print("📭 No reports need reel generation")
-            return {
-                'total_reports': 0,
-                'success': 0,
-                'failed': 0,
-                'skipped': 0
-            }
-        
-        print(f"📋 Found {len(reports)} reports to process")
-        
-        stats = {
-            'total_reports': len(reports),
-            'success': 0,
-            'failed': 0,
-            'skipped': 0,
-            'updated': 0
-        }
-        
-        for i, report in enumerate(reports, 1):
-            print(f"\n[{i}/{len(reports)}] Report #{report['id']}")
-            
-            result = self.generate_for_report(
-                report_id=report['id'],
-                force_update=force_update
-            )
-            
-            if result.success:
-                if force_update:
-                    stats['updated'] += 1
-                else:
-                    stats['success'] += 1
-            else:
-                stats['failed'] += 1
-                print(f"   ⚠️  Error: {result.error_message}")
-            
-            # Small delay between processing
-            if i < len(reports):
-                time.sleep(2)
-        
-        print(f"\n{'='*70}")
-        print(f"📊 Final Results:")
-        print(f"   • Reports: {stats['total_reports']}")
-        print(f"   • Success: {stats['success']}")
-        print(f"   • Updated: {stats['updated']}")
-        print(f"   • Failed: {stats['failed']}")
-        print(f"{'='*70}")
-        
-        return stats
+    def _render_settings(self) -> RenderSettings:
+        return RenderSettings(
+            width=self.REEL_WIDTH,
+            height=self.REEL_HEIGHT,
+            fps=self.REEL_FPS
+        )
     
-    def _create_reel(
-        self,
-        image_paths: List[str],
-        audio_path: str,
-        report_id: int,
-        retries: int = 2
-    ) -> ReelGenerationResult:
-        """Create a vertical video reel from multiple images and audio"""
+    def _create_reel(self, prepared: _PreparedReel, retries: int = 2) -> ReelGenerationResult:
+        """Render the prepared reel in this process and upload it"""
         
         for attempt in range(retries):
+            temp_video_path = tempfile.mktemp(suffix='.mp4')
             try:
                 print(f"   🎬 Creating reel (attempt {attempt + 1}/{retries})...")
+                print(f"   📊 Audio duration: {prepared.duration:.2f}s")
+                print(f"   🖼️  Creating slideshow from {len(prepared.image_paths)} images")
                 
-                # Load audio to get duration
-                audio_clip = AudioFileClip(audio_path)
-                audio_duration = audio_clip.duration
-                
-                # Ensure duration is within Instagram Reel limits
-                if audio_duration < self.MIN_DURATION:
-                    print(f"   ⚠️  Audio too short ({audio_duration:.1f}s), extending to {self.MIN_DURATION}s")
-                    audio_duration = self.MIN_DURATION
-                elif audio_duration > self.MAX_DURATION:
-                    print(f"   ⚠️  Audio too long ({audio_duration:.1f}s), trimming to {self.MAX_DURATION}s")
-                    audio_duration = self.MAX_DURATION
-                    audio_clip = audio_clip.subclip(0, self.MAX_DURATION)
-                
-                print(f"   📊 Audio duration: {audio_duration:.2f}s")
-                print(f"   🖼️  Creating slideshow from {len(image_paths)} images")
-                
-                # Process and create clips from all images
-                temp_image_paths = []
-                image_clips = []
-                
-                # Calculate duration per image
-                duration_per_image = audio_duration / len(image_paths)
-                
-                for idx, image_path in enumerate(image_paths):
-                    # Load and prepare image
-                    image = Image.open(image_path)
-                    original_width, original_height = image.size
-                    
-                    # Resize image to fit reel dimensions (9:16 aspect ratio)
-                    # Maintain aspect ratio and center crop
-                    target_aspect = self.REEL_WIDTH / self.REEL_HEIGHT
-                    image_aspect = original_width / original_height
-                    
-                    if image_aspect > target_aspect:
-                        # Image is wider, crop width
-                        new_width = int(original_height * target_aspect)
-                        left = (original_width - new_width) // 2
-                        image = image.crop((left, 0, left + new_width, original_height))
-                    else:
-                        # Image is taller, crop height
-                        new_height = int(original_width / target_aspect)
-                        top = (original_height - new_height) // 2
-                        image = image.crop((0, top, original_width, top + new_height))
-                    
-                    # Resize to exact reel dimensions
-                    image = image.resize((self.REEL_WIDTH, self.REEL_HEIGHT), Image.Resampling.LANCZOS)
-                    
-                    # Save processed image to temp file
-                    temp_image_path = tempfile.mktemp(suffix=f'_img{idx}.png')
-                    image.save(temp_image_path, 'PNG')
-                    temp_image_paths.append(temp_image_path)
-                    
-                    # Create video clip from image
-                    img_clip = ImageClip(temp_image_path, duration=duration_per_image)
-                    img_clip = img_clip.set_fps(self.REEL_FPS)
-                    img_clip = img_clip.resize((self.REEL_WIDTH, self.REEL_HEIGHT))
-                    
-                    # Set start time for this image clip
-                    img_clip = img_clip.set_start(idx * duration_per_image)
-                    
-                    image_clips.append(img_clip)
-                
-                # Combine all image clips into a slideshow
-                from moviepy.editor import concatenate_videoclips
-                combined_image_clip = concatenate_videoclips(image_clips, method="compose")
-                
-                # النص معطل - فيديو بدون كتابة
-                # Add text overlays if text content is provided
-                # if text_content:
-                #     print(f"   📝 Adding text overlays to video...")
-                #     text_clips = self._create_text_overlays(text_content, audio_duration, audio_path)
-                #     if text_clips:
-                #         # Composite slideshow with text overlays
-                #         video_clip = CompositeVideoClip([combined_image_clip] + text_clips)
-                #     else:
-                #         video_clip = combined_image_clip
-                # else:
-                #     video_clip = combined_image_clip
-                
-                # استخدام الفيديو بدون نص
-                video_clip = combined_image_clip
-                
-                # Combine video with audio
-                video_clip = video_clip.set_audio(audio_clip)
-                
-                # Export video to temp file
-                temp_video_path = tempfile.mktemp(suffix='.mp4')
-                print(f"   🎥 Rendering video...")
-                
-                video_clip.write_videofile(
-                    temp_video_path,
-                    fps=self.REEL_FPS,
-                    codec='libx264',
-                    audio_codec='aac',
-                    preset='medium',
-                    verbose=False,
-                    logger=None
+                render_start = time.time()
+                render_reel(
+                    image_paths=prepared.image_paths,
+                    audio_path=prepared.audio_path,
+                    output_path=temp_video_path,
+                    duration=prepared.duration,
+                    settings=self._render_settings(),
+                    overlays=prepared.overlays
                 )
+                print(f"   ✅ Video rendered ({os.path.getsize(temp_video_path):,} bytes, "
+                      f"{prepared.duration:.2f}s) in {time.time() - render_start:.1f}s")
                 
-                # Read video bytes
-                with open(temp_video_path, 'rb') as f:
-                    video_bytes = f.read()
-                
-                print(f"   ✅ Video rendered ({len(video_bytes):,} bytes, {audio_duration:.2f}s)")
-                
-                # Cleanup temp files
-                for clip in image_clips:
-                    clip.close()
-                audio_clip.close()
-                video_clip.close()
-                for temp_path in temp_image_paths:
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                os.remove(temp_video_path)
-                
-                # Upload to S3
-                timestamp = int(time.time())
-                file_name = f"reel_{report_id}_{timestamp}.mp4"
-                s3_key = f"{self.s3_folder}{file_name}"
-                
-                print(f"   📤 Uploading to S3: {s3_key}")
-                
-                self.s3_client.put_object(
-                    Bucket=self.bucket_name,
-                    Key=s3_key,
-                    Body=video_bytes,
-                    ContentType='video/mp4'
-                )
-                
-                s3_url = f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
-                print(f"   ✅ Uploaded successfully: {s3_url}")
+                s3_url = self._upload_reel(prepared.inputs.report_id, temp_video_path)
                 
                 return ReelGenerationResult(
                     success=True,
                     reel_url=s3_url,
-                    duration_seconds=audio_duration
+                    duration_seconds=prepared.duration
                 )
                 
             except Exception as e:
                 error_msg = str(e)
                 print(f"   ⚠️  Error: {error_msg[:300]}")
                 
-                # Cleanup on error
-                try:
-                    if 'temp_image_paths' in locals():
-                        for temp_path in temp_image_paths:
-                            if os.path.exists(temp_path):
-                                os.remove(temp_path)
-                    if 'temp_video_path' in locals() and os.path.exists(temp_video_path):
-                        os.remove(temp_video_path)
-                    if 'image_clips' in locals():
-                        for clip in image_clips:
-                            clip.close()
-                    if 'audio_clip' in locals():
-                        audio_clip.close()
-                    if 'video_clip' in locals():
-                        video_clip.close()
-                except:
-                    pass
-                
                 if attempt < retries - 1:
                     print(f"   🔄 Retrying in 5 seconds...")
                     time.sleep(5)
@@ -586,84 +592,83 @@ class ReelGenerator:
                         success=False,
                         error_message=f"Generation failed: {error_msg[:300]}"
                     )
+            
+            finally:
+                if os.path.exists(temp_video_path):
+                    os.remove(temp_video_path)
         
         return ReelGenerationResult(
             success=False,
             error_message="Max retries exceeded"
         )
     
+    def _upload_reel(self, report_id: int, video_path: str) -> str:
+        """Upload the rendered mp4 to S3 (I/O thread, multipart from disk) and return its URL"""
+        timestamp = int(time.time())
+        file_name = f"reel_{report_id}_{timestamp}.mp4"
+        s3_key = f"{self.s3_folder}{file_name}"
+        
+        print(f"   📤 Uploading to S3: {s3_key}")
+        
+        upload_file_multipart(
+            self.s3_client,
+            video_path,
+            bucket=self.bucket_name,
+            key=s3_key,
+            content_type='video/mp4'
+        )
+        
+        s3_url = f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
+        print(f"   ✅ Uploaded successfully: {s3_url}")
+        return s3_url
+    
+    def _save_result(self, inputs: _ReelInputs, s3_url: str, duration: float) -> ReelGenerationResult:
+        """Create/update the reel's generated_content row (main thread)"""
+        if inputs.existing_reel:
+            success = self._update_reel_record(
+                content_id=inputs.existing_reel['id'],
+                report_id=inputs.report_id,
+                s3_url=s3_url,
+                duration=duration
+            )
+            action = "Updated"
+        else:
+            success = self._save_reel_record(
+                report_id=inputs.report_id,
+                s3_url=s3_url,
+                duration=duration
+            )
+            action = "Created"
+        
+        if success:
+            print(f"✅ {action} database record")
+            return ReelGenerationResult(
+                success=True,
+                reel_url=s3_url,
+                s3_path=s3_url,
+                duration_seconds=duration
+            )
+        
+        return ReelGenerationResult(
+            success=False,
+            error_message=f"Failed to {action.lower()} database record"
+        )
+    
+    
     def _download_from_url(self, url: str) -> str:
-        """Download file from any URL to temporary file"""
+        """Download file from any URL to a private temp file (streamed, via the media cache)"""
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            suffix = os.path.splitext(url)[1] or '.tmp'
-            temp_file = tempfile.mktemp(suffix=suffix)
-            
-            with open(temp_file, 'wb') as f:
-                f.write(response.content)
-            
-            return temp_file
-            
+            return fetch_to_temp(url, s3_client=self.s3_client)
         except Exception as e:
             print(f"   ⚠️  Failed to download from {url[:60]}...: {e}")
             return None
     
     def _download_from_s3_url(self, s3_url: str) -> str:
-        """Download file from S3 URL to temporary file"""
+        """Download file from S3 URL to a private temp file (ranged GETs, HTTP fallback)"""
         try:
-            # Parse S3 URL - handle different formats:
-            # 1. https://bucket-name.s3.amazonaws.com/key
-            # 2. https://s3.region.amazonaws.com/bucket-name/key
-            # 3. https://bucket-name.s3.region.amazonaws.com/key
-            parsed = urlparse(s3_url)
-            
-            # Try to extract bucket and key from URL
-            if '.s3.' in parsed.netloc or 's3.' in parsed.netloc:
-                # Format: bucket.s3.region.amazonaws.com or s3.region.amazonaws.com
-                if parsed.netloc.startswith('s3.'):
-                    # Format: s3.region.amazonaws.com/bucket/key
-                    path_parts = parsed.path.lstrip('/').split('/', 1)
-                    bucket = path_parts[0]
-                    key = path_parts[1] if len(path_parts) > 1 else ''
-                else:
-                    # Format: bucket.s3.region.amazonaws.com/key
-                    bucket = parsed.netloc.split('.')[0]
-                    key = parsed.path.lstrip('/')
-            else:
-                # Fallback: assume it's a direct HTTP URL
-                raise ValueError("Cannot parse S3 URL format")
-            
-            # Download from S3 using boto3
-            response = self.s3_client.get_object(Bucket=bucket, Key=key)
-            file_content = response['Body'].read()
-            
-            # Save to temp file
-            suffix = os.path.splitext(key)[1] or '.tmp'
-            temp_file = tempfile.mktemp(suffix=suffix)
-            
-            with open(temp_file, 'wb') as f:
-                f.write(file_content)
-            
-            return temp_file
-            
+            return fetch_to_temp(s3_url, s3_client=self.s3_client)
         except Exception as e:
-            # Fallback: try HTTP download if S3 direct access fails
-            try:
-                print(f"   ⚠️  S3 direct download failed, trying HTTP: {e}")
-                response = requests.get(s3_url, timeout=30)
-                response.raise_for_status()
-                
-                suffix = os.path.splitext(s3_url)[1] or '.tmp'
-                temp_file = tempfile.mktemp(suffix=suffix)
-                
-                with open(temp_file, 'wb') as f:
-                    f.write(response.content)
-                
-                return temp_file
-            except Exception as e2:
-                raise Exception(f"Failed to download from S3: {e}, HTTP fallback also failed: {e2}")
+            raise Exception(f"Failed to download from S3: {e}")
     
     def _get_content_by_type(self, report_id: int, content_type_id: int, include_content: bool = False) -> Optional[Dict]:
         """Get content by report_id and content_type_id"""
@@ -1004,122 +1009,116 @@ class ReelGenerator:
             print(f"   ⚠️  Failed to get word timestamps: {e}")
             return None
     
-    def _create_text_overlays(self, text: str, audio_duration: float, audio_path: str = None) -> List:
-        """Create synchronized text overlays for the video using word-level timing"""
-        try:
-            import re
-            
-            # Try to get word-level timestamps from audio
-            word_timestamps = None
-            if audio_path:
-                word_timestamps = self._get_word_timestamps_from_audio(audio_path)
-            
-            # Split text into sentences (Arabic sentences end with . or ؟ or !)
-            sentences = re.split(r'[.!؟]\s+', text)
-            sentences = [s.strip() for s in sentences if s.strip()]
-            
-            if not sentences:
-                return []
-            
-            # Position: center of reel (vertically centered)
-            text_y_position = (self.REEL_HEIGHT - 400) // 2
+    def _compute_text_timings(self, text: str, audio_duration: float, audio_path: str = None) -> List[Dict]:
+        """Split text into sentences and time them against the audio (word-level if possible)"""
+        import re
+        
+        # Try to get word-level timestamps from audio
+        word_timestamps = None
+        if audio_path:
+            word_timestamps = self._get_word_timestamps_from_audio(audio_path)
+        
+        # Split text into sentences (Arabic sentences end with . or ؟ or !)
+        sentences = re.split(r'[.!؟]\s+', text)
+        sentences = [s.strip() for s in sentences if s.strip()]
+        
+        if not sentences:
+            return []
+        
+        sentence_timings = []
+        
+        if word_timestamps:
+            # Use word-level timestamps for accurate synchronization
+            print(f"   📊 Using word-level timestamps for {len(sentences)} sentences")
             
-            text_clips = []
+            # Match sentences to word timestamps
+            word_index = 0
             
-            if word_timestamps:
-                # Use word-level timestamps for accurate synchronization
-                print(f"   📊 Using word-level timestamps for {len(sentences)} sentences")
+            for sentence in sentences:
+                sentence_words = sentence.split()
+                sentence_word_count = len(sentence_words)
                 
-                # Match sentences to word timestamps
-                text_words = text.split()
-                sentence_timings = []
-                word_index = 0
-                
-                for sentence in sentences:
-                    sentence_words = sentence.split()
-                    sentence_word_count = len(sentence_words)
+                if word_index < len(word_timestamps):
+                    start_time = word_timestamps[word_index]['start_time']
                     
-                    if word_index < len(word_timestamps):
-                        start_time = word_timestamps[word_index]['start_time']
-                        
-                        # Find end time (last word of sentence)
-                        end_index = min(word_index + sentence_word_count - 1, len(word_timestamps) - 1)
-                        end_time = word_timestamps[end_index]['end_time']
-                        
-                        sentence_timings.append({
-                            'text': sentence,
-                            'start_time': start_time,
-                            'duration': end_time - start_time
-                        })
-                        
-                        word_index += sentence_word_count
-                    else:
-                        # Fallback: estimate timing for remaining sentences
-                        remaining_duration = audio_duration - word_timestamps[-1]['end_time']
-                        remaining_sentences = len(sentences) - len(sentence_timings)
-                        duration = remaining_duration / max(remaining_sentences, 1)
-                        
-                        start_time = sentence_timings[-1]['start_time'] + sentence_timings[-1]['duration'] if sentence_timings else 0
-                        sentence_timings.append({
-                            'text': sentence,
-                            'start_time': start_time,
-                            'duration': duration
-                        })
-                
-                # Create text clips with accurate timing
-                for i, timing in enumerate(sentence_timings):
-                    txt_clip = self._create_text_clip_pil(
-                        timing['text'],
-                        timing['duration'],
-                        timing['start_time'],
-                        ('center', text_y_position)
-                    )
-                    if txt_clip:
-                        text_clips.append(txt_clip)
-                    else:
-                        print(f"   ⚠️  Failed to create text clip for sentence {i+1}")
-            else:
-                # Fallback: use character-based estimation (better than equal distribution)
-                print(f"   📊 Using character-based timing estimation for {len(sentences)} sentences")
-                
-                # Estimate timing based on sentence length (more accurate than equal split)
-                total_chars = sum(len(s) for s in sentences)
-                current_time = 0
-                
-                for i, sentence in enumerate(sentences):
-                    # Duration proportional to sentence length
-                    char_ratio = len(sentence) / total_chars
-                    duration = audio_duration * char_ratio
+                    # Find end time (last word of sentence)
+                    end_index = min(word_index + sentence_word_count - 1, len(word_timestamps) - 1)
+                    end_time = word_timestamps[end_index]['end_time']
                     
-                    # Minimum duration of 1 second per sentence
-                    duration = max(duration, 1.0)
+                    sentence_timings.append({
+                        'text': sentence,
+                        'start_time': start_time,
+                        'duration': end_time - start_time
+                    })
                     
-                    txt_clip = self._create_text_clip_pil(
-                        sentence,
-                        duration,
-                        current_time,
-                        ('center', text_y_position)
-                    )
-                    if txt_clip:
-                        text_clips.append(txt_clip)
-                        current_time += duration
-                    else:
-                        print(f"   ⚠️  Failed to create text clip for sentence {i+1}")
+                    word_index += sentence_word_count
+                else:
+                    # Fallback: estimate timing for remaining sentences
+                    remaining_duration = audio_duration - word_timestamps[-1]['end_time']
+                    remaining_sentences = len(sentences) - len(sentence_timings)
+                    duration = remaining_duration / max(remaining_sentences, 1)
+                    
+                    start_time = sentence_timings[-1]['start_time'] + sentence_timings[-1]['duration'] if sentence_timings else 0
+                    sentence_timings.append({
+                        'text': sentence,
+                        'start_time': start_time,
+                        'duration': duration
+                    })
+        else:
+            # Fallback: use character-based estimation (better than equal distribution)
+            print(f"   📊 Using character-based timing estimation for {len(sentences)} sentences")
+            
+            # Estimate timing based on sentence length (more accurate than equal split)
+            total_chars = sum(len(s) for s in sentences)
+            current_time = 0
+            
+            for sentence in sentences:
+                # Duration proportional to sentence length
+                char_ratio = len(sentence) / total_chars
+                duration = audio_duration * char_ratio
+                
+                # Minimum duration of 1 second per sentence
+                duration = max(duration, 1.0)
+                
+                sentence_timings.append({
+                    'text': sentence,
+                    'start_time': current_time,
+                    'duration': duration
+                })
+                current_time += duration
+        
+        return sentence_timings
+    
+    def _build_text_overlays(self, text: str, audio_duration: float, audio_path: str = None) -> List[TextOverlay]:
+        """Sentences timed against the audio, as transparent PNG overlays for the renderer"""
+        try:
+            sentence_timings = self._compute_text_timings(text, audio_duration, audio_path)
+            text_y_position = (self.REEL_HEIGHT - 400) // 2
             
-            print(f"   ✅ Created {len(text_clips)} text overlays with synchronized timing")
-            return text_clips
+            overlays = []
+            for i, timing in enumerate(sentence_timings):
+                image_path = self._render_text_image(timing['text'])
+                if image_path:
+                    overlays.append(TextOverlay(
+                        image_path=image_path,
+                        start=timing['start_time'],
+                        duration=timing['duration'],
+                        y=text_y_position
+                    ))
+                else:
+                    print(f"   ⚠️  Failed to create text image for sentence {i+1}")
+            
+            print(f"   ✅ Created {len(overlays)} text overlays with synchronized timing")
+            return overlays
             
         except Exception as e:
             print(f"   ⚠️  Error creating text overlays: {e}")
-            import traceback
-            traceback.print_exc()
             return []
     
-    def _create_text_clip_pil(self, text: str, duration: float, start_time: float, position: tuple) -> Optional:
-        """Create text clip using PIL with proper Arabic RTL support"""
+    def _render_text_image(self, text: str) -> Optional[str]:
+        """Render a text block to a transparent PNG (reel width x 400) with Arabic RTL support"""
         try:
-            from moviepy.editor import ImageClip
-            from PIL import Image, ImageDraw, ImageFont
+            from PIL import Image, ImageDraw
             import textwrap
             import tempfile
             
@@ -1127,128 +1126,9 @@ class ReelGenerator:
             img = Image.new('RGBA', (self.REEL_WIDTH, 400), (0, 0, 0, 0))
             draw = ImageDraw.Draw(img)
             
-            # Load enhanced Arabic font with better fallback chain
-            font = None
-            font_size = 55  # Slightly smaller for better mobile readability
-            
-            # Enhanced font loading optimized for Render deployment
-            font = None
+            # Arabic font from the asset registry (resolved once, cached per size)
             font_size = 55  # Optimized for mobile readability
-            
-            # Priority 1: Try bundled font (works best on Render)
-            try:
-                # Multiple possible paths for the bundled font
-                possible_paths = [
-                    # Relative to current working directory (Render deployment)
-                    'fonts/NotoSansArabic-Regular.ttf',
-                    './fonts/NotoSansArabic-Regular.ttf',
-                    # Relative to backend directory
-                    'backend/fonts/NotoSansArabic-Regular.ttf',
-                    './backend/fonts/NotoSansArabic-Regular.ttf',
-                    # Absolute path calculation (fallback)
-                    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 'fonts', 'NotoSansArabic-Regular.ttf')
-                ]
-                
-                for font_path in possible_paths:
-                    if os.path.exists(font_path):
-                        try:
-                            font = ImageFont.truetype(font_path, font_size)
-                            print(f"   ✅ Using bundled Arabic font: {font_path}")
-                            break
-                        except Exception as e:
-                            print(f"   ⚠️  Failed to load {font_path}: {e}")
-                            continue
-                
-            except Exception as e:
-                print(f"   ⚠️  Error finding bundled font: {e}")
-            
-            # Priority 2: System fonts (Linux containers on Render)
-            if not font:
-                try:
-                    # Render uses Linux containers, so focus on Linux fonts
-                    linux_font_paths = [
-                        # Common Arabic fonts on Linux
-                        '/usr/share/fonts/truetype/noto/NotoSansArabic-Regular.ttf',
-                        '/usr/share/fonts/truetype/noto/NotoSansArabic-Bold.ttf',
-                        '/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf',
-                        '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
-                        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-                        '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf',
-                        '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
-                        # Ubuntu/Debian specific
-                        '/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf',
-                        '/usr/share/fonts/truetype/ubuntu/Ubuntu-Regular.ttf',
-                    ]
-                    
-                    for font_path in linux_font_paths:
-                        if os.path.exists(font_path):
-                            try:
-                                font = ImageFont.truetype(font_path, font_size)
-                                print(f"   ✅ Using system font: {os.path.basename(font_path)}")
-                                break
-                            except Exception as e:
-                                print(f"   ⚠️  Failed to load {font_path}: {e}")
-                                continue
-                                
-                except Exception as e:
-                    print(f"   ⚠️  Error loading system fonts: {e}")
-            
-            # Priority 3: Install Noto fonts if not available (Render-specific)
-            if not font:
-                try:
-                    print(f"   🔄 Attempting to install Noto Arabic fonts for Render...")
-                    import subprocess
-                    
-                    # Try to install fonts using apt (works on Render's Ubuntu containers)
-                    try:
-                        subprocess.run(['apt-get', 'update'], check=False, capture_output=True)
-                        subprocess.run(['apt-get', 'install', '-y', 'fonts-noto'], check=False, capture_output=True)
-                        print(f"   ✅ Attempted to install Noto fonts")
-                        
-                        # Try loading again after installation
-                        noto_path = '/usr/share/fonts/truetype/noto/NotoSansArabic-Regular.ttf'
-                        if os.path.exists(noto_path):
-                            font = ImageFont.truetype(noto_path, font_size)
-                            print(f"   ✅ Successfully loaded installed Noto font")
-                    except Exception as e:
-                        print(f"   ⚠️  Font installation failed: {e}")
-                        
-                except Exception as e:
-                    print(f"   ⚠️  Could not attempt font installation: {e}")
-            
-            # Priority 4: Download font if needed (Render fallback)
-            if not font:
-                try:
-                    print(f"   🌐 Downloading Arabic font for Render deployment...")
-                    import requests
-                    import tempfile
-                    
-                    # Download Noto Sans Arabic from Google Fonts
-                    font_url = "https://github.com/googlefonts/noto-fonts/raw/main/hinted/ttf/NotoSansArabic/NotoSansArabic-Regular.ttf"
-                    
-                    response = requests.get(font_url, timeout=30)
-                    response.raise_for_status()
-                    
-                    # Save to temporary file
-                    temp_font_path = tempfile.mktemp(suffix='.ttf')
-                    with open(temp_font_path, 'wb') as f:
-                        f.write(response.content)
-                    
-                    font = ImageFont.truetype(temp_font_path, font_size)
-                    print(f"   ✅ Downloaded and loaded Arabic font from Google Fonts")
-                    
-                except Exception as e:
-                    print(f"   ⚠️  Font download failed: {e}")
-            
-            # Last resort: Default font with warning
-            if not font:
-                try:
-                    font = ImageFont.load_default()
-                    print(f"   ⚠️  Using default font - Arabic text may not render correctly on Render")
-                    print(f"   💡 Consider adding fonts to your Render deployment")
-                except Exception as e:
-                    print(f"   ❌ No font available at all: {e}")
-                    font = None
+            font = get_asset_registry().font('arabic', font_size)
             
             # Enhanced Arabic text processing optimized for Render deployment
             try:
@@ -1478,14 +1358,10 @@ class ReelGenerator:
                 print(f"   ❌ Text image file was not created!")
                 return None
             
-            # Create ImageClip from the text image
-            text_clip = ImageClip(temp_text_img, duration=duration)
-            text_clip = text_clip.set_position(position).set_start(start_time)
-            
-            return text_clip
+            return temp_text_img
             
         except Exception as e:
-            print(f"   ⚠️  Error in PIL text clip creation: {e}")
+            print(f"   ⚠️  Error in PIL text image creation: {e}")
             import traceback
             traceback.print_exc()
             return None
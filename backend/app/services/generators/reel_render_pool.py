@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🏭 Reel Render Pool
+رندر الريلز بعمليات منفصلة بدل thread الـ job
+
+المشكلة: الـ encode (CPU) كان يشتغل بـ thread الـ job، فيزاحم باقي الـ jobs
+اللي worker.py بيشغلها بالتوازي، وأي crash/تسريب ذاكرة بيوقع العملية كلها
+الحل:
+- ProcessPoolExecutor (spawn) بعدد REEL_RENDER_PROCESSES
+- كل worker: nice (أولوية أقل)، cores مخصصة (affinity، بيورثها ffmpeg)،
+  وحد ذاكرة RLIMIT_AS (REEL_RENDER_MEMORY_MB)
+- طابور داخلي: ما بيروح للـ pool أكثر من عدد الـ workers بنفس الوقت،
+  فإذا worker مات (OOM) بس الريلز اللي كانت شغالة بتتأثر، وبتنعاد مرة وحدة
+- التقدم من ffmpeg (-progress) بيوصل عبر Queue للعملية الرئيسية
+
+التنزيل والرفع وقاعدة البيانات بيضلوا بـ threads العملية الرئيسية
+"""
+
+import os
+import threading
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Callable, Deque, List, Optional, Tuple
+
+from app.services.generators.reel_renderer import RenderSettings, TextOverlay, render_reel
+
+
+REEL_RENDER_PROCESSES = int(os.getenv('REEL_RENDER_PROCESSES', 1))
+REEL_RENDER_CPUS = int(os.getenv('REEL_RENDER_CPUS', 0))            # cores لكل worker (0 = الكل)
+REEL_RENDER_MEMORY_MB = int(os.getenv('REEL_RENDER_MEMORY_MB', 0))  # 0 = بدون حد
+REEL_RENDER_NICE = int(os.getenv('REEL_RENDER_NICE', 10))
+
+# كم مرة نعيد ريل كان شغال لما worker وقع بسبب ريل ثاني
+MAX_CRASH_RETRIES = 1
+
+
+@dataclass
+class RenderJob:
+    """ريل جاهز للرندر (كل الملفات محلية)"""
+    job_id: str
+    image_paths: List[str]
+    audio_path: str
+    output_path: str
+    duration: float
+    overlays: List[TextOverlay] = field(default_factory=list)
+    settings: RenderSettings = field(default_factory=RenderSettings)
+
+
+@dataclass
+class RenderOutcome:
+    """نتيجة الرندر"""
+    job_id: str
+    success: bool
+    output_path: Optional[str] = None
+    backend: Optional[str] = None
+    error: Optional[str] = None
+    render_seconds: float = 0.0
+
+
+# ============================================
+# داخل الـ worker process
+# ============================================
+
+_progress_queue = None
+
+
+def _assign_cores(index: int, cpus_per_worker: int) -> Optional[List[int]]:
+    """cores الـ worker رقم index (من آخر القائمة، ونترك أول core للعملية الرئيسية)"""
+    if cpus_per_worker <= 0 or not hasattr(os, 'sched_getaffinity'):
+        return None
+
+    available = sorted(os.sched_getaffinity(0))
+    if len(available) > 1:
+        available = available[1:]
+
+    count = min(cpus_per_worker, len(available))
+    start = (index * count) % len(available)
+    return [available[(start + i) % len(available)] for i in range(count)]
+
+
+def _init_worker(progress_queue, counter, cpus_per_worker: int, memory_mb: int, nice: int):
+    """إعداد الـ worker مرة وحدة: أولوية، cores، حد ذاكرة"""
+    global _progress_queue
+    _progress_queue = progress_queue
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    try:
+        if nice:
+            os.nice(nice)
+    except (AttributeError, OSError):
+        pass
+
+    cores = _assign_cores(index, cpus_per_worker)
+    if cores:
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+
+    if memory_mb > 0:
+        try:
+            import resource
+            limit = memory_mb * 1024 * 1024
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        except (ImportError, ValueError, OSError):
+            pass
+
+
+def run_render_job(job: RenderJob) -> RenderOutcome:
+    """رندر ريل واحد (بالـ worker أو بنفس العملية) - ما بيرمي exceptions"""
+    start = time.time()
+
+    def on_progress(fraction: float):
+        if _progress_queue is not None:
+            try:
+                _progress_queue.put_nowait((job.job_id, fraction))
+            except Exception:
+                pass
+
+    try:
+        backend = render_reel(
+            image_paths=job.image_paths,
+            audio_path=job.audio_path,
+            output_path=job.output_path,
+            duration=job.duration,
+            settings=job.settings,
+            overlays=job.overlays,
+            on_progress=on_progress
+        )
+        return RenderOutcome(
+            job_id=job.job_id,
+            success=True,
+            output_path=job.output_path,
+            backend=backend,
+            render_seconds=time.time() - start
+        )
+    except Exception as e:
+        return RenderOutcome(
+            job_id=job.job_id,
+            success=False,
+            error=str(e)[:500],
+            render_seconds=time.time() - start
+        )
+
+
+# ============================================
+# بالعملية الرئيسية
+# ============================================
+
+class ReelRenderService:
+    """طابور رندر فوق process pool مع تقدم وعزل للأخطاء"""
+
+    def __init__(
+        self,
+        processes: int = None,
+        cpus_per_worker: int = None,
+        memory_mb: int = None,
+        nice: int = None,
+        on_progress: Callable[[str, float], None] = None
+    ):
+        self.processes = max(1, processes or REEL_RENDER_PROCESSES)
+        self.cpus_per_worker = REEL_RENDER_CPUS if cpus_per_worker is None else cpus_per_worker
+        self.memory_mb = REEL_RENDER_MEMORY_MB if memory_mb is None else memory_mb
+        self.nice = REEL_RENDER_NICE if nice is None else nice
+        self.on_progress = on_progress or self._print_progress
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._progress_queue = self._ctx.Queue()
+        self._counter = self._ctx.Value('i', 0)
+
+        self._lock = threading.RLock()     # الـ callback ممكن ينادى بنفس الـ thread
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: Deque[Tuple[RenderJob, Future, int]] = deque()
+        self._in_flight = 0
+        self._closed = False
+
+        self._listener = threading.Thread(target=self._listen_progress, daemon=True)
+        self._listener.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    @staticmethod
+    def _print_progress(job_id: str, fraction: float):
+        print(f"   🎞️  Reel {job_id}: {fraction * 100:.0f}%")
+
+    def _listen_progress(self):
+        while True:
+            item = self._progress_queue.get()
+            if item is None:
+                return
+            try:
+                self.on_progress(*item)
+            except Exception:
+                pass
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=self._ctx,
+            initializer=_init_worker,
+            initargs=(
+                self._progress_queue, self._counter,
+                self.cpus_per_worker, self.memory_mb, self.nice
+            )
+        )
+
+    def submit(self, job: RenderJob) -> "Future[RenderOutcome]":
+        """إضافة ريل للطابور (النتيجة RenderOutcome، ما بترمي exception)"""
+        result: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ReelRenderService is shut down")
+            self._pending.append((job, result, 0))
+        self._dispatch()
+        return result
+
+    def _dispatch(self):
+        """إرسال من الطابور للـ pool لحد عدد الـ workers"""
+        with self._lock:
+            while self._pending and self._in_flight < self.processes:
+                job, result, crashes = self._pending.popleft()
+                if self._executor is None:
+                    self._executor = self._new_executor()
+                executor = self._executor
+                try:
+                    future = executor.submit(run_render_job, job)
+                except BrokenProcessPool:
+                    self._discard_executor(executor)
+                    self._pending.appendleft((job, result, crashes))
+                    continue
+                self._in_flight += 1
+                future.add_done_callback(
+                    lambda f, executor=executor, job=job, result=result, crashes=crashes:
+                        self._on_done(f, executor, job, result, crashes)
+                )
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """pool مكسور: ننساه مرة وحدة (باقي الريلز اللي كانت عليه بتوصل هون كمان)"""
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False)
+
+    def _on_done(
+        self,
+        future: Future,
+        executor: ProcessPoolExecutor,
+        job: RenderJob,
+        result: Future,
+        crashes: int
+    ):
+        with self._lock:
+            self._in_flight -= 1
+
+        try:
+            outcome = future.result()
+        except BrokenProcessPool:
+            # الـ worker مات (OOM / حد الذاكرة / signal) - pool جديد للباقي
+            with self._lock:
+                self._discard_executor(executor)
+                if crashes < MAX_CRASH_RETRIES and not self._closed:
+                    self._pending.appendleft((job, result, crashes + 1))
+                    outcome = None
+                else:
+                    outcome = RenderOutcome(
+                        job_id=job.job_id,
+                        success=False,
+                        error="Render worker crashed (memory limit?)"
+                    )
+        except Exception as e:
+            outcome = RenderOutcome(job_id=job.job_id, success=False, error=str(e)[:500])
+
+        if outcome is not None:
+            result.set_result(outcome)
+        self._dispatch()
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            self._closed = True
+            executor = self._executor
+            self._executor = None
+            pending = list(self._pending)
+            self._pending.clear()
+
+        for job, result, _ in pending:
+            result.set_result(RenderOutcome(job_id=job.job_id, success=False, error="Cancelled"))
+
+        if executor:
+            executor.shutdown(wait=wait)
+
+        self._progress_queue.put(None)
+        self._listener.join(timeout=5)
@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🎞️ Reel Renderer
+رندر الريل بأمر ffmpeg واحد بدل تركيب moviepy إطار بإطار بالبايثون
+
+القديم: PIL crop/resize ← PNG مؤقت ← ImageClip (resize ثاني) ← concatenate(compose) ← encode preset=medium
+الجديد: filtergraph واحد:
+- كل صورة: scale (تغطية 9:16) + crop بالنص، تنفك مرة وحدة وبتتكرر كإطارات (loop)
+- اختياري: Ken Burns (zoompan) بدل الصورة الثابتة
+- concat للشرائح + overlay لصور النص (PNG شفاف) بأوقاتها
+- الصوت: apad/atrim لمدة الريل
+- encode أصلي libx264 (preset/CRF قابلين للتعديل) + faststart
+
+ffmpeg: من PATH أو النسخة اللي بتيجي مع moviepy (imageio-ffmpeg)
+إذا مش موجود أو فشل → render_reel بيرجع لـ moviepy
+
+كل الدوال هون بدون DB/S3 وقابلة للتشغيل بعملية منفصلة (reel_render_pool)
+"""
+
+import os
+import re
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence
+
+# مسار ffmpeg بيتحدد ويتفحص مرة وحدة لكل عملية (مشترك مع تحويل الصوت)
+from app.utils.media_transcode import find_ffmpeg, is_ffmpeg_available
+
+
+REEL_RENDER_BACKEND = os.getenv('REEL_RENDER_BACKEND', 'auto').lower()   # auto | ffmpeg | moviepy
+REEL_FFMPEG_PRESET = os.getenv('REEL_FFMPEG_PRESET', 'veryfast')
+REEL_FFMPEG_CRF = int(os.getenv('REEL_FFMPEG_CRF', 23))
+REEL_FFMPEG_THREADS = int(os.getenv('REEL_FFMPEG_THREADS', 0))           # 0 = تلقائي
+REEL_KEN_BURNS = os.getenv('REEL_KEN_BURNS', 'false').lower() == 'true'
+REEL_AUDIO_BITRATE = os.getenv('REEL_AUDIO_BITRATE', '128k')
+REEL_RENDER_TIMEOUT = int(os.getenv('REEL_RENDER_TIMEOUT', 600))
+
+# Ken Burns: أقصى تكبير بنهاية كل شريحة
+KEN_BURNS_MAX_ZOOM = 1.15
+
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+_PROGRESS_TIME_RE = re.compile(r'^out_time_(?:us|ms)=(\d+)$')
+
+
+def use_ffmpeg_backend() -> bool:
+    """هل نرندر بـ ffmpeg؟ (REEL_RENDER_BACKEND + توفر ffmpeg)"""
+    if REEL_RENDER_BACKEND == 'moviepy':
+        return False
+    if is_ffmpeg_available():
+        return True
+    if REEL_RENDER_BACKEND == 'ffmpeg':
+        print("   ⚠️  REEL_RENDER_BACKEND=ffmpeg but ffmpeg not found - using moviepy")
+    return False
+
+
+def get_media_duration(path: str) -> float:
+    """مدة ملف صوت/فيديو بالثواني (ffmpeg -i، أو moviepy إذا ffmpeg مش موجود)"""
+    ffmpeg = find_ffmpeg()
+    if ffmpeg:
+        result = subprocess.run(
+            [ffmpeg, '-hide_banner', '-i', path],
+            capture_output=True,
+            timeout=60
+        )
+        match = _DURATION_RE.search(result.stderr.decode('utf-8', 'ignore'))
+        if match:
+            hours, minutes, seconds = match.groups()
+            return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    from moviepy.editor import AudioFileClip
+    clip = AudioFileClip(path)
+    try:
+        return clip.duration
+    finally:
+        clip.close()
+
+
+@dataclass
+class TextOverlay:
+    """صورة نص شفافة (PNG بعرض الريل) بتظهر بين start و start + duration"""
+    image_path: str
+    start: float
+    duration: float
+    y: int
+
+
+@dataclass
+class RenderSettings:
+    """إعدادات الرندر (القيم الافتراضية من env)"""
+    width: int = 1080
+    height: int = 1920
+    fps: int = 30
+    preset: str = field(default_factory=lambda: REEL_FFMPEG_PRESET)
+    crf: int = field(default_factory=lambda: REEL_FFMPEG_CRF)
+    ken_burns: bool = field(default_factory=lambda: REEL_KEN_BURNS)
+    threads: int = field(default_factory=lambda: REEL_FFMPEG_THREADS)
+    audio_bitrate: str = field(default_factory=lambda: REEL_AUDIO_BITRATE)
+
+
+def slide_frame_counts(duration: float, count: int, fps: int) -> List[int]:
+    """عدد إطارات كل شريحة (مجموعها = مدة الريل بالضبط بدون تراكم تقريب)"""
+    total = max(count, int(round(duration * fps)))
+    bounds = [int(round(i * total / count)) for i in range(count + 1)]
+    return [bounds[i + 1] - bounds[i] for i in range(count)]
+
+
+def _slide_filter(index: int, frames: int, settings: RenderSettings) -> str:
+    """فلتر شريحة وحدة → [v{index}]"""
+    w, h, fps = settings.width, settings.height, settings.fps
+
+    if settings.ken_burns:
+        # نكبر الصورة قبل zoompan حتى ما يصير اهتزاز بالتقريب
+        big_w, big_h = (w * 3 // 2) & ~1, (h * 3 // 2) & ~1
+        step = (KEN_BURNS_MAX_ZOOM - 1) / max(frames, 1)
+        chain = (
+            f"scale={big_w}:{big_h}:force_original_aspect_ratio=increase:flags=lanczos,"
+            f"crop={big_w}:{big_h},"
+            f"zoompan=z='min(1+{step:.6f}*on,{KEN_BURNS_MAX_ZOOM})':d={frames}"
+            f":x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={w}x{h}:fps={fps},"
+            f"setsar=1,format=yuv420p"
+        )
+    else:
+        # الصورة بتنفك وبتتصغر مرة وحدة، وبعدين نفس الإطار بيتكرر
+        chain = (
+            f"scale={w}:{h}:force_original_aspect_ratio=increase:flags=lanczos,"
+            f"crop={w}:{h},setsar=1,format=yuv420p,"
+            f"loop=loop={frames - 1}:size=1:start=0"
+        )
+
+    return f"[{index}:v]{chain},trim=end_frame={frames},settb=1/{fps},setpts=N[v{index}]"
+
+
+def build_ffmpeg_command(
+    ffmpeg: str,
+    image_paths: Sequence[str],
+    audio_path: str,
+    output_path: str,
+    duration: float,
+    settings: RenderSettings,
+    overlays: Sequence[TextOverlay] = ()
+) -> List[str]:
+    """أمر ffmpeg كامل (المدخلات + filter_complex + إعدادات encode)"""
+    cmd = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y']
+
+    # المدخلات: الصور ← الصوت ← صور النص
+    for path in image_paths:
+        cmd += ['-i', path]
+    audio_index = len(image_paths)
+    cmd += ['-i', audio_path]
+    for overlay in overlays:
+        cmd += ['-i', overlay.image_path]
+
+    frames = slide_frame_counts(duration, len(image_paths), settings.fps)
+    filters = [_slide_filter(i, n, settings) for i, n in enumerate(frames)]
+
+    slides = ''.join(f"[v{i}]" for i in range(len(image_paths)))
+    filters.append(f"{slides}concat=n={len(image_paths)}:v=1:a=0[base]")
+
+    label = 'base'
+    for k, overlay in enumerate(overlays):
+        end = overlay.start + overlay.duration
+        filters.append(
+            f"[{label}][{audio_index + 1 + k}:v]overlay=x=(main_w-overlay_w)/2:y={overlay.y}"
+            f":enable='between(t,{overlay.start:.3f},{end:.3f})'[ov{k}]"
+        )
+        label = f"ov{k}"
+    filters.append(f"[{label}]null[vout]")
+
+    # الصوت: تمديد بصمت إذا أقصر من الريل، قص إذا أطول
+    filters.append(
+        f"[{audio_index}:a]apad,atrim=end={duration:.3f},asetpts=PTS-STARTPTS[aout]"
+    )
+
+    cmd += [
+        '-filter_complex', ';'.join(filters),
+        '-map', '[vout]', '-map', '[aout]',
+        '-c:v', 'libx264', '-preset', settings.preset, '-crf', str(settings.crf),
+        '-pix_fmt', 'yuv420p', '-r', str(settings.fps),
+        '-c:a', 'aac', '-b:a', settings.audio_bitrate,
+        '-movflags', '+faststart',
+        '-threads', str(settings.threads),
+        '-t', f"{duration:.3f}",
+        output_path
+    ]
+    return cmd
+
+
+def render_reel_ffmpeg(
+    image_paths: Sequence[str],
+    audio_path: str,
+    output_path: str,
+    duration: float,
+    settings: Optional[RenderSettings] = None,
+    overlays: Sequence[TextOverlay] = (),
+    on_progress: Optional[Callable[[float], None]] = None
+) -> str:
+    """
+    رندر الريل لملف mp4
+
+    Args:
+        on_progress: بتنادى بنسبة الإنجاز (0..1) من -progress تبع ffmpeg
+    Raises:
+        RuntimeError إذا ffmpeg مش موجود أو فشل
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not available for reel rendering")
+    if not image_paths:
+        raise ValueError("No images to render")
+
+    settings = settings or RenderSettings()
+    cmd = build_ffmpeg_command(
+        ffmpeg, image_paths, audio_path, output_path, duration, settings, overlays
+    )
+
+    if not on_progress:
+        result = subprocess.run(cmd, capture_output=True, timeout=REEL_RENDER_TIMEOUT)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'ignore')[-500:]}")
+        return output_path
+
+    # -progress على stdout (سطر key=value)، والأخطاء لملف حتى ما يعلق الـ pipe
+    cmd = cmd[:-1] + ['-progress', 'pipe:1', '-nostats', cmd[-1]]
+    deadline = time.monotonic() + REEL_RENDER_TIMEOUT
+
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+        reported = 0.0
+        try:
+            for raw_line in process.stdout:
+                if time.monotonic() > deadline:
+                    process.kill()
+                    raise RuntimeError(f"ffmpeg timed out after {REEL_RENDER_TIMEOUT}s")
+
+                match = _PROGRESS_TIME_RE.match(raw_line.decode('utf-8', 'ignore').strip())
+                if match and duration > 0:
+                    fraction = min(1.0, int(match.group(1)) / 1_000_000 / duration)
+                    if fraction - reported >= 0.05:
+                        reported = fraction
+                        on_progress(fraction)
+
+            returncode = process.wait(timeout=max(1.0, deadline - time.monotonic()))
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+        if returncode != 0:
+            stderr_file.seek(0)
+            error = stderr_file.read().decode('utf-8', 'ignore')[-500:]
+            raise RuntimeError(f"ffmpeg failed: {error}")
+
+    on_progress(1.0)
+    return output_path
+
+
+def render_reel_moviepy(
+    image_paths: Sequence[str],
+    audio_path: str,
+    output_path: str,
+    duration: float,
+    settings: Optional[RenderSettings] = None,
+    overlays: Sequence[TextOverlay] = ()
+) -> str:
+    """الرندر القديم عبر moviepy (لما ffmpeg CLI مش متاح أو فشل)"""
+    from moviepy.editor import (
+        AudioFileClip, CompositeVideoClip, ImageClip, concatenate_videoclips
+    )
+    from PIL import Image
+
+    settings = settings or RenderSettings()
+    width, height = settings.width, settings.height
+
+    temp_image_paths = []
+    clips = []
+    audio_clip = None
+    video_clip = None
+
+    try:
+        audio_clip = AudioFileClip(audio_path)
+        if audio_clip.duration > duration:
+            audio_clip = audio_clip.subclip(0, duration)
+
+        # Calculate duration per image
+        duration_per_image = duration / len(image_paths)
+        target_aspect = width / height
+
+        for idx, image_path in enumerate(image_paths):
+            # Load and prepare image (centre crop to 9:16, then exact reel size)
+            image = Image.open(image_path).convert('RGB')
+            original_width, original_height = image.size
+            image_aspect = original_width / original_height
+
+            if image_aspect > target_aspect:
+                new_width = int(original_height * target_aspect)
+                left = (original_width - new_width) // 2
+                image = image.crop((left, 0, left + new_width, original_height))
+            else:
+                new_height = int(original_width / target_aspect)
+                top = (original_height - new_height) // 2
+                image = image.crop((0, top, original_width, top + new_height))
+
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+
+            temp_image_path = tempfile.mktemp(suffix=f'_img{idx}.png')
+            image.save(temp_image_path, 'PNG')
+            temp_image_paths.append(temp_image_path)
+
+            img_clip = ImageClip(temp_image_path, duration=duration_per_image)
+            img_clip = img_clip.set_fps(settings.fps).set_start(idx * duration_per_image)
+            clips.append(img_clip)
+
+        video_clip = concatenate_videoclips(clips, method="compose")
+
+        if overlays:
+            text_clips = [
+                ImageClip(overlay.image_path, duration=overlay.duration)
+                .set_position(('center', overlay.y))
+                .set_start(overlay.start)
+                for overlay in overlays
+            ]
+            clips.extend(text_clips)
+            video_clip = CompositeVideoClip([video_clip] + text_clips)
+
+        video_clip = video_clip.set_audio(audio_clip).set_duration(duration)
+
+        video_clip.write_videofile(
+            output_path,
+            fps=settings.fps,
+            codec='libx264',
+            audio_codec='aac',
+            preset='medium',
+            verbose=False,
+            logger=None
+        )
+        return output_path
+
+    finally:
+        for clip in clips:
+            clip.close()
+        if audio_clip:
+            audio_clip.close()
+        if video_clip:
+            video_clip.close()
+        for temp_path in temp_image_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def render_reel(
+    image_paths: Sequence[str],
+    audio_path: str,
+    output_path: str,
+    duration: float,
+    settings: Optional[RenderSettings] = None,
+    overlays: Sequence[TextOverlay] = (),
+    on_progress: Optional[Callable[[float], None]] = None
+) -> str:
+    """
+    رندر بـ ffmpeg إذا متاح، وإلا (أو عند الفشل) بـ moviepy
+
+    Returns:
+        اسم الـ backend اللي نجح ('ffmpeg' أو 'moviepy')
+    """
+    settings = settings or RenderSettings()
+
+    if use_ffmpeg_backend():
+        try:
+            print(f"   🎥 Rendering video with ffmpeg (preset={settings.preset}, crf={settings.crf}"
+                  f"{', ken burns' if settings.ken_burns else ''})...")
+            render_reel_ffmpeg(
+                image_paths, audio_path, output_path, duration, settings, overlays, on_progress
+            )
+            return 'ffmpeg'
+        except Exception as e:
+            print(f"   ⚠️  ffmpeg render failed, falling back to moviepy: {str(e)[:300]}")
+
+    print("   🎥 Rendering video with moviepy...")
+    render_reel_moviepy(image_paths, audio_path, output_path, duration, settings, overlays)
+    if on_progress:
+        on_progress(1.0)
+    return 'moviepy'
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🔤 Render Assets
+سجل موحد للخطوط واللوغوهات اللي بيستخدمها الرسم بـ PIL (صور السوشال ونص الريلز)
+
+قبل: كل صورة/جملة كانت تفحص ~20 مسار خط بـ os.path.exists، تحمل الـ TTF من جديد،
+وممكن تعمل apt-get install أو تنزل خط من GitHub جوا الطلب؛
+واللوغو كان ينزل ويتصغر مع كل template
+
+هلأ:
+- مسار الخط بيتحدد مرة وحدة (bundled ← النظام ← تنزيل عبر كاش الميديا وقت الـ warm-up بس)
+- ImageFont محفوظ لكل (خط، حجم)
+- اللوغو بينزل ويتصغر مرة وحدة لكل template (بالـ warm-up بس؛ logo() ما بينزل شي)
+- warm_up() بيجهز كل شي وقت التشغيل ويرجع المدة لكل خطوة
+- بدون apt-get وبدون شبكة وقت الرسم
+"""
+
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image, ImageFont
+
+from app.utils.media_cache import NOTO_ARABIC_FONT_URL, fetch_bytes, fetch_font
+
+
+# مسموح ننزل الخط وقت الـ warm-up إذا مش موجود محلياً (مش وقت الرسم)
+RENDER_ASSETS_ALLOW_DOWNLOAD = os.getenv('RENDER_ASSETS_ALLOW_DOWNLOAD', 'true').lower() == 'true'
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+BUNDLED_FONTS_DIR = os.path.join(_BACKEND_DIR, 'fonts')
+
+# الخطوط بالأولوية لكل عائلة
+FONT_CANDIDATES: Dict[str, List[str]] = {
+    'arabic': [
+        # الخط العربي المرفق مع المشروع (أولوية عالية لـ Render)
+        os.path.join(BUNDLED_FONTS_DIR, 'NotoSansArabic-Regular.ttf'),
+        'fonts/NotoSansArabic-Regular.ttf',
+
+        # خطوط النظام (Linux - Render containers)
+        '/usr/share/fonts/truetype/noto/NotoSansArabic-Regular.ttf',
+        '/usr/share/fonts/truetype/noto/NotoSansArabic-Bold.ttf',
+        '/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf',
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf',
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+        '/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf',
+        '/usr/share/fonts/truetype/ubuntu/Ubuntu-Regular.ttf',
+
+        # للتطوير المحلي (Windows / macOS)
+        'C:/Windows/Fonts/arial.ttf',
+        'C:/Windows/Fonts/tahoma.ttf',
+        '/System/Library/Fonts/Arial.ttf',
+        '/System/Library/Fonts/Helvetica.ttc',
+    ],
+    'latin_bold': [
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+        'C:/Windows/Fonts/arialbd.ttf',
+    ],
+}
+
+# إذا ما في ولا خط محلي، بننزله (وقت الـ warm-up) من هون
+FONT_DOWNLOADS: Dict[str, str] = {
+    'arabic': NOTO_ARABIC_FONT_URL,
+}
+
+
+class AssetNotLoaded(Exception):
+    """لوغو ما انحمل بالـ warm-up (ما بننزله وقت الرسم)"""
+
+
+class AssetRegistry:
+    """خطوط ولوغوهات جاهزة بالذاكرة، مشتركة بين كل المولدات بنفس العملية"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._font_paths: Dict[str, Optional[str]] = {}
+        self._fonts: Dict[Tuple[str, int], ImageFont.ImageFont] = {}
+        self._logos: Dict[str, Image.Image] = {}
+        self._logo_sources: Dict[str, Tuple[str, Tuple[int, int]]] = {}
+        self.timings: Dict[str, float] = {}
+
+    # ============================================
+    # Fonts
+    # ============================================
+
+    def _resolve_font_path(self, family: str, allow_download: bool) -> Optional[str]:
+        for path in FONT_CANDIDATES.get(family, []):
+            if os.path.exists(path):
+                try:
+                    ImageFont.truetype(path, 12)
+                    return path
+                except Exception as e:
+                    print(f"   ⚠️  Failed to load {path}: {e}")
+
+        url = FONT_DOWNLOADS.get(family)
+        if url and allow_download:
+            try:
+                print(f"   🌐 Downloading {family} font (one time)...")
+                return fetch_font(url)
+            except Exception as e:
+                print(f"   ⚠️  Font download failed: {e}")
+
+        return None
+
+    def font_path(self, family: str = 'arabic', allow_download: bool = False) -> Optional[str]:
+        """مسار الخط (بيتحدد مرة وحدة، None = الخط الافتراضي)"""
+        with self._lock:
+            if family in self._font_paths and (self._font_paths[family] or not allow_download):
+                return self._font_paths[family]
+
+        path = self._resolve_font_path(family, allow_download)
+        with self._lock:
+            self._font_paths[family] = path
+        if path:
+            print(f"   ✅ Using {family} font: {os.path.basename(path)}")
+        else:
+            print(f"   ⚠️  No {family} font found - using default font (Arabic may not render correctly)")
+        return path
+
+    def font(self, family: str = 'arabic', size: int = 64) -> ImageFont.ImageFont:
+        """ImageFont جاهز لـ (family, size) - بدون شبكة"""
+        key = (family, size)
+        font = self._fonts.get(key)
+        if font is not None:
+            return font
+
+        path = self.font_path(family)
+        try:
+            font = ImageFont.truetype(path, size) if path else ImageFont.load_default()
+        except Exception as e:
+            print(f"   ⚠️  Failed to load {family} font: {e}")
+            font = ImageFont.load_default()
+
+        with self._lock:
+            return self._fonts.setdefault(key, font)
+
+    # ============================================
+    # Logos
+    # ============================================
+
+    def register_logo(self, name: str, url: str, size: Tuple[int, int]):
+        """تسجيل لوغو (بيتنزل ويتصغر بالـ warm-up)"""
+        with self._lock:
+            if self._logo_sources.get(name) != (url, size):
+                self._logo_sources[name] = (url, size)
+                self._logos.pop(name, None)
+
+    @staticmethod
+    def _scale_logo(data: bytes, size: Tuple[int, int]) -> Image.Image:
+        logo = Image.open(BytesIO(data))
+        if logo.mode != 'RGBA':
+            logo = logo.convert('RGBA')
+
+        target_w, target_h = size
+        w, h = logo.size
+        scale = min(target_w / w, target_h / h)
+
+        logo = logo.resize((int(w * scale), int(h * scale)), Image.Resampling.LANCZOS)
+        logo.load()
+        return logo
+
+    def logo(self, name: str) -> Image.Image:
+        """
+        اللوغو بالحجم النهائي (للقراءة بس - paste ما بيعدله)
+
+        Raises:
+            AssetNotLoaded: الـ warm-up ما حمّله (ما في تنزيل وقت الرسم)
+        """
+        logo = self._logos.get(name)
+        if logo is not None:
+            return logo
+
+        with self._lock:
+            registered = name in self._logo_sources
+        if not registered:
+            raise KeyError(f"Logo not registered: {name}")
+        raise AssetNotLoaded(f"Logo {name} not loaded - warm_up() failed or was not run")
+
+    def _load_logo(self, name: str) -> Image.Image:
+        """تنزيل + تصغير (عبر كاش الميديا) - من warm_up بس"""
+        with self._lock:
+            source = self._logo_sources.get(name)
+        if not source:
+            raise KeyError(f"Logo not registered: {name}")
+
+        url, size = source
+        logo = self._scale_logo(fetch_bytes(url, timeout=30), size)
+        with self._lock:
+            return self._logos.setdefault(name, logo)
+
+    # ============================================
+    # Warm-up
+    # ============================================
+
+    def warm_up(
+        self,
+        fonts: Dict[str, Iterable[int]] = None,
+        logos: Iterable[str] = None
+    ) -> Dict[str, float]:
+        """
+        تجهيز الخطوط واللوغوهات قبل الرسم
+
+        Args:
+            fonts: {'arabic': [55, 64], ...}
+            logos: أسماء لوغوهات مسجلة (الافتراضي: الكل)، المحمّلة قبل ما بتنعاد
+
+        Returns:
+            المدة بالثواني لكل خطوة (كمان محفوظة بـ self.timings)
+        """
+        timings: Dict[str, float] = {}
+
+        for family, sizes in (fonts or {}).items():
+            start = time.perf_counter()
+            self.font_path(family, allow_download=RENDER_ASSETS_ALLOW_DOWNLOAD)
+            for size in sizes:
+                self.font(family, size)
+            timings[f"font:{family}"] = time.perf_counter() - start
+
+        with self._lock:
+            names = list(self._logo_sources) if logos is None else list(logos)
+
+        for name in names:
+            if name in self._logos:
+                continue
+            start = time.perf_counter()
+            try:
+                self._load_logo(name)
+            except Exception as e:
+                print(f"   ⚠️  Logo {name} warm-up failed: {e}")
+            timings[f"logo:{name}"] = time.perf_counter() - start
+
+        self.timings.update(timings)
+        if timings:
+            total = sum(timings.values())
+            details = ', '.join(f"{k} {v * 1000:.0f}ms" for k, v in timings.items())
+            print(f"🔤 Render assets ready in {total * 1000:.0f}ms ({details})")
+        return timings
+
+
+_shared_registry: Optional[AssetRegistry] = None
+_shared_registry_lock = threading.Lock()
+
+
+def get_asset_registry() -> AssetRegistry:
+    """نفس السجل لكل المولدات بنفس العملية"""
+    global _shared_registry
+    with _shared_registry_lock:
+        if _shared_registry is None:
+            _shared_registry = AssetRegistry()
+        return _shared_registry
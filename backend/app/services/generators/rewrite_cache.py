@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+♻️ Report Rewrite Cache
+كاش مشترك لإعادة صياغة التقارير بين مولدات النشرة والبث والموجز
+
+الجدول: report_rewrite_cache
+المفتاح: (report_id, content_hash, rewrite_kind, prompt_version)
+
+- content_hash = بصمة (العنوان + المحتوى)، إذا تعدل التقرير تتغير البصمة
+  فلا يطابق الكاش القديم (invalidation تلقائي)
+- prompt_version = نسخة البرومبت، إذا تغير البرومبت نرفع النسخة في
+  REWRITE_PROMPT_VERSIONS فيُعاد التوليد
+- عند الحفظ نحذف النسخ القديمة لنفس التقرير والنوع
+
+أنواع إعادة الصياغة (نوع لكل برومبت، نفس أنواع broadcast_segments):
+- headline_broadcast → BroadcastGenerator._convert_to_headlines (rewrite_headline، عنوان واحد)
+- broadcast_summary  → BroadcastGenerator._rewrite_for_broadcast
+- bulletin_summary   → BulletinGenerator._rewrite_reports_for_bulletin
+- headline_digest    → DigestGenerator._convert_titles_with_gemini (convert_digest_headlines، عدة عناوين بطلب واحد)
+"""
+
+from typing import Dict, List
+
+from app.services.generators.broadcast_segments import compute_content_hash
+
+
+# ارفع النسخة عند تعديل البرومبت الخاص بالنوع
+REWRITE_PROMPT_VERSIONS = {
+    'headline_broadcast': 'v1',
+    'broadcast_summary': 'v1',
+    'bulletin_summary': 'v1',
+    'headline_digest': 'v1',
+}
+
+
+def ensure_rewrite_cache_table(cursor):
+    """إنشاء جدول الكاش إذا ما كان موجود (الـ commit على المستدعي)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS report_rewrite_cache (
+            id SERIAL PRIMARY KEY,
+            report_id INTEGER NOT NULL,
+            content_hash VARCHAR(64) NOT NULL,
+            rewrite_kind VARCHAR(50) NOT NULL,
+            prompt_version VARCHAR(20) NOT NULL,
+            text TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW(),
+            UNIQUE(report_id, content_hash, rewrite_kind, prompt_version)
+        )
+    """)
+
+
+def prepare_rewrite_cache(conn, cursor):
+    """تجهيز الجدول عند تهيئة المولد (الكاش اختياري، الفشل لا يوقف المولد)"""
+    try:
+        ensure_rewrite_cache_table(cursor)
+        conn.commit()
+    except Exception as e:
+        print(f"   ⚠️ Rewrite cache table unavailable: {str(e)[:100]}")
+        conn.rollback()
+
+
+def load_cached_rewrites(cursor, reports: List, rewrite_kind: str) -> Dict[int, str]:
+    """
+    جلب إعادة الصياغة المخزنة لمجموعة تقارير (استعلام واحد)
+
+    Args:
+        cursor: cursor مفتوح
+        reports: عناصر فيها id, title, content
+        rewrite_kind: نوع إعادة الصياغة
+
+    Returns:
+        Dict: {report_id: text} للتقارير اللي بصمتها ونسخة برومبتها مطابقة فقط
+    """
+    if not reports:
+        return {}
+
+    expected = {r.id: compute_content_hash(r.title, r.content) for r in reports}
+
+    try:
+        cursor.execute("""
+            SELECT report_id, content_hash, text
+            FROM report_rewrite_cache
+            WHERE report_id = ANY(%s)
+              AND rewrite_kind = %s
+              AND prompt_version = %s
+        """, (list(expected.keys()), rewrite_kind, REWRITE_PROMPT_VERSIONS[rewrite_kind]))
+
+        return {
+            row[0]: row[2]
+            for row in cursor.fetchall()
+            if row[2] and expected.get(row[0]) == row[1]
+        }
+
+    except Exception as e:
+        # الجدول غير موجود بعد أو خطأ بالاتصال → نكمل بدون cache
+        print(f"   ⚠️ Rewrite cache unavailable: {str(e)[:100]}")
+        cursor.connection.rollback()
+        return {}
+
+
+def load_cached_rewrite(cursor, report_id: int, content_hash: str, rewrite_kind: str) -> str:
+    """جلب إعادة صياغة تقرير واحد (أو None)"""
+    try:
+        cursor.execute("""
+            SELECT text FROM report_rewrite_cache
+            WHERE report_id = %s AND content_hash = %s
+              AND rewrite_kind = %s AND prompt_version = %s
+        """, (report_id, content_hash, rewrite_kind, REWRITE_PROMPT_VERSIONS[rewrite_kind]))
+
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    except Exception as e:
+        print(f"   ⚠️ Rewrite cache unavailable: {str(e)[:100]}")
+        cursor.connection.rollback()
+        return None
+
+
+def save_rewrite(cursor, report_id: int, content_hash: str, rewrite_kind: str, text: str):
+    """
+    حفظ إعادة صياغة ناجحة وحذف النسخ القديمة لنفس التقرير والنوع
+    (الـ commit على المستدعي - لا تحفظ نصوص الـ fallback)
+    """
+    version = REWRITE_PROMPT_VERSIONS[rewrite_kind]
+
+    cursor.execute("""
+        DELETE FROM report_rewrite_cache
+        WHERE report_id = %s AND rewrite_kind = %s
+          AND (content_hash <> %s OR prompt_version <> %s)
+    """, (report_id, rewrite_kind, content_hash, version))
+
+    cursor.execute("""
+        INSERT INTO report_rewrite_cache
+            (report_id, content_hash, rewrite_kind, prompt_version, text, created_at)
+        VALUES (%s, %s, %s, %s, %s, NOW())
+        ON CONFLICT (report_id, content_hash, rewrite_kind, prompt_version)
+        DO UPDATE SET text = EXCLUDED.text, created_at = NOW()
+    """, (report_id, content_hash, rewrite_kind, version, text))
+
+
+def store_rewrite(conn, cursor, report, rewrite_kind: str, text: str):
+    """حفظ إعادة صياغة لتقرير (ReportItem) مع commit، بدون ما يكسر المولد عند الفشل"""
+    try:
+        save_rewrite(
+            cursor,
+            report.id,
+            compute_content_hash(report.title, report.content),
+            rewrite_kind,
+            text
+        )
+        conn.commit()
+    except Exception as e:
+        print(f"   ⚠️ Rewrite cache save failed: {str(e)[:100]}")
+        conn.rollback()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🖼️ Social Image Render
+رسم صور السوشال لتقرير واحد (كل الـ templates) - PIL بس، بدون DB/S3
+
+بيشتغل بعملية منفصلة (process pool بـ SocialImageGenerator) أو بنفس العملية:
+- الخلفية بتنفك (decode) وتتصغر وتتحسن مرة وحدة للتقرير
+- كل template = نسخة + لوغو + encode بالذاكرة (JPEG/WebP بجودة محددة)
+- اللوغوهات بتوصل للـ worker مرة وحدة (initializer) مش مع كل تقرير
+- timings لكل مرحلة
+"""
+
+import os
+import time
+from io import BytesIO
+from typing import Dict, Iterable, Optional, Tuple
+
+from PIL import Image, ImageEnhance
+
+
+SOCIAL_IMAGE_FORMAT = os.getenv('SOCIAL_IMAGE_FORMAT', 'jpeg').lower()     # jpeg | webp
+SOCIAL_IMAGE_QUALITY = int(os.getenv('SOCIAL_IMAGE_QUALITY', 88))
+
+FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+}
+
+# هامش اللوغو (المنطقة الآمنة لفيسبوك)
+LOGO_SAFE_MARGIN = 20
+
+_worker_logos: Dict[str, Image.Image] = {}
+
+
+def resize_to_fit(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """تكبير/تصغير لتغطية المقاس ثم قص من الوسط"""
+    w, h = size
+    iw, ih = img.size
+    scale = max(w / iw, h / ih)
+    nw, nh = int(iw * scale), int(ih * scale)
+    img = img.resize((nw, nh), Image.Resampling.LANCZOS)
+    l = (nw - w) // 2
+    t = (nh - h) // 2
+    return img.crop((l, t, l + w, t + h))
+
+
+def enhance(img: Image.Image) -> Image.Image:
+    img = ImageEnhance.Brightness(img).enhance(1.1)
+    img = ImageEnhance.Contrast(img).enhance(1.15)
+    img = ImageEnhance.Color(img).enhance(1.2)
+    return img
+
+
+def add_logo(img: Image.Image, logo: Image.Image) -> Image.Image:
+    if logo.mode == 'RGBA':
+        img.paste(logo, (LOGO_SAFE_MARGIN, LOGO_SAFE_MARGIN), logo)
+    else:
+        img.paste(logo, (LOGO_SAFE_MARGIN, LOGO_SAFE_MARGIN))
+    return img
+
+
+def image_format(fmt: str = None) -> Tuple[str, str, str]:
+    """(PIL format, content type, extension)"""
+    return FORMATS.get((fmt or SOCIAL_IMAGE_FORMAT).lower(), FORMATS['jpeg'])
+
+
+def encode_image(img: Image.Image, fmt: str = None, quality: int = None) -> bytes:
+    """encode بالذاكرة (JPEG progressive/optimized أو WebP)"""
+    pil_format, _, _ = image_format(fmt)
+    quality = quality or SOCIAL_IMAGE_QUALITY
+
+    buf = BytesIO()
+    if pil_format == 'JPEG':
+        img.convert('RGB').save(buf, format='JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        img.save(buf, format='WEBP', quality=quality, method=4)
+    return buf.getvalue()
+
+
+def logo_to_bytes(logo: Image.Image) -> bytes:
+    """اللوغو المصغر كـ PNG (لإرساله للـ workers مرة وحدة)"""
+    buf = BytesIO()
+    logo.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def init_worker(logos: Dict[str, bytes]):
+    """initializer للـ process pool: فك اللوغوهات مرة وحدة"""
+    _worker_logos.clear()
+    for name, data in logos.items():
+        logo = Image.open(BytesIO(data))
+        logo.load()
+        _worker_logos[name] = logo
+
+
+def render_report_templates(
+    report_id: int,
+    background: bytes,
+    templates: Iterable[str],
+    output_size: Tuple[int, int],
+    fmt: str = None,
+    quality: int = None,
+    logos: Optional[Dict[str, Image.Image]] = None
+) -> Dict:
+    """
+    كل صور التقرير من خلفية وحدة
+
+    Returns:
+        {'report_id', 'images': {template: bytes}, 'errors': {template: str},
+         'timings': {stage: seconds}}
+    """
+    logos = logos if logos is not None else _worker_logos
+    timings = {}
+
+    start = time.perf_counter()
+    bg = Image.open(BytesIO(background)).convert('RGB')
+    timings['decode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bg = resize_to_fit(bg, output_size)
+    timings['resize'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bg = enhance(bg)
+    timings['enhance'] = time.perf_counter() - start
+
+    images = {}
+    errors = {}
+    timings['compose'] = 0.0
+    timings['encode'] = 0.0
+
+    for template in templates:
+        try:
+            start = time.perf_counter()
+            final = add_logo(bg.copy(), logos[template])
+            timings['compose'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            images[template] = encode_image(final, fmt, quality)
+            timings['encode'] += time.perf_counter() - start
+        except Exception as e:
+            errors[template] = str(e)[:300]
+
+    return {'report_id': report_id, 'images': images, 'errors': errors, 'timings': timings}
@@ -11,17 +11,37 @@ Structure in DB:
 
 import os
 import json
-import requests
+import time
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from io import BytesIO
 from typing import Dict, Optional, List
 import psycopg2
 
-from PIL import Image, ImageDraw, ImageFont, ImageEnhance
+from PIL import Image, ImageDraw
 import arabic_reshaper
 from bidi.algorithm import get_display
 import boto3
 
 from settings import DB_CONFIG
+from app.services.generators.render_assets import AssetNotLoaded, get_asset_registry
+from app.services.generators.social_image_render import (
+    add_logo,
+    encode_image,
+    enhance,
+    image_format,
+    init_worker,
+    logo_to_bytes,
+    render_report_templates,
+    resize_to_fit,
+)
+from app.utils.media_cache import fetch_bytes
+
+
+# عمليات الرسم (0/1 = بنفس العملية) و threads التنزيل/الرفع
+SOCIAL_IMAGE_PROCESSES = int(os.getenv('SOCIAL_IMAGE_PROCESSES', 2))
+SOCIAL_IMAGE_IO_WORKERS = int(os.getenv('SOCIAL_IMAGE_IO_WORKERS', 4))
 
 
 class SocialImageGenerator:
@@ -117,6 +137,12 @@ class SocialImageGenerator:
             'DOT': (160, 160)        # حجم موحد
         }
         
+        # الخطوط واللوغوهات مرة وحدة (مش مع كل صورة)
+        self.assets = get_asset_registry()
+        for template in self.TEMPLATES:
+            self.assets.register_logo(template, self.LOGOS[template], self.logo_sizes.get(template, (180, 180)))
+        self.assets.warm_up(fonts={'arabic': [64]}, logos=self.TEMPLATES)
+        
         print("=" * 60 + "\n")
     
     def _validate_facebook_specs(self):
@@ -170,34 +196,14 @@ class SocialImageGenerator:
             
             print(f"📊 Processing {len(reports)} reports\n")
             
-            for i, report_id in enumerate(reports, 1):
-                print(f"[{i}/{len(reports)}] Report #{report_id}...")
-                
-                try:
-                    result = self.generate_all(report_id)
-                    
-                    if result['success']:
-                        saved = self._save_to_generated_content(
-                            report_id, result['images'], force_update
-                        )
-                        
-                        if saved == 'created':
-                            stats['success'] += 1
-                        elif saved == 'updated':
-                            stats['updated'] += 1
-                        elif saved == 'skipped':
-                            stats['skipped'] += 1
-                        
-                        print(f"   ✅ {len(result['images'])} images")
-                    else:
-                        stats['failed'] += 1
-                        print(f"   ❌ {result.get('error')}")
-                except Exception as e:
-                    stats['failed'] += 1
-                    print(f"   ❌ {e}")
+            # لوغو فشل بالـ init بينعاد هون مرة للدفعة (مش مع كل صورة)
+            self.assets.warm_up(logos=self.TEMPLATES)
+            
+            timings = self._generate_pipelined(reports, force_update, stats)
             
             print(f"\n{'='*70}")
             print(f"📊 SUMMARY: {stats}")
+            print("⏱️  Stages: " + ', '.join(f"{k} {v:.2f}s" for k, v in timings.items()))
             print(f"{'='*70}\n")
             
         except Exception as e:
@@ -205,8 +211,150 @@ class SocialImageGenerator:
         
         return stats
     
+    @staticmethod
+    def _count_saved(stats: Dict, saved: str):
+        if saved == 'created':
+            stats['success'] += 1
+        elif saved == 'updated':
+            stats['updated'] += 1
+        elif saved == 'skipped':
+            stats['skipped'] += 1
+        else:
+            stats['failed'] += 1
+    
+    def _generate_pipelined(self, reports: List[int], force_update: bool, stats: Dict) -> Dict[str, float]:
+        """
+        توليد صور عدة تقارير كـ pipeline:
+        - قاعدة البيانات من الـ thread الرئيسي بس
+        - تنزيل الخلفيات والرفع على S3 بـ I/O threads (كل template لحال)
+        - الرسم والـ encode بـ process pool (تقرير كامل لكل مهمة، الخلفية بتنفك مرة وحدة)
+        
+        Returns:
+            مجموع الوقت لكل مرحلة (ثواني)
+        """
+        timings: Dict[str, float] = defaultdict(float)
+        
+        jobs = []
+        for report_id in reports:
+            title = self._get_report_title(report_id)
+            bg_url = self._get_background_image(report_id) if title else None
+            if not bg_url:
+                print(f"   ❌ Report #{report_id}: {'No image' if title else 'No title'}")
+                stats['failed'] += 1
+                continue
+            jobs.append((report_id, bg_url))
+        
+        if not jobs:
+            return dict(timings)
+        
+        render_pool = self._new_render_pool(len(jobs))
+        uploads: Dict[int, Dict] = {}
+        
+        try:
+            with ThreadPoolExecutor(max_workers=SOCIAL_IMAGE_IO_WORKERS) as io_pool:
+                pending = {
+                    io_pool.submit(self._timed, fetch_bytes, bg_url, timeout=30): ('download', report_id, None)
+                    for report_id, bg_url in jobs
+                }
+                
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    
+                    for future in done:
+                        stage, report_id, template = pending.pop(future)
+                        
+                        try:
+                            value = future.result()
+                        except Exception as e:
+                            print(f"   ❌ Report #{report_id}: {stage} failed: {str(e)[:200]}")
+                            if stage == 'upload':
+                                value = (None, 0.0)
+                            else:
+                                stats['failed'] += 1
+                                continue
+                        
+                        if stage == 'download':
+                            background, seconds = value
+                            timings['download'] += seconds
+                            render = self._submit_render(render_pool, io_pool, report_id, background)
+                            pending[render] = ('render', report_id, None)
+                            continue
+                        
+                        if stage == 'render':
+                            for name, seconds in value['timings'].items():
+                                timings[name] += seconds
+                            for name, error in value['errors'].items():
+                                print(f"   ⚠️  Report #{report_id}: {name} failed: {error}")
+                            
+                            if not value['images']:
+                                stats['failed'] += 1
+                                continue
+                            
+                            uploads[report_id] = {'remaining': len(value['images']), 'images': {}}
+                            for name, data in value['images'].items():
+                                upload = io_pool.submit(self._timed, self._upload_bytes, data, report_id, name)
+                                pending[upload] = ('upload', report_id, name)
+                            continue
+                        
+                        # upload
+                        url, seconds = value
+                        timings['upload'] += seconds
+                        state = uploads[report_id]
+                        state['remaining'] -= 1
+                        if url:
+                            state['images'][template] = url
+                        if state['remaining']:
+                            continue
+                        
+                        if not state['images']:
+                            stats['failed'] += 1
+                            continue
+                        
+                        start = time.perf_counter()
+                        saved = self._save_to_generated_content(report_id, state['images'], force_update)
+                        timings['save'] += time.perf_counter() - start
+                        self._count_saved(stats, saved)
+                        print(f"   ✅ Report #{report_id}: {len(state['images'])} images")
+        finally:
+            if render_pool:
+                render_pool.shutdown()
+        
+        return dict(timings)
+    
+    @staticmethod
+    def _timed(fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return result, time.perf_counter() - start
+    
+    def _new_render_pool(self, report_count: int) -> Optional[ProcessPoolExecutor]:
+        """process pool للرسم (اللوغوهات بتنبعت مرة وحدة)، None = بنفس العملية"""
+        processes = min(SOCIAL_IMAGE_PROCESSES, report_count)
+        if processes <= 1:
+            return None
+        
+        logos = {template: logo_to_bytes(self.assets.logo(template)) for template in self.TEMPLATES}
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(logos,)
+        )
+    
+    def _submit_render(self, render_pool, io_pool, report_id: int, background: bytes):
+        if render_pool:
+            return render_pool.submit(
+                render_report_templates, report_id, background, self.TEMPLATES, self.output_size
+            )
+        
+        logos = {template: self.assets.logo(template) for template in self.TEMPLATES}
+        return io_pool.submit(
+            render_report_templates, report_id, background, self.TEMPLATES, self.output_size,
+            logos=logos
+        )
+    
     def generate_all(self, report_id: int) -> Dict:
-        """Generate 3 images for one report"""
+        """Generate all template images for one report (background decoded once)"""
         
         title = self._get_report_title(report_id)
         if not title:
@@ -217,22 +365,32 @@ class SocialImageGenerator:
             return {'success': False, 'error': 'No image'}
         
         try:
-            background = self._download_image(bg_url)
+            background = fetch_bytes(bg_url, timeout=30)
         except:
             return {'success': False, 'error': 'Download failed'}
         
-        results = {}
+        try:
+            logos = {template: self.assets.logo(template) for template in self.TEMPLATES}
+        except AssetNotLoaded as e:
+            return {'success': False, 'error': str(e)}
         
-        for template in self.TEMPLATES:
-            try:
-                logo = self._download_logo(self.LOGOS[template], template)  # Pass template name
-                final = self._create_image(background.copy(), logo, title)
-                upload = self._upload_to_s3(final, report_id, template)
-                
-                if upload['success']:
-                    results[template] = upload['image_url']
-            except Exception as e:
-                print(f"   ⚠️  {template} failed: {e}")
+        rendered = render_report_templates(
+            report_id, background, self.TEMPLATES, self.output_size, logos=logos
+        )
+        for template, error in rendered['errors'].items():
+            print(f"   ⚠️  {template} failed: {error}")
+        
+        results = {}
+        with ThreadPoolExecutor(max_workers=SOCIAL_IMAGE_IO_WORKERS) as io_pool:
+            futures = {
+                io_pool.submit(self._upload_bytes, data, report_id, template): template
+                for template, data in rendered['images'].items()
+            }
+            for future, template in futures.items():
+                try:
+                    results[template] = future.result()
+                except Exception as e:
+                    print(f"   ⚠️  {template} upload failed: {e}")
         
         return {'success': len(results) > 0, 'images': results}
     
@@ -473,27 +631,14 @@ class SocialImageGenerator:
             return 'failed'
     
     def _download_image(self, url: str) -> Image.Image:
-        """Download"""
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
-        return Image.open(BytesIO(r.content)).convert('RGB')
+        """Download (shared media cache)"""
+        return Image.open(BytesIO(fetch_bytes(url, timeout=30))).convert('RGB')
     
     def _download_logo(self, url: str, template: str) -> Image.Image:
-        """Download logo with template-specific size"""
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
-        logo = Image.open(BytesIO(r.content))
-        
-        if logo.mode != 'RGBA':
-            logo = logo.convert('RGBA')
-        
-        # Get size for this template
-        target_w, target_h = self.logo_sizes.get(template, (180, 180))
-        
-        w, h = logo.size
-        scale = min(target_w/w, target_h/h)
-        
-        return logo.resize((int(w*scale), int(h*scale)), Image.Resampling.LANCZOS)
+        """Logo with template-specific size (downloaded and scaled once per process)"""
+        self.assets.register_logo(template, url, self.logo_sizes.get(template, (180, 180)))
+        self.assets.warm_up(logos=[template])
+        return self.assets.logo(template)
     
     def _create_image(self, bg: Image.Image, logo: Image.Image, title: str) -> Image.Image:
         """Create - background with logo only, no text"""
@@ -506,34 +651,15 @@ class SocialImageGenerator:
     
     def _resize_to_fit(self, img: Image.Image) -> Image.Image:
         """Resize"""
-        w, h = self.output_size
-        iw, ih = img.size
-        scale = max(w/iw, h/ih)
-        nw, nh = int(iw*scale), int(ih*scale)
-        img = img.resize((nw, nh), Image.Resampling.LANCZOS)
-        l = (nw-w)//2
-        t = (nh-h)//2
-        return img.crop((l, t, l+w, t+h))
+        return resize_to_fit(img, self.output_size)
     
     def _enhance_image(self, img: Image.Image) -> Image.Image:
         """Enhance"""
-        img = ImageEnhance.Brightness(img).enhance(1.1)
-        img = ImageEnhance.Contrast(img).enhance(1.15)
-        img = ImageEnhance.Color(img).enhance(1.2)
-        return img
+        return enhance(img)
     
     def _add_logo(self, img: Image.Image, logo: Image.Image) -> Image.Image:
         """Add logo in safe zone for Facebook"""
-        # المنطقة الآمنة لفيسبوك - بعيداً عن الحواف
-        safe_margin = 20  # هامش آمن من الحواف
-        x = safe_margin
-        y = safe_margin
-        
-        if logo.mode == 'RGBA':
-            img.paste(logo, (x, y), logo)
-        else:
-            img.paste(logo, (x, y))
-        return img
+        return add_logo(img, logo)
     
     def _add_title_with_box(self, img: Image.Image, title: str) -> Image.Image:
         """Add title with proper Arabic RTL support and enhanced font handling"""
@@ -684,139 +810,36 @@ class SocialImageGenerator:
     
     def _get_font(self, size=58):
         """Get font - fallback method"""
-        for p in ['/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 'C:/Windows/Fonts/arialbd.ttf']:
-            if os.path.exists(p):
-                try:
-                    return ImageFont.truetype(p, size)
-                except:
-                    pass
-        return ImageFont.load_default()
+        return self.assets.font('latin_bold', size)
     
     def _get_arabic_font(self, size=64):
-        """Get Arabic font with Render-optimized fallback chain"""
-        
-        # قائمة الخطوط بالأولوية (محسنة لـ Render)
-        font_paths = [
-            # الخط العربي المحلي (أولوية عالية لـ Render)
-            'fonts/NotoSansArabic-Regular.ttf',
-            './fonts/NotoSansArabic-Regular.ttf',
-            'backend/fonts/NotoSansArabic-Regular.ttf',
-            './backend/fonts/NotoSansArabic-Regular.ttf',
-            
-            # خطوط النظام العربية (Linux - Render containers)
-            '/usr/share/fonts/truetype/noto/NotoSansArabic-Regular.ttf',
-            '/usr/share/fonts/truetype/noto/NotoSansArabic-Bold.ttf',
-            '/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf',
-            '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
-            '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-            '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf',
-            '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
-            
-            # Ubuntu/Debian fonts (common on Render)
-            '/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf',
-            '/usr/share/fonts/truetype/ubuntu/Ubuntu-Regular.ttf',
-            
-            # خطوط النظام العربية (Windows - للتطوير المحلي)
-            'C:/Windows/Fonts/arial.ttf',
-            'C:/Windows/Fonts/arialbd.ttf',
-            'C:/Windows/Fonts/tahoma.ttf',
-            'C:/Windows/Fonts/tahomabd.ttf',
-            
-            # خطوط النظام العربية (macOS - للتطوير المحلي)
-            '/System/Library/Fonts/Arial.ttf',
-            '/System/Library/Fonts/Helvetica.ttc',
-        ]
-        
-        # محاولة تحميل الخطوط بالترتيب
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                try:
-                    font = ImageFont.truetype(font_path, size)
-                    print(f"   ✅ Using Arabic font: {os.path.basename(font_path)}")
-                    return font
-                except Exception as e:
-                    print(f"   ⚠️  Failed to load {font_path}: {e}")
-                    continue
-        
-        # محاولة تثبيت الخطوط على Render
-        try:
-            print(f"   🔄 Attempting to install fonts for Render deployment...")
-            import subprocess
-            
-            # محاولة تثبيت خطوط Noto على Ubuntu (Render containers)
-            try:
-                subprocess.run(['apt-get', 'update'], check=False, capture_output=True, timeout=30)
-                subprocess.run(['apt-get', 'install', '-y', 'fonts-noto'], check=False, capture_output=True, timeout=60)
-                print(f"   ✅ Attempted to install Noto fonts on Render")
-                
-                # محاولة تحميل الخط بعد التثبيت
-                noto_path = '/usr/share/fonts/truetype/noto/NotoSansArabic-Regular.ttf'
-                if os.path.exists(noto_path):
-                    font = ImageFont.truetype(noto_path, size)
-                    print(f"   ✅ Successfully loaded installed Noto font")
-                    return font
-                    
-            except Exception as e:
-                print(f"   ⚠️  Font installation failed: {e}")
-                
-        except Exception as e:
-            print(f"   ⚠️  Could not attempt font installation: {e}")
-        
-        # محاولة تحميل الخط من الإنترنت (Render fallback)
-        try:
-            print(f"   🌐 Downloading Arabic font for Render...")
-            import requests
-            import tempfile
-            
-            # تحميل خط Noto Sans Arabic من Google Fonts
-            font_url = "https://github.com/googlefonts/noto-fonts/raw/main/hinted/ttf/NotoSansArabic/NotoSansArabic-Regular.ttf"
-            
-            response = requests.get(font_url, timeout=30)
-            response.raise_for_status()
-            
-            # حفظ في ملف مؤقت
-            temp_font_path = tempfile.mktemp(suffix='.ttf')
-            with open(temp_font_path, 'wb') as f:
-                f.write(response.content)
-            
-            font = ImageFont.truetype(temp_font_path, size)
-            print(f"   ✅ Downloaded and loaded Arabic font from Google Fonts")
-            return font
-            
-        except Exception as e:
-            print(f"   ⚠️  Font download failed: {e}")
-        
-        # إذا فشل كل شيء، استخدم الخط الافتراضي
-        print(f"   ⚠️  Using default font - Arabic may not render correctly on Render")
-        print(f"   💡 Consider bundling fonts in your Render deployment")
-        try:
-            return ImageFont.load_default()
-        except:
-            # آخر محاولة - إنشاء خط بسيط
-            return ImageFont.load_default()
+        """Get Arabic font (resolved once, cached per size - no installs/downloads here)"""
+        return self.assets.font('arabic', size)
     
     def _upload_to_s3(self, img: Image.Image, report_id: int, template: str) -> Dict:
         """Upload"""
         try:
-            buf = BytesIO()
-            img.save(buf, format='JPEG', quality=95)
-            buf.seek(0)
-            
-            import time
-            fn = f"{template}_{report_id}_{int(time.time())}.jpg"
-            key = f"{self.s3_folder}{template}/{fn}"
-            
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=key,
-                Body=buf.getvalue(),
-                ContentType='image/jpeg'
-            )
-            
-            return {'success': True, 'image_url': f"https://{self.bucket_name}.s3.amazonaws.com/{key}"}
+            url = self._upload_bytes(encode_image(img), report_id, template)
+            return {'success': True, 'image_url': url}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def _upload_bytes(self, data: bytes, report_id: int, template: str) -> str:
+        """Upload an encoded image (any thread) and return its URL"""
+        _, content_type, extension = image_format()
+        
+        fn = f"{template}_{report_id}_{int(time.time())}.{extension}"
+        key = f"{self.s3_folder}{template}/{fn}"
+        
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=data,
+            ContentType=content_type
+        )
+        
+        return f"https://{self.bucket_name}.s3.amazonaws.com/{key}"
+    
     def close(self):
         """Close"""
         try:
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+✂️ STT Segmenter
+تقسيم التسجيلات الطويلة لمقاطع أقصر من 60 ثانية عند السكتات (ffmpeg silencedetect)
+
+Google Speech الـ recognize المتزامن حده دقيقة، والبديل long_running_recognize
+بيستنى دقائق بالتسلسل. هون:
+- plan_segments: نقاط القص بنص السكتات، وكل مقطع <= STT_SEGMENT_MAX_SECONDS
+  (إذا ما في سكتة كافية بنقص قص إجباري عند الحد)
+- extract_segment: المقطع كـ LINEAR16 16kHz mono بالذاكرة (pipe) عبر media_transcode
+- stitch_segments: تجميع النص بالترتيب + ثقة موزونة بمدة المقاطع + offsets
+"""
+
+import os
+import re
+import subprocess
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.media_transcode import find_ffmpeg, run_ffmpeg, to_pcm
+
+
+STT_SEGMENTED_ENABLED = os.getenv('STT_SEGMENTED_ENABLED', 'true').lower() == 'true'
+
+# أقل من حد الـ sync (60s) بهامش
+STT_SEGMENT_MAX_SECONDS = float(os.getenv('STT_SEGMENT_MAX_SECONDS', 55))
+# ما بنقص قبل هالمدة (عشان ما يطلع مقاطع قصيرة كتير بدون سياق)
+STT_SEGMENT_MIN_SECONDS = float(os.getenv('STT_SEGMENT_MIN_SECONDS', 15))
+STT_SILENCE_DB = int(os.getenv('STT_SILENCE_DB', -35))
+STT_SILENCE_MIN_SECONDS = float(os.getenv('STT_SILENCE_MIN_SECONDS', 0.4))
+# عدد المقاطع اللي بتنبعت لـ Google بنفس الوقت
+STT_SEGMENT_WORKERS = int(os.getenv('STT_SEGMENT_WORKERS', 6))
+
+SAMPLE_RATE = 16000
+
+FFMPEG_TIMEOUT = 120
+
+_SILENCE_START_RE = re.compile(r'silence_start:\s*(-?[\d.]+)')
+_SILENCE_END_RE = re.compile(r'silence_end:\s*(-?[\d.]+)')
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):([\d.]+)')
+
+
+@dataclass
+class Segment:
+    index: int
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+# ============================================
+# ffmpeg
+# ============================================
+
+def probe_duration(path: str) -> Optional[float]:
+    """مدة الملف بالثواني (None إذا ما قدرنا نعرف)"""
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            capture_output=True, text=True, timeout=30
+        )
+        if result.returncode == 0 and result.stdout.strip() not in ('', 'N/A'):
+            return float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        pass
+
+    # بدون ffprobe: من رسالة ffmpeg -i
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        return None
+    try:
+        result = subprocess.run(
+            [ffmpeg, '-hide_banner', '-i', path],
+            capture_output=True, text=True, timeout=30
+        )
+        match = _DURATION_RE.search(result.stderr)
+        if match:
+            hours, minutes, seconds = match.groups()
+            return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+
+    return None
+
+
+def parse_silences(ffmpeg_log: str) -> List[Tuple[float, float]]:
+    """[(start, end)] من مخرجات silencedetect"""
+    silences = []
+    start = None
+    for line in ffmpeg_log.splitlines():
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+
+def detect_silences(
+    path: str,
+    noise_db: int = None,
+    min_silence: float = None
+) -> List[Tuple[float, float]]:
+    """السكتات بالملف عبر ffmpeg silencedetect (تحليل بس، بدون إخراج)"""
+    noise_db = STT_SILENCE_DB if noise_db is None else noise_db
+    min_silence = STT_SILENCE_MIN_SECONDS if min_silence is None else min_silence
+
+    _, log = run_ffmpeg(
+        ['-nostats', '-i', path,
+         '-af', f'silencedetect=noise={noise_db}dB:d={min_silence}',
+         '-f', 'null', '-'],
+        timeout=FFMPEG_TIMEOUT
+    )
+    return parse_silences(log)
+
+
+def extract_segment(path: str, segment: Segment) -> bytes:
+    """المقطع كـ LINEAR16 16kHz mono (raw PCM) بالذاكرة"""
+    return to_pcm(path, SAMPLE_RATE, start=segment.start, duration=segment.duration, timeout=FFMPEG_TIMEOUT)
+
+
+# ============================================
+# Planning / stitching
+# ============================================
+
+def plan_segments(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    max_seconds: float = None,
+    min_seconds: float = None
+) -> List[Segment]:
+    """
+    نقاط القص عند نص السكتات
+
+    كل مقطع <= max_seconds؛ بنختار آخر سكتة قبل الحد (أطول مقطع ممكن)،
+    وإذا ما في سكتة بعد min_seconds بنقص عند الحد
+    """
+    max_seconds = max_seconds or STT_SEGMENT_MAX_SECONDS
+    min_seconds = STT_SEGMENT_MIN_SECONDS if min_seconds is None else min(min_seconds, max_seconds)
+
+    cuts = sorted((start + end) / 2 for start, end in silences if 0 < (start + end) / 2 < duration)
+
+    segments = []
+    start = 0.0
+    while duration - start > max_seconds:
+        limit = start + max_seconds
+        candidates = [cut for cut in cuts if start + min_seconds <= cut <= limit]
+        end = candidates[-1] if candidates else limit
+        segments.append(Segment(len(segments), start, end))
+        start = end
+
+    if duration - start > 0 or not segments:
+        segments.append(Segment(len(segments), start, duration))
+    return segments
+
+
+def stitch_segments(results: List[Dict]) -> Dict:
+    """
+    تجميع نتائج المقاطع بالترتيب
+
+    Args:
+        results: [{'index', 'start', 'end', 'text', 'confidence'}]
+
+    Returns:
+        {'text', 'confidence' (موزونة بالمدة), 'segments' (بالترتيب)}
+    """
+    ordered = sorted(results, key=lambda r: r['index'])
+
+    text = ' '.join(r['text'].strip() for r in ordered if r.get('text')).strip()
+
+    weighted = [(r['end'] - r['start'], r['confidence']) for r in ordered if r.get('text')]
+    total = sum(weight for weight, _ in weighted)
+    confidence = sum(weight * value for weight, value in weighted) / total if total else 0.0
+
+    return {'text': text, 'confidence': confidence, 'segments': ordered}
@@ -4,14 +4,31 @@
 🎙️ STT Service (Speech-to-Text)
 تحويل الصوت إلى نص باستخدام Google Cloud Speech-to-Text
 يدعم الملفات الطويلة (> 1 دقيقة) والـ WebM format
+
+الملفات الأطول من دقيقة بتتقسم عند السكتات لمقاطع < 60s وبتتحول بالتوازي
+(بدل long_running_recognize اللي بيستنى دقائق)
 """
 
 import os
 import sys
-import subprocess
-import tempfile
-from typing import Optional, Dict
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.services.generators.stt_segmenter import (
+    SAMPLE_RATE,
+    STT_SEGMENT_MAX_SECONDS,
+    STT_SEGMENT_WORKERS,
+    STT_SEGMENTED_ENABLED,
+    Segment,
+    detect_silences,
+    extract_segment,
+    plan_segments,
+    probe_duration,
+    stitch_segments,
+)
+from app.utils.media_cache import fetch_to_temp
+from app.utils.media_transcode import TranscodeError, to_wav
 
 # Load environment variables
 from dotenv import load_dotenv
@@ -72,124 +89,11 @@ class STTService:
         
         print(f"🎙️ Transcribing audio: {audio_url}")
         
-        audio_file_path = None
-        wav_file_path = None
+        prepared = None
         
         try:
-            # ========================================
-            # Step 1: Download audio
-            # ========================================
-            audio_file_path = self._download_audio(audio_url)
-            print(f"✅ Audio downloaded: {audio_file_path}")
-            
-            # ========================================
-            # Step 2: Convert to WAV if needed
-            # ========================================
-            file_extension = audio_url.split('.')[-1].lower()
-            
-            if file_extension in ['webm', 'ogg', 'm4a']:
-                print(f"🔄 Converting {file_extension} to WAV...")
-                wav_file_path = self._convert_to_wav(audio_file_path)
-                if wav_file_path:
-                    print(f"✅ Converted to WAV: {wav_file_path}")
-                    working_file = wav_file_path
-                    encoding = speech.RecognitionConfig.AudioEncoding.LINEAR16
-                    sample_rate = 16000
-                else:
-                    print(f"⚠️ Conversion failed, trying original format")
-                    working_file = audio_file_path
-                    encoding = self._get_audio_encoding(file_extension)
-                    sample_rate = None
-            else:
-                working_file = audio_file_path
-                encoding = self._get_audio_encoding(file_extension)
-                sample_rate = None
-            
-            # ========================================
-            # Step 3: Read audio content
-            # ========================================
-            with open(working_file, 'rb') as f:
-                audio_content = f.read()
-            
-            file_size_mb = len(audio_content) / (1024 * 1024)
-            print(f"📊 Audio size: {file_size_mb:.2f} MB")
-            
-            # ========================================
-            # Step 4: Transcribe with retries
-            # ========================================
-            last_error = None
-            
-            for attempt in range(max_retries):
-                try:
-                    print(f"🤖 Transcribing... (attempt {attempt + 1}/{max_retries})")
-                    
-                    # Build config
-                    config_params = {
-                        'encoding': encoding,
-                        'language_code': 'ar-SA',
-                        'alternative_language_codes': ['ar-EG', 'ar-JO', 'ar-PS'],
-                        'enable_automatic_punctuation': True,
-                        'model': 'default',
-                    }
-                    
-                    if sample_rate:
-                        config_params['sample_rate_hertz'] = sample_rate
-                    
-                    config = speech.RecognitionConfig(**config_params)
-                    audio = speech.RecognitionAudio(content=audio_content)
-                    
-                    # Try sync first, then async for long audio
-                    print(f"   📤 Sending to Google Cloud Speech API...")
-                    
-                    try:
-                        response = self.client.recognize(config=config, audio=audio)
-                    except Exception as sync_error:
-                        error_str = str(sync_error)
-                        if 'Sync input too long' in error_str or 'audio too long' in error_str.lower():
-                            print(f"   ⏳ Audio too long, using async recognition...")
-                            response = self._transcribe_long_audio(audio_content, config)
-                        else:
-                            raise sync_error
-                    
-                    # Extract transcription
-                    transcription = self._extract_transcription(response)
-                    
-                    if not transcription or len(transcription) < 10:
-                        print(f"⚠️ Transcription too short: {len(transcription) if transcription else 0} chars")
-                        if attempt < max_retries - 1:
-                            continue
-                        else:
-                            return {'success': False, 'error': 'النص المستخرج قصير جداً أو فارغ'}
-                    
-                    confidence = self._calculate_confidence(response)
-                    
-                    print(f"✅ Transcription successful: {len(transcription)} chars")
-                    print(f"   Preview: {transcription[:100]}...")
-                    print(f"   Confidence: {confidence:.2%}")
-                    
-                    return {
-                        'success': True,
-                        'text': transcription,
-                        'language': 'ar',
-                        'confidence': confidence,
-                        'char_count': len(transcription),
-                        'word_count': len(transcription.split())
-                    }
-                    
-                except Exception as e:
-                    last_error = str(e)
-                    print(f"❌ Attempt {attempt + 1} failed: {e}")
-                    
-                    # Don't retry for certain errors
-                    if 'sample rate' in last_error.lower():
-                        break
-                    
-                    continue
-            
-            return {
-                'success': False,
-                'error': f'فشل التحويل بعد {max_retries} محاولات: {last_error}'
-            }
+            prepared = self.prepare_audio(audio_url)
+            return self.transcribe_prepared(prepared, max_retries)
             
         except Exception as e:
             print(f"❌ Error: {e}")
@@ -197,8 +101,274 @@ class STTService:
             
         finally:
             # Cleanup temp files
-            self._cleanup(audio_file_path)
-            self._cleanup(wav_file_path)
+            self.release(prepared)
+    
+    def prepare_audio(self, audio_url: str) -> Dict:
+        """
+        مرحلة التنزيل + ffmpeg (بدون Google) - بتشتغل بأي thread
+        
+        - الملفات الطويلة: مدة + خطة المقاطع عند السكتات
+        - القصيرة: تحويل لـ WAV إذا لزم
+        
+        Returns:
+            prepared dict لـ transcribe_prepared (ولازم release بعدها)
+        """
+        prepared = {'source': audio_url, 'temp_files': []}
+        
+        # ========================================
+        # Step 1: Download audio
+        # ========================================
+        audio_file_path = self._download_audio(audio_url)
+        prepared['temp_files'].append(audio_file_path)
+        prepared['download_path'] = audio_file_path
+        print(f"✅ Audio downloaded: {audio_file_path}")
+        
+        # ========================================
+        # Long audio: plan segments at pauses
+        # ========================================
+        if STT_SEGMENTED_ENABLED:
+            duration = probe_duration(audio_file_path)
+            if duration and duration > STT_SEGMENT_MAX_SECONDS:
+                try:
+                    silences = detect_silences(audio_file_path)
+                    prepared['duration'] = duration
+                    prepared['segments'] = plan_segments(duration, silences)
+                    print(f"✂️ {duration:.0f}s audio → {len(prepared['segments'])} segments "
+                          f"({len(silences)} pauses)")
+                    return prepared
+                except Exception as e:
+                    print(f"   ⚠️ Silence detection failed: {e}")
+        
+        self._prepare_full_file(prepared)
+        return prepared
+    
+    def _prepare_full_file(self, prepared: Dict):
+        """Step 2: Convert to WAV if needed (للتحويل الكامل بطلب واحد)"""
+        audio_file_path = prepared['download_path']
+        file_extension = prepared['source'].split('.')[-1].lower()
+        
+        # الفيديو (رفع/تسجيل): صوته بينسحب هون بالـ job بدل وقت الرفع
+        if file_extension in ['webm', 'ogg', 'm4a', 'mp4', 'mov', 'avi', 'mkv']:
+            print(f"🔄 Converting {file_extension} to WAV...")
+            try:
+                # WAV بالذاكرة (pipe) بدون ملف مؤقت تاني
+                prepared['content'] = to_wav(audio_file_path, SAMPLE_RATE)
+                print(f"✅ Converted to WAV: {len(prepared['content']) / 1024 / 1024:.2f} MB")
+                prepared['path'] = audio_file_path
+                prepared['encoding'] = speech.RecognitionConfig.AudioEncoding.LINEAR16
+                prepared['sample_rate'] = SAMPLE_RATE
+                return
+            except TranscodeError as e:
+                print(f"⚠️ Conversion failed ({str(e)[-200:]}), trying original format")
+        
+        prepared['path'] = audio_file_path
+        prepared['encoding'] = self._get_audio_encoding(file_extension)
+        prepared['sample_rate'] = None
+    
+    def release(self, prepared: Optional[Dict]):
+        """حذف ملفات prepare_audio المؤقتة"""
+        for path in (prepared or {}).get('temp_files', []):
+            self._cleanup(path)
+    
+    def transcribe_prepared(self, prepared: Dict, max_retries: int = 3) -> Dict:
+        """مرحلة Google Speech لملف جاهز من prepare_audio"""
+        
+        # ========================================
+        # Long audio: segmented parallel transcription
+        # ========================================
+        if prepared.get('segments'):
+            segmented = self._transcribe_segmented(
+                prepared['download_path'], prepared['duration'], prepared['segments'], max_retries
+            )
+            if segmented:
+                return segmented
+            print("⚠️ Segmented transcription failed, using full-file recognition")
+        
+        if 'path' not in prepared:
+            self._prepare_full_file(prepared)
+        
+        encoding = prepared['encoding']
+        sample_rate = prepared['sample_rate']
+        
+        # ========================================
+        # Step 3: Read audio content
+        # ========================================
+        audio_content = prepared.get('content')
+        if audio_content is None:
+            with open(prepared['path'], 'rb') as f:
+                audio_content = f.read()
+        
+        file_size_mb = len(audio_content) / (1024 * 1024)
+        print(f"📊 Audio size: {file_size_mb:.2f} MB")
+        
+        # ========================================
+        # Step 4: Transcribe with retries
+        # ========================================
+        last_error = None
+        
+        for attempt in range(max_retries):
+            try:
+                print(f"🤖 Transcribing... (attempt {attempt + 1}/{max_retries})")
+                
+                config = self._build_config(encoding, sample_rate)
+                audio = speech.RecognitionAudio(content=audio_content)
+                
+                # Try sync first, then async for long audio
+                print(f"   📤 Sending to Google Cloud Speech API...")
+                
+                try:
+                    response = self.client.recognize(config=config, audio=audio)
+                except Exception as sync_error:
+                    error_str = str(sync_error)
+                    if 'Sync input too long' in error_str or 'audio too long' in error_str.lower():
+                        print(f"   ⏳ Audio too long, using async recognition...")
+                        response = self._transcribe_long_audio(audio_content, config)
+                    else:
+                        raise sync_error
+                
+                # Extract transcription
+                transcription = self._extract_transcription(response)
+                
+                if not transcription or len(transcription) < 10:
+                    print(f"⚠️ Transcription too short: {len(transcription) if transcription else 0} chars")
+                    if attempt < max_retries - 1:
+                        continue
+                    else:
+                        return {'success': False, 'error': 'النص المستخرج قصير جداً أو فارغ'}
+                
+                confidence = self._calculate_confidence(response)
+                
+                print(f"✅ Transcription successful: {len(transcription)} chars")
+                print(f"   Preview: {transcription[:100]}...")
+                print(f"   Confidence: {confidence:.2%}")
+                
+                return {
+                    'success': True,
+                    'text': transcription,
+                    'language': 'ar',
+                    'confidence': confidence,
+                    'char_count': len(transcription),
+                    'word_count': len(transcription.split())
+                }
+                
+            except Exception as e:
+                last_error = str(e)
+                print(f"❌ Attempt {attempt + 1} failed: {e}")
+                
+                # Don't retry for certain errors
+                if 'sample rate' in last_error.lower():
+                    break
+                
+                continue
+        
+        return {
+            'success': False,
+            'error': f'فشل التحويل بعد {max_retries} محاولات: {last_error}'
+        }
+    
+    def _build_config(self, encoding, sample_rate: Optional[int] = None) -> speech.RecognitionConfig:
+        """Recognition config (Arabic + dialects)"""
+        config_params = {
+            'encoding': encoding,
+            'language_code': 'ar-SA',
+            'alternative_language_codes': ['ar-EG', 'ar-JO', 'ar-PS'],
+            'enable_automatic_punctuation': True,
+            'model': 'default',
+        }
+        
+        if sample_rate:
+            config_params['sample_rate_hertz'] = sample_rate
+        
+        return speech.RecognitionConfig(**config_params)
+    
+    # ============================================
+    # Segmented transcription
+    # ============================================
+    
+    def _transcribe_segmented(
+        self,
+        audio_path: str,
+        duration: float,
+        segments: List[Segment],
+        max_retries: int = 3
+    ) -> Optional[Dict]:
+        """
+        recognize متزامن لكل مقطع (من plan_segments) بالتوازي
+        
+        Returns:
+            نفس شكل transcribe_audio + 'segments' و 'duration'،
+            أو None إذا فشل أي مقطع (الـ caller بيرجع للطريقة الكاملة)
+        """
+        start_time = time.perf_counter()
+        print(f"🤖 Transcribing {len(segments)} segments ({STT_SEGMENT_WORKERS} parallel)...")
+        
+        config = self._build_config(speech.RecognitionConfig.AudioEncoding.LINEAR16, SAMPLE_RATE)
+        
+        with ThreadPoolExecutor(max_workers=min(STT_SEGMENT_WORKERS, len(segments))) as pool:
+            futures = [
+                pool.submit(self._transcribe_segment, audio_path, segment, config, max_retries)
+                for segment in segments
+            ]
+            results = [future.result() for future in futures]
+        
+        failed = [r['index'] for r in results if r.get('error')]
+        if failed:
+            print(f"   ❌ Segments failed: {failed}")
+            return None
+        
+        stitched = stitch_segments(results)
+        transcription = stitched['text']
+        
+        if len(transcription) < 10:
+            return {'success': False, 'error': 'النص المستخرج قصير جداً أو فارغ'}
+        
+        print(f"✅ Transcription successful: {len(transcription)} chars "
+              f"in {time.perf_counter() - start_time:.1f}s")
+        print(f"   Preview: {transcription[:100]}...")
+        print(f"   Confidence: {stitched['confidence']:.2%}")
+        
+        return {
+            'success': True,
+            'text': transcription,
+            'language': 'ar',
+            'confidence': stitched['confidence'],
+            'char_count': len(transcription),
+            'word_count': len(transcription.split()),
+            'duration': duration,
+            'segments': stitched['segments']
+        }
+    
+    def _transcribe_segment(
+        self,
+        audio_path: str,
+        segment: Segment,
+        config: speech.RecognitionConfig,
+        max_retries: int
+    ) -> Dict:
+        """مقطع واحد (any thread) → {'index', 'start', 'end', 'text', 'confidence'} أو 'error'"""
+        result = {'index': segment.index, 'start': segment.start, 'end': segment.end}
+        
+        try:
+            audio = speech.RecognitionAudio(content=extract_segment(audio_path, segment))
+        except Exception as e:
+            return {**result, 'error': str(e)}
+        
+        last_error = None
+        for attempt in range(max_retries):
+            try:
+                response = self.client.recognize(config=config, audio=audio)
+                return {
+                    **result,
+                    'text': self._extract_transcription(response),
+                    'confidence': self._calculate_confidence(response)
+                }
+            except Exception as e:
+                last_error = str(e)
+                print(f"   ⚠️ Segment {segment.index} attempt {attempt + 1} failed: {e}")
+                if attempt < max_retries - 1:
+                    time.sleep(2 ** attempt)
+        
+        return {**result, 'error': last_error}
     
     def _transcribe_long_audio(self, audio_content: bytes, config: speech.RecognitionConfig):
         """
@@ -214,60 +384,20 @@ class STTService:
         
         return response
     
-    def _convert_to_wav(self, input_path: str) -> Optional[str]:
-        """
-        Convert audio to WAV format (16kHz, mono)
-        """
-        try:
-            # Create output path
-            output_path = tempfile.NamedTemporaryFile(delete=False, suffix='.wav').name
-            
-            # Try ffmpeg conversion
-            cmd = [
-                'ffmpeg', '-y', '-i', input_path,
-                '-ar', '16000',      # 16kHz sample rate
-                '-ac', '1',          # mono
-                '-acodec', 'pcm_s16le',  # LINEAR16
-                output_path
-            ]
-            
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                timeout=60,
-                text=True
-            )
-            
-            if result.returncode == 0 and os.path.exists(output_path):
-                file_size = os.path.getsize(output_path)
-                if file_size > 1000:  # At least 1KB
-                    return output_path
-            
-            # Cleanup failed output
-            self._cleanup(output_path)
-            return None
-            
-        except Exception as e:
-            print(f"   ⚠️ FFmpeg conversion failed: {e}")
-            return None
-    
     def _download_audio(self, audio_url: str) -> str:
         """Download audio file from URL"""
         extension = audio_url.split('.')[-1].lower()
         if extension not in ['mp3', 'wav', 'ogg', 'm4a', 'webm', 'flac']:
             extension = 'mp3'
         
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{extension}')
-        temp_file_path = temp_file.name
-        temp_file.close()
-        
         print(f"📥 Downloading audio from: {audio_url}")
-        response = requests.get(audio_url, stream=True, timeout=60)
-        response.raise_for_status()
+        temp_file_path = fetch_to_temp(audio_url, timeout=60)
         
-        with open(temp_file_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        # الامتداد المتوقع من باقي الخدمة (الكاش بيحافظ على امتداد الرابط)
+        if not temp_file_path.endswith(f'.{extension}'):
+            renamed = f"{os.path.splitext(temp_file_path)[0]}.{extension}"
+            os.replace(temp_file_path, renamed)
+            temp_file_path = renamed
         
         file_size = os.path.getsize(temp_file_path)
         print(f"✅ Downloaded: {file_size / 1024 / 1024:.2f} MB")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🗂️ TTS Sentence Cache
+كاش صوت على مستوى الجملة للنصوص اللي بتتكرر بالبث
+
+أمثلة: مقدمة المحطة، نص الطقس الافتراضي، نفس العنوان بكل موجز ساعة
+
+المفتاح (content-addressed): sha256(voice | encoding | الجملة بعد التطبيع)
+الطبقات:
+1. Disk LRU محلي (TTS_CACHE_DIR، حد TTS_CACHE_MAX_MB)
+2. S3 (cache/tts/...) مشترك بين الـ workers وبيضل بعد إعادة التشغيل
+
+التدفق: الجمل الموجودة بالكاش ما بتروح على Google TTS،
+الجمل الجديدة بس بتتولد (بالتوازي) وبتنحفظ بالطبقتين
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.utils.disk_lru import DiskLRU
+
+
+TTS_CACHE_ENABLED = os.getenv('TTS_CACHE_ENABLED', 'true').lower() == 'true'
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'tts_cache'))
+TTS_CACHE_MAX_MB = int(os.getenv('TTS_CACHE_MAX_MB', 500))
+TTS_CACHE_S3_PREFIX = os.getenv('TTS_CACHE_S3_PREFIX', 'cache/tts/')
+
+# عدد طلبات TTS بنفس الوقت (أجزاء/جمل النص الواحد)
+TTS_MAX_CONCURRENCY = int(os.getenv('TTS_MAX_CONCURRENCY', 4))
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+# ============================================
+# المفاتيح
+# ============================================
+
+def normalize_sentence(sentence: str) -> str:
+    """تطبيع الجملة للمفتاح (المسافات فقط، الترقيم بيأثر على النطق)"""
+    return _WHITESPACE_RE.sub(' ', sentence).strip()
+
+
+def cache_key(sentence: str, voice: str, encoding: str) -> str:
+    raw = f"{voice}|{encoding}|{normalize_sentence(sentence)}".encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+# ============================================
+# Disk LRU (app.utils.disk_lru)
+# ============================================
+
+_disk_tiers: Dict[str, DiskLRU] = {}
+_disk_tiers_lock = threading.Lock()
+
+
+def _get_disk_tier(directory: str, max_bytes: int) -> DiskLRU:
+    """نفس الـ DiskLRU لكل المولدات بنفس العملية (فهرس وحجم مشترك)"""
+    with _disk_tiers_lock:
+        tier = _disk_tiers.get(directory)
+        if tier is None:
+            tier = DiskLRU(directory, max_bytes)
+            _disk_tiers[directory] = tier
+        return tier
+
+
+# ============================================
+# TTS Cache
+# ============================================
+
+class TTSCache:
+    """كاش صوت الجمل: Disk LRU ← S3"""
+
+    def __init__(self, s3_client=None, bucket_name: str = None):
+        self.disk = _get_disk_tier(TTS_CACHE_DIR, TTS_CACHE_MAX_MB * 1024 * 1024)
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.stats = {'disk_hits': 0, 's3_hits': 0, 'misses': 0, 'stored': 0}
+
+    def _s3_key(self, key: str, voice: str, encoding: str) -> str:
+        return f"{TTS_CACHE_S3_PREFIX}{voice}/{encoding.lower()}/{key}.bin"
+
+    def get(self, sentence: str, voice: str, encoding: str) -> Optional[bytes]:
+        key = cache_key(sentence, voice, encoding)
+
+        data = self.disk.get(key)
+        if data:
+            self.stats['disk_hits'] += 1
+            return data
+
+        if self.s3_client and self.bucket_name:
+            try:
+                response = self.s3_client.get_object(
+                    Bucket=self.bucket_name,
+                    Key=self._s3_key(key, voice, encoding)
+                )
+                data = response['Body'].read()
+                if data:
+                    self.disk.put(key, data)
+                    self.stats['s3_hits'] += 1
+                    return data
+            except Exception:
+                # NoSuchKey أو خطأ اتصال → miss
+                pass
+
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, sentence: str, voice: str, encoding: str, audio_bytes: bytes):
+        key = cache_key(sentence, voice, encoding)
+
+        try:
+            self.disk.put(key, audio_bytes)
+        except OSError as e:
+            print(f"   ⚠️ TTS disk cache write failed: {e}")
+
+        if self.s3_client and self.bucket_name:
+            try:
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self._s3_key(key, voice, encoding),
+                    Body=audio_bytes,
+                    ContentType='application/octet-stream'
+                )
+            except Exception as e:
+                print(f"   ⚠️ TTS S3 cache write failed: {str(e)[:100]}")
+
+        self.stats['stored'] += 1
+
+
+def synthesize_sentences(
+    units: List[str],
+    voice: str,
+    encoding: str,
+    synthesize: Callable[[str], bytes],
+    cache: Optional[TTSCache] = None,
+    max_workers: int = None
+) -> Tuple[List[bytes], int]:
+    """
+    صوت كل وحدة بالترتيب: من الكاش، أو synthesize(unit) للجمل الجديدة (بالتوازي)
+
+    Args:
+        synthesize: دالة ترجع bytes أو ترمي exception عند الفشل
+    Returns:
+        (الأجزاء بالترتيب, عدد الجمل من الكاش)
+    Raises:
+        أول exception من synthesize
+    """
+    parts: List[Optional[bytes]] = [None] * len(units)
+    pending: Dict[str, List[int]] = {}
+
+    for i, unit in enumerate(units):
+        audio = cache.get(unit, voice, encoding) if cache else None
+        if audio:
+            parts[i] = audio
+        else:
+            # نفس الجملة مكررة بالنص → طلب واحد
+            pending.setdefault(normalize_sentence(unit), []).append(i)
+
+    hits = len(units) - sum(len(v) for v in pending.values())
+
+    if pending:
+        workers = max(1, min(max_workers or TTS_MAX_CONCURRENCY, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            future_to_sentence = {
+                executor.submit(synthesize, sentence): sentence
+                for sentence in pending
+            }
+
+            for future in as_completed(future_to_sentence):
+                sentence = future_to_sentence[future]
+                try:
+                    audio = future.result()
+                except Exception:
+                    for other in future_to_sentence:
+                        other.cancel()
+                    raise
+
+                for i in pending[sentence]:
+                    parts[i] = audio
+                if cache:
+                    cache.put(sentence, voice, encoding, audio)
+
+    return parts, hits
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🚦 TTS Rate Limiter
+حد مشترك لطلبات Google TTS (requests per minute) بين كل الـ threads بالعملية
+
+بدل sleep ثابت بين التقارير و 60 ثانية عند 429:
+- token bucket بمعدل TTS_REQUESTS_PER_MINUTE (مع burst صغير)
+- عند RESOURCE_EXHAUSTED: المعدل ينزل للنص + توقف مؤقت للكل (backoff أُسّي مع jitter)
+- مع كل نجاح المعدل بيرجع يطلع تدريجياً لحد الأصلي
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+
+TTS_REQUESTS_PER_MINUTE = float(os.getenv('TTS_REQUESTS_PER_MINUTE', 300))
+TTS_RATE_LIMIT_BURST = int(os.getenv('TTS_RATE_LIMIT_BURST', 4))
+
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+MIN_RATE_FACTOR = 0.1       # أقل معدل = 10% من الأصلي
+RECOVERY_STEP = 0.05        # كل نجاح يرجع 5% من المعدل الأصلي
+
+T = TypeVar('T')
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """هل الخطأ 429 / RESOURCE_EXHAUSTED من Google؟"""
+    error_msg = str(error)
+    return "RESOURCE_EXHAUSTED" in error_msg or "429" in error_msg
+
+
+class RateLimiter:
+    """token bucket بمعدل متغير (AIMD) وتوقف مشترك عند rate limit"""
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.max_rate = requests_per_minute / 60.0     # طلب بالثانية
+        self.rate = self.max_rate
+        self.burst = max(1, burst)
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._strikes = 0
+
+        self.stats = {'requests': 0, 'rate_limited': 0, 'waited_seconds': 0.0}
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """انتظار لحد ما يكون في token (وما في توقف)"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    self.stats['requests'] += 1
+                    self.stats['waited_seconds'] += waited
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+            waited += wait
+
+    def on_success(self):
+        """زيادة تدريجية للمعدل بعد النجاح"""
+        with self._lock:
+            self._strikes = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+    def on_rate_limited(self) -> float:
+        """
+        تخفيض المعدل للنص وتوقف مشترك لكل الطلبات
+
+        Returns:
+            مدة التوقف بالثواني
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            self.rate = max(self.max_rate * MIN_RATE_FACTOR, self.rate / 2)
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** self._strikes))
+            delay *= random.uniform(0.8, 1.2)
+            self._strikes += 1
+
+            # الطلبات اللي فشلت مع بعض ما بتمدد التوقف أكثر من مرة
+            self._paused_until = max(self._paused_until, now + delay)
+            self._tokens = 0.0
+            self.stats['rate_limited'] += 1
+            return self._paused_until - now
+
+    def call(self, fn: Callable[[], T], max_rate_limit_retries: int = 6) -> T:
+        """
+        تنفيذ طلب TTS عبر الـ limiter، وإعادته عند 429 بعد الـ backoff
+
+        Raises:
+            أي خطأ غير rate limit مباشرة، أو آخر 429 بعد المحاولات
+        """
+        for attempt in range(max_rate_limit_retries + 1):
+            self.acquire()
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= max_rate_limit_retries:
+                    raise
+                delay = self.on_rate_limited()
+                print(f"      ⏳ TTS rate limit - backing off {delay:.1f}s "
+                      f"(rate now {self.rate * 60:.0f}/min)")
+                continue
+
+            self.on_success()
+            return result
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_tts_rate_limiter() -> RateLimiter:
+    """نفس الـ limiter لكل مولدات الصوت بنفس العملية (حصة Google مشتركة)"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(TTS_REQUESTS_PER_MINUTE, TTS_RATE_LIMIT_BURST)
+        return _shared_limiter
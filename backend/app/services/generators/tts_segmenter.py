@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+✂️ TTS Segmenter
+تجهيز النص لـ Google TTS: إضافة نقاط، تقسيم جمل، وتجميع أجزاء حسب حجم UTF-8
+
+نفس مخرجات BulletinAudioGenerator._add_punctuation / _split_text_into_chunks القديمة
+بالضبط، لكن بمرور خطي:
+- بدون result += char وبدون rstrip على كل النص المتجمع
+- بدون replace بلوب لحد ما يثبت (regex مُجهز مسبقاً بنفس النتيجة)
+
+حد Google TTS هو 5000 byte للـ input (مش عدد حروف)،
+العربي 2 bytes للحرف تقريباً، فالتجميع بيقيس طول UTF-8 عبر size=utf8_len
+"""
+
+import re
+from typing import Callable, List
+
+
+# Google TTS: أقصى حجم للنص بالطلب الواحد
+TTS_MAX_INPUT_BYTES = 5000
+
+PUNCTUATION_CHARS = '.،؟!'
+
+# إذا مر هالعدد من الحروف بدون علامة ترقيم، نضيف نقطة عند أول فراغ
+PUNCTUATION_INTERVAL = 150
+
+_PUNCT_RE = re.compile(r'[.،؟!]')
+_SENTENCE_END_RE = re.compile(r'[.،؟!\n]')
+_NON_SPACE_RE = re.compile(r'\S')
+_DOTS_RE = re.compile(r'\.{2,}')
+_DOT_SPACE_DOT_RE = re.compile(r'\.(?: \.)+')
+_SPACES_RE = re.compile(r' {2,}')
+
+# علامات نهاية الجملة لـ split_cacheable_sentences (النقطة العشرية 3.65 مش نهاية)
+_SENTENCE_RE = re.compile(r'(?:[^.؟!\n]|\.(?=\d))*(?:(?:[؟!\n]|\.(?!\d))+|$)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# سطر وهمي حوالين المقطع بـ split_segment_sentences (جملة مستقلة بتنشال)
+_SEGMENT_EDGE = 'فاصل'
+
+
+def utf8_len(text: str) -> int:
+    """حجم النص بالـ bytes كما يحسبه Google TTS"""
+    return len(text.encode('utf-8'))
+
+
+def _rstrip_parts(parts: List[str]):
+    """rstrip لآخر النص المتجمع بدون ما نجمعه (الفراغات ممكن تمتد على أكثر من جزء)"""
+    while parts:
+        stripped = parts[-1].rstrip()
+        if stripped:
+            parts[-1] = stripped
+            return
+        parts.pop()
+
+
+def add_punctuation(text: str) -> str:
+    """إضافة نقاط للنص لتسهيل القراءة على TTS"""
+
+    # استبدال السطور الجديدة بنقاط
+    text = text.replace('\n\n', '. ')
+    text = text.replace('\n', '. ')
+
+    # استبدال الشرطات والنقطتين بنقاط
+    text = text.replace(' - ', '. ')
+    text = text.replace(' – ', '. ')
+    text = text.replace(' : ', '. ')
+    text = text.replace(':', '. ')
+
+    # نقطة عند أول فراغ بعد 150 حرف بدون ترقيم
+    # بدل المرور حرف بحرف: نقفز من علامة ترقيم للي بعدها،
+    # وبكل مقطع نبحث عن أول فراغ بعد الحد (العداد بيبدأ من 0 بكل مقطع)
+    out: List[str] = []
+    pos = 0
+    length = len(text)
+
+    while pos < length:
+        match = _PUNCT_RE.search(text, pos)
+        end = match.start() if match else length
+
+        space = text.find(' ', pos + PUNCTUATION_INTERVAL, end)
+        if space == -1:
+            out.append(text[pos:end + 1])
+            pos = end + 1
+            continue
+
+        out.append(text[pos:space])
+        _rstrip_parts(out)
+        out.append('. ')
+        pos = space + 1
+
+    result = ''.join(out)
+
+    # تنظيف النقاط المتكررة (نفس ترتيب الـ replace loops)
+    result = _DOTS_RE.sub('.', result)
+    result = _DOT_SPACE_DOT_RE.sub('.', result)
+    result = _SPACES_RE.sub(' ', result)
+
+    # التأكد من وجود نقطة في النهاية
+    result = result.strip()
+    if result and result[-1] not in PUNCTUATION_CHARS:
+        result += '.'
+
+    return result
+
+
+def split_sentences(text: str) -> List[str]:
+    """تقسيم على . ، ؟ ! وسطر جديد (العلامة بتضل مع الجملة)"""
+    sentences = []
+    start = 0
+    blank_until = 0     # text[start:blank_until] فراغات فقط
+
+    for match in _SENTENCE_END_RE.finditer(text):
+        i = match.start()
+        # علامة الترقيم نفسها محتوى، السطر الجديد لازم قبله نص
+        if text[i] != '\n' or _NON_SPACE_RE.search(text, blank_until, i):
+            sentences.append(text[start:i + 1])
+            start = i + 1
+        blank_until = i + 1
+
+    # إضافة أي نص متبقي
+    if text[start:].strip():
+        sentences.append(text[start:])
+
+    return sentences
+
+
+def pack_chunks(
+    sentences: List[str],
+    max_size: int,
+    size: Callable[[str], int] = len
+) -> List[str]:
+    """
+    تجميع الجمل في أجزاء لا تتجاوز max_size
+
+    Args:
+        size: len (حروف) أو utf8_len (bytes)
+    """
+    chunks = []
+    current: List[str] = []
+    current_size = 0
+
+    space_size = size(' ')
+
+    for sentence in sentences:
+        sentence_size = size(sentence)
+
+        # إذا الجملة لوحدها أطول من الحد
+        if sentence_size > max_size:
+            if current:
+                chunks.append(''.join(current))
+                current = []
+                current_size = 0
+
+            # نقسم الجملة الطويلة بالقوة على الكلمات
+            piece: List[str] = []
+            piece_size = 0      # حجم "word word ... " مع الفراغ الأخير
+            for word in sentence.split():
+                word_size = size(word)
+                if piece_size + word_size + space_size <= max_size:
+                    piece.append(word)
+                    piece_size += word_size + space_size
+                else:
+                    if piece:
+                        chunks.append(' '.join(piece) + '.')
+                    piece = [word]
+                    piece_size = word_size + space_size
+            if piece:
+                chunks.append(' '.join(piece))
+
+        # إذا إضافة الجملة تتجاوز الحد
+        elif current_size + sentence_size > max_size:
+            chunks.append(''.join(current))
+            current = [sentence]
+            current_size = sentence_size
+
+        else:
+            current.append(sentence)
+            current_size += sentence_size
+
+    # إضافة آخر chunk
+    if current:
+        chunks.append(''.join(current))
+
+    return chunks
+
+
+def split_text_into_chunks(
+    text: str,
+    max_size: int,
+    size: Callable[[str], int] = len
+) -> List[str]:
+    """تقسيم النص لأجزاء عند نقاط مناسبة (نقاط ← جمل ← تجميع)"""
+    return pack_chunks(split_sentences(add_punctuation(text)), max_size, size)
+
+
+def split_for_tts(text: str, max_bytes: int = TTS_MAX_INPUT_BYTES) -> List[str]:
+    """أجزاء جاهزة لـ Google TTS، كل جزء <= max_bytes بترميز UTF-8"""
+    return split_text_into_chunks(text, max_bytes, size=utf8_len)
+
+
+def split_cacheable_sentences(text: str, max_bytes: int = TTS_MAX_INPUT_BYTES) -> List[str]:
+    """
+    تقسيم النص لجمل كاملة (نهاية بـ . ؟ ! أو سطر جديد) كوحدات لكاش الصوت
+
+    الفاصلة ما بتقسم (الجملة بتنقرأ كاملة بنغمة وحدة)،
+    والجملة الأكبر من max_bytes بتنقسم على الكلمات
+    """
+    units = []
+    space_size = 1
+
+    for match in _SENTENCE_RE.finditer(text):
+        sentence = _WHITESPACE_RE.sub(' ', match.group(0)).strip()
+        if not sentence or not any(c.isalnum() for c in sentence):
+            continue
+
+        if utf8_len(sentence) <= max_bytes:
+            units.append(sentence)
+            continue
+
+        piece: List[str] = []
+        piece_size = 0
+        for word in sentence.split():
+            word_size = utf8_len(word)
+            if piece and piece_size + space_size + word_size > max_bytes:
+                units.append(' '.join(piece))
+                piece = [word]
+                piece_size = word_size
+            else:
+                piece_size += word_size + (space_size if piece else 0)
+                piece.append(word)
+        if piece:
+            units.append(' '.join(piece))
+
+    return units
+
+
+def split_segment_sentences(text: str, max_bytes: int = TTS_MAX_INPUT_BYTES) -> List[str]:
+    """
+    جمل مقطع تقرير مثل ما بتطلع من split_cacheable_sentences على السكريبت الكامل
+
+    بالسكريبت المقطع دايماً بسطر لحاله بعد سطر تاني، فبعد add_punctuation
+    بيجي بعد ". " وعداد PUNCTUATION_INTERVAL بيبدأ من الفراغ؛ لحاله بيبدأ من
+    أول حرف فممكن تنحط النقطة بمكان تاني. فبنحطه بين سطرين وهميين ونشيل جملتيهم
+    """
+    wrapped = f"{_SEGMENT_EDGE}\n{text}\n{_SEGMENT_EDGE}"
+    return split_cacheable_sentences(add_punctuation(wrapped), max_bytes)[1:-1]
@@ -16,7 +16,6 @@ Usage:
 import re
 import time
 import json
-import requests
 import feedparser
 import warnings
 from enum import Enum
@@ -27,6 +26,8 @@ from urllib.parse import urlparse, urljoin
 from bs4 import BeautifulSoup
 from dateutil import parser as date_parser
 
+from app.utils.http_client import get_http_client
+
 # تجاهل تحذيرات SSL
 warnings.filterwarnings('ignore', message='Unverified HTTPS request')
 
@@ -410,7 +411,7 @@ class TelegramScraper:
         print(f"   🔗 Fetching: {web_url}")
         
         try:
-            response = requests.get(web_url, headers=self.headers, timeout=30)
+            response = get_http_client().get(web_url, headers=self.headers, timeout=30)
             response.raise_for_status()
         except Exception as e:
             return ScrapeResult(
@@ -951,7 +952,7 @@ class WebScraper:
     
     def _fetch_requests(self, url: str) -> Optional[str]:
         try:
-            response = requests.get(url, headers=self.headers, timeout=self.timeout, verify=False)
+            response = get_http_client().get(url, headers=self.headers, timeout=self.timeout, verify=False)
             response.raise_for_status()
             return response.text
         except:
@@ -1094,7 +1095,7 @@ class WebScraper:
     def _fetch_article(self, url: str, config: Dict) -> Optional[Dict]:
         """جلب محتوى مقال"""
         try:
-            response = requests.get(url, headers=self.headers, timeout=self.timeout, verify=False)
+            response = get_http_client().get(url, headers=self.headers, timeout=self.timeout, verify=False)
             response.raise_for_status()
             soup = BeautifulSoup(response.text, 'html.parser')
             
@@ -8,6 +8,7 @@ Pipeline:
 User Audio → S3 → STT → Refiner → Classifier → raw_news
 """
 
+import threading
 import psycopg2
 from datetime import datetime
 from typing import Dict, Optional
@@ -16,6 +17,7 @@ from fastapi import UploadFile
 # Import our services
 from app.utils.s3_uploader import S3Uploader
 from app.utils.audio_converter import AudioConverter
+from app.utils.media_transcode import TranscodeError, to_wav
 from app.services.generators.stt_service import STTService
 from app.services.processing.news_refiner import NewsRefiner
 from app.services.processing.classifier import classify_with_gemini
@@ -23,6 +25,13 @@ from app.services.processing.classifier import classify_with_gemini
 from settings import DB_CONFIG
 
 
+# نفس MAX_RETRIES بـ audio_transcription_job: نسخة فشلت كل محاولاتها ما بنرجعها كـ duplicate
+UPLOAD_MAX_RETRIES = 3
+
+_content_hash_ready = False
+_content_hash_lock = threading.Lock()
+
+
 class AudioInputProcessor:
     """
     معالج الصوت المدخل - ينسق كل الخدمات
@@ -85,6 +94,8 @@ class AudioInputProcessor:
             print(f"❌ Database connection failed: {e}")
             raise
         
+        self._ensure_content_hash_column()
+        
         print("=" * 60)
         print("✅ Audio Input Processor initialized successfully!")
         print("=" * 60 + "\n")
@@ -153,54 +164,20 @@ class AudioInputProcessor:
             if mime_type and self.audio_converter.needs_conversion(mime_type):
                 print(f"   🔄 Converting {mime_type} to WAV before upload...")
                 
-                # Save to temp file
-                import tempfile
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_file:
-                    temp_file.write(audio_bytes)
-                    temp_path = temp_file.name
-                
-                # Convert to WAV
+                # WAV بالذاكرة عبر ffmpeg pipes (بدون ملفات مؤقتة)
                 try:
-                    import subprocess
-                    wav_temp = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-                    wav_path = wav_temp.name
-                    wav_temp.close()
-                    
-                    cmd = [
-                        self.audio_converter.ffmpeg_path,
-                        '-i', temp_path,
-                        '-ar', '16000',        # 16kHz
-                        '-ac', '1',            # mono
-                        '-acodec', 'pcm_s16le',  # LINEAR16
-                        '-y',
-                        wav_path
-                    ]
-                    
-                    result = subprocess.run(cmd, capture_output=True, timeout=60)
+                    wav_content = to_wav(audio_bytes)
                     
-                    if result.returncode == 0:
-                        # Read converted WAV
-                        with open(wav_path, 'rb') as f:
-                            wav_content = f.read()
-                        
-                        # Update file object
-                        from io import BytesIO
-                        file.file = BytesIO(wav_content)
-                        file.filename = file.filename.rsplit('.', 1)[0] + '.wav'
-                        mime_type = 'audio/wav'
-                        file_size = len(wav_content)
-                        
-                        print(f"   ✅ Converted to WAV: {len(wav_content)} bytes")
-                    else:
-                        print(f"   ⚠️  Conversion failed, uploading original")
+                    # Update file object
+                    file.file = BytesIO(wav_content)
+                    file.filename = file.filename.rsplit('.', 1)[0] + '.wav'
+                    mime_type = 'audio/wav'
+                    file_size = len(wav_content)
                     
-                    # Cleanup
-                    import os
-                    os.unlink(temp_path)
-                    os.unlink(wav_path)
+                    print(f"   ✅ Converted to WAV: {len(wav_content)} bytes")
                     
-                except Exception as e:
-                    print(f"   ⚠️  Conversion error: {e}, uploading original")
+                except TranscodeError as e:
+                    print(f"   ⚠️  Conversion failed ({str(e)[-200:]}), uploading original")
             
             upload_result = self._upload_to_s3(file)
             
@@ -389,6 +366,88 @@ class AudioInputProcessor:
             }
 
     
+    def _ensure_content_hash_column(self):
+        """uploaded_files.content_hash (SHA-256 للملف) + index - مرة وحدة لكل عملية"""
+        global _content_hash_ready
+        
+        with _content_hash_lock:
+            if _content_hash_ready:
+                return
+            try:
+                # ALTER بياخد قفل على الجدول حتى لو العمود موجود، فبنفحص أول
+                self.cursor.execute("""
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name = 'uploaded_files' AND column_name = 'content_hash'
+                """)
+                if self.cursor.fetchone():
+                    self.conn.commit()
+                    _content_hash_ready = True
+                    return
+                
+                self.cursor.execute("""
+                    ALTER TABLE uploaded_files
+                    ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)
+                """)
+                self.cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_uploaded_files_content_hash
+                    ON uploaded_files (content_hash)
+                """)
+                self.conn.commit()
+                _content_hash_ready = True
+            except Exception as e:
+                print(f"⚠️  content_hash column setup failed: {e}")
+                self.conn.rollback()
+    
+    def find_duplicate_upload(self, content_hash: str, file_type: str) -> Optional[Dict]:
+        """
+        ملف مرفوع مسبقاً بنفس المحتوى (SHA-256)
+        
+        الأولوية: completed ← قيد المعالجة ← فاشل (أقدم أول)
+        
+        Returns:
+            {'id', 'file_path', 'stored_filename', 'processing_status',
+             'transcription', 'retry_exhausted'} أو None
+        """
+        if not content_hash:
+            return None
+        
+        try:
+            self.cursor.execute("""
+                SELECT id, file_path, stored_filename, processing_status,
+                       transcription, retry_count
+                FROM uploaded_files
+                WHERE content_hash = %s
+                AND file_type = %s
+                AND file_path IS NOT NULL AND file_path != ''
+                ORDER BY
+                    CASE processing_status
+                        WHEN 'completed' THEN 0
+                        WHEN 'processing' THEN 1
+                        WHEN 'pending' THEN 2
+                        ELSE 3
+                    END,
+                    created_at ASC
+                LIMIT 1
+            """, (content_hash, file_type))
+            
+            row = self.cursor.fetchone()
+            if not row:
+                return None
+            
+            return {
+                'id': row[0],
+                'file_path': row[1],
+                'stored_filename': row[2],
+                'processing_status': row[3],
+                'transcription': row[4],
+                'retry_exhausted': row[3] == 'failed' and (row[5] or 0) >= UPLOAD_MAX_RETRIES
+            }
+            
+        except Exception as e:
+            print(f"⚠️  Duplicate lookup failed: {e}")
+            self.conn.rollback()
+            return None
+    
     def _save_uploaded_file_metadata(
         self, 
         original_filename: str,
@@ -396,7 +455,8 @@ class AudioInputProcessor:
         file_path: str,
         file_size: int,
         file_type: str,
-        mime_type: str
+        mime_type: str,
+        content_hash: Optional[str] = None
     ) -> Optional[int]:
         """
         حفظ metadata في uploaded_files table
@@ -408,6 +468,7 @@ class AudioInputProcessor:
             file_size: حجم الملف بالـ bytes
             file_type: نوع الملف (audio)
             mime_type: نوع الـ MIME (audio/mpeg, audio/wav, etc.)
+            content_hash: SHA-256 للمحتوى (للـ dedup)
         
         Returns:
             uploaded_file_id (int) or None
@@ -426,9 +487,10 @@ class AudioInputProcessor:
                     processing_status,
                     retry_count,
                     metadata,
+                    content_hash,
                     created_at
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW())
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s, NOW())
                 RETURNING id
             """
             
@@ -441,7 +503,8 @@ class AudioInputProcessor:
                 mime_type,
                 'pending',
                 0,  # retry_count
-                json.dumps({})  # Convert dict to JSON string
+                json.dumps({}),  # Convert dict to JSON string
+                content_hash
             ))
             
             uploaded_file_id = self.cursor.fetchone()[0]
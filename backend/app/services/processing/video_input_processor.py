@@ -6,12 +6,11 @@
 """
 
 import os
-import tempfile
 from typing import Dict, Optional
 from fastapi import UploadFile
-from moviepy.editor import VideoFileClip
 from io import BytesIO
 from app.services.processing.audio_input_processor import AudioInputProcessor
+from app.utils.media_transcode import TranscodeError, extract_audio
 
 class VideoInputProcessor:
     def __init__(self):
@@ -35,13 +34,10 @@ class VideoInputProcessor:
             original_filename = file.filename
             mime_type = file.content_type or 'video/mp4'
             
-            # قراءة المحتوى بالكامل في الذاكرة لتجنب خطأ I/O بعد الرفع
+            # الحجم من الملف المؤقت نفسه (بدون قراءته للذاكرة)
+            file.file.seek(0, os.SEEK_END)
+            video_size = file.file.tell()
             file.file.seek(0)
-            video_bytes = file.file.read()
-            video_size = len(video_bytes)
-            
-            # إعادة بناء الـ Stream للرفع لـ S3
-            file.file = BytesIO(video_bytes)
 
             # --- 2. رفع الفيديو الأصلي لـ S3 ---
             print("\n📤 Step 1: Uploading Original Video to S3...")
@@ -68,9 +64,7 @@ class VideoInputProcessor:
 
             # --- 4. استخراج الصوت من الفيديو ---
             print("\n🎵 Step 3: Extracting audio for processing...")
-            # نستخدم نسخة الذاكرة (video_bytes) للاستخراج
-            temp_upload_file = UploadFile(filename=original_filename, file=BytesIO(video_bytes))
-            audio_upload_file = self._extract_audio_from_video(temp_upload_file)
+            audio_upload_file = self._extract_audio_from_video(file)
             
             if not audio_upload_file:
                 return {'success': False, 'error': 'فشل استخراج الصوت من الفيديو'}
@@ -121,47 +115,21 @@ class VideoInputProcessor:
             return {'success': False, 'error': str(e)}
 
     def _extract_audio_from_video(self, video_file: UploadFile) -> Optional[UploadFile]:
-        try:
-            video_file.file.seek(0)
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_video:
-                temp_video.write(video_file.file.read())
-                temp_video_path = temp_video.name
-
-            video_clip = VideoFileClip(temp_video_path)
-
-            if not video_clip.audio:
-                video_clip.close()
-                os.unlink(temp_video_path)
-                return None
+        """
+        صوت الفيديو كـ WAV (16kHz mono LINEAR16) عبر ffmpeg pipes
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
-                temp_audio_path = temp_audio.name
-                video_clip.audio.write_audiofile(
-                    temp_audio_path,
-                    codec="pcm_s16le",     # LINEAR16
-                    fps=16000,             # sample rate
-                    nbytes=2,
-                    ffmpeg_params=["-ac", "1"],  # mono
-                    logger=None
-                )
-
-            video_clip.close()
-            os.unlink(temp_video_path)
-
-            with open(temp_audio_path, 'rb') as f:
-                audio_content = f.read()
+        ملف الـ upload بيتمرر لـ ffmpeg مباشرة (بدون نسخة على القرص وبدون moviepy)
+        """
+        try:
+            audio_content = extract_audio(video_file.file)
 
-            audio_file = UploadFile(
+            return UploadFile(
                 filename=f"extracted_{os.path.splitext(video_file.filename)[0]}.wav",
                 file=BytesIO(audio_content)
             )
 
-            os.unlink(temp_audio_path)
-            return audio_file
-
-        except Exception as e:
-            print(f"❌ Extraction Error: {e}")
+        except TranscodeError as e:
+            print(f"❌ Extraction Error: {str(e)[-300:]}")
             return None
 
     def close(self):
@@ -5,19 +5,21 @@
 قاعدة مشتركة لكل منصات السوشال ميديا
 
 هذا الكلاس يوفر:
-- جلب المحتوى من الـ API
-- جلب الصور (Generated / Original)
-- جلب التقرير الكامل
+- جلب المحتوى والصور والتقرير الكامل (PublishDataProvider: استعلام واحد، أو الـ API)
 - تنسيق الهاشتاجات
 """
 
 import re
-import json
-import requests
 from io import BytesIO
 from typing import Dict, Optional, Tuple
 from abc import ABC, abstractmethod
 
+from app.services.publishers.publish_data import PublishData, PublishDataProvider
+from app.utils.media_cache import fetch_bytes
+
+
+IMAGE_REQUEST_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
 
 class BaseSocialPublisher(ABC):
     """
@@ -26,56 +28,50 @@ class BaseSocialPublisher(ABC):
     كل platform يرث من هذا الكلاس ويعمل override للـ publish method
     """
     
-    def __init__(self, api_base_url: str):
+    def __init__(self, api_base_url: str, conn=None):
         """
         Args:
-            api_base_url: Base URL للـ API (مثلاً: http://localhost:8000)
+            api_base_url: Base URL للـ API (مثلاً: http://localhost:8000) - backend بديل
+            conn: اتصال DB (None = اتصال جديد لكل تحميل)
         """
         self.api_base_url = api_base_url.rstrip('/')
+        self.publish_data = PublishDataProvider(conn=conn, api_base_url=self.api_base_url)
+        self._publish_data_cache: Optional[PublishData] = None
     
     # ==========================================
     # 📊 Data Fetching Methods (مشتركة)
     # ==========================================
     
+    def get_publish_data(self, report_id: int, refresh: bool = False) -> Optional[PublishData]:
+        """كل بيانات التقرير (استعلام واحد، محفوظة لباقي خطوات نفس النشر)"""
+        cached = self._publish_data_cache
+        if refresh or cached is None or cached.report_id != report_id:
+            self._publish_data_cache = cached = self.publish_data.load(report_id)
+        return cached
+    
     def get_social_content(self, report_id: int, platform: str) -> Optional[Dict]:
         """
-        جلب محتوى السوشال ميديا من الـ API
+        جلب محتوى السوشال ميديا
         
         Args:
             report_id: ID التقرير
             platform: 'facebook', 'instagram', 'twitter', etc.
         
         Returns:
-            {'title': '...', 'content': '...', 'hashtags': '...'}
+            {'title': '...', 'content': '...', 'raw': {...}}
         """
-        try:
-            url = f"{self.api_base_url}/api/v1/social-media/by-report/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                print(f"❌ Failed to get social content: {response.status_code}")
-                return None
-            
-            data = response.json()
-            content_json = data.get('content', '{}')
-            
-            # Parse JSON
-            social_posts = json.loads(content_json)
-            platform_data = social_posts.get(platform, {})
-            
-            if not platform_data:
-                print(f"⚠️  No {platform} content found")
-                return None
-            
-            return {
-                'title': platform_data.get('title', ''),
-                'content': platform_data.get('content', ''),
-                'raw': platform_data  # للاحتياط
-            }
+        data = self.get_publish_data(report_id)
+        platform_data = data.platform_content(platform) if data else None
         
-        except Exception as e:
-            print(f"❌ Error getting social content: {e}")
+        if platform_data is None:
+            print(f"❌ Failed to get social content for report {report_id}")
+            return None
+        
+        if not platform_data['raw']:
+            print(f"⚠️  No {platform} content found")
             return None
+        
+        return platform_data
     
     def get_image(self, report_id: int, prefer_generated: bool = True) -> Optional[BytesIO]:
         """
@@ -103,78 +99,27 @@ class BaseSocialPublisher(ABC):
         print("❌ No image found (neither generated nor original)")
         return None
     
-    def _get_generated_image(self, report_id: int) -> Optional[BytesIO]:
-        """جلب الصورة المولدة من الـ AI"""
-        try:
-            url = f"{self.api_base_url}/api/v1/images/by-report/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            image_url = data.get('file_url')
-            
-            if not image_url:
-                return None
-            
-            # Download image
-            img_response = requests.get(
-                image_url,
-                headers={'User-Agent': 'Mozilla/5.0'},
-                stream=True,
-                timeout=15
-            )
-            
-            if img_response.status_code == 200:
-                print("✅ Using Generated Image")
-                return BytesIO(img_response.content)
-            
+    def _download_image(self, image_url: Optional[str], label: str) -> Optional[BytesIO]:
+        if not image_url:
             return None
-        
+        try:
+            # Download image (shared media cache)
+            image_bytes = fetch_bytes(image_url, headers=IMAGE_REQUEST_HEADERS, timeout=15)
+            print(f"✅ Using {label} Image")
+            return BytesIO(image_bytes)
         except Exception as e:
-            print(f"⚠️  Generated image failed: {e}")
+            print(f"⚠️  {label} image failed: {e}")
             return None
     
+    def _get_generated_image(self, report_id: int) -> Optional[BytesIO]:
+        """جلب الصورة المولدة من الـ AI"""
+        data = self.get_publish_data(report_id)
+        return self._download_image(data.generated_image_url if data else None, 'Generated')
+    
     def _get_original_image(self, report_id: int) -> Optional[BytesIO]:
         """جلب الصورة الأصلية من الأخبار"""
-        try:
-            url = f"{self.api_base_url}/api/v1/reports/reports/{report_id}/raw-news-images"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            
-            # افترض أن الـ API يرجع list من الصور
-            if isinstance(data, list) and len(data) > 0:
-                image_url = data[0].get('url') or data[0].get('image_url')
-            elif isinstance(data, dict):
-                image_url = data.get('url') or data.get('image_url')
-            else:
-                return None
-            
-            if not image_url:
-                return None
-            
-            # Download image
-            img_response = requests.get(
-                image_url,
-                headers={'User-Agent': 'Mozilla/5.0'},
-                stream=True,
-                timeout=15
-            )
-            
-            if img_response.status_code == 200:
-                print("✅ Using Original Image")
-                return BytesIO(img_response.content)
-            
-            return None
-        
-        except Exception as e:
-            print(f"⚠️  Original image failed: {e}")
-            return None
+        data = self.get_publish_data(report_id)
+        return self._download_image(data.original_image_url if data else None, 'Original')
     
     def get_full_report(self, report_id: int) -> Optional[str]:
         """
@@ -183,33 +128,14 @@ class BaseSocialPublisher(ABC):
         Returns:
             النص الكامل للتقرير
         """
-        try:
-            url = f"{self.api_base_url}/api/v1/reports/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                print(f"❌ Failed to get report: {response.status_code}")
-                return None
-            
-            data = response.json()
-            
-            # افترض أن الـ API يرجع object فيه title و content
-            title = data.get('title', '')
-            content = data.get('content', '') or data.get('body', '')
-            
-            if title and content:
-                return f"{title}\n\n{content}"
-            elif content:
-                return content
-            elif title:
-                return title
-            
-            print("⚠️  Report has no content")
+        data = self.get_publish_data(report_id)
+        if not data:
+            print(f"❌ Failed to get report {report_id}")
             return None
         
-        except Exception as e:
-            print(f"❌ Error getting report: {e}")
-            return None
+        if not data.full_report:
+            print("⚠️  Report has no content")
+        return data.full_report
     
     # ==========================================
     # 🎨 Formatting Methods (مشتركة)
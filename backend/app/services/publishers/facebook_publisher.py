@@ -7,6 +7,7 @@
 Features:
 - نشر Posts (صورة + caption + hashtags + comment)
 - نشر Videos/Reels (فيديو + caption + hashtags)
+- الـ caption والهاشتاجات جاهزة مسبقاً (publish_captions) - بدون Gemini وقت النشر
 
 Priority:
 1. Facebook Template (h-GAZA/DOT from content_type_id=9)
@@ -14,15 +15,17 @@ Priority:
 3. Generated Image
 """
 
-import re
-import json
-import time
 import requests
 from io import BytesIO
 from typing import Dict, Optional
-import google.generativeai as genai
 import psycopg2
 
+from app.services.publishers.publish_captions import ready_caption
+from app.services.publishers.publish_data import PublishData, PublishDataProvider
+from app.services.publishers.publish_limits import get_publish_limits
+from app.utils.http_client import get_http_client
+from app.utils.media_cache import fetch_bytes
+
 
 class FacebookPublisher:
     
@@ -36,8 +39,7 @@ class FacebookPublisher:
         fb_gaza_page_id: str = None,
         fb_dot_access_token: str = None,
         fb_dot_page_id: str = None,
-        api_base_url: str = None,
-        gemini_api_key: str = None
+        api_base_url: str = None
     ):
         import os
         
@@ -50,18 +52,9 @@ class FacebookPublisher:
         self.FB_DOT_PAGE_ID = fb_dot_page_id or os.getenv('FB_DOT_PAGE_ID') or ""
         
         self.API_BASE_URL = (api_base_url or os.getenv('API_BASE_URL') or "http://localhost:8000").rstrip('/')
-        self.GEMINI_API_KEY = gemini_api_key or os.getenv('GEMINI_API_KEY')
         
         self.FB_COMMENT_MAX = 8000
         
-        # Gemini
-        if self.GEMINI_API_KEY:
-            genai.configure(api_key=self.GEMINI_API_KEY)
-            self.gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            print("✅ Gemini initialized")
-        else:
-            self.gemini_model = None
-        
         # Database
         try:
             try:
@@ -83,6 +76,17 @@ class FacebookPublisher:
             print(f"⚠️  Database error: {e}")
             self.conn = None
             self.cursor = None
+        
+        # بيانات النشر (تقرير + محتوى + صور + templates + ريل) باستعلام واحد
+        self.publish_data = PublishDataProvider(conn=self.conn, api_base_url=self.API_BASE_URL)
+        self.http = get_http_client()
+        self._publish_data_cache: Optional[PublishData] = None
+        
+        # token bucket لكل صفحة (بدل sleep ثابت بين الصفحات والبوست والفيديو)
+        self.limits = get_publish_limits()
+        self.limits.register_page('facebook', 'h-GAZA', self.FB_GAZA_PAGE_ID)
+        if self.FB_DOT_PAGE_ID:
+            self.limits.register_page('facebook', 'DOT', self.FB_DOT_PAGE_ID)
     
     def publish(self, report_id: int, content_type: str = 'both') -> Dict:
         """
@@ -108,6 +112,7 @@ class FacebookPublisher:
         print(f"{'='*70}\n")
         
         self._update_report_status(report_id, 'publishing')
+        self._get_publish_data(report_id, refresh=True)
         
         # 1. Get templates
         print("1️⃣ Getting Facebook templates...")
@@ -123,7 +128,7 @@ class FacebookPublisher:
         
         # 3. Format caption
         print("3️⃣ Formatting caption...")
-        caption = self._format_caption(fb_content['title'], fb_content['content'])
+        caption = self._format_caption(fb_content)
         
         # 4. Get full report
         print("4️⃣ Getting full report...")
@@ -199,6 +204,7 @@ class FacebookPublisher:
         print(f"{'='*70}\n")
         
         self._update_report_status(report_id, 'publishing')
+        self._get_publish_data(report_id, refresh=True)
         
         # 1. Get reel content
         print("1️⃣ Getting reel content...")
@@ -224,7 +230,7 @@ class FacebookPublisher:
         
         # 4. Format caption
         print("3️⃣ Formatting caption...")
-        caption = self._format_video_caption(fb_content['title'], fb_content['content'])
+        caption = self._format_video_caption(fb_content)
         
         # 5. Publish to pages
         results = []
@@ -250,12 +256,6 @@ class FacebookPublisher:
             print(f"📤 Publishing video to DOT...")
             print(f"{'─'*70}")
             
-            # Add delay before DOT to avoid rate limiting
-            if results:  # إذا نشرنا على h-GAZA بالفعل
-                delay_seconds = 5
-                print(f"   ⏳ Waiting {delay_seconds} seconds (rate limit protection)...")
-                time.sleep(delay_seconds)
-            
             result = self._publish_video_to_page(
                 self.FB_DOT_PAGE_ID,
                 self.FB_DOT_ACCESS_TOKEN,
@@ -305,10 +305,7 @@ class FacebookPublisher:
         else:
             print(f"✅ Post published\n")
         
-        # Longer delay between post and video to avoid rate limiting
-        delay_seconds = 10  # زيادة من 3 إلى 10 ثواني
-        print(f"⏳ Waiting {delay_seconds} seconds before video upload (rate limit protection)...")
-        time.sleep(delay_seconds)
+        # الفاصل بين البوست والفيديو على نفس الصفحة من الـ page bucket (_publish_video_to_page)
         
         # 2. Publish Video - DISABLED
         # print("🔹 Publishing Video...")
@@ -338,30 +335,17 @@ class FacebookPublisher:
         
         return results
     
+    def _get_publish_data(self, report_id: int, refresh: bool = False) -> Optional[PublishData]:
+        """كل بيانات التقرير (استعلام واحد، محفوظة لباقي خطوات نفس النشر)"""
+        cached = self._publish_data_cache
+        if refresh or cached is None or cached.report_id != report_id:
+            self._publish_data_cache = cached = self.publish_data.load(report_id)
+        return cached
+    
     def _get_facebook_templates(self, report_id: int) -> Dict[str, str]:
         """Get templates from content_type_id=9"""
-        try:
-            if not self.cursor:
-                return {}
-            
-            sql = "SELECT content FROM generated_content WHERE report_id=%s AND content_type_id=9 LIMIT 1"
-            self.cursor.execute(sql, (report_id,))
-            result = self.cursor.fetchone()
-            
-            if not result or not result[0]:
-                return {}
-            
-            content_json = json.loads(result[0]) if isinstance(result[0], str) else result[0]
-            
-            templates = {}
-            if 'h-GAZA' in content_json and content_json['h-GAZA']:
-                templates['h-GAZA'] = content_json['h-GAZA']
-            if 'DOT' in content_json and content_json['DOT']:
-                templates['DOT'] = content_json['DOT']
-            
-            return templates
-        except:
-            return {}
+        data = self._get_publish_data(report_id)
+        return dict(data.templates) if data else {}
     
     def _get_image_for_page(self, report_id: int, page_key: str, template_url: str = None) -> Optional[BytesIO]:
         """
@@ -373,10 +357,9 @@ class FacebookPublisher:
         if template_url:
             print(f"   🎯 Using {page_key} template")
             try:
-                response = requests.get(template_url, timeout=15)
-                if response.status_code == 200:
-                    print(f"   ✅ Template image loaded")
-                    return BytesIO(response.content)
+                image_bytes = fetch_bytes(template_url, timeout=15)
+                print(f"   ✅ Template image loaded")
+                return BytesIO(image_bytes)
             except:
                 pass
         
@@ -396,50 +379,28 @@ class FacebookPublisher:
     
     def _get_original_image(self, report_id: int) -> Optional[BytesIO]:
         """Get original image"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/reports/reports/{report_id}/raw-news-images"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            
-            if isinstance(data, list) and len(data) > 0:
-                image_url = data[0].get('url') or data[0].get('image_url')
-            elif isinstance(data, dict):
-                image_url = data.get('url') or data.get('image_url')
-            else:
-                return None
-            
-            if image_url:
-                img_response = requests.get(image_url, timeout=15)
-                if img_response.status_code == 200:
-                    print("   ✅ Using Original Image")
-                    return BytesIO(img_response.content)
-        except:
-            pass
+        data = self._get_publish_data(report_id)
+        image_url = data.original_image_url if data else None
+        if image_url:
+            try:
+                image_bytes = fetch_bytes(image_url, timeout=15)
+                print("   ✅ Using Original Image")
+                return BytesIO(image_bytes)
+            except:
+                pass
         return None
     
     def _get_generated_image(self, report_id: int) -> Optional[BytesIO]:
         """Get generated image"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/images/by-report/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            image_url = data.get('file_url')
-            
-            if image_url:
-                img_response = requests.get(image_url, timeout=15)
-                if img_response.status_code == 200:
-                    print("   ✅ Using Generated Image")
-                    return BytesIO(img_response.content)
-        except:
-            pass
+        data = self._get_publish_data(report_id)
+        image_url = data.generated_image_url if data else None
+        if image_url:
+            try:
+                image_bytes = fetch_bytes(image_url, timeout=15)
+                print("   ✅ Using Generated Image")
+                return BytesIO(image_bytes)
+            except:
+                pass
         return None
     
     def _publish_to_page(self, page_id: str, access_token: str, page_name: str, 
@@ -456,7 +417,8 @@ class FacebookPublisher:
         files = {'source': ('news.jpg', image, 'image/jpeg')}
         
         try:
-            response = requests.post(url, data=payload, files=files, timeout=30)
+            self.limits.acquire('facebook', page_name)
+            response = self.http.post(url, data=payload, files=files)
             result = response.json()
             
             if 'id' in result:
@@ -499,7 +461,8 @@ class FacebookPublisher:
             print(f"   🔄 Uploading video from URL...")
             print(f"   📎 Video URL: {video_url[:80]}...")
             
-            response = requests.post(url, data=payload, timeout=120)
+            self.limits.acquire('facebook', page_name)
+            response = self.http.post(url, data=payload, timeout=(10, 120))
             result = response.json()
             
             if 'id' in result:
@@ -516,7 +479,8 @@ class FacebookPublisher:
                 if error_code == 368 and retry_count < 2:
                     retry_delay = 30 * (retry_count + 1)  # 30s, 60s
                     print(f"   ⚠️  Rate limit hit. Retrying in {retry_delay} seconds... (attempt {retry_count + 1}/2)")
-                    time.sleep(retry_delay)
+                    # الصفحة كلها بتوقف (مش بس هالطلب)، والمحاولة الجاية بتستنى الـ bucket
+                    self.limits.pause('facebook', page_name, retry_delay, reason='(368)')
                     return self._publish_video_to_page(page_id, access_token, page_name, caption, video_url, retry_count + 1)
                 
                 print(f"   ❌ Upload error ({error_code}): {error_message}")
@@ -530,137 +494,25 @@ class FacebookPublisher:
             return {'success': False, 'message': str(e)}
     
     def _get_facebook_content(self, report_id: int) -> Optional[Dict]:
-        """Get Facebook content"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/social-media/by-report/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            content_json = data.get('content', '{}')
-            social_posts = json.loads(content_json)
-            fb_data = social_posts.get('facebook', {})
-            
-            return {'title': fb_data.get('title', ''), 'content': fb_data.get('content', '')}
-        except:
-            return None
+        """Facebook caption parts {'title', 'body', 'hashtags'} (precomputed, no Gemini here)"""
+        data = self._get_publish_data(report_id)
+        return ready_caption(data, 'facebook') if data else None
     
     def _get_reel_content(self, report_id: int) -> Optional[Dict]:
-        """جلب محتوى Reel/Video"""
-        
-        # Try Method 1: Direct query by report
-        print(f"   🔍 Method 1: Querying report {report_id} directly...")
-        reel = self._get_reel_from_report(report_id)
-        if reel:
-            return reel
-        
-        # Try Method 2: Query generated_content table directly
-        print(f"   🔍 Method 2: Querying generated_content...")
-        reel = self._get_reel_from_db(report_id)
-        if reel:
-            return reel
+        """جلب محتوى Reel/Video (content_type_id=8)"""
+        data = self._get_publish_data(report_id)
+        if data and data.reel:
+            print(f"   ✅ Found reel!")
+            return data.reel
         
         print(f"   ❌ No reel found for report {report_id}")
         return None
     
-    def _get_reel_from_report(self, report_id: int) -> Optional[Dict]:
-        """جلب reel من report endpoint"""
-        try:
-            # Query single report
-            url = f"{self.API_BASE_URL}/api/v1/reports/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            report = response.json()
-            
-            # Now get its generated content
-            url = f"{self.API_BASE_URL}/api/v1/reports/{report_id}/generated-content"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            content_items = response.json()
-            
-            # Find reel (content_type_id = 8)
-            for item in content_items:
-                if item.get('content_type_id') == self.FACEBOOK_REEL_CONTENT_ID:
-                    content_str = item.get('content', '{}')
-                    try:
-                        content_json = json.loads(content_str) if isinstance(content_str, str) else content_str
-                    except:
-                        content_json = {}
-                    
-                    print(f"   ✅ Found reel!")
-                    return {
-                        'report_id': report_id,
-                        'video_url': item.get('file_url'),
-                        'title': item.get('title', ''),
-                        'description': item.get('description', ''),
-                        'content': content_json
-                    }
-            
-            return None
-            
-        except Exception as e:
-            print(f"   ⚠️  Method 1 error: {e}")
-            return None
-    
-    def _get_reel_from_db(self, report_id: int) -> Optional[Dict]:
-        """جلب reel من database مباشرة (fallback)"""
-        
-        if not self.cursor:
-            return None
-        
-        try:
-            sql = """
-                SELECT id, title, description, content, file_url
-                FROM generated_content
-                WHERE report_id = %s 
-                AND content_type_id = %s
-                LIMIT 1
-            """
-            
-            self.cursor.execute(sql, (report_id, self.FACEBOOK_REEL_CONTENT_ID))
-            result = self.cursor.fetchone()
-            
-            if not result:
-                return None
-            
-            content_str = result[3] or '{}'
-            try:
-                content_json = json.loads(content_str) if isinstance(content_str, str) else content_str
-            except:
-                content_json = {}
-            
-            print(f"   ✅ Found reel in database!")
-            return {
-                'report_id': report_id,
-                'video_url': result[4],
-                'title': result[1] or '',
-                'description': result[2] or '',
-                'content': content_json
-            }
-            
-        except Exception as e:
-            print(f"   ⚠️  Method 2 error: {e}")
-            return None
-    
-    def _format_caption(self, title: str, content: str) -> str:
+    def _format_caption(self, fb_content: Dict) -> str:
         """Format caption for photo post"""
-        hashtag_start = content.find('#')
-        
-        if hashtag_start != -1:
-            main_content = content[:hashtag_start].strip()
-            hashtags = content[hashtag_start:].strip()
-            hashtags = self._format_hashtags(hashtags)
-        else:
-            main_content = content.strip()
-            hashtags = ''
+        title = fb_content['title']
+        main_content = fb_content['body']
+        hashtags = fb_content['hashtags']
         
         result = []
         if title:
@@ -673,17 +525,11 @@ class FacebookPublisher:
         
         return '\n\n'.join(result)
     
-    def _format_video_caption(self, title: str, content: str) -> str:
+    def _format_video_caption(self, fb_content: Dict) -> str:
         """Format caption for video post"""
-        hashtag_start = content.find('#')
-        
-        if hashtag_start != -1:
-            main_content = content[:hashtag_start].strip()
-            hashtags = content[hashtag_start:].strip()
-            hashtags = self._format_hashtags(hashtags)
-        else:
-            main_content = content.strip()
-            hashtags = ''
+        title = fb_content['title']
+        main_content = fb_content['body']
+        hashtags = fb_content['hashtags']
         
         result = []
         if title:
@@ -697,60 +543,10 @@ class FacebookPublisher:
         
         return '\n\n'.join(result)
     
-    def _format_hashtags(self, text: str) -> str:
-        """Format hashtags with Gemini"""
-        hashtags = re.findall(r'#[\w\u0600-\u06FF_]+', text)
-        
-        if not hashtags or not self.gemini_model:
-            return text
-        
-        try:
-            corrected = self._correct_hashtags_with_gemini(hashtags)
-            result = text
-            for old, new in zip(hashtags, corrected):
-                if old != new:
-                    result = result.replace(old, new, 1)
-            return result
-        except:
-            return text
-    
-    def _correct_hashtags_with_gemini(self, hashtags: list) -> list:
-        """Correct hashtags with Gemini"""
-        hashtags_str = '\n'.join(hashtags)
-        
-        prompt = f"""افصل الكلمات الملتصقة بـ _
-
-مثال:
-#قواتحفظالسلام → #قوات_حفظ_السلام
-
-الهاشتاجات:
-{hashtags_str}
-
-النتيجة:"""
-        
-        response = self.gemini_model.generate_content(prompt)
-        corrected_text = response.text.strip()
-        
-        corrected = [line.strip() for line in corrected_text.split('\n') if line.strip().startswith('#')]
-        
-        return corrected if len(corrected) == len(hashtags) else hashtags
-    
     def _get_full_report(self, report_id: int) -> Optional[str]:
         """Get full report"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/reports/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            title = data.get('title', '')
-            content = data.get('content', '') or data.get('body', '')
-            
-            return f"{title}\n\n{content}" if title and content else (content or title)
-        except:
-            return None
+        data = self._get_publish_data(report_id)
+        return data.full_report if data else None
     
     def _prepare_comment(self, full_report: str) -> str:
         """Prepare comment"""
@@ -773,7 +569,7 @@ class FacebookPublisher:
         payload = {'message': text, 'access_token': access_token}
         
         try:
-            response = requests.post(url, data=payload, timeout=15)
+            response = self.http.post(url, data=payload)
             result = response.json()
             
             if 'id' in result:
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+⏳ Instagram Container Poller
+متابعة containers الانستغرام (ريلز) لحد ما تجهز ونشرها، بشكل async لعدة containers سوا
+
+قبل: _wait_for_container_ready بيوقف الـ thread لحد 120 ثانية لكل ريل (فحص كل 8 ثواني)،
+فنشر N ريلز = N انتظارات ورا بعض، وإذا وقف الـ worker بالنص الـ container بيضيع
+هلأ:
+- الـ publisher بينشئ الـ container وبيسجله بجدول instagram_containers وبيكمل
+- الـ poller بيفحص كل الـ containers المستحقة بطلب Graph واحد (?ids=a,b,c)
+- فترة الفحص adaptive: بتبدأ قصيرة (IG_CONTAINER_POLL_MIN) وبتكبر لحد IG_CONTAINER_POLL_MAX
+- أول ما يصير FINISHED بينشر (_publish_container) بـ task لحاله، بدون ما يستنى الباقي
+- الحالة محفوظة بالـ DB: بعد restart الـ drain الجاي بيكمل من وين وقف
+  (container بحالة publishing من قبل الـ restart بينفحص: PUBLISHED = خلص، FINISHED = بينشر)
+
+الحالات (state): pending → publishing → published | failed
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.services.publishers.publish_limits import GRAPH_RATE_LIMIT_CODES
+
+
+IG_ASYNC_CONTAINERS = os.getenv('IG_ASYNC_CONTAINERS', 'true').lower() == 'true'  # الريل بيرجع بدون انتظار
+IG_CONTAINER_POLL_MIN = float(os.getenv('IG_CONTAINER_POLL_MIN', 5))        # أول فحص بعد (ثواني)
+IG_CONTAINER_POLL_MAX = float(os.getenv('IG_CONTAINER_POLL_MAX', 60))
+IG_CONTAINER_POLL_BACKOFF = float(os.getenv('IG_CONTAINER_POLL_BACKOFF', 1.5))
+IG_CONTAINER_MAX_AGE = int(os.getenv('IG_CONTAINER_MAX_AGE', 3600))          # بعدها الـ container بيفشل
+IG_CONTAINER_DRAIN_TIMEOUT = float(os.getenv('IG_CONTAINER_DRAIN_TIMEOUT', 300))  # أقصى انتظار بدورة الـ job
+IG_CONTAINER_PUBLISH_ATTEMPTS = 3
+
+# حد Graph لعدد الـ ids بطلب واحد
+GRAPH_IDS_PER_REQUEST = 50
+
+# container بحالة publishing أقدم من هيك = الـ worker وقف بالنص
+STALE_PUBLISHING_SECONDS = 600
+
+
+def ensure_containers_table(cursor):
+    """جدول الـ containers المعلقة (الـ commit على المستدعي)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS instagram_containers (
+            container_id VARCHAR(64) PRIMARY KEY,
+            report_id INTEGER NOT NULL,
+            ig_user_id VARCHAR(64) NOT NULL,
+            media_kind VARCHAR(20) NOT NULL DEFAULT 'reel',
+            state VARCHAR(20) NOT NULL DEFAULT 'pending',
+            status_code VARCHAR(30),
+            checks INTEGER DEFAULT 0,
+            publish_attempts INTEGER DEFAULT 0,
+            media_id VARCHAR(64),
+            error TEXT,
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_instagram_containers_state
+        ON instagram_containers (ig_user_id, state)
+    """)
+
+
+@dataclass
+class PendingContainer:
+    container_id: str
+    report_id: int
+    media_kind: str
+    age: float                  # ثواني من الإنشاء (وقت التحميل)
+    interval: float = IG_CONTAINER_POLL_MIN
+    next_check: float = 0.0     # time.monotonic()
+    checks: int = 0
+    publish_attempts: int = 0
+    loaded_at: float = 0.0
+
+    @property
+    def expired(self) -> bool:
+        return self.age + (time.monotonic() - self.loaded_at) > IG_CONTAINER_MAX_AGE
+
+
+class InstagramContainerPoller:
+    """
+    متابعة ونشر containers حساب انستغرام واحد
+
+    الـ DB بتنستعمل من thread الـ event loop بس (اتصال الـ publisher)،
+    وطلبات Graph (فحص + نشر) بتروح على threads عبر asyncio.to_thread
+    """
+
+    def __init__(self, publisher):
+        """
+        Args:
+            publisher: InstagramPublisher (الـ token، الحساب، الاتصال، وتحديث حالة التقرير)
+        """
+        self.publisher = publisher
+        self.conn = publisher.conn
+        self.cursor = publisher.cursor
+        self._pending: Dict[str, PendingContainer] = {}
+        self._outcomes: Dict[str, Dict] = {}
+
+        ensure_containers_table(self.cursor)
+        self.conn.commit()
+
+    # ============================================
+    # Persistence
+    # ============================================
+
+    def track(self, container_id: str, report_id: int, media_kind: str = 'reel'):
+        """تسجيل container جديد (بينشر لاحقاً بـ drain)"""
+        self.cursor.execute("""
+            INSERT INTO instagram_containers (container_id, report_id, ig_user_id, media_kind)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (container_id) DO NOTHING
+        """, (container_id, report_id, self.publisher.IG_USER_ID, media_kind))
+        self.conn.commit()
+        print(f"   📌 Container {container_id} queued for report #{report_id}")
+
+    def _load(self, container_ids: Optional[Iterable[str]] = None):
+        """الـ containers النشطة من الـ DB (ومنها اللي علقت بـ publishing قبل restart)"""
+        self.cursor.execute("""
+            UPDATE instagram_containers
+            SET state = 'pending', updated_at = NOW()
+            WHERE ig_user_id = %s AND state = 'publishing'
+              AND updated_at < NOW() - INTERVAL '%s seconds'
+        """, (self.publisher.IG_USER_ID, STALE_PUBLISHING_SECONDS))
+
+        sql = """
+            SELECT container_id, report_id, media_kind, checks, publish_attempts,
+                   EXTRACT(EPOCH FROM NOW() - created_at)
+            FROM instagram_containers
+            WHERE ig_user_id = %s AND state = 'pending'
+        """
+        params: List = [self.publisher.IG_USER_ID]
+        if container_ids is not None:
+            sql += " AND container_id = ANY(%s)"
+            params.append(list(container_ids))
+        self.cursor.execute(sql, params)
+        rows = self.cursor.fetchall()
+        self.conn.commit()
+
+        now = time.monotonic()
+        self._pending = {}
+        for container_id, report_id, media_kind, checks, publish_attempts, age in rows:
+            # container قديم (من قبل restart) بينفحص فوراً؛ الجديد بعد IG_CONTAINER_POLL_MIN
+            fresh = not checks and float(age or 0) < IG_CONTAINER_POLL_MIN
+            self._pending[container_id] = PendingContainer(
+                container_id=container_id,
+                report_id=report_id,
+                media_kind=media_kind,
+                age=float(age or 0),
+                next_check=now + (IG_CONTAINER_POLL_MIN - float(age or 0) if fresh else 0),
+                checks=checks or 0,
+                publish_attempts=publish_attempts or 0,
+                loaded_at=now
+            )
+
+    def _save(self, container: PendingContainer, state: str = 'pending', status_code: str = None,
+              media_id: str = None, error: str = None):
+        self.cursor.execute("""
+            UPDATE instagram_containers
+            SET state = %s, status_code = COALESCE(%s, status_code), checks = %s,
+                publish_attempts = %s, media_id = COALESCE(%s, media_id), error = %s, updated_at = NOW()
+            WHERE container_id = %s
+        """, (state, status_code, container.checks, container.publish_attempts, media_id, error,
+              container.container_id))
+        self.conn.commit()
+
+    def _claim(self, container: PendingContainer) -> bool:
+        """pending → publishing (ذري: worker تاني ما بينشر نفس الـ container)"""
+        self.cursor.execute("""
+            UPDATE instagram_containers SET state = 'publishing', updated_at = NOW()
+            WHERE container_id = %s AND state = 'pending'
+        """, (container.container_id,))
+        claimed = self.cursor.rowcount == 1
+        self.conn.commit()
+        return claimed
+
+    # ============================================
+    # Graph API
+    # ============================================
+
+    def _fetch_statuses(self, container_ids: List[str]) -> Dict[str, Dict]:
+        """
+        status_code لعدة containers بطلب واحد
+
+        Returns:
+            {container_id: {'status_code': ..., 'status': ...} أو {'error': {...}}}
+        """
+        statuses = {}
+        for i in range(0, len(container_ids), GRAPH_IDS_PER_REQUEST):
+            batch = container_ids[i:i + GRAPH_IDS_PER_REQUEST]
+            try:
+                response = self.publisher.http.get("https://graph.facebook.com/v18.0/", params={
+                    'ids': ','.join(batch),
+                    'fields': 'status_code,status',
+                    'access_token': self.publisher.FB_ACCESS_TOKEN
+                })
+                result = response.json()
+            except Exception as e:
+                result = {'error': {'message': str(e)}}
+
+            if 'error' not in result:
+                statuses.update(result)
+            elif len(batch) > 1:
+                # id واحد غلط بيفشل كل الطلب → كل واحد لحاله
+                for container_id in batch:
+                    statuses.update(self._fetch_statuses([container_id]))
+            else:
+                statuses[batch[0]] = result
+        return statuses
+
+    # ============================================
+    # Polling
+    # ============================================
+
+    def _reschedule(self, container: PendingContainer, slow: bool = False):
+        """فترة الفحص الجاية (بتكبر مع كل فحص، وبتصير الحد الأعلى مع rate limit)"""
+        if slow:
+            container.interval = IG_CONTAINER_POLL_MAX
+        else:
+            container.interval = min(IG_CONTAINER_POLL_MAX, container.interval * IG_CONTAINER_POLL_BACKOFF)
+        container.next_check = time.monotonic() + container.interval
+
+    def _apply_status(self, container: PendingContainer, result: Optional[Dict], publishing: Set[asyncio.Task]):
+        container.checks += 1
+        result = result or {}
+        status_code = result.get('status_code')
+        error = result.get('error')
+
+        if status_code == 'FINISHED':
+            print(f"   ✅ Container {container.container_id} FINISHED after {container.checks} checks")
+            del self._pending[container.container_id]
+            publishing.add(asyncio.create_task(self._publish(container)))
+        elif status_code == 'PUBLISHED':
+            # انتشر قبل restart
+            self._finish(container, 'published', status_code=status_code)
+        elif status_code in ('ERROR', 'EXPIRED'):
+            self._finish(container, 'failed', status_code=status_code,
+                         error=result.get('status') or f'Container {status_code}')
+        elif container.expired:
+            self._finish(container, 'failed', status_code=status_code,
+                         error=f'Not ready after {IG_CONTAINER_MAX_AGE}s')
+        else:
+            rate_limited = bool(error) and error.get('code') in GRAPH_RATE_LIMIT_CODES
+            if error:
+                print(f"   ⚠️  Container {container.container_id} check error: {error.get('message', error)}")
+            self._reschedule(container, slow=rate_limited)
+            self._save(container, status_code=status_code)
+
+    async def _publish(self, container: PendingContainer):
+        if not self._claim(container):
+            print(f"   ⏭️  Container {container.container_id} already claimed by another worker")
+            return
+
+        container.publish_attempts += 1
+        media_id = await asyncio.to_thread(self.publisher._publish_container, container.container_id)
+
+        if media_id:
+            self._finish(container, 'published', status_code='FINISHED', media_id=media_id)
+        elif container.publish_attempts < IG_CONTAINER_PUBLISH_ATTEMPTS:
+            # "Media ID is not available" أحياناً بعد FINISHED مباشرة → فحص تاني
+            self._reschedule(container)
+            self._save(container, state='pending')
+            self._pending[container.container_id] = container
+        else:
+            self._finish(container, 'failed', error='media_publish failed')
+
+    def _finish(self, container: PendingContainer, state: str, status_code: str = None,
+                media_id: str = None, error: str = None):
+        self._pending.pop(container.container_id, None)
+        self._save(container, state=state, status_code=status_code, media_id=media_id, error=error)
+        self._outcomes[container.container_id] = {
+            'report_id': container.report_id, 'state': state, 'media_id': media_id, 'error': error
+        }
+
+        publisher = self.publisher
+        current_status = publisher._get_current_status(container.report_id)
+        if state == 'published':
+            print(f"   ✅ Report #{container.report_id} {container.media_kind} published: {media_id or '(before restart)'}")
+            publisher._update_report_status(
+                container.report_id, publisher._calculate_new_status(current_status, 'instagram')
+            )
+        else:
+            print(f"   ❌ Report #{container.report_id} {container.media_kind} failed: {error}")
+            # ما نمسح نجاح البوست على انستغرام
+            if 'instagram' not in current_status.lower():
+                publisher._update_report_status(container.report_id, 'failed')
+
+    async def run(self, container_ids: Optional[Iterable[str]] = None, timeout: float = None) -> Dict:
+        """
+        فحص ونشر لحد ما تخلص كل الـ containers (أو الـ timeout؛ الباقي بيضل pending بالـ DB)
+
+        Args:
+            container_ids: None = كل الـ containers المعلقة للحساب
+            timeout: ثواني (None = لحد ما يخلصوا أو IG_CONTAINER_MAX_AGE)
+        """
+        self._load(container_ids)
+        self._outcomes = {}
+        deadline = time.monotonic() + timeout if timeout else None
+        publishing: Set[asyncio.Task] = set()
+
+        if self._pending:
+            print(f"   ⏳ Polling {len(self._pending)} Instagram container(s)...")
+
+        while self._pending or publishing:
+            now = time.monotonic()
+            if deadline and now >= deadline:
+                break
+
+            due = [c for c in self._pending.values() if c.next_check <= now]
+            if due:
+                statuses = await asyncio.to_thread(self._fetch_statuses, [c.container_id for c in due])
+                for container in due:
+                    self._apply_status(container, statuses.get(container.container_id), publishing)
+
+            wake = min((c.next_check for c in self._pending.values()), default=time.monotonic() + IG_CONTAINER_POLL_MAX)
+            if deadline:
+                wake = min(wake, deadline)
+            delay = max(0.0, wake - time.monotonic())
+
+            if publishing:
+                _, publishing = await asyncio.wait(publishing, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(delay)
+
+        # النشر اللي بلش ما بينقطع
+        if publishing:
+            await asyncio.wait(publishing)
+
+        states = [o['state'] for o in self._outcomes.values()]
+        return {
+            'published': states.count('published'),
+            'failed': states.count('failed'),
+            'pending': len(self._pending),
+            'containers': dict(self._outcomes)
+        }
+
+    def drain(self, container_ids: Optional[Iterable[str]] = None, timeout: float = None) -> Dict:
+        """نسخة sync من run (للـ jobs والـ publisher)"""
+        return asyncio.run(self.run(container_ids, timeout))
@@ -7,20 +7,25 @@
 Features:
 - نشر Posts (صورة + caption + hashtags + comment)
 - نشر Reels (فيديو + caption + hashtags)
-- تنسيق هاشتاجات احترافي بـ Gemini
+- caption وهاشتاجات جاهزة مسبقاً (publish_captions) - بدون Gemini وقت النشر
 - معالجة ذكية للنصوص الطويلة
 - Status tracking في Database
 """
 
-import re
-import json
 import time
-import requests
 from io import BytesIO
 from typing import Dict, Optional
-import google.generativeai as genai
 import psycopg2
 
+from app.services.publishers.instagram_container_poller import (
+    IG_ASYNC_CONTAINERS, IG_CONTAINER_POLL_BACKOFF, IG_CONTAINER_POLL_MAX, IG_CONTAINER_POLL_MIN,
+    InstagramContainerPoller
+)
+from app.services.publishers.publish_captions import ready_caption
+from app.services.publishers.publish_data import PublishData, PublishDataProvider
+from app.services.publishers.publish_limits import get_publish_limits
+from app.utils.http_client import get_http_client
+
 
 class InstagramPublisher:
     """
@@ -39,15 +44,13 @@ class InstagramPublisher:
         self,
         ig_user_id: str = None,
         fb_access_token: str = None,
-        api_base_url: str = None,
-        gemini_api_key: str = None
+        api_base_url: str = None
     ):
         """
         Args:
             ig_user_id: Instagram Business Account ID
             fb_access_token: Facebook Access Token
             api_base_url: Base URL للـ API
-            gemini_api_key: Gemini API Key
         """
         
         import os
@@ -55,7 +58,6 @@ class InstagramPublisher:
         self.IG_USER_ID = ig_user_id or os.getenv('IG_GAZA_USER_ID')
         self.FB_ACCESS_TOKEN = fb_access_token or os.getenv('FB_gaza_ACCESS_TOKEN')
         self.API_BASE_URL = (api_base_url or os.getenv('API_BASE_URL') or "http://localhost:8000").rstrip('/')
-        self.GEMINI_API_KEY = gemini_api_key or os.getenv('GEMINI_API_KEY')
         
         # Validate credentials
         if not self.IG_USER_ID:
@@ -73,15 +75,6 @@ class InstagramPublisher:
         self.IG_CAPTION_MAX = 2200  # Instagram caption limit
         self.IG_COMMENT_MAX = 2200  # Instagram comment limit
         
-        # Initialize Gemini
-        if self.GEMINI_API_KEY:
-            genai.configure(api_key=self.GEMINI_API_KEY)
-            self.gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            print("✅ Gemini initialized")
-        else:
-            self.gemini_model = None
-            print("⚠️  No Gemini key")
-        
         # Database connection
         try:
             # Try importing DB_CONFIG first
@@ -105,6 +98,16 @@ class InstagramPublisher:
             print(f"⚠️  Database connection failed: {e}")
             self.conn = None
             self.cursor = None
+        
+        # بيانات النشر (تقرير + محتوى + صور + ريل) باستعلام واحد
+        self.publish_data = PublishDataProvider(conn=self.conn, api_base_url=self.API_BASE_URL)
+        self.http = get_http_client()
+        self._publish_data_cache: Optional[PublishData] = None
+        self._container_poller: Optional[InstagramContainerPoller] = None
+        
+        # حد Content Publishing للحساب (IG_POSTS_PER_DAY)
+        self.limits = get_publish_limits()
+        self.limits.register_page('instagram', self.IG_USER_ID, self.IG_USER_ID)
     
     # ==========================================
     # 🎯 Main Publish Functions
@@ -123,6 +126,7 @@ class InstagramPublisher:
         
         # Update status
         self._update_report_status(report_id, 'publishing')
+        self._get_publish_data(report_id, refresh=True)
         
         # 1. Get Instagram content
         print("1️⃣ Getting Instagram content...")
@@ -133,7 +137,7 @@ class InstagramPublisher:
         
         # 2. Format caption
         print("2️⃣ Formatting caption...")
-        caption = self._format_caption(ig_content['title'], ig_content['content'])
+        caption = self._format_caption(ig_content)
         print(f"\n📝 Caption: {caption[:150]}...\n")
         
         # 3. Get image
@@ -172,19 +176,32 @@ class InstagramPublisher:
         
         return {'success': True, 'media_id': media_id, 'type': 'post'}
     
-    def publish_reel(self, report_id: int) -> Dict:
+    def publish_reel(self, report_id: int, wait: bool = None) -> Dict:
         """
         نشر Reel على Instagram
         
         فيديو + caption + hashtags
+        
+        Args:
+            wait: False = تسجيل الـ container والرجوع فوراً (بينشر بـ drain_pending_containers)
+                  None = حسب IG_ASYNC_CONTAINERS
+        
+        Returns:
+            {'success': True, 'media_id'} بس بعد النشر الفعلي؛ الـ container اللي لسا
+            عند الـ poller بيرجع {'success': False, 'pending': True, 'container_id'}
+            (مش فشل - التقرير بيضل 'publishing' والـ poller بيحدثه)
         """
         
+        if wait is None:
+            wait = not IG_ASYNC_CONTAINERS
+        
         print(f"\n{'='*70}")
         print(f"🎬 Instagram Reel Publishing - Report #{report_id}")
         print(f"{'='*70}\n")
         
         # Update status
         self._update_report_status(report_id, 'publishing')
+        self._get_publish_data(report_id, refresh=True)
         
         # 1. Get Instagram reel content
         print("1️⃣ Getting Instagram reel content...")
@@ -206,7 +223,13 @@ class InstagramPublisher:
         
         # 4. Publish reel
         print("4️⃣ Publishing reel to Instagram...")
-        result = self._publish_instagram_reel(video_url, caption)
+        result = self._publish_instagram_reel(video_url, caption, report_id=report_id, wait=wait)
+        
+        if result.get('tracked'):
+            # حالة التقرير بيحدثها الـ poller لما الـ container يخلص
+            if result.get('pending'):
+                print(f"⏳ Reel container {result['container_id']} queued, will publish when ready")
+            return {**result, 'type': 'reel'}
         
         if not result['success']:
             self._update_report_status(report_id, 'failed')
@@ -280,7 +303,9 @@ class InstagramPublisher:
             results['reel'] = reel_result
             print("🔹 Reel publishing is disabled")
             
-            if not results['reel']['success']:
+            if results['reel'].get('pending'):
+                print(f"⏳ Reel queued: {results['reel'].get('container_id')}")
+            elif not results['reel']['success']:
                 print(f"❌ Reel failed: {results['reel'].get('message')}")
             else:
                 print(f"✅ Reel published: {results['reel']['media_id']}\n")
@@ -309,132 +334,31 @@ class InstagramPublisher:
     # 📊 Data Fetching
     # ==========================================
     
+    def _get_publish_data(self, report_id: int, refresh: bool = False) -> Optional[PublishData]:
+        """كل بيانات التقرير (استعلام واحد، محفوظة لباقي خطوات نفس النشر)"""
+        cached = self._publish_data_cache
+        if refresh or cached is None or cached.report_id != report_id:
+            self._publish_data_cache = cached = self.publish_data.load(report_id)
+        return cached
+    
     def _get_instagram_content(self, report_id: int) -> Optional[Dict]:
-        """جلب محتوى Instagram من social_media"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/social-media/by-report/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                print(f"❌ API error: {response.status_code}")
-                return None
-            
-            data = response.json()
-            content_json = data.get('content', '{}')
-            social_posts = json.loads(content_json)
-            ig_data = social_posts.get('instagram', {})
-            
-            return {
-                'title': ig_data.get('title', ''),
-                'content': ig_data.get('content', '')
-            }
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            return None
+        """أجزاء caption انستغرام {'title', 'body', 'hashtags'} (جاهزة مسبقاً من social_media)"""
+        data = self._get_publish_data(report_id)
+        ig_content = ready_caption(data, 'instagram') if data else None
+        if ig_content is None:
+            print(f"❌ No social media content for report {report_id}")
+        return ig_content
     
     def _get_reel_content(self, report_id: int) -> Optional[Dict]:
-        """جلب محتوى Reel"""
-        
-        # Try Method 1: Direct query by report
-        print(f"   🔍 Method 1: Querying report {report_id} directly...")
-        reel = self._get_reel_from_report(report_id)
-        if reel:
-            return reel
-        
-        # Try Method 2: Query generated_content table directly
-        print(f"   🔍 Method 2: Querying generated_content...")
-        reel = self._get_reel_from_db(report_id)
-        if reel:
-            return reel
+        """جلب محتوى Reel (content_type_id=8)"""
+        data = self._get_publish_data(report_id)
+        if data and data.reel:
+            print(f"   ✅ Found reel!")
+            return data.reel
         
         print(f"   ❌ No reel found for report {report_id}")
         return None
     
-    def _get_reel_from_report(self, report_id: int) -> Optional[Dict]:
-        """جلب reel من report endpoint"""
-        try:
-            # Query single report
-            url = f"{self.API_BASE_URL}/api/v1/reports/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            report = response.json()
-            
-            # Now get its generated content
-            url = f"{self.API_BASE_URL}/api/v1/reports/{report_id}/generated-content"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            content_items = response.json()
-            
-            # Find reel (content_type_id = 8)
-            for item in content_items:
-                if item.get('content_type_id') == self.INSTAGRAM_REEL_CONTENT_ID:
-                    content_str = item.get('content', '{}')
-                    try:
-                        content_json = json.loads(content_str) if isinstance(content_str, str) else content_str
-                    except:
-                        content_json = {}
-                    
-                    print(f"   ✅ Found reel!")
-                    return {
-                        'report_id': report_id,
-                        'video_url': item.get('file_url'),
-                        'title': item.get('title', ''),
-                        'description': item.get('description', ''),
-                        'content': content_json
-                    }
-            
-            return None
-            
-        except Exception as e:
-            print(f"   ⚠️  Method 1 error: {e}")
-            return None
-    
-    def _get_reel_from_db(self, report_id: int) -> Optional[Dict]:
-        """جلب reel من database مباشرة (fallback)"""
-        
-        if not self.cursor:
-            return None
-        
-        try:
-            sql = """
-                SELECT id, title, description, content, file_url
-                FROM generated_content
-                WHERE report_id = %s 
-                AND content_type_id = %s
-                LIMIT 1
-            """
-            
-            self.cursor.execute(sql, (report_id, self.INSTAGRAM_REEL_CONTENT_ID))
-            result = self.cursor.fetchone()
-            
-            if not result:
-                return None
-            
-            content_str = result[3] or '{}'
-            try:
-                content_json = json.loads(content_str) if isinstance(content_str, str) else content_str
-            except:
-                content_json = {}
-            
-            print(f"   ✅ Found reel in database!")
-            return {
-                'report_id': report_id,
-                'video_url': result[4],
-                'title': result[1] or '',
-                'description': result[2] or '',
-                'content': content_json
-            }
-            
-        except Exception as e:
-            print(f"   ⚠️  Method 2 error: {e}")
-            return None
-    
     def _get_image_url(self, report_id: int) -> Optional[str]:
         """
         جلب URL الصورة
@@ -458,110 +382,35 @@ class InstagramPublisher:
     
     def _get_generated_image_url(self, report_id: int) -> Optional[str]:
         """Get Generated Image URL"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/images/by-report/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            image_url = data.get('file_url')
-            
-            if image_url:
-                print("✅ Using Generated Image")
-                return image_url
-            
-            return None
-        except:
-            return None
+        data = self._get_publish_data(report_id)
+        if data and data.generated_image_url:
+            print("✅ Using Generated Image")
+            return data.generated_image_url
+        return None
     
     def _get_original_image_url(self, report_id: int) -> Optional[str]:
         """Get Original Image URL"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/reports/reports/{report_id}/raw-news-images"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            
-            if isinstance(data, list) and len(data) > 0:
-                image_url = data[0].get('url') or data[0].get('image_url')
-            elif isinstance(data, dict):
-                image_url = data.get('url') or data.get('image_url')
-            else:
-                return None
-            
-            if image_url:
-                print("✅ Using Original Image")
-                return image_url
-            
-            return None
-        except:
-            return None
+        data = self._get_publish_data(report_id)
+        if data and data.original_image_url:
+            print("✅ Using Original Image")
+            return data.original_image_url
+        return None
     
     def _get_full_report(self, report_id: int) -> Optional[str]:
         """جلب التقرير الكامل"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/reports/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            title = data.get('title', '')
-            content = data.get('content', '') or data.get('body', '')
-            
-            if title and content:
-                return f"{title}\n\n{content}"
-            return content or title
-        except:
-            return None
+        data = self._get_publish_data(report_id)
+        return data.full_report if data else None
     
     # ==========================================
     # 🎨 Text Formatting (Same as Facebook)
     # ==========================================
     
-    def _format_caption(self, title: str, content: str) -> str:
-        """تنسيق caption لـ Instagram Post مع إصلاح المسافات"""
-        
-        # إصلاح المسافات في النص
-        print(f"   🔧 Original title: {title[:50]}...")
-        title = self._fix_text_spacing(title)
-        print(f"   ✅ Fixed title: {title[:50]}...")
-        
-        print(f"   🔧 Original content: {content[:50]}...")
-        content = self._fix_text_spacing(content)
-        print(f"   ✅ Fixed content: {content[:50]}...")
-        
-        # فصل المحتوى عن الهاشتاجات
-        hashtag_start = content.find('#')
-        
-        if hashtag_start != -1:
-            main_content = content[:hashtag_start].strip()
-            hashtags = content[hashtag_start:].strip()
-            hashtags = self._format_hashtags(hashtags)
-            print(f"   📌 Hashtags found: {hashtags[:50]}...")
-        else:
-            main_content = content.strip()
-            hashtags = ''
-            print(f"   ⚠️  No hashtags in content")
-            
-            # Try to extract from title if it has hashtags
-            if '#' in title:
-                title_parts = title.split('#', 1)
-                title = title_parts[0].strip()
-                hashtags = '#' + title_parts[1].strip()
-                hashtags = self._format_hashtags(hashtags)
-                print(f"   📌 Hashtags from title: {hashtags[:50]}...")
-        
-        # لو ما في hashtags، نولدهم بـ Gemini
-        if not hashtags and self.gemini_model:
-            print(f"   🤖 Generating hashtags with Gemini...")
-            hashtags = self._generate_hashtags(title + ' ' + main_content)
+    def _format_caption(self, ig_content: Dict) -> str:
+        """تنسيق caption لـ Instagram Post (المسافات والهاشتاجات مصلحة مسبقاً)"""
+        
+        title = ig_content['title']
+        main_content = ig_content['body']
+        hashtags = ig_content['hashtags']
         
         # تجميع Caption
         result = []
@@ -594,227 +443,32 @@ class InstagramPublisher:
         
         return caption
     
-    def _fix_text_spacing(self, text: str) -> str:
-        """
-        إصلاح المسافات في النص العربي باستخدام Gemini
-        
-        يفصل الكلمات الملتصقة ويضيف مسافات صحيحة
-        """
-        
-        if not text or len(text.strip()) < 10:
-            return text
-        
-        # لو في Gemini، نستخدمه
-        if self.gemini_model:
-            try:
-                fixed = self._fix_spacing_with_gemini(text)
-                if fixed and len(fixed) > len(text) * 0.8:  # Sanity check
-                    return fixed
-            except Exception as e:
-                print(f"   ⚠️  Gemini spacing fix failed: {e}")
-        
-        # Fallback: basic regex fixes
-        return self._basic_spacing_fix(text)
-    
-    def _fix_spacing_with_gemini(self, text: str) -> str:
-        """استخدام Gemini لإصلاح المسافات"""
-        
-        prompt = f"""أنت خبير في تنسيق النصوص العربية.
-
-المهمة: أصلح المسافات في هذا النص. الكلمات ملتصقة ببعضها ومحتاجة مسافات.
-
-القواعد:
-1. ضع مسافة بين كل كلمتين
-2. ضع مسافة قبل وبعد علامات الترقيم
-3. لا تغير أي كلمة أو حرف - فقط أضف مسافات
-4. احترم الأرقام والإيموجي - لا تغيرهم
-5. أرجع النص المصلح فقط بدون أي شرح أو مقدمات
-
-النص الأصلي:
-{text}
-
-النص المصلح (فقط النص، بدون مقدمات):"""
-        
-        response = self.gemini_model.generate_content(prompt)
-        fixed_text = response.text.strip()
-        
-        # تنظيف أي مقدمات
-        unwanted_starts = ['النص المصلح:', 'إليك النص:', 'هنا النص:', 'التصحيح:']
-        for prefix in unwanted_starts:
-            if fixed_text.startswith(prefix):
-                fixed_text = fixed_text[len(prefix):].strip()
-                break
-        
-        # إزالة أي backticks
-        fixed_text = fixed_text.replace('```', '').strip()
-        
-        return fixed_text
-    
-    def _basic_spacing_fix(self, text: str) -> str:
-        """إصلاح بسيط للمسافات (fallback)"""
-        
-        import re
-        
-        # إضافة مسافة قبل علامات الترقيم العربية
-        text = re.sub(r'([^\s])([؟،؛])', r'\1 \2', text)
-        
-        # إضافة مسافة بعد علامات الترقيم
-        text = re.sub(r'([؟،؛:\.!])([^\s])', r'\1 \2', text)
-        
-        # إضافة مسافة بين كلمة عربية ورقم
-        text = re.sub(r'([\u0600-\u06FF])(\d)', r'\1 \2', text)
-        text = re.sub(r'(\d)([\u0600-\u06FF])', r'\1 \2', text)
-        
-        # إضافة مسافة بين كلمة عربية وحرف إنجليزي
-        text = re.sub(r'([\u0600-\u06FF])([a-zA-Z])', r'\1 \2', text)
-        text = re.sub(r'([a-zA-Z])([\u0600-\u06FF])', r'\1 \2', text)
-        
-        # تنظيف المسافات المتعددة
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text.strip()
-    
-    def _generate_hashtags(self, text: str) -> str:
-        """
-        توليد hashtags مناسبة للمحتوى باستخدام Gemini
-        """
-        
-        try:
-            # نأخذ أول 500 حرف من المحتوى للسياق
-            context = text[:500] if len(text) > 500 else text
-            
-            prompt = f"""أنت خبير في السوشيال ميديا والهاشتاجات.
-
-المهمة: ولّد 5-8 هاشتاجات عربية مناسبة لهذا المحتوى.
-
-القواعد:
-1. الهاشتاجات يجب أن تكون ذات صلة بالمحتوى
-2. استخدم كلمات شائعة ومطلوبة في البحث
-3. الهاشتاجات يجب أن تكون قصيرة (كلمة-3 كلمات)
-4. افصل الكلمات بـ _ للقراءة
-5. أرجع الهاشتاجات فقط (كل واحد في سطر)
-
-المحتوى:
-{context}
-
-الهاشتاجات (فقط الهاشتاجات، بدون شرح):"""
-            
-            response = self.gemini_model.generate_content(prompt)
-            hashtags_text = response.text.strip()
-            
-            # استخراج الهاشتاجات
-            hashtags = []
-            for line in hashtags_text.split('\n'):
-                line = line.strip()
-                if line.startswith('#'):
-                    hashtags.append(line)
-            
-            # لو ما رجع hashtags، نستخدم fallback
-            if not hashtags:
-                return ""
-            
-            result = ' '.join(hashtags[:8])  # أقصى 8 هاشتاجات
-            print(f"   ✅ Generated {len(hashtags)} hashtags")
-            
-            return result
-            
-        except Exception as e:
-            print(f"   ⚠️  Hashtag generation failed: {e}")
-            return ""
-    
     def _format_reel_caption(self, reel_content: Dict) -> str:
         """
         تنسيق caption لـ Instagram Reel
         
-        يستخدم عنوان ومحتوى Instagram
+        يستخدم عنوان ومحتوى Instagram، وإذا ما في محتوى الريل نفسه
         """
         
-        # Method 1: استخدام Instagram content من social_media
-        report_id = reel_content.get('report_id')
-        if report_id:
-            ig_content = self._get_instagram_content(report_id)
-            if ig_content:
-                title = ig_content.get('title', '')
-                content = ig_content.get('content', '')
-                
-                # إصلاح المسافات
-                title = self._fix_text_spacing(title)
-                content = self._fix_text_spacing(content)
-                
-                # استخراج الهاشتاجات
-                hashtag_start = content.find('#')
-                if hashtag_start != -1:
-                    main_content = content[:hashtag_start].strip()
-                    hashtags = content[hashtag_start:].strip()
-                    hashtags = self._format_hashtags(hashtags)
-                else:
-                    main_content = content.strip()
-                    hashtags = ''
-                
-                # لو ما في hashtags، نولدهم
-                if not hashtags and self.gemini_model:
-                    print(f"   🤖 Generating hashtags for reel...")
-                    hashtags = self._generate_hashtags(title + ' ' + main_content)
-                
-                # تجميع Caption
-                result = []
-                if title:
-                    result.append(title)
-                if main_content:
-                    # نأخذ أول 200 حرف من المحتوى للـ reel
-                    short_content = main_content[:200] + '...' if len(main_content) > 200 else main_content
-                    result.append(short_content)
-                if hashtags:
-                    result.append(hashtags)
-                
-                caption = '\n\n'.join(result)
-                
-                # Instagram Reel caption limit
-                if len(caption) > self.IG_CAPTION_MAX:
-                    caption = caption[:self.IG_CAPTION_MAX - 50] + "..."
-                
-                return caption
-        
-        # Method 2: Fallback - استخدام reel_content نفسه
-        title = reel_content.get('title', '')
-        description = reel_content.get('description', '')
-        content = reel_content.get('content', {})
-        
-        # إصلاح المسافات
-        title = self._fix_text_spacing(title)
-        description = self._fix_text_spacing(description)
-        
-        # محاولة استخراج caption و hashtags من content
-        if isinstance(content, dict):
-            caption_text = content.get('caption', description)
-            hashtags_text = content.get('hashtags', '')
-        else:
-            caption_text = description
-            hashtags_text = ''
-        
-        caption_text = self._fix_text_spacing(caption_text)
-        
-        # تنسيق الهاشتاجات
-        if hashtags_text and self.gemini_model:
-            hashtags_text = self._format_hashtags(hashtags_text)
+        # Method 1: Instagram content من social_media
+        # Method 2: Fallback - محتوى الريل (caption + hashtags)
+        data = self._get_publish_data(reel_content.get('report_id')) if reel_content.get('report_id') else None
+        parts = None
+        if data:
+            parts = ready_caption(data, 'instagram') or ready_caption(data, 'instagram_reel')
+        if parts is None:
+            parts = {'title': reel_content.get('title', ''), 'body': reel_content.get('description', ''), 'hashtags': ''}
         
-        # لو ما في hashtags، نولدهم
-        if not hashtags_text and self.gemini_model:
-            print(f"   🤖 Generating hashtags for reel...")
-            hashtags_text = self._generate_hashtags(title + ' ' + caption_text)
-        
-        # تجميع
+        # تجميع Caption
         result = []
-        
-        if title:
-            result.append(title)
-        
-        if caption_text:
-            short_caption = caption_text[:200] + '...' if len(caption_text) > 200 else caption_text
-            result.append(short_caption)
-        
-        if hashtags_text:
-            result.append(hashtags_text)
+        if parts['title']:
+            result.append(parts['title'])
+        if parts['body']:
+            # نأخذ أول 200 حرف من المحتوى للـ reel
+            body = parts['body']
+            result.append(body[:200] + '...' if len(body) > 200 else body)
+        if parts['hashtags']:
+            result.append(parts['hashtags'])
         
         caption = '\n\n'.join(result)
         
@@ -824,62 +478,6 @@ class InstagramPublisher:
         
         return caption
     
-    def _format_hashtags(self, text: str) -> str:
-        """تنسيق هاشتاجات بـ Gemini (نفس Facebook)"""
-        
-        print(f"   🔧 Formatting hashtags...")
-        
-        hashtags = re.findall(r'#[\w\u0600-\u06FF_]+', text)
-        
-        if not hashtags:
-            return text
-        
-        if self.gemini_model:
-            try:
-                corrected = self._correct_hashtags_with_gemini(hashtags)
-                result = text
-                for old, new in zip(hashtags, corrected):
-                    if old != new:
-                        result = result.replace(old, new, 1)
-                        print(f"   ✓ {old} → {new}")
-                return result
-            except:
-                return text
-        else:
-            return text
-    
-    def _correct_hashtags_with_gemini(self, hashtags: list) -> list:
-        """تصحيح هاشتاجات بـ Gemini"""
-        
-        hashtags_str = '\n'.join(hashtags)
-        
-        prompt = f"""أنت خبير في الهاشتاجات العربية.
-
-افصل الكلمات الملتصقة بـ _
-
-مثال:
-#قواتحفظالسلام → #قوات_حفظ_السلام
-#انتهاكصارخ → #انتهاك_صارخ
-
-الهاشتاجات:
-{hashtags_str}
-
-النتيجة (هاشتاج في كل سطر):"""
-        
-        response = self.gemini_model.generate_content(prompt)
-        corrected_text = response.text.strip()
-        
-        corrected = []
-        for line in corrected_text.split('\n'):
-            line = line.strip()
-            if line and line.startswith('#'):
-                corrected.append(line)
-        
-        if len(corrected) != len(hashtags):
-            return hashtags
-        
-        return corrected
-    
     def _prepare_comment(self, full_report: str) -> str:
         """تحضير Comment (نفس Facebook بس مع Instagram limits)"""
         
@@ -929,8 +527,15 @@ class InstagramPublisher:
         except Exception as e:
             return {'success': False, 'message': str(e)}
     
-    def _publish_instagram_reel(self, video_url: str, caption: str) -> Dict:
-        """نشر Reel على Instagram - IMPROVED VERSION"""
+    def _publish_instagram_reel(self, video_url: str, caption: str, report_id: int = None, wait: bool = True) -> Dict:
+        """
+        نشر Reel على Instagram - IMPROVED VERSION
+        
+        مع DB + report_id: الـ container بيتسجل عند الـ poller (بيكمل بعد restart)
+        - wait=False: بيرجع {'success': False, 'pending': True} فوراً
+        - wait=True: الـ poller بيستنى هالـ container بس
+        بدون DB: انتظار مباشر (_wait_for_container_ready)
+        """
         
         try:
             # Step 1: Create container
@@ -942,6 +547,22 @@ class InstagramPublisher:
             
             print(f"   ✅ Container created: {container_id}")
             
+            poller = self._get_container_poller() if report_id else None
+            if poller:
+                poller.track(container_id, report_id, 'reel')
+                # success بس لما الـ poller يأكد النشر
+                result = {'success': False, 'tracked': True, 'pending': True, 'container_id': container_id,
+                          'message': 'Video still processing, will publish when ready'}
+                if not wait:
+                    return result
+                
+                outcome = poller.drain(container_ids=[container_id], timeout=120).get('containers', {}).get(container_id)
+                if not outcome:
+                    return result
+                if outcome['state'] != 'published':
+                    return {**result, 'pending': False, 'message': outcome['error']}
+                return {**result, 'success': True, 'pending': False, 'message': None, 'media_id': outcome['media_id']}
+            
             # Step 2: Wait for processing - CRITICAL STEP
             print("   ⏳ Waiting for video processing...")
             processing_success = self._wait_for_container_ready(container_id)
@@ -984,7 +605,7 @@ class InstagramPublisher:
         print(f"   🖼️ Image URL: {image_url[:50]}...")
         
         try:
-            response = requests.post(url, data=payload, timeout=30)
+            response = self.http.post(url, data=payload)
             result = response.json()
             
             print(f"   📦 API Response: {result}")
@@ -1027,7 +648,7 @@ class InstagramPublisher:
         print(f"   📝 Caption: {caption[:100]}...")
         
         try:
-            response = requests.post(url, data=payload, timeout=30)
+            response = self.http.post(url, data=payload)
             result = response.json()
             
             print(f"   📦 API Response: {result}")
@@ -1053,8 +674,25 @@ class InstagramPublisher:
             print(f"   ❌ Container creation exception: {e}")
             return None
     
+    def drain_pending_containers(self, timeout: float = None) -> Dict:
+        """نشر كل الـ containers المعلقة لهالحساب (منها اللي ضلت من قبل restart)"""
+        poller = self._get_container_poller()
+        if not poller:
+            return {'published': 0, 'failed': 0, 'pending': 0, 'containers': {}}
+        return poller.drain(timeout=timeout)
+    
+    def _get_container_poller(self) -> Optional[InstagramContainerPoller]:
+        """الـ poller (بده DB لحفظ الحالة)"""
+        if self._container_poller is None and self.conn and self.cursor:
+            try:
+                self._container_poller = InstagramContainerPoller(self)
+            except Exception as e:
+                print(f"   ⚠️  Container poller unavailable: {e}")
+                self.conn.rollback()
+        return self._container_poller
+    
     def _wait_for_container_ready(self, container_id: str, max_wait: int = 120) -> bool:
-        """Wait for container processing - FIXED VERSION"""
+        """Wait for container processing - FIXED VERSION (بدون DB)"""
         
         url = f"https://graph.facebook.com/v18.0/{container_id}"
         params = {
@@ -1064,6 +702,7 @@ class InstagramPublisher:
         
         start_time = time.time()
         check_count = 0
+        interval = IG_CONTAINER_POLL_MIN
         
         print(f"   ⏳ Waiting for video processing to complete...")
         print(f"   📍 Container ID: {container_id}")
@@ -1072,7 +711,7 @@ class InstagramPublisher:
             check_count += 1
             
             try:
-                response = requests.get(url, params=params, timeout=15)
+                response = self.http.get(url, params=params)
                 result = response.json()
                 
                 print(f"   📦 API Response: {result}")
@@ -1093,12 +732,12 @@ class InstagramPublisher:
                 else:
                     print(f"   ⚠️  Unknown status: {status}")
                 
-                # Wait longer between checks to avoid rate limiting
-                time.sleep(8)
-                
             except Exception as e:
                 print(f"   ⚠️  Status check error: {e}")
-                time.sleep(8)
+            
+            # فترة adaptive: قصيرة بالأول وبتكبر (أقل فحوصات للفيديوهات الطويلة)
+            time.sleep(interval)
+            interval = min(IG_CONTAINER_POLL_MAX, interval * IG_CONTAINER_POLL_BACKOFF)
         
         elapsed = int(time.time() - start_time)
         print(f"   ⏰ TIMEOUT after {elapsed}s - Video processing did not complete")
@@ -1119,7 +758,8 @@ class InstagramPublisher:
         print(f"   🆔 Container ID: {container_id}")
         
         try:
-            response = requests.post(url, data=payload, timeout=30)
+            self.limits.acquire('instagram', self.IG_USER_ID)
+            response = self.http.post(url, data=payload)
             result = response.json()
             
             print(f"   📦 Publish Response: {result}")
@@ -1161,7 +801,7 @@ class InstagramPublisher:
         }
         
         try:
-            response = requests.post(url, data=payload, timeout=15)
+            response = self.http.post(url, data=payload)
             result = response.json()
             
             if 'id' in result:
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+✍️ Publish Captions
+نص النشر الجاهز لكل تقرير (العنوان + المحتوى + الهاشتاجات)، بيتجهز مسبقاً خارج دورة النشر
+
+قبل: FacebookPublisher و InstagramPublisher كانوا ينادوا Gemini وقت النشر
+(تصحيح الهاشتاجات، إصلاح المسافات، توليد هاشتاجات) لكل منصة ولكل تقرير،
+ونفس الهاشتاجات بتتصحح مرتين لفيسبوك وانستغرام
+هلأ:
+- report_publish_captions: صف لكل (تقرير، نوع) مع content_hash + prompt_version (نفس فكرة rewrite_cache)
+  facebook / instagram (محتوى السوشال)، instagram_reel (محتوى الريل لما ما في سوشال)
+- CaptionPrecomputer (caption_precompute.py) بيجهز الناقص بعد توليد محتوى السوشال
+- الـ publishers بيقروا الجاهز مع بيانات النشر (نفس الاستعلام)؛ إذا ناقص أو قديم
+  بيرجعوا لتنسيق محلي (regex) - بدون أي طلب Gemini وقت النشر
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.generators.broadcast_segments import compute_content_hash
+
+
+# ارفع النسخة عند تعديل برومبتات caption_precompute.py
+CAPTION_PROMPT_VERSION = 'v1'
+
+CAPTION_KINDS = ('facebook', 'instagram', 'instagram_reel')
+
+# انستغرام: إصلاح المسافات + توليد هاشتاجات إذا ما في (فيسبوك بس تصحيح الهاشتاجات)
+INSTAGRAM_KINDS = ('instagram', 'instagram_reel')
+
+HASHTAG_PATTERN = re.compile(r'#[\w\u0600-\u06FF_]+')
+
+
+def ensure_captions_table(cursor):
+    """إنشاء الجدول إذا ما كان موجود (الـ commit على المستدعي)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS report_publish_captions (
+            id SERIAL PRIMARY KEY,
+            report_id INTEGER NOT NULL,
+            caption_kind VARCHAR(30) NOT NULL,
+            content_hash VARCHAR(64) NOT NULL,
+            prompt_version VARCHAR(20) NOT NULL,
+            title TEXT,
+            body TEXT,
+            hashtags TEXT,
+            created_at TIMESTAMP DEFAULT NOW(),
+            UNIQUE(report_id, caption_kind)
+        )
+    """)
+
+
+def save_caption(cursor, report_id: int, kind: str, content_hash: str, caption: Dict):
+    """حفظ نص جاهز (الـ commit على المستدعي - لا تحفظ نتيجة الـ fallback المحلي)"""
+    cursor.execute("""
+        INSERT INTO report_publish_captions
+            (report_id, caption_kind, content_hash, prompt_version, title, body, hashtags, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+        ON CONFLICT (report_id, caption_kind)
+        DO UPDATE SET content_hash = EXCLUDED.content_hash, prompt_version = EXCLUDED.prompt_version,
+                      title = EXCLUDED.title, body = EXCLUDED.body, hashtags = EXCLUDED.hashtags,
+                      created_at = NOW()
+    """, (report_id, kind, content_hash, CAPTION_PROMPT_VERSION,
+          caption['title'], caption['body'], caption['hashtags']))
+
+
+# ============================================
+# Source text (من PublishData)
+# ============================================
+
+def caption_source(data, kind: str) -> Optional[Dict]:
+    """
+    النص الخام لنوع caption
+
+    Returns:
+        {'title', 'content', 'hashtags'} أو None إذا ما في محتوى
+    """
+    if kind == 'instagram_reel':
+        reel = data.reel
+        if not reel:
+            return None
+        content = reel.get('content')
+        if isinstance(content, dict):
+            return {
+                'title': reel.get('title') or '',
+                'content': content.get('caption') or reel.get('description') or '',
+                'hashtags': content.get('hashtags') or ''
+            }
+        return {'title': reel.get('title') or '', 'content': reel.get('description') or '', 'hashtags': ''}
+
+    platform = data.platform_content(kind)
+    if platform is None:
+        return None
+    return {'title': platform['title'] or '', 'content': platform['content'] or '', 'hashtags': ''}
+
+
+def source_hash(source: Dict) -> str:
+    """بصمة النص الخام (تتغير إذا انولد محتوى سوشال/ريل جديد)"""
+    return compute_content_hash(source['title'], f"{source['content']}\n{source['hashtags']}")
+
+
+def missing_caption_kinds(data) -> List[str]:
+    """
+    الأنواع اللي إلها محتوى وما إلها caption بنفس البصمة والنسخة
+    (data.captions فيها بس نسخة CAPTION_PROMPT_VERSION)
+    """
+    missing = []
+    for kind in CAPTION_KINDS:
+        source = caption_source(data, kind)
+        if source is None:
+            continue
+        # الريل بيستعمل caption انستغرام إذا في محتوى سوشال
+        if kind == 'instagram_reel' and data.social is not None:
+            continue
+        if (data.captions.get(kind) or {}).get('hash') != source_hash(source):
+            missing.append(kind)
+    return missing
+
+
+# ============================================
+# Text processing (مشتركة بين التجهيز المسبق والـ fallback)
+# ============================================
+
+def basic_spacing_fix(text: str) -> str:
+    """إصلاح بسيط للمسافات بالـ regex"""
+    if not text:
+        return text
+
+    # إضافة مسافة قبل علامات الترقيم العربية
+    text = re.sub(r'([^\s])([؟،؛])', r'\1 \2', text)
+
+    # إضافة مسافة بعد علامات الترقيم
+    text = re.sub(r'([؟،؛:\.!])([^\s])', r'\1 \2', text)
+
+    # إضافة مسافة بين كلمة عربية ورقم
+    text = re.sub(r'([\u0600-\u06FF])(\d)', r'\1 \2', text)
+    text = re.sub(r'(\d)([\u0600-\u06FF])', r'\1 \2', text)
+
+    # إضافة مسافة بين كلمة عربية وحرف إنجليزي
+    text = re.sub(r'([\u0600-\u06FF])([a-zA-Z])', r'\1 \2', text)
+    text = re.sub(r'([a-zA-Z])([\u0600-\u06FF])', r'\1 \2', text)
+
+    # تنظيف المسافات المتعددة
+    text = re.sub(r'\s+', ' ', text)
+
+    return text.strip()
+
+
+def split_hashtags(text: str) -> Tuple[str, str]:
+    """(المحتوى، الهاشتاجات من أول #)"""
+    start = (text or '').find('#')
+    if start == -1:
+        return (text or '').strip(), ''
+    return text[:start].strip(), text[start:].strip()
+
+
+def apply_hashtag_corrections(text: str, correct: Callable[[list], list]) -> str:
+    """استبدال كل هاشتاج بنسخته المصححة (correct: list → list بنفس الطول)"""
+    hashtags = HASHTAG_PATTERN.findall(text or '')
+    if not hashtags:
+        return text
+
+    corrected = correct(hashtags)
+    if len(corrected) != len(hashtags):
+        return text
+
+    for old, new in zip(hashtags, corrected):
+        if old != new:
+            text = text.replace(old, new, 1)
+    return text
+
+
+def prepare_caption(
+    kind: str,
+    source: Dict,
+    fix_spacing: Callable[[str], str] = basic_spacing_fix,
+    correct_hashtags: Callable[[list], list] = None,
+    generate_hashtags: Callable[[str], str] = None
+) -> Dict:
+    """
+    العنوان + المحتوى + الهاشتاجات الجاهزة لنوع caption
+
+    بدون callables = تنسيق محلي فقط (الـ fallback وقت النشر)
+
+    Returns:
+        {'title', 'body', 'hashtags'}
+    """
+    title = source['title'] or ''
+    content = source['content'] or ''
+    instagram = kind in INSTAGRAM_KINDS
+
+    if instagram and fix_spacing:
+        title = fix_spacing(title) if len(title.strip()) >= 10 else title
+        content = fix_spacing(content) if len(content.strip()) >= 10 else content
+
+    if kind == 'instagram_reel':
+        body, hashtags = content.strip(), (source['hashtags'] or '').strip()
+    else:
+        body, hashtags = split_hashtags(content)
+        # انستغرام: الهاشتاجات ممكن تكون بالعنوان
+        if not hashtags and kind == 'instagram' and '#' in title:
+            title, hashtags = title.split('#', 1)
+            title, hashtags = title.strip(), '#' + hashtags.strip()
+
+    if hashtags and correct_hashtags:
+        hashtags = apply_hashtag_corrections(hashtags, correct_hashtags)
+
+    if not hashtags and instagram and generate_hashtags:
+        hashtags = generate_hashtags(f"{title} {body}") or ''
+
+    return {'title': title.strip(), 'body': body, 'hashtags': hashtags}
+
+
+def ready_caption(data, kind: str) -> Optional[Dict]:
+    """
+    الـ caption الجاهز لتقرير (وقت النشر)
+
+    المخزن إذا بصمته ونسخته مطابقة، وإلا تنسيق محلي بدون Gemini
+
+    Returns:
+        {'title', 'body', 'hashtags'} أو None إذا ما في محتوى للنوع
+    """
+    source = caption_source(data, kind)
+    if source is None:
+        return None
+
+    stored = (data.captions or {}).get(kind)
+    if stored and stored.get('hash') == source_hash(source):
+        return {'title': stored.get('title') or '', 'body': stored.get('body') or '',
+                'hashtags': stored.get('hashtags') or ''}
+
+    print(f"   ⚠️  No precomputed {kind} caption for report #{data.report_id}, formatting locally")
+    return prepare_caption(kind, source)
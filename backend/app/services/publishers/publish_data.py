@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+📦 Publish Data Provider
+كل البيانات اللي بيحتاجها النشر لتقرير (أو مجموعة تقارير) بطلب واحد
+
+قبل: كل publisher كان يعمل 5-10 طلبات HTTP لـ API_BASE_URL (نفس السيرفر)
+للعنوان، التقرير، محتوى السوشال، الصورة المولدة، الصور الأصلية، الريل...
+هلأ:
+- DBPublishDataProvider: استعلام واحد (LATERAL joins) لكل التقارير المطلوبة
+- HTTPPublishDataProvider: نفس النتيجة من الـ API (backend بعيد اختياري)
+- PUBLISH_DATA_BACKEND=db|http، والـ db بيرجع للـ HTTP إذا فشل الاتصال
+- الـ captions الجاهزة (report_publish_captions) بتيجي بنفس الاستعلام
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import psycopg2
+
+from app.services.publishers.publish_captions import CAPTION_PROMPT_VERSION, ensure_captions_table
+from app.utils.http_client import get_http_client
+from settings import DB_CONFIG
+
+
+PUBLISH_DATA_BACKEND = os.getenv('PUBLISH_DATA_BACKEND', 'db').lower()     # db | http
+
+# content_type_id بـ generated_content
+SOCIAL_CONTENT_TYPE_ID = 1
+GENERATED_IMAGE_TYPE_ID = 6
+REEL_CONTENT_TYPE_ID = 8
+SOCIAL_TEMPLATES_TYPE_ID = 9
+
+# صفحات فيسبوك اللي إلها templates (content_type_id=9)
+TEMPLATE_PAGES = ('h-GAZA', 'DOT')
+
+
+def _parse_json(value, default=None):
+    if value is None or value == '':
+        return default
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass
+class PublishData:
+    """كل اللي بيلزم لنشر تقرير على أي منصة"""
+    report_id: int
+    title: str = ''
+    content: str = ''
+    status: Optional[str] = None
+    # None = ما في صف محتوى سوشال للتقرير
+    social: Optional[Dict[str, Dict]] = None
+    generated_image_url: Optional[str] = None
+    original_image_urls: List[str] = field(default_factory=list)
+    templates: Dict[str, str] = field(default_factory=dict)
+    reel: Optional[Dict] = None
+    # {kind: {'hash', 'title', 'body', 'hashtags'}} من report_publish_captions (publish_captions.ready_caption)
+    captions: Dict[str, Dict] = field(default_factory=dict)
+
+    @property
+    def original_image_url(self) -> Optional[str]:
+        return self.original_image_urls[0] if self.original_image_urls else None
+
+    @property
+    def full_report(self) -> Optional[str]:
+        """العنوان + النص (للكومنت)"""
+        if self.title and self.content:
+            return f"{self.title}\n\n{self.content}"
+        return self.content or self.title or None
+
+    def platform_content(self, platform: str) -> Optional[Dict]:
+        """{'title', 'content', 'raw'} لمنصة (None إذا ما في محتوى سوشال أبداً)"""
+        if self.social is None:
+            return None
+        data = self.social.get(platform) or {}
+        return {'title': data.get('title', ''), 'content': data.get('content', ''), 'raw': data}
+
+    @staticmethod
+    def parse_templates(value) -> Dict[str, str]:
+        content_json = _parse_json(value, {}) or {}
+        return {page: content_json[page] for page in TEMPLATE_PAGES if content_json.get(page)}
+
+    @staticmethod
+    def make_reel(report_id: int, title, description, content, file_url) -> Dict:
+        return {
+            'report_id': report_id,
+            'video_url': file_url,
+            'title': title or '',
+            'description': description or '',
+            'content': _parse_json(content or '{}', {})
+        }
+
+
+# ============================================
+# DB backend
+# ============================================
+
+PUBLISH_DATA_SQL = """
+    SELECT
+        gr.id, gr.title, gr.content, gr.status,
+        social.content,
+        image.file_url,
+        templates.content,
+        reel.title, reel.description, reel.content, reel.file_url, reel.id,
+        originals.urls,
+        captions.items
+    FROM generated_report gr
+    LEFT JOIN LATERAL (
+        SELECT content FROM generated_content
+        WHERE report_id = gr.id AND content_type_id = %(social)s
+        ORDER BY created_at DESC LIMIT 1
+    ) social ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT file_url FROM generated_content
+        WHERE report_id = gr.id AND content_type_id = %(image)s
+        ORDER BY created_at DESC LIMIT 1
+    ) image ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT content FROM generated_content
+        WHERE report_id = gr.id AND content_type_id = %(templates)s
+        ORDER BY created_at DESC LIMIT 1
+    ) templates ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT id, title, description, content, file_url FROM generated_content
+        WHERE report_id = gr.id AND content_type_id = %(reel)s
+        ORDER BY created_at DESC LIMIT 1
+    ) reel ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT array_agg(rn.content_img ORDER BY rn.id) AS urls
+        FROM news_cluster_members ncm
+        JOIN raw_news rn ON rn.id = ncm.news_id
+        WHERE ncm.cluster_id = gr.cluster_id
+          AND rn.content_img IS NOT NULL AND rn.content_img <> ''
+    ) originals ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT json_object_agg(caption_kind, json_build_object(
+            'hash', content_hash, 'title', title, 'body', body, 'hashtags', hashtags
+        )) AS items
+        FROM report_publish_captions
+        WHERE report_id = gr.id AND prompt_version = %(caption_version)s
+    ) captions ON TRUE
+    WHERE gr.id = ANY(%(ids)s)
+"""
+
+
+_captions_table_ready = False
+_captions_table_lock = threading.Lock()
+
+
+def _ensure_captions_table(conn):
+    """الاستعلام بيعمل join على report_publish_captions، فلازم الجدول يكون موجود (مرة لكل عملية)"""
+    global _captions_table_ready
+    with _captions_table_lock:
+        if _captions_table_ready:
+            return
+        cursor = conn.cursor()
+        ensure_captions_table(cursor)
+        conn.commit()
+        cursor.close()
+        _captions_table_ready = True
+
+
+class DBPublishDataProvider:
+    """بيانات النشر من قاعدة البيانات مباشرة (استعلام واحد لأي عدد تقارير)"""
+
+    def __init__(self, conn=None):
+        """
+        Args:
+            conn: اتصال الـ publisher (None = اتصال جديد لكل تحميل)
+        """
+        self.conn = conn
+
+    def load_many(self, report_ids: Iterable[int]) -> Dict[int, PublishData]:
+        report_ids = list(dict.fromkeys(int(r) for r in report_ids))
+        if not report_ids:
+            return {}
+
+        conn = self.conn or psycopg2.connect(**DB_CONFIG)
+        try:
+            _ensure_captions_table(conn)
+            cursor = conn.cursor()
+            cursor.execute(PUBLISH_DATA_SQL, {
+                'ids': report_ids,
+                'social': SOCIAL_CONTENT_TYPE_ID,
+                'image': GENERATED_IMAGE_TYPE_ID,
+                'templates': SOCIAL_TEMPLATES_TYPE_ID,
+                'reel': REEL_CONTENT_TYPE_ID,
+                'caption_version': CAPTION_PROMPT_VERSION,
+            })
+            rows = cursor.fetchall()
+            cursor.close()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            if conn is not self.conn:
+                conn.close()
+
+        bundles = {}
+        for row in rows:
+            (report_id, title, content, status, social, image_url, templates,
+             reel_title, reel_description, reel_content, reel_url, reel_id, originals, captions) = row
+
+            bundles[report_id] = PublishData(
+                report_id=report_id,
+                title=title or '',
+                content=content or '',
+                status=status,
+                social=_parse_json(social, {}) if social is not None else None,
+                generated_image_url=image_url or None,
+                original_image_urls=list(originals or []),
+                templates=PublishData.parse_templates(templates),
+                reel=PublishData.make_reel(report_id, reel_title, reel_description, reel_content, reel_url)
+                if reel_id is not None else None,
+                captions=_parse_json(captions, {}) or {}
+            )
+        return bundles
+
+    def load(self, report_id: int) -> Optional[PublishData]:
+        return self.load_many([report_id]).get(report_id)
+
+
+# ============================================
+# HTTP backend (API بعيد)
+# ============================================
+
+class HTTPPublishDataProvider:
+    """نفس البيانات من الـ API (لما الـ publisher ما عنده وصول للـ DB)"""
+
+    def __init__(self, api_base_url: str = None, timeout: int = 10):
+        self.api_base_url = (api_base_url or os.getenv('API_BASE_URL') or "http://localhost:8000").rstrip('/')
+        self.timeout = timeout
+
+    def _get(self, path: str):
+        response = get_http_client().get(f"{self.api_base_url}/api/v1{path}", timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    def _latest_of_type(self, report_id: int, content_type_id: int) -> Optional[Dict]:
+        data = self._get(f"/reports/reports/{report_id}/{content_type_id}") or {}
+        items = data.get('generated_content') or []
+        return items[0] if items else None
+
+    def load(self, report_id: int) -> Optional[PublishData]:
+        report = self._get(f"/reports/{report_id}")
+        if not report:
+            return None
+
+        bundle = PublishData(
+            report_id=report_id,
+            title=report.get('title') or '',
+            content=report.get('content') or report.get('body') or '',
+            status=report.get('status')
+        )
+
+        social = self._get(f"/social-media/by-report/{report_id}")
+        if social is not None:
+            bundle.social = _parse_json(social.get('content', '{}'), {})
+
+        image = self._get(f"/images/by-report/{report_id}")
+        if image:
+            bundle.generated_image_url = image.get('file_url') or None
+
+        originals = self._get(f"/reports/reports/{report_id}/raw-news-images") or {}
+        bundle.original_image_urls = [
+            item['img_url'] for item in originals.get('images', []) if item.get('img_url')
+        ]
+
+        templates = self._latest_of_type(report_id, SOCIAL_TEMPLATES_TYPE_ID)
+        if templates:
+            bundle.templates = PublishData.parse_templates(templates.get('content'))
+
+        reel = self._latest_of_type(report_id, REEL_CONTENT_TYPE_ID)
+        if reel:
+            bundle.reel = PublishData.make_reel(
+                report_id, reel.get('title'), reel.get('description'), reel.get('content'), reel.get('file_url')
+            )
+
+        return bundle
+
+    def load_many(self, report_ids: Iterable[int]) -> Dict[int, PublishData]:
+        bundles = {}
+        for report_id in report_ids:
+            bundle = self.load(report_id)
+            if bundle:
+                bundles[report_id] = bundle
+        return bundles
+
+
+# ============================================
+# Provider selection
+# ============================================
+
+class PublishDataProvider:
+    """
+    الـ backend حسب PUBLISH_DATA_BACKEND
+
+    db: استعلام واحد، وإذا فشل (DB مش متاحة) بنجرب الـ API
+    http: الـ API بس
+    """
+
+    def __init__(self, conn=None, api_base_url: str = None, backend: str = None):
+        self.backend = (backend or PUBLISH_DATA_BACKEND).lower()
+        self.db = DBPublishDataProvider(conn) if self.backend == 'db' else None
+        self.http = HTTPPublishDataProvider(api_base_url)
+
+    def load_many(self, report_ids: Iterable[int]) -> Dict[int, PublishData]:
+        report_ids = list(report_ids)
+        if self.db:
+            try:
+                return self.db.load_many(report_ids)
+            except Exception as e:
+                print(f"⚠️  Publish data DB query failed ({e}), falling back to API")
+        try:
+            return self.http.load_many(report_ids)
+        except Exception as e:
+            print(f"❌ Publish data API failed: {e}")
+            return {}
+
+    def load(self, report_id: int) -> Optional[PublishData]:
+        return self.load_many([report_id]).get(report_id)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🚦 Publish Rate Limits
+token buckets للنشر على كل منصة وكل صفحة، مشتركة بين كل الـ threads بالعملية
+
+قبل: sleep ثابت (60s بين التقارير، 30s بين الدورات، 10s/5s بين الصفحات)
+هلأ:
+- bucket مشترك لكل API: graph (فيسبوك + انستغرام بنفس الـ app) و telegram_bot
+- bucket لكل صفحة/حساب/قناة: facebook:h-GAZA، facebook:DOT، instagram:<ig user>، telegram:<chat>
+- الـ publisher بياخد token قبل كل نشر (page bucket + الـ bucket المشترك)
+- الحدود الافتراضية حسب حدود المنصات الموثقة:
+  Instagram Content Publishing: 50 منشور / 24 ساعة لكل حساب
+  Telegram: 30 رسالة/ثانية للبوت، 20 رسالة/دقيقة لنفس القناة
+  Graph: 200 طلب/ساعة (Platform Rate Limit) + حد محافظ للمنشورات لكل صفحة
+- ردود Graph/Telegram بتعدل الـ buckets (hook على الـ http client):
+  X-App-Usage / X-Page-Usage / X-Business-Use-Case-Usage: المعدل بينزل فوق PUBLISH_USAGE_THROTTLE_PCT
+  estimated_time_to_regain_access / retry_after / أكواد rate limit: توقف للـ bucket
+  توقف طويل (>= PUBLISH_LONG_PAUSE_MINUTES) بيتسجل كمان بملف الإيقاف (set_publishing_pause)
+- deadline (نهاية دورة الـ scheduler): الـ acquire ما بيستنى لبعدها، بيرمي PublishDeadlineExceeded
+  والمنشور بيضل بالطابور للدورة الجاية
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.services.generators.tts_rate_limiter import RateLimiter, MIN_RATE_FACTOR
+
+
+FB_APP_CALLS_PER_HOUR = float(os.getenv('FB_APP_CALLS_PER_HOUR', 200))
+FB_PAGE_POSTS_PER_HOUR = float(os.getenv('FB_PAGE_POSTS_PER_HOUR', 30))
+IG_POSTS_PER_DAY = float(os.getenv('IG_POSTS_PER_DAY', 50))
+TG_MESSAGES_PER_SECOND = float(os.getenv('TG_MESSAGES_PER_SECOND', 30))
+TG_CHAT_MESSAGES_PER_MINUTE = float(os.getenv('TG_CHAT_MESSAGES_PER_MINUTE', 20))
+
+PUBLISH_USAGE_THROTTLE_PCT = float(os.getenv('PUBLISH_USAGE_THROTTLE_PCT', 75))
+PUBLISH_LONG_PAUSE_MINUTES = float(os.getenv('PUBLISH_LONG_PAUSE_MINUTES', 30))
+
+# (طلبات بالدقيقة، burst)
+BUCKET_LIMITS: Dict[str, Tuple[float, int]] = {
+    'graph': (FB_APP_CALLS_PER_HOUR / 60, 10),
+    'telegram_bot': (TG_MESSAGES_PER_SECOND * 60, 30),
+    'facebook': (FB_PAGE_POSTS_PER_HOUR / 60, 2),
+    'instagram': (IG_POSTS_PER_DAY / 1440, 2),
+    'telegram': (TG_CHAT_MESSAGES_PER_MINUTE, 1),
+}
+
+# الـ bucket المشترك لكل منصة
+SHARED_BUCKETS = {'facebook': 'graph', 'instagram': 'graph', 'telegram': 'telegram_bot'}
+
+GRAPH_HOST = 'graph.facebook.com'
+TELEGRAM_HOST = 'api.telegram.org'
+
+# أكواد Graph للـ rate limit (app / user / page / custom / BUC pages / BUC instagram)
+GRAPH_RATE_LIMIT_CODES = frozenset({4, 17, 32, 613, 80001, 80002})
+# حظر مؤقت (spam) على الصفحة
+GRAPH_BLOCKED_CODE = 368
+# حدود Graph بتضل شغالة دقائق، فأقل توقف بعد الرفض
+GRAPH_RATE_LIMIT_PAUSE = 60
+
+
+class PublishDeadlineExceeded(Exception):
+    """الـ token مش جاهز قبل نهاية دورة النشر"""
+
+
+class PublishBucket(RateLimiter):
+    """RateLimiter مع توقف بمدة معروفة، وتخفيض المعدل حسب نسبة الاستهلاك من الـ headers"""
+
+    def __init__(self, name: str, requests_per_minute: float, burst: int = 1):
+        super().__init__(requests_per_minute, burst)
+        self.name = name
+        self.usage = 0.0
+
+    def wait_time(self) -> float:
+        """كم ثانية لحد أول token (0 = جاهز)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def acquire_before(self, deadline: float) -> bool:
+        """متل acquire، بس False بدل الانتظار لبعد deadline (time.monotonic)"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    self.stats['requests'] += 1
+                    self.stats['waited_seconds'] += waited
+                    return True
+                else:
+                    wait = (1 - self._tokens) / self.rate
+
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float):
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self.stats['rate_limited'] += 1
+
+    def apply_usage(self, percent: float):
+        """نسبة الاستهلاك (0-100): فوق الحد المعدل بينزل خطياً لحد MIN_RATE_FACTOR"""
+        with self._lock:
+            self.usage = percent
+            if percent >= PUBLISH_USAGE_THROTTLE_PCT:
+                factor = max(MIN_RATE_FACTOR, (100 - percent) / (100 - PUBLISH_USAGE_THROTTLE_PCT))
+                self.rate = min(self.rate, self.max_rate * factor)
+
+
+def _usage_percent(value: Dict) -> float:
+    return max(float(value.get(key) or 0) for key in ('call_count', 'total_cputime', 'total_time'))
+
+
+class PublishRateLimits:
+    """كل الـ buckets + قراءة الـ headers من ردود المنصات"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, PublishBucket] = {}
+        # Graph object id (صفحة / حساب انستغرام) → (platform, page)
+        self._objects: Dict[str, Tuple[str, str]] = {}
+        # deadline لكل thread (worker الـ scheduler) بدل ما نمرره لكل publisher
+        self._local = threading.local()
+
+    # ============================================
+    # Buckets
+    # ============================================
+
+    def bucket(self, platform: str, page: str = None) -> PublishBucket:
+        """page=None = الـ bucket المشترك للمنصة"""
+        key = f"{platform}:{page}" if page else SHARED_BUCKETS.get(platform, platform)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                per_minute, burst = BUCKET_LIMITS[key.split(':', 1)[0]]
+                bucket = self._buckets[key] = PublishBucket(key, per_minute, burst)
+            return bucket
+
+    def register_page(self, platform: str, page: str, object_id: str = None):
+        """ربط id الصفحة بـ Graph بالـ bucket تبعها (لقراءة X-Page-Usage)"""
+        self.bucket(platform, page)
+        if object_id:
+            with self._lock:
+                self._objects[str(object_id)] = (platform, page)
+
+    def acquire(self, platform: str, page: str = None, deadline: float = None):
+        """
+        انتظار token من bucket الصفحة ثم المشترك
+
+        Args:
+            deadline: time.monotonic() (None = deadline الـ thread إذا في، وإلا بدون حد)
+
+        Raises:
+            PublishDeadlineExceeded: الـ token مش جاهز قبل الـ deadline
+        """
+        deadline = deadline or getattr(self._local, 'deadline', None)
+        buckets = ([self.bucket(platform, page)] if page else []) + [self.bucket(platform)]
+
+        if deadline is None:
+            for bucket in buckets:
+                bucket.acquire()
+            return
+
+        # المشترك أول بالفحص حتى ما نصرف token الصفحة على الفاضي
+        if max(b.wait_time() for b in buckets) > deadline - time.monotonic() or \
+                not all(b.acquire_before(deadline) for b in buckets):
+            self._local.deadline_hit = True
+            raise PublishDeadlineExceeded(f"{platform} rate limit: next slot after cycle deadline")
+
+    @contextmanager
+    def deadline(self, deadline: float):
+        """كل acquire بهالـ thread جوا الـ block ما بيستنى لبعد deadline"""
+        self._local.deadline = deadline
+        self._local.deadline_hit = False
+        try:
+            yield
+        finally:
+            self._local.deadline = None
+
+    def deadline_hit(self) -> bool:
+        """آخر block بهالـ thread وقف عند الـ deadline؟ (الـ publishers بيمسكوا الـ exception)"""
+        return getattr(self._local, 'deadline_hit', False)
+
+    def wait_time(self, platform: str) -> float:
+        """أطول انتظار بين buckets المنصة (للـ scheduler: هل في وقت نبلش نشر جديد)"""
+        with self._lock:
+            buckets = [b for key, b in self._buckets.items() if key.startswith(f"{platform}:")]
+        buckets.append(self.bucket(platform))
+        return max(b.wait_time() for b in buckets)
+
+    def pause(self, platform: str, page: str = None, seconds: float = 60, reason: str = ''):
+        bucket = self.bucket(platform, page)
+        bucket.pause(seconds)
+        print(f"   🚦 {bucket.name} paused {seconds:.0f}s {reason}".rstrip())
+
+        if seconds >= PUBLISH_LONG_PAUSE_MINUTES * 60 and platform in ('facebook', 'instagram'):
+            # الدورات الجاية (وأي worker تاني) بتشوف الإيقاف
+            from app.jobs.publishers_job import set_publishing_pause
+            set_publishing_pause(platform, hours=seconds / 3600)
+
+    # ============================================
+    # Response headers (hook على الـ http client)
+    # ============================================
+
+    def observe(self, response):
+        host = urlparse(response.url).hostname or ''
+        if host == GRAPH_HOST:
+            self._observe_graph(response)
+        elif host == TELEGRAM_HOST and response.status_code == 429:
+            self._observe_telegram(response)
+
+    def _graph_object(self, url: str) -> Optional[Tuple[str, str]]:
+        """/v18.0/{id}/... → (platform, page) إذا الـ id مسجل"""
+        parts = [p for p in urlparse(url).path.split('/') if p]
+        if parts and parts[0].startswith('v'):
+            parts = parts[1:]
+        return self._objects.get(parts[0]) if parts else None
+
+    def _observe_graph(self, response):
+        headers = response.headers
+        target = self._graph_object(response.url)
+        graph = self.bucket('facebook')
+
+        app_usage = _parse_header(headers.get('X-App-Usage'))
+        if app_usage:
+            graph.apply_usage(_usage_percent(app_usage))
+
+        page_usage = _parse_header(headers.get('X-Page-Usage'))
+        if page_usage and target:
+            self.bucket(*target).apply_usage(_usage_percent(page_usage))
+
+        for object_id, entries in (_parse_header(headers.get('X-Business-Use-Case-Usage')) or {}).items():
+            owner = self._objects.get(str(object_id))
+            for entry in entries or []:
+                bucket = self.bucket(*owner) if owner else graph
+                bucket.apply_usage(_usage_percent(entry))
+                regain = float(entry.get('estimated_time_to_regain_access') or 0)
+                if regain > 0:
+                    platform, page = owner or ('facebook', None)
+                    self.pause(platform, page, regain * 60, reason='(business use case limit)')
+
+        if response.status_code >= 400:
+            try:
+                error = response.json().get('error') or {}
+            except ValueError:
+                error = {}
+            code = error.get('code')
+            if code in GRAPH_RATE_LIMIT_CODES or code == GRAPH_BLOCKED_CODE:
+                # code 4 = حد الـ app كله، الباقي على الصفحة/الحساب
+                platform, page = target if target and code != 4 else ('facebook', None)
+                self.bucket(platform, page).on_rate_limited()
+                self.pause(platform, page, GRAPH_RATE_LIMIT_PAUSE, reason=f'(code {code})')
+        elif not app_usage or graph.usage < PUBLISH_USAGE_THROTTLE_PCT:
+            graph.on_success()
+            if target:
+                self.bucket(*target).on_success()
+
+    def _observe_telegram(self, response):
+        try:
+            retry_after = float((response.json().get('parameters') or {}).get('retry_after') or 0)
+        except ValueError:
+            retry_after = 0
+        retry_after = retry_after or float(response.headers.get('Retry-After') or 0) or 30
+        self.pause('telegram', seconds=retry_after, reason='(429)')
+
+    # ============================================
+    # Stats
+    # ============================================
+
+    def summary(self) -> str:
+        with self._lock:
+            buckets = list(self._buckets.values())
+        parts = []
+        for bucket in buckets:
+            if bucket.stats['requests'] or bucket.stats['rate_limited']:
+                parts.append(f"{bucket.name} {bucket.stats['requests']} "
+                             f"(waited {bucket.stats['waited_seconds']:.0f}s, "
+                             f"{bucket.stats['rate_limited']} limited, {bucket.rate * 60:.2f}/min)")
+        return '; '.join(parts) or 'idle'
+
+
+def _parse_header(value: Optional[str]) -> Optional[Dict]:
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+_shared_limits: Optional[PublishRateLimits] = None
+_shared_limits_lock = threading.Lock()
+
+
+def get_publish_limits() -> PublishRateLimits:
+    """نفس الـ buckets لكل الـ publishers بنفس العملية (الحصة عند المنصة مشتركة)"""
+    global _shared_limits
+    with _shared_limits_lock:
+        if _shared_limits is None:
+            from app.utils.http_client import get_http_client
+            _shared_limits = PublishRateLimits()
+            get_http_client().add_response_hook(_shared_limits.observe)
+        return _shared_limits
@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🗓️ Publish Scheduler
+طابور نشر بالـ DB مع أولويات، وworker لكل منصة بالتوازي، والسرعة حسب الـ token buckets
+
+قبل: حلقة وحدة لكل المنصات ورا بعض مع sleep ثابت (60s بين التقارير، 5s للتيليجرام،
+30s بين تقارير الدورة المنفصلة، 10s بين المنصات)
+هلأ:
+- publish_queue: صف لكل (تقرير، منصة) مع priority (JobPriority) وعدد المحاولات و not_before
+  UNIQUE(report_id, platform): التقرير ما بينضاف مرتين لنفس المنصة
+- run(): thread لكل منصة، كل واحد بيسحب من طابوره (FOR UPDATE SKIP LOCKED) وبينشر
+  طول ما الـ buckets (publish_limits) بتسمح وضمن وقت الدورة (PUBLISH_CYCLE_BUDGET)
+- الفشل: إعادة بعد backoff لحد PUBLISH_QUEUE_MAX_ATTEMPTS
+- نتيجة pending (ريل انستغرام عند الـ container poller): الصف 'submitted' بدون إعادة،
+  وحالة التقرير بيحدثها الـ poller بعد النشر الفعلي
+- حالة التقرير بتنحسب من (الحالة الحالية + المنصات اللي خلصت بالطابور) داخل transaction
+  بـ SELECT ... FOR UPDATE، فالمنصات اللي بتنشر سوا ما بتمسح نتيجة بعض
+- الإيقاف (PAUSE_FILE) بينفحص قبل كل تقرير
+- كل acquire للـ buckets جوا النشر محدود بنهاية الدورة (limits.deadline)؛ إذا ما لحق،
+  الصف بيرجع 'pending' بدون ما تنحسب محاولة
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+
+import psycopg2
+
+from app.services.publishers.publish_limits import get_publish_limits
+from app.utils.job_queue import JobPriority
+from settings import DB_CONFIG
+
+
+PUBLISH_CYCLE_BUDGET = float(os.getenv('PUBLISH_CYCLE_BUDGET', 300))         # ثواني لكل دورة نشر
+PUBLISH_QUEUE_MAX_ATTEMPTS = int(os.getenv('PUBLISH_QUEUE_MAX_ATTEMPTS', 3))
+PUBLISH_RETRY_DELAY = 120                                                   # ثواني، بتتضاعف مع كل محاولة
+
+PUBLISH_QUEUE_KEEP_DAYS = 7
+
+# صف بحالة running أقدم من هيك = الـ worker وقف بالنص
+STALE_RUNNING_SECONDS = 900
+
+PLATFORMS = ('facebook', 'instagram', 'telegram')
+
+
+# ============================================
+# Report status (facebook_instagram_published ...)
+# ============================================
+
+def published_platforms(status: Optional[str]) -> Set[str]:
+    """المنصات اللي انتشر عليها التقرير حسب الـ status"""
+    status = (status or '').lower()
+    if status == 'all_platforms_published':
+        return set(PLATFORMS)
+    if not status.endswith('_published'):
+        return set()
+    return {platform for platform in PLATFORMS if platform in status}
+
+
+def merge_published_status(platforms: Iterable[str]) -> Optional[str]:
+    """{'facebook', 'telegram'} → facebook_telegram_published (None إذا فاضية)"""
+    platforms = set(platforms) & set(PLATFORMS)
+    if not platforms:
+        return None
+    if len(platforms) == len(PLATFORMS):
+        return 'all_platforms_published'
+    return '_'.join(p for p in PLATFORMS if p in platforms) + '_published'
+
+
+def ensure_publish_queue_table(cursor):
+    """جدول الطابور (الـ commit على المستدعي)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS publish_queue (
+            id SERIAL PRIMARY KEY,
+            report_id INTEGER NOT NULL,
+            platform VARCHAR(20) NOT NULL,
+            priority INTEGER DEFAULT 2,
+            base_status VARCHAR(100),
+            state VARCHAR(20) DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            not_before TIMESTAMP DEFAULT NOW(),
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW(),
+            UNIQUE (report_id, platform)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_publish_queue_ready
+        ON publish_queue (platform, state, priority, not_before)
+    """)
+
+
+class PublishScheduler:
+    """
+    طابور النشر + workers المنصات
+
+    كل worker بيستعمل publisher منصته (من PublishersJob) واتصال DB خاص فيه
+    """
+
+    def __init__(self, job):
+        """
+        Args:
+            job: PublishersJob (الـ publishers والاتصال الأساسي)
+        """
+        self.job = job
+        self.limits = get_publish_limits()
+
+        ensure_publish_queue_table(job.cursor)
+        # صفوف قديمة خلصت (التقرير ما بيرجع للطابور إلا إذا انمسح صفه)
+        job.cursor.execute("""
+            DELETE FROM publish_queue
+            WHERE state IN ('done', 'failed', 'submitted') AND updated_at < NOW() - INTERVAL '%s days'
+        """, (PUBLISH_QUEUE_KEEP_DAYS,))
+        job.conn.commit()
+
+    # ============================================
+    # Queue
+    # ============================================
+
+    def enqueue(self, platform: str, reports: List, priority: JobPriority = JobPriority.NORMAL) -> int:
+        """
+        إضافة تقارير لطابور منصة (الموجود مسبقاً ما بيتكرر)
+
+        Args:
+            reports: (report_id, status, created_at) من get_reports_ready_for_publishing
+
+        Returns:
+            عدد الصفوف الجديدة
+        """
+        added = 0
+        cursor = self.job.cursor
+        for report_id, status, _ in reports:
+            cursor.execute("""
+                INSERT INTO publish_queue (report_id, platform, priority, base_status)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (report_id, platform) DO NOTHING
+            """, (report_id, platform, priority.value, status))
+            added += cursor.rowcount
+        self.job.conn.commit()
+        return added
+
+    @staticmethod
+    def _reset_stale(cursor, platform: str):
+        cursor.execute("""
+            UPDATE publish_queue SET state = 'pending', updated_at = NOW()
+            WHERE platform = %s AND state = 'running'
+              AND updated_at < NOW() - INTERVAL '%s seconds'
+        """, (platform, STALE_RUNNING_SECONDS))
+
+    @staticmethod
+    def _dequeue(cursor, platform: str) -> Optional[Dict]:
+        """أعلى priority جاهز (أحدث تقرير أول) - نفس أسلوب JobQueue.dequeue"""
+        cursor.execute("""
+            UPDATE publish_queue
+            SET state = 'running', attempts = attempts + 1, updated_at = NOW()
+            WHERE id = (
+                SELECT id FROM publish_queue
+                WHERE platform = %s AND state = 'pending' AND not_before <= NOW()
+                ORDER BY priority DESC, report_id DESC
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, report_id, base_status, attempts
+        """, (platform,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {'id': row[0], 'report_id': row[1], 'base_status': row[2], 'attempts': row[3], 'platform': platform}
+
+    def _finish(self, conn, item: Dict, success: bool, error: str = None, pending: bool = False,
+                deferred: bool = False) -> str:
+        """
+        تحديث الطابور وحالة التقرير بنفس الـ transaction
+
+        Args:
+            pending: الـ publisher سلم المنشور لـ poller (مش نجاح ولا فشل)
+            deferred: ما في token قبل نهاية الدورة (بيرجع للطابور بدون ما تنحسب محاولة)
+
+        Returns:
+            حالة الصف الجديدة (done / pending / failed / submitted)
+        """
+        cursor = conn.cursor()
+        try:
+            if pending and not success:
+                # حالة التقرير ('publishing') بيحدثها الـ poller
+                cursor.execute("""
+                    UPDATE publish_queue SET state = 'submitted', last_error = NULL, updated_at = NOW()
+                    WHERE id = %s
+                """, (item['id'],))
+                conn.commit()
+                return 'submitted'
+
+            if success:
+                state = 'done'
+                cursor.execute("""
+                    UPDATE publish_queue SET state = 'done', last_error = NULL, updated_at = NOW()
+                    WHERE id = %s
+                """, (item['id'],))
+            elif deferred:
+                state = 'pending'
+                cursor.execute("""
+                    UPDATE publish_queue
+                    SET state = 'pending', attempts = GREATEST(attempts - 1, 0), updated_at = NOW()
+                    WHERE id = %s
+                """, (item['id'],))
+            elif item['attempts'] < PUBLISH_QUEUE_MAX_ATTEMPTS:
+                state = 'pending'
+                cursor.execute("""
+                    UPDATE publish_queue
+                    SET state = 'pending', last_error = %s, updated_at = NOW(),
+                        not_before = NOW() + INTERVAL '%s seconds'
+                    WHERE id = %s
+                """, ((error or '')[:500], PUBLISH_RETRY_DELAY * 2 ** (item['attempts'] - 1), item['id']))
+            else:
+                state = 'failed'
+                cursor.execute("""
+                    UPDATE publish_queue SET state = 'failed', last_error = %s, updated_at = NOW()
+                    WHERE id = %s
+                """, ((error or '')[:500], item['id']))
+
+            # الحالة = اللي كان منشور + اللي خلص بالطابور (الـ publishers بيكتبوا حالات وسطية)
+            cursor.execute("SELECT status FROM generated_report WHERE id = %s FOR UPDATE", (item['report_id'],))
+            row = cursor.fetchone()
+            cursor.execute("""
+                SELECT platform FROM publish_queue WHERE report_id = %s AND state = 'done'
+            """, (item['report_id'],))
+            done = {r[0] for r in cursor.fetchall()}
+
+            platforms = published_platforms(row[0] if row else None) | published_platforms(item['base_status']) | done
+            new_status = merge_published_status(platforms)
+            if not new_status:
+                new_status = 'publishing_failed' if state == 'failed' else (item['base_status'] or 'completed')
+
+            sql = "UPDATE generated_report SET status = %s, updated_at = NOW()"
+            if success:
+                sql += ", published_at = NOW()"
+            cursor.execute(sql + " WHERE id = %s", (new_status, item['report_id']))
+            conn.commit()
+            return state
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def queue_stats(self) -> Dict[str, Dict[str, int]]:
+        """{platform: {state: count}}"""
+        cursor = self.job.cursor
+        cursor.execute("SELECT platform, state, COUNT(*) FROM publish_queue GROUP BY platform, state")
+        stats: Dict[str, Dict[str, int]] = {}
+        for platform, state, count in cursor.fetchall():
+            stats.setdefault(platform, {})[state] = count
+        return stats
+
+    # ============================================
+    # Publishing
+    # ============================================
+
+    def _publish(self, platform: str, report_id: int) -> Dict:
+        """نشر تقرير على منصة (بوست فقط لفيسبوك/انستغرام، نفس الدورة القديمة)"""
+        publisher = self.job.publishers.get(platform)
+        if not publisher:
+            return {'success': False, 'message': f'{platform} publisher not available'}
+        if platform == 'telegram':
+            return publisher.publish(report_id) or {'success': False, 'message': 'No result'}
+        return publisher.publish(report_id, 'post') or {'success': False, 'message': 'No result'}
+
+    @staticmethod
+    def _is_success(result: Dict) -> bool:
+        parts = [result.get(key) or {} for key in ('post', 'video', 'reel')]
+        return bool(result.get('success') or any(part.get('success') for part in parts))
+
+    @staticmethod
+    def _is_pending(result: Dict) -> bool:
+        parts = [result.get(key) or {} for key in ('post', 'video', 'reel')]
+        return bool(result.get('pending') or any(part.get('pending') for part in parts))
+
+    def _worker(self, platform: str, deadline: float) -> List[Dict]:
+        """سحب ونشر من طابور المنصة لحد ما يفضى، أو توقف، أو يخلص الوقت"""
+        from app.jobs.publishers_job import is_publishing_paused
+
+        results = []
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            cursor = conn.cursor()
+            self._reset_stale(cursor, platform)
+            conn.commit()
+
+            while True:
+                if is_publishing_paused(platform):
+                    break
+
+                # التقرير الجاي بيبلش بس إذا الـ buckets جاهزة قبل نهاية الدورة
+                remaining = deadline - time.monotonic()
+                if self.limits.wait_time(platform) >= remaining:
+                    if remaining > 0:
+                        print(f"   🚦 {platform}: next slot after cycle budget, leaving rest queued")
+                    break
+
+                item = self._dequeue(cursor, platform)
+                conn.commit()
+                if not item:
+                    break
+
+                report_id = item['report_id']
+                with self.limits.deadline(deadline):
+                    try:
+                        result = self._publish(platform, report_id)
+                    except Exception as e:
+                        result = {'success': False, 'message': str(e)}
+
+                success = self._is_success(result)
+                deferred = not success and self.limits.deadline_hit()
+                state = self._finish(conn, item, success, None if success else result.get('message', 'Unknown error'),
+                                     pending=self._is_pending(result), deferred=deferred)
+                icon = '✅' if success else ('⏳' if state == 'submitted' else '🚦' if deferred else '❌')
+                print(f"   {icon} {platform} report #{report_id}: {state}")
+                results.append({'report_id': report_id, 'platform': platform, 'success': success,
+                                'state': state, 'result': result})
+                if deferred:
+                    print(f"   🚦 {platform}: rate limit outlasts cycle budget, leaving rest queued")
+                    break
+        finally:
+            conn.close()
+        return results
+
+    def run(self, platforms: Iterable[str] = PLATFORMS, budget: float = None) -> List[Dict]:
+        """
+        كل منصة بـ thread لحالها (المنصات ما بتستنى بعض)
+
+        Returns:
+            [{'report_id', 'platform', 'success', 'state', 'result'}]
+        """
+        platforms = [p for p in platforms if self.job.publishers.get(p)]
+        if not platforms:
+            return []
+
+        deadline = time.monotonic() + (budget or PUBLISH_CYCLE_BUDGET)
+        results: List[Dict] = []
+        with ThreadPoolExecutor(max_workers=len(platforms), thread_name_prefix='publish') as executor:
+            futures = {executor.submit(self._worker, platform, deadline): platform for platform in platforms}
+            for future, platform in futures.items():
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    print(f"   ❌ {platform} publish worker failed: {e}")
+        return results
@@ -10,10 +10,13 @@ Priority:
 """
 
 import os
-import requests
 from typing import Dict, Optional
 import psycopg2
 
+from app.services.publishers.publish_data import PublishData, PublishDataProvider
+from app.services.publishers.publish_limits import get_publish_limits
+from app.utils.http_client import get_http_client
+
 
 class TelegramPublisher:
     """
@@ -73,6 +76,15 @@ class TelegramPublisher:
             print(f"⚠️  Database error: {e}")
             self.conn = None
             self.cursor = None
+        
+        # بيانات النشر (عنوان + صور) باستعلام واحد
+        self.publish_data = PublishDataProvider(conn=self.conn, api_base_url=self.API_BASE_URL)
+        self.http = get_http_client()
+        self._publish_data_cache: Optional[PublishData] = None
+        
+        # 20 رسالة/دقيقة للقناة + 30/ثانية للبوت
+        self.limits = get_publish_limits()
+        self.limits.register_page('telegram', self.CHAT_ID)
     
     def publish(self, report_id: int) -> Dict:
         """
@@ -97,6 +109,7 @@ class TelegramPublisher:
             return {'success': False, 'message': 'TG_CHAT_ID not configured'}
         
         self._update_report_status(report_id, 'publishing')
+        self._get_publish_data(report_id, refresh=True)
         
         # 1. Get Title
         print("1️⃣ Getting report title...")
@@ -133,21 +146,20 @@ class TelegramPublisher:
         
         return result
     
+    def _get_publish_data(self, report_id: int, refresh: bool = False) -> Optional[PublishData]:
+        """كل بيانات التقرير (استعلام واحد، محفوظة لباقي خطوات نفس النشر)"""
+        cached = self._publish_data_cache
+        if refresh or cached is None or cached.report_id != report_id:
+            self._publish_data_cache = cached = self.publish_data.load(report_id)
+        return cached
+    
     def _get_report_title(self, report_id: int) -> Optional[str]:
         """جلب عنوان التقرير"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/reports/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                print(f"   ❌ API error: {response.status_code}")
-                return None
-            
-            data = response.json()
-            return data.get('title', '')
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
+        data = self._get_publish_data(report_id)
+        if not data:
+            print(f"   ❌ Report {report_id} not found")
             return None
+        return data.title
     
     def _get_image_url(self, report_id: int) -> Optional[str]:
         """
@@ -172,53 +184,25 @@ class TelegramPublisher:
     
     def _get_generated_image_url(self, report_id: int) -> Optional[str]:
         """Get Generated Image URL"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/images/by-report/{report_id}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                print(f"   ⚠️  Generated image API returned: {response.status_code}")
-                return None
-            
-            data = response.json()
-            image_url = data.get('file_url')
-            
-            if image_url:
-                print(f"   ✅ Using Generated Image: {image_url[:50]}...")
-                return image_url
-            
-            return None
-        except Exception as e:
-            print(f"   ❌ Error getting generated image: {e}")
-            return None
+        data = self._get_publish_data(report_id)
+        image_url = data.generated_image_url if data else None
+        if image_url:
+            print(f"   ✅ Using Generated Image: {image_url[:50]}...")
+            return image_url
+        
+        print("   ⚠️  No generated image")
+        return None
     
     def _get_original_image_url(self, report_id: int) -> Optional[str]:
         """Get Original Image URL"""
-        try:
-            url = f"{self.API_BASE_URL}/api/v1/reports/reports/{report_id}/raw-news-images"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                print(f"   ❌ API error: {response.status_code}")
-                return None
-            
-            data = response.json()
-            
-            # Response format: {"report_id": 123, "images": [{"news_id": 1, "title": "...", "img_url": "..."}]}
-            images = data.get('images', [])
-            
-            if isinstance(images, list) and len(images) > 0:
-                # Try different possible keys for image URL
-                image_url = images[0].get('img_url') or images[0].get('url') or images[0].get('image_url')
-                if image_url:
-                    print(f"   ✅ Using Original Image: {image_url[:50]}...")
-                    return image_url
-            
-            print("   ⚠️  No images found in response")
-            return None
-        except Exception as e:
-            print(f"   ❌ Error getting original image: {e}")
-            return None
+        data = self._get_publish_data(report_id)
+        image_url = data.original_image_url if data else None
+        if image_url:
+            print(f"   ✅ Using Original Image: {image_url[:50]}...")
+            return image_url
+        
+        print("   ⚠️  No original images")
+        return None
     
     def _send_photo(self, photo_url: str, caption: str) -> Dict:
         """إرسال صورة لـ Telegram"""
@@ -233,7 +217,8 @@ class TelegramPublisher:
         }
         
         try:
-            response = requests.post(url, json=payload, timeout=30)
+            self.limits.acquire('telegram', self.CHAT_ID)
+            response = self.http.post(url, json=payload)
             result = response.json()
             
             if result.get('ok'):
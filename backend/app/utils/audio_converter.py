@@ -3,43 +3,28 @@ Audio Converter Utility
 ========================
 
 Utility class for audio conversion and FFmpeg availability checking.
+
+Thin wrapper over app.utils.media_transcode: FFmpeg is located and probed
+once per process, and conversions stream through pipes instead of temp files.
 """
 
-import os
-import subprocess
-import shutil
-import tempfile
-import requests
 from io import BytesIO
 from typing import Optional
 
+from app.utils import media_transcode
+from app.utils.media_transcode import TranscodeError
+
 
 class AudioConverter:
     """Audio converter utility with FFmpeg support."""
     
     def __init__(self):
         """Initialize the audio converter."""
-        self.ffmpeg_path = self._find_ffmpeg()
-    
-    def _find_ffmpeg(self) -> Optional[str]:
-        """Find FFmpeg executable in system PATH."""
-        return shutil.which('ffmpeg')
+        self.ffmpeg_path = media_transcode.find_ffmpeg()
     
     def is_ffmpeg_available(self) -> bool:
-        """Check if FFmpeg is available on the system."""
-        if self.ffmpeg_path:
-            try:
-                # Test FFmpeg by running version command
-                result = subprocess.run(
-                    [self.ffmpeg_path, '-version'], 
-                    capture_output=True, 
-                    text=True, 
-                    timeout=10
-                )
-                return result.returncode == 0
-            except (subprocess.TimeoutExpired, FileNotFoundError, OSError):
-                return False
-        return False
+        """Check if FFmpeg is available on the system (probed once per process)."""
+        return media_transcode.is_ffmpeg_available()
     
     def needs_conversion(self, mime_type: str) -> bool:
         """
@@ -66,6 +51,8 @@ class AudioConverter:
         """
         Convert audio from URL to WAV format (16kHz, mono, LINEAR16).
         
+        FFmpeg reads the URL directly (HTTP input); nothing is written to disk.
+
         Args:
             audio_url: URL of the audio file to convert
             
@@ -76,68 +63,18 @@ class AudioConverter:
             print("❌ FFmpeg not available for audio conversion")
             return None
         
-        temp_input = None
-        temp_output = None
-        
         try:
-            # Download audio from URL
-            print(f"   📥 Downloading audio from URL...")
-            response = requests.get(audio_url, timeout=30)
-            response.raise_for_status()
-            
-            # Save to temp file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_input:
-                temp_input.write(response.content)
-                temp_input_path = temp_input.name
-            
-            # Create temp output file
-            temp_output = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-            temp_output_path = temp_output.name
-            temp_output.close()
-            
-            # Convert using FFmpeg
             print(f"   🔄 Converting to WAV (16kHz, mono)...")
-            cmd = [
-                self.ffmpeg_path,
-                '-i', temp_input_path,
-                '-ar', '16000',        # Sample rate: 16kHz
-                '-ac', '1',            # Channels: mono
-                '-acodec', 'pcm_s16le',  # Codec: LINEAR16
-                '-y',                  # Overwrite
-                temp_output_path
-            ]
-            
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True,
-                timeout=60
-            )
-            
-            if result.returncode != 0:
-                print(f"❌ FFmpeg conversion failed: {result.stderr}")
-                return None
-            
-            # Read converted file
-            with open(temp_output_path, 'rb') as f:
-                wav_data = BytesIO(f.read())
-            
+            wav_data = BytesIO(media_transcode.to_wav(audio_url))
             print(f"   ✅ Conversion successful")
             return wav_data
             
+        except TranscodeError as e:
+            print(f"❌ FFmpeg conversion failed: {e}")
+            return None
         except Exception as e:
             print(f"❌ Conversion error: {e}")
             return None
-            
-        finally:
-            # Cleanup temp files
-            try:
-                if temp_input_path and os.path.exists(temp_input_path):
-                    os.unlink(temp_input_path)
-                if temp_output_path and os.path.exists(temp_output_path):
-                    os.unlink(temp_output_path)
-            except:
-                pass
     
     def convert_audio(self, input_path: str, output_path: str, format: str = 'mp3') -> bool:
         """
@@ -156,15 +93,8 @@ class AudioConverter:
             return False
         
         try:
-            cmd = [
-                self.ffmpeg_path,
-                '-i', input_path,
-                '-y',  # Overwrite output file
-                output_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            return result.returncode == 0
+            media_transcode.run_ffmpeg(['-i', input_path, '-y', output_path])
+            return True
             
         except Exception as e:
             print(f"❌ Audio conversion failed: {e}")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+💽 Disk LRU
+تخزين محلي بمفاتيح (hash) بحد أقصى للحجم، يحذف الأقدم استخداماً
+
+مستخدم بكاش صوت TTS (bytes) وكاش الميديا (ملفات كبيرة تنحط بـ rename بدون قراءة)
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class DiskLRU:
+    """تخزين محلي بحد أقصى للحجم، يحذف الأقدم استخداماً"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.bin")
+
+    def _load_index(self):
+        """بناء الفهرس من الملفات الموجودة (الأقدم تعديلاً أول)"""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith('.bin'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total += size
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._total -= self._entries.pop(key, 0)
+
+    def get_path(self, key: str) -> Optional[str]:
+        """مسار الملف إذا موجود (وبيصير الأحدث استخداماً)"""
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            os.utime(path, None)
+            return path
+        except OSError:
+            self._forget(key)
+            return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.get_path(key)
+        if not path:
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            self._forget(key)
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # كتابة ذرية (ملف مؤقت ثم rename)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        self._commit(key, tmp_path, len(data))
+
+    def put_file(self, key: str, src_path: str) -> str:
+        """
+        نقل ملف جاهز للتخزين (rename، بدون قراءة)
+
+        src_path لازم يكون على نفس الـ filesystem (مثلاً من temp_path())
+        """
+        size = os.path.getsize(src_path)
+        os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+        self._commit(key, src_path, size)
+        return self._path(key)
+
+    def temp_path(self) -> str:
+        """مسار مؤقت جوا المجلد (للكتابة ثم put_file)"""
+        return os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+
+    def _commit(self, key: str, tmp_path: str, size: int):
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self._total -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._total += size
+            evicted = self._evict()
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def _evict(self) -> List[str]:
+        evicted = []
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            old_key, size = self._entries.popitem(last=False)
+            self._total -= size
+            evicted.append(old_key)
+        return evicted
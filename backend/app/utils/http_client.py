@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🌐 HTTP Client
+عميل HTTP مشترك لكل الطلبات الخارجية (Graph API، Telegram، تنزيل الصور، الـ scraper)
+
+قبل: requests.get/post على مستوى الموديول = اتصال TLS جديد مع كل طلب
+هلأ:
+- connection pool لكل host (urllib3) مشترك بين كل الـ threads، مع keep-alive
+- Session لكل thread (الـ cookies/headers مش thread-safe) فوق نفس الـ pools
+- HTTP/2 اختياري (HTTP_CLIENT_HTTP2) إذا urllib3 بيدعمه (urllib3.http2 + h2)
+- retry/backoff موحد مع قواعد idempotency:
+  GET/HEAD/OPTIONS/PUT/DELETE: أخطاء الاتصال، timeouts، 429/5xx
+  POST: بس إذا الاتصال ما انفتح أصلاً (الطلب ما وصل)، أو idempotent=True صريح
+  Retry-After بيتحترم
+- timeouts لكل host (connect, read)
+- metrics لكل host: عدد الطلبات، retries، أخطاء، status codes، زمن
+- response hooks: موديولات تانية بتقرأ الـ headers (مثلاً rate limit headers للنشر)
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', 20))            # عدد الـ hosts بالـ pool
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 16))        # اتصالات لكل host
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 3))
+HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', 0.5))   # ثواني (أسّي + jitter)
+HTTP_RETRY_MAX_WAIT = float(os.getenv('HTTP_RETRY_MAX_WAIT', 30))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+HTTP_CLIENT_HTTP2 = os.getenv('HTTP_CLIENT_HTTP2', 'false').lower() == 'true'
+
+# (connect, read) لكل host - الطلب بيقدر يحدد timeout خاص فيه
+HOST_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    'graph.facebook.com': (HTTP_CONNECT_TIMEOUT, 60),
+    'api.telegram.org': (HTTP_CONNECT_TIMEOUT, 30),
+}
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+Timeout = Union[float, Tuple[float, float], None]
+
+
+def _enable_http2() -> bool:
+    """HTTP/2 عبر urllib3 (تجريبي بـ urllib3 >= 2.3 ومحتاج h2)"""
+    try:
+        from urllib3.http2 import inject_into_urllib3
+        inject_into_urllib3()
+        return True
+    except Exception as e:
+        print(f"⚠️  HTTP/2 not available, using HTTP/1.1 keep-alive: {e}")
+        return False
+
+
+class HttpClient:
+    """
+    طلبات HTTP عبر pools مشتركة + retry + metrics
+
+    نفس واجهة requests (بيرجع requests.Response لأي status بعد الـ retries،
+    وبيرمي آخر exception إذا كل المحاولات فشلت)
+    """
+
+    def __init__(self, max_retries: int = None):
+        self.max_retries = HTTP_MAX_RETRIES if max_retries is None else max_retries
+        self.http2 = _enable_http2() if HTTP_CLIENT_HTTP2 else False
+
+        # الـ adapter (وفيه PoolManager) مشترك بين Sessions كل الـ threads
+        self._adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_HOSTS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            max_retries=0
+        )
+        self._local = threading.local()
+        self._metrics_lock = threading.Lock()
+        self._metrics: Dict[str, Dict] = {}
+        self._hooks: List[Callable[[requests.Response], None]] = []
+
+    def add_response_hook(self, hook: Callable[[requests.Response], None]):
+        """hook بينادى مع كل response (ومنها اللي رح تنعاد)، أخطاؤه ما بتأثر على الطلب"""
+        self._hooks.append(hook)
+
+    def _run_hooks(self, response: requests.Response):
+        for hook in self._hooks:
+            try:
+                hook(response)
+            except Exception as e:
+                print(f"⚠️  HTTP response hook failed: {e}")
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            self._local.session = session
+        return session
+
+    # ============================================
+    # Policy
+    # ============================================
+
+    @staticmethod
+    def timeout_for(host: str) -> Tuple[float, float]:
+        return HOST_TIMEOUTS.get(host, (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, HTTP_RETRY_MAX_WAIT)
+        # full jitter
+        return random.uniform(0, min(HTTP_RETRY_MAX_WAIT, HTTP_RETRY_BACKOFF * (2 ** attempt)))
+
+    @staticmethod
+    def _never_sent(error: Exception) -> bool:
+        """الطلب ما وصل السيرفر (الاتصال نفسه فشل) → آمن نعيده حتى لو POST"""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(error, requests.exceptions.ConnectionError):
+            reason = str(error)
+            return any(hint in reason for hint in (
+                'NewConnectionError', 'Name or service not known', 'Temporary failure in name resolution',
+                'Connection refused', 'nodename nor servname'
+            ))
+        return False
+
+    @staticmethod
+    def _rewind(kwargs: Dict):
+        """الملفات المرفقة لازم ترجع لأولها قبل إعادة الطلب"""
+        files = kwargs.get('files') or {}
+        values = files.values() if isinstance(files, dict) else [f[1] for f in files]
+        for value in values:
+            fileobj = value[1] if isinstance(value, (tuple, list)) else value
+            if hasattr(fileobj, 'seek'):
+                try:
+                    fileobj.seek(0)
+                except Exception:
+                    pass
+
+    # ============================================
+    # Requests
+    # ============================================
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        idempotent: Optional[bool] = None,
+        retries: Optional[int] = None,
+        timeout: Timeout = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        Args:
+            idempotent: None = حسب الـ method؛ True لـ POST آمن للإعادة (مثلاً polling)
+            retries: عدد الإعادات (None = HTTP_MAX_RETRIES، 0 = بدون)
+            timeout: None = timeout الـ host
+            **kwargs: نفس requests (params, data, json, files, headers, stream, verify...)
+        """
+        method = method.upper()
+        host = urlparse(url).hostname or ''
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        retries = self.max_retries if retries is None else retries
+        timeout = timeout if timeout is not None else self.timeout_for(host)
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self._session().request(method, url, timeout=timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                elapsed = time.perf_counter() - started
+                retryable = attempt < retries and (idempotent or self._never_sent(e))
+                self._record(host, None, elapsed, error=type(e).__name__, retried=retryable)
+                if not retryable:
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                self._rewind(kwargs)
+                continue
+
+            elapsed = time.perf_counter() - started
+            # 429 = ما انعالج، آمن نعيده لأي method؛ 5xx بس للـ idempotent
+            retryable = attempt < retries and response.status_code in RETRY_STATUSES and (
+                idempotent or response.status_code == 429
+            )
+            self._record(host, response.status_code, elapsed, retried=retryable)
+            self._run_hooks(response)
+            if not retryable:
+                return response
+
+            wait = self._backoff(attempt, self._retry_after(response))
+            response.close()
+            time.sleep(wait)
+            attempt += 1
+            self._rewind(kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request('HEAD', url, **kwargs)
+
+    # ============================================
+    # Metrics
+    # ============================================
+
+    def _record(self, host: str, status: Optional[int], elapsed: float, error: str = None, retried: bool = False):
+        with self._metrics_lock:
+            stats = self._metrics.setdefault(host, {
+                'requests': 0, 'retries': 0, 'errors': 0, 'statuses': {}, 'total_seconds': 0.0, 'max_seconds': 0.0
+            })
+            stats['requests'] += 1
+            stats['total_seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+            if retried:
+                stats['retries'] += 1
+            if error:
+                stats['errors'] += 1
+                stats['statuses'][error] = stats['statuses'].get(error, 0) + 1
+            else:
+                stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+
+    def metrics(self) -> Dict[str, Dict]:
+        """نسخة من الـ metrics لكل host (مع متوسط الزمن)"""
+        with self._metrics_lock:
+            snapshot = {}
+            for host, stats in self._metrics.items():
+                snapshot[host] = {
+                    **stats,
+                    'statuses': dict(stats['statuses']),
+                    'avg_seconds': stats['total_seconds'] / stats['requests'] if stats['requests'] else 0.0
+                }
+            return snapshot
+
+    def summary(self) -> str:
+        """سطر لكل host للـ logs"""
+        parts = []
+        for host, stats in sorted(self.metrics().items(), key=lambda item: -item[1]['requests']):
+            parts.append(f"{host or '?'} {stats['requests']} req "
+                         f"({stats['retries']} retried, {stats['errors']} errors, "
+                         f"avg {stats['avg_seconds'] * 1000:.0f}ms, max {stats['max_seconds'] * 1000:.0f}ms)")
+        return '; '.join(parts) or 'no requests'
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            self._metrics.clear()
+
+
+_shared_client: Optional[HttpClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """نفس العميل (ونفس الـ pools) لكل الموديولات بنفس العملية"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
+
+
+def http_metrics() -> Dict[str, Dict]:
+    return get_http_client().metrics()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🗃️ Media Cache
+كاش محلي مشترك على القرص للصور والصوت والخطوط اللي بتنزل من S3 / مواقع الأخبار
+
+بيستخدمه: الريلز، صور السوشال (خلفية + لوغو)، الناشرين، STT، والخطوط
+
+التصميم:
+- content-addressed: الملفات (blobs) مخزنة بـ sha256 للمحتوى بـ DiskLRU
+  (حد MEDIA_CACHE_MAX_MB، الأقدم استخداماً بينحذف أول)،
+  وفهرس لكل رابط: الرابط ← sha256 + ETag/Last-Modified + وقت آخر تحقق
+  نفس الصورة من رابطين = نسخة وحدة عالقرص
+- خلال MEDIA_CACHE_FRESH_SECONDS من آخر تحقق: hit بدون شبكة
+- بعدها: revalidation (If-None-Match / If-Modified-Since، أو head_object لـ S3)،
+  304 / نفس ETag → نفس الملف بدون تنزيل
+- إذا الشبكة فشلت والملف موجود → النسخة القديمة (stale) بدل الفشل
+- طلبات متزامنة لنفس الرابط: تنزيل واحد والباقي بيستنوه (coalescing)
+- التنزيل stream لملف مع hash أثناء الكتابة → ذاكرة ثابتة مهما كان الحجم
+- stats: hits / revalidated / misses / coalesced / stale / errors
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.utils.disk_lru import DiskLRU
+from app.utils.s3_transfer import (
+    HTTP_CHUNK_SIZE,
+    TRANSFER_CONFIG,
+    download_to_file,
+    parse_s3_url,
+)
+
+
+MEDIA_CACHE_ENABLED = os.getenv('MEDIA_CACHE_ENABLED', 'true').lower() == 'true'
+MEDIA_CACHE_DIR = os.getenv('MEDIA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'media_cache'))
+MEDIA_CACHE_MAX_MB = int(os.getenv('MEDIA_CACHE_MAX_MB', 1024))
+MEDIA_CACHE_FRESH_SECONDS = int(os.getenv('MEDIA_CACHE_FRESH_SECONDS', 6 * 3600))
+
+NOTO_ARABIC_FONT_URL = "https://github.com/googlefonts/noto-fonts/raw/main/hinted/ttf/NotoSansArabic/NotoSansArabic-Regular.ttf"
+
+
+def _url_suffix(url: str) -> str:
+    suffix = os.path.splitext(urlparse(url).path)[1].lower()
+    return suffix if 0 < len(suffix) <= 6 else '.tmp'
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HTTP_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaCache:
+    """كاش ميديا content-addressed مع revalidation و coalescing"""
+
+    def __init__(
+        self,
+        directory: str = MEDIA_CACHE_DIR,
+        max_bytes: int = MEDIA_CACHE_MAX_MB * 1024 * 1024,
+        fresh_seconds: int = MEDIA_CACHE_FRESH_SECONDS
+    ):
+        self.directory = directory
+        self.fresh_seconds = fresh_seconds
+        self.blobs = DiskLRU(os.path.join(directory, 'blobs'), max_bytes)
+        self.index_dir = os.path.join(directory, 'urls')
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+
+        self.stats = {
+            'hits': 0,
+            'revalidated': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'stale': 0,
+            'errors': 0,
+            'bytes_downloaded': 0
+        }
+
+    # ============================================
+    # Metrics
+    # ============================================
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def hit_rate(self) -> float:
+        """نسبة الطلبات اللي ما احتاجت تنزيل"""
+        served = (self.stats['hits'] + self.stats['revalidated']
+                  + self.stats['coalesced'] + self.stats['stale'])
+        total = served + self.stats['misses']
+        return served / total if total else 0.0
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"hit rate {self.hit_rate() * 100:.0f}% "
+                f"(hits {s['hits']}, revalidated {s['revalidated']}, coalesced {s['coalesced']}, "
+                f"misses {s['misses']}, stale {s['stale']}, errors {s['errors']}, "
+                f"downloaded {s['bytes_downloaded'] / 1024 / 1024:.1f} MB, "
+                f"on disk {self.blobs.total_bytes / 1024 / 1024:.1f} MB)")
+
+    # ============================================
+    # فهرس الروابط
+    # ============================================
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.index_dir, key[:2], f"{key}.json")
+
+    def _read_entry(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._entry_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, key: str, entry: Dict):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def _cached(self, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """(entry, مسار الـ blob) - الـ blob ممكن يكون انحذف بالـ LRU"""
+        entry = self._read_entry(key)
+        if not entry:
+            return None, None
+        return entry, self.blobs.get_path(entry['sha256'])
+
+    def _is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry.get('checked_at', 0) < self.fresh_seconds
+
+    # ============================================
+    # التنزيل (conditional)
+    # ============================================
+
+    def _download(
+        self,
+        url: str,
+        entry: Optional[Dict],
+        s3_client,
+        headers: Optional[Dict],
+        timeout: int
+    ) -> Optional[Dict]:
+        """
+        تنزيل الرابط للكاش إذا تغير
+
+        Returns:
+            None إذا ما تغير (304 / نفس ETag)، وإلا entry جديد
+        """
+        location = parse_s3_url(url) if s3_client else None
+        if location:
+            try:
+                return self._download_s3(url, location, entry, s3_client)
+            except Exception as e:
+                print(f"   ⚠️  S3 direct download failed, trying HTTP: {e}")
+
+        return self._download_http(url, entry, headers, timeout)
+
+    def _download_s3(self, url: str, location: Tuple[str, str], entry: Optional[Dict], s3_client) -> Optional[Dict]:
+        bucket, key = location
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+        etag = head.get('ETag')
+
+        if entry and etag and entry.get('etag') == etag:
+            return None
+
+        tmp_path = self.blobs.temp_path()
+        try:
+            s3_client.download_file(bucket, key, tmp_path, Config=TRANSFER_CONFIG)
+            return self._store(url, tmp_path, _hash_file(tmp_path), etag, None)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _download_http(self, url: str, entry: Optional[Dict], headers: Optional[Dict], timeout: int) -> Optional[Dict]:
+        from app.utils.http_client import get_http_client
+
+        request_headers = dict(headers or {})
+        if entry:
+            if entry.get('etag'):
+                request_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request_headers['If-Modified-Since'] = entry['last_modified']
+
+        tmp_path = self.blobs.temp_path()
+        try:
+            with get_http_client().get(url, headers=request_headers, timeout=timeout, stream=True) as response:
+                if response.status_code == 304 and entry:
+                    return None
+                response.raise_for_status()
+
+                digest = hashlib.sha256()
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=HTTP_CHUNK_SIZE):
+                        if chunk:
+                            digest.update(chunk)
+                            f.write(chunk)
+
+                return self._store(
+                    url, tmp_path, digest.hexdigest(),
+                    response.headers.get('ETag'),
+                    response.headers.get('Last-Modified')
+                )
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _store(self, url: str, tmp_path: str, sha256: str, etag: Optional[str], last_modified: Optional[str]) -> Dict:
+        size = os.path.getsize(tmp_path)
+        self._count('bytes_downloaded', size)
+
+        # نفس المحتوى موجود (من رابط ثاني) → ما بنخزن نسخة ثانية
+        if not self.blobs.get_path(sha256):
+            self.blobs.put_file(sha256, tmp_path)
+
+        return {
+            'url': url,
+            'sha256': sha256,
+            'size': size,
+            'etag': etag,
+            'last_modified': last_modified,
+            'checked_at': time.time()
+        }
+
+    # ============================================
+    # API
+    # ============================================
+
+    def fetch(self, url: str, s3_client=None, headers: Dict = None, timeout: int = 30) -> str:
+        """
+        مسار الملف بالكاش (ينزل/يتحقق حسب الحاجة)
+
+        المسار ملك الكاش وممكن ينحذف بالـ LRU - للقراءة الفورية بس،
+        وإلا materialize() لنسخة خاصة
+        """
+        key = _url_key(url)
+
+        entry, blob = self._cached(key)
+        if blob and self._is_fresh(entry):
+            self._count('hits')
+            return blob
+
+        # coalescing: أول طلب بينزل والباقي بيستنوه
+        while True:
+            with self._lock:
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = threading.Event()
+                    self._inflight[key] = event
+
+            if leader:
+                break
+
+            event.wait()
+            entry, blob = self._cached(key)
+            if blob and self._is_fresh(entry):
+                self._count('coalesced')
+                return blob
+            # الأول فشل → نجرب بنفسنا
+
+        try:
+            return self._refresh(url, key, s3_client, headers, timeout)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _refresh(self, url: str, key: str, s3_client, headers: Optional[Dict], timeout: int) -> str:
+        entry, blob = self._cached(key)
+        if blob and self._is_fresh(entry):
+            self._count('hits')
+            return blob
+
+        try:
+            new_entry = self._download(url, entry if blob else None, s3_client, headers, timeout)
+        except Exception:
+            self._count('errors')
+            if blob:
+                # الشبكة فشلت بس عنا نسخة → أحسن من لا شيء
+                self._count('stale')
+                return blob
+            raise
+
+        if new_entry is None:
+            entry['checked_at'] = time.time()
+            self._write_entry(key, entry)
+            self._count('revalidated')
+            return blob
+
+        self._write_entry(key, new_entry)
+        self._count('misses')
+
+        path = self.blobs.get_path(new_entry['sha256'])
+        if not path:
+            raise FileNotFoundError(f"Evicted right after download: {url[:60]}")
+        return path
+
+    def get_bytes(self, url: str, s3_client=None, headers: Dict = None, timeout: int = 30) -> bytes:
+        """محتوى الرابط (للصور الصغيرة اللي بتنفتح بالذاكرة)"""
+        for attempt in range(2):
+            path = self.fetch(url, s3_client=s3_client, headers=headers, timeout=timeout)
+            try:
+                with open(path, 'rb') as f:
+                    return f.read()
+            except FileNotFoundError:
+                # انحذف بالـ LRU بين fetch و open
+                if attempt:
+                    raise
+
+    def materialize(
+        self,
+        url: str,
+        dest: str = None,
+        s3_client=None,
+        headers: Dict = None,
+        timeout: int = 30
+    ) -> str:
+        """نسخة خاصة من الملف (hard link إذا ممكن) - المستخدم مسؤول عن حذفها"""
+        private = dest or tempfile.mktemp(suffix=_url_suffix(url))
+
+        for attempt in range(2):
+            cached = self.fetch(url, s3_client=s3_client, headers=headers, timeout=timeout)
+            try:
+                tmp_private = f"{private}.{threading.get_ident()}.tmp"
+                try:
+                    os.link(cached, tmp_private)
+                except FileNotFoundError:
+                    raise
+                except OSError:
+                    shutil.copyfile(cached, tmp_private)
+                os.replace(tmp_private, private)
+                return private
+            except FileNotFoundError:
+                # انحذف بالـ LRU بين fetch و link
+                if attempt:
+                    raise
+
+
+_shared_cache: Optional[MediaCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_media_cache() -> MediaCache:
+    """نفس الكاش لكل المستخدمين بنفس العملية (فهرس، coalescing و stats مشتركة)"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = MediaCache()
+        return _shared_cache
+
+
+def fetch_to_temp(url: str, s3_client=None, headers: Dict = None, timeout: int = 30) -> str:
+    """ملف مؤقت خاص بالرابط (عبر الكاش إذا مفعل، وإلا تنزيل stream مباشر)"""
+    if MEDIA_CACHE_ENABLED:
+        return get_media_cache().materialize(url, s3_client=s3_client, headers=headers, timeout=timeout)
+
+    path = tempfile.mktemp(suffix=_url_suffix(url))
+    try:
+        download_to_file(url, path, s3_client=s3_client, timeout=timeout, headers=headers)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return path
+
+
+_font_paths: Dict[str, str] = {}
+_font_paths_lock = threading.Lock()
+
+
+def fetch_font(url: str, timeout: int = 30) -> str:
+    """
+    مسار ثابت لخط من الإنترنت (للـ ImageFont.truetype)
+
+    مرة وحدة بالعملية، ونسخة خاصة ما بيحذفها الـ LRU
+    """
+    with _font_paths_lock:
+        path = _font_paths.get(url)
+        if path and os.path.exists(path):
+            return path
+
+        fonts_dir = os.path.join(MEDIA_CACHE_DIR, 'fonts')
+        os.makedirs(fonts_dir, exist_ok=True)
+        path = os.path.join(fonts_dir, f"{_url_key(url)[:16]}{_url_suffix(url)}")
+
+        if not os.path.exists(path):
+            if MEDIA_CACHE_ENABLED:
+                get_media_cache().materialize(url, dest=path, timeout=timeout)
+            else:
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                download_to_file(url, tmp_path, timeout=timeout)
+                os.replace(tmp_path, path)
+
+        _font_paths[url] = path
+        return path
+
+
+def fetch_bytes(url: str, s3_client=None, headers: Dict = None, timeout: int = 30) -> bytes:
+    """محتوى الرابط (عبر الكاش إذا مفعل)"""
+    if MEDIA_CACHE_ENABLED:
+        return get_media_cache().get_bytes(url, s3_client=s3_client, headers=headers, timeout=timeout)
+
+    path = fetch_to_temp(url, s3_client=s3_client, headers=headers, timeout=timeout)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
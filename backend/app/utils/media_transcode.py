@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🎚️ Media Transcode
+تحويل الصوت/الفيديو بـ ffmpeg عبر pipes (stdin/stdout) بدل ملفات مؤقتة للمدخل والمخرج
+
+- find_ffmpeg / get_capabilities: المسار والنسخة والبروتوكولات بتنفحص مرة وحدة لكل عملية
+  (بدل ffmpeg -version مع كل تحويل)
+- المدخل: bytes / file object / مسار / رابط HTTP(S) (ffmpeg بيقرأ الرابط مباشرة)
+- المخرج: PCM أو WAV بالذاكرة (WAV header بينكتب هون لأن ffmpeg ما بيعرف الحجم على pipe)
+- FFMPEG_MAX_CONCURRENT: حد لعمليات ffmpeg بنفس الوقت بالعملية (ما نغرق الـ CPU)
+- ملف الـ upload المؤقت بيتقرأ بمكانه (/dev/fd) مع seek، بدون نسخة
+- MP4/MOV اللي الـ moov فيها بالآخر ما بتنقرأ من pipe → ملف مؤقت كـ fallback بس
+"""
+
+import os
+import shutil
+import stat
+import struct
+import subprocess
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import FrozenSet, List, Optional, Tuple, Union
+
+
+FFMPEG_MAX_CONCURRENT = int(os.getenv('FFMPEG_MAX_CONCURRENT', max(1, (os.cpu_count() or 2) // 2)))
+FFMPEG_TIMEOUT = int(os.getenv('FFMPEG_TIMEOUT', 300))
+
+# LINEAR16 لـ Google Speech
+STT_SAMPLE_RATE = 16000
+
+# رسائل ffmpeg لما الملف بده seek (ما بينقرأ من pipe)
+_NEEDS_SEEKABLE_HINTS = ('moov atom not found', 'partial file', 'Invalid data found when processing input')
+
+Source = Union[bytes, str, object]
+
+
+class TranscodeError(Exception):
+    """ffmpeg مش موجود أو فشل التحويل"""
+
+
+@dataclass(frozen=True)
+class FfmpegCapabilities:
+    path: Optional[str]
+    version: str
+    protocols: FrozenSet[str]
+
+    @property
+    def available(self) -> bool:
+        return self.path is not None
+
+    def supports_protocol(self, name: str) -> bool:
+        return name in self.protocols
+
+
+_capabilities: Optional[FfmpegCapabilities] = None
+_capabilities_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(FFMPEG_MAX_CONCURRENT)
+
+
+# ============================================
+# Capabilities (مرة وحدة لكل عملية)
+# ============================================
+
+def _locate_ffmpeg() -> Optional[str]:
+    """PATH أولاً، ثم imageio-ffmpeg تبع moviepy"""
+    path = shutil.which('ffmpeg')
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def _probe_protocols(path: str) -> FrozenSet[str]:
+    """بروتوكولات الإدخال (قسم Input: بـ ffmpeg -protocols)"""
+    result = subprocess.run([path, '-hide_banner', '-protocols'], capture_output=True, text=True, timeout=15)
+    protocols = set()
+    section = None
+    for line in result.stdout.splitlines():
+        name = line.strip()
+        if name.endswith(':'):
+            section = name[:-1].lower()
+        elif name and section == 'input':
+            protocols.add(name)
+    return frozenset(protocols)
+
+
+def get_capabilities() -> FfmpegCapabilities:
+    """مسار ffmpeg + نسخته + البروتوكولات (بتنفحص أول مرة بس)"""
+    global _capabilities
+    with _capabilities_lock:
+        if _capabilities is not None:
+            return _capabilities
+
+        path = _locate_ffmpeg()
+        version = ''
+        protocols: FrozenSet[str] = frozenset()
+
+        if path:
+            try:
+                result = subprocess.run([path, '-version'], capture_output=True, text=True, timeout=15)
+                if result.returncode != 0:
+                    raise OSError(result.stderr[-200:])
+                version = result.stdout.split('\n', 1)[0]
+                protocols = _probe_protocols(path)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                print(f"⚠️  ffmpeg at {path} is not usable: {e}")
+                path = None
+
+        _capabilities = FfmpegCapabilities(path, version, protocols)
+        return _capabilities
+
+
+def find_ffmpeg() -> Optional[str]:
+    return get_capabilities().path
+
+
+def is_ffmpeg_available() -> bool:
+    return get_capabilities().available
+
+
+# ============================================
+# Running ffmpeg
+# ============================================
+
+def run_ffmpeg(args: List[str], stdin=None, timeout: int = None, pass_fds: Tuple[int, ...] = ()) -> Tuple[bytes, str]:
+    """
+    تشغيل ffmpeg تحت حد التوازي
+
+    Args:
+        args: بعد اسم البرنامج (بدون -hide_banner)
+        stdin: None / bytes / file object (بـ fileno بيتمرر للـ OS مباشرة)
+        pass_fds: file descriptors للـ /dev/fd/N inputs
+
+    Returns:
+        (stdout, stderr)
+
+    Raises:
+        TranscodeError
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise TranscodeError('ffmpeg not available')
+
+    cmd = [ffmpeg, '-hide_banner', '-loglevel', 'info']
+    if stdin is None:
+        cmd.append('-nostdin')
+    cmd += args
+
+    data = stdin if isinstance(stdin, (bytes, bytearray)) else None
+    stdin_arg = subprocess.PIPE if data is not None else (stdin if stdin is not None else subprocess.DEVNULL)
+
+    with _slots:
+        try:
+            process = subprocess.Popen(
+                cmd, stdin=stdin_arg, stdout=subprocess.PIPE, stderr=subprocess.PIPE, pass_fds=pass_fds
+            )
+        except OSError as e:
+            raise TranscodeError(f'ffmpeg failed to start: {e}')
+
+        try:
+            stdout, stderr = process.communicate(input=data, timeout=timeout or FFMPEG_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise TranscodeError(f'ffmpeg timed out after {timeout or FFMPEG_TIMEOUT}s')
+
+    stderr_text = stderr.decode('utf-8', errors='ignore')
+    if process.returncode != 0:
+        raise TranscodeError(stderr_text[-500:].strip() or f'ffmpeg exited with {process.returncode}')
+    return stdout, stderr_text
+
+
+def _is_url(source) -> bool:
+    return isinstance(source, str) and source.startswith(('http://', 'https://'))
+
+
+def _unlink(path: Optional[str]):
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _regular_fd(source) -> Optional[int]:
+    """fd لملف عادي على القرص (ffmpeg بيقدر يعمل seek عليه عبر /dev/fd) وإلا None"""
+    if not os.path.isdir('/dev/fd'):
+        return None
+    try:
+        fd = source.fileno()
+        return fd if stat.S_ISREG(os.fstat(fd).st_mode) else None
+    except Exception:
+        return None
+
+
+def _input(source: Source) -> Tuple[List[str], object, Tuple[int, ...]]:
+    """(-i args, stdin, pass_fds) للمصدر"""
+    if isinstance(source, (bytes, bytearray)):
+        return ['-i', 'pipe:0'], source, ()
+
+    if _is_url(source):
+        return ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+                '-i', source], None, ()
+
+    if isinstance(source, str):
+        return ['-i', source], None, ()
+
+    # file object: ملف مؤقت على القرص (UploadFile) بيتقرأ بمكانه مع seek (MP4 مع moov بالآخر)
+    try:
+        source.flush()
+    except Exception:
+        pass
+    fd = _regular_fd(source)
+    if fd is not None:
+        return ['-i', f'/dev/fd/{fd}'], None, (fd,)
+
+    # غير هيك (BytesIO / stream): stdin
+    try:
+        source.seek(0)
+    except Exception:
+        pass
+    try:
+        source.fileno()
+        return ['-i', 'pipe:0'], source, ()
+    except Exception:
+        return ['-i', 'pipe:0'], source.read(), ()
+
+
+def _spill_to_file(stdin) -> str:
+    """نسخة على القرص للملفات اللي بدها seek (MP4 مع moov بالآخر)"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.media') as temp:
+        if isinstance(stdin, (bytes, bytearray)):
+            temp.write(stdin)
+        else:
+            stdin.seek(0)
+            shutil.copyfileobj(stdin, temp, 1024 * 1024)
+        return temp.name
+
+
+def transcode(
+    source: Source,
+    output_args: List[str],
+    start: float = None,
+    duration: float = None,
+    timeout: int = None
+) -> bytes:
+    """
+    تحويل لأي صيغة على stdout
+
+    Args:
+        source: bytes / file object / مسار / رابط
+        output_args: خيارات المخرج (لازم فيها -f لأن المخرج pipe)
+        start/duration: قص بالثواني (اختياري)
+    """
+    seek_args = ['-ss', f'{start:.3f}'] if start else []
+    limit_args = ['-t', f'{duration:.3f}'] if duration else []
+
+    # ffmpeg بدون http/https (build مصغر): تنزيل عبر كاش الميديا
+    downloaded = None
+    if _is_url(source) and not get_capabilities().supports_protocol(source.split(':', 1)[0]):
+        from app.utils.media_cache import fetch_to_temp
+        source = downloaded = fetch_to_temp(source, timeout=timeout or 60)
+
+    spilled = None
+    try:
+        input_args, stdin, pass_fds = _input(source)
+        try:
+            stdout, _ = run_ffmpeg(
+                seek_args + input_args + limit_args + output_args + ['pipe:1'], stdin, timeout, pass_fds
+            )
+            return stdout
+        except TranscodeError as e:
+            if stdin is None or not any(hint in str(e) for hint in _NEEDS_SEEKABLE_HINTS):
+                raise
+
+        spilled = _spill_to_file(stdin)
+        stdout, _ = run_ffmpeg(seek_args + ['-i', spilled] + limit_args + output_args + ['pipe:1'], None, timeout)
+        return stdout
+    finally:
+        _unlink(spilled)
+        _unlink(downloaded)
+
+
+# ============================================
+# Audio helpers
+# ============================================
+
+def wav_header(data_size: int, sample_rate: int = STT_SAMPLE_RATE, channels: int = 1, bits: int = 16) -> bytes:
+    """RIFF/WAVE header لـ PCM بحجم معروف"""
+    byte_rate = sample_rate * channels * bits // 8
+    block_align = channels * bits // 8
+    return (
+        b'RIFF' + struct.pack('<I', 36 + data_size) + b'WAVE'
+        + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, sample_rate, byte_rate, block_align, bits)
+        + b'data' + struct.pack('<I', data_size)
+    )
+
+
+def to_pcm(
+    source: Source,
+    sample_rate: int = STT_SAMPLE_RATE,
+    start: float = None,
+    duration: float = None,
+    timeout: int = None
+) -> bytes:
+    """الصوت (من ملف صوت أو فيديو) كـ PCM s16le mono"""
+    return transcode(
+        source,
+        ['-vn', '-ac', '1', '-ar', str(sample_rate), '-acodec', 'pcm_s16le', '-f', 's16le'],
+        start=start, duration=duration, timeout=timeout
+    )
+
+
+def to_wav(
+    source: Source,
+    sample_rate: int = STT_SAMPLE_RATE,
+    start: float = None,
+    duration: float = None,
+    timeout: int = None
+) -> bytes:
+    """الصوت كـ WAV (16kHz mono LINEAR16 افتراضياً) بالذاكرة - لـ STT"""
+    pcm = to_pcm(source, sample_rate, start=start, duration=duration, timeout=timeout)
+    if not pcm:
+        raise TranscodeError('no audio stream')
+    return wav_header(len(pcm), sample_rate) + pcm
+
+
+def extract_audio(source: Source, sample_rate: int = STT_SAMPLE_RATE, timeout: int = None) -> bytes:
+    """صوت الفيديو كـ WAV (المصدر ممكن يكون رابط: ffmpeg بيقرأ بس اللي بيلزمه)"""
+    return to_wav(source, sample_rate, timeout=timeout)
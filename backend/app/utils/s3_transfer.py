@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+☁️ S3 Streaming Transfers
+تنزيل ورفع ملفات كبيرة (فيديو/صوت) بدون ما تنحمل كاملة بالذاكرة
+
+- التنزيل: download_file بيعمل ranged GETs بالتوازي ويكتب عالقرص مباشرة
+- الرفع: upload_file بيعمل multipart upload بالتوازي من الملف
+- الذاكرة المستخدمة = حجم الجزء × عدد الأجزاء بنفس الوقت (مش حجم الملف)
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from boto3.s3.transfer import TransferConfig
+
+
+S3_TRANSFER_CHUNK_MB = int(os.getenv('S3_TRANSFER_CHUNK_MB', 8))
+S3_TRANSFER_CONCURRENCY = int(os.getenv('S3_TRANSFER_CONCURRENCY', 4))
+
+# كل ملف أكبر من جزء واحد بيتقسم (ranged GET / multipart upload)
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_TRANSFER_CHUNK_MB * 1024 * 1024,
+    multipart_chunksize=S3_TRANSFER_CHUNK_MB * 1024 * 1024,
+    max_concurrency=S3_TRANSFER_CONCURRENCY,
+    use_threads=True
+)
+
+HTTP_CHUNK_SIZE = 1024 * 1024
+
+
+def parse_s3_url(url: str) -> Optional[Tuple[str, str]]:
+    """
+    استخراج (bucket, key) من رابط S3
+
+    الصيغ:
+    1. https://bucket-name.s3.amazonaws.com/key
+    2. https://s3.region.amazonaws.com/bucket-name/key
+    3. https://bucket-name.s3.region.amazonaws.com/key
+
+    Returns:
+        None إذا الرابط مش S3
+    """
+    parsed = urlparse(url)
+    netloc = parsed.netloc
+
+    if '.s3.' not in netloc and not netloc.startswith('s3.'):
+        return None
+
+    if netloc.startswith('s3.'):
+        path_parts = parsed.path.lstrip('/').split('/', 1)
+        bucket = path_parts[0]
+        key = path_parts[1] if len(path_parts) > 1 else ''
+    else:
+        bucket = netloc.split('.')[0]
+        key = parsed.path.lstrip('/')
+
+    if not bucket or not key:
+        return None
+    return bucket, key
+
+
+def download_http_to_file(url: str, path: str, timeout: int = 30, headers: Dict = None):
+    """تنزيل HTTP بأجزاء (stream) لملف"""
+    from app.utils.http_client import get_http_client
+
+    with get_http_client().get(url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        with open(path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=HTTP_CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+
+
+def download_to_file(url: str, path: str, s3_client=None, timeout: int = 30, headers: Dict = None):
+    """
+    تنزيل رابط (S3 أو HTTP) لملف محلي بدون تحميله بالذاكرة
+
+    S3 عبر boto3 أول (ranged GETs)، وإذا فشل أو الرابط مش S3 → HTTP stream
+    """
+    location = parse_s3_url(url) if s3_client else None
+
+    if location:
+        bucket, key = location
+        try:
+            s3_client.download_file(bucket, key, path, Config=TRANSFER_CONFIG)
+            return
+        except Exception as e:
+            print(f"   ⚠️  S3 direct download failed, trying HTTP: {e}")
+
+    download_http_to_file(url, path, timeout=timeout, headers=headers)
+
+
+def upload_file_multipart(
+    s3_client,
+    path: str,
+    bucket: str,
+    key: str,
+    content_type: str
+):
+    """رفع ملف من القرص (multipart بالتوازي للملفات الكبيرة)"""
+    s3_client.upload_file(
+        path,
+        bucket,
+        key,
+        ExtraArgs={'ContentType': content_type},
+        Config=TRANSFER_CONFIG
+    )
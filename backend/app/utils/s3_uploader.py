@@ -198,6 +198,83 @@ class S3Uploader:
         }
         return content_types.get(extension, 'audio/mpeg')
     
+    # ============================================
+    # Streaming (multipart) uploads
+    # ============================================
+    
+    def new_media_key(self, file_type: str, extension: str) -> tuple:
+        """
+        مسار S3 واسم فريد لملف أصلي
+        
+        Returns:
+            (s3_key, unique_filename)
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        unique_id = str(uuid.uuid4())[:8]
+        
+        if file_type == 'video':
+            unique_filename = f"video_{timestamp}_{unique_id}.{extension}"
+            return f"{S3_ORIGINAL_VIDEOS_FOLDER}{unique_filename}", unique_filename
+        
+        unique_filename = f"audio_{timestamp}_{unique_id}.{extension}"
+        return f"{S3_ORIGINAL_AUDIOS_FOLDER}{unique_filename}", unique_filename
+    
+    def content_type_for(self, file_type: str, extension: str) -> str:
+        if file_type == 'video':
+            return self._get_video_content_type(extension)
+        return self._get_content_type(extension)
+    
+    def url_for(self, s3_key: str) -> str:
+        return f"https://{self.bucket_name}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
+    
+    def put_bytes(self, s3_key: str, data: bytes, content_type: str):
+        """رفع ملف صغير بطلب واحد"""
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            Body=data,
+            ContentType=content_type
+        )
+    
+    def create_multipart(self, s3_key: str, content_type: str) -> str:
+        """بداية multipart upload → upload_id"""
+        response = self.s3_client.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            ContentType=content_type
+        )
+        return response['UploadId']
+    
+    def upload_part(self, s3_key: str, upload_id: str, part_number: int, data: bytes) -> dict:
+        """رفع جزء (كل الأجزاء >= 5MB ما عدا الأخير)"""
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        return {'ETag': response['ETag'], 'PartNumber': part_number}
+    
+    def complete_multipart(self, s3_key: str, upload_id: str, parts: list):
+        self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    
+    def abort_multipart(self, s3_key: str, upload_id: str):
+        """إلغاء multipart (عشان الأجزاء ما تضل محجوزة ومحسوبة بالتخزين)"""
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                UploadId=upload_id
+            )
+        except Exception as e:
+            print(f"⚠️ Abort multipart failed for {s3_key}: {e}")
+    
     def delete_file(self, s3_key: str) -> bool:
         """
         حذف ملف من S3
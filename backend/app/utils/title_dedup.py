@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🔁 Title Dedup
+إزالة الأخبار المكررة حسب تشابه العناوين (مشترك بين مولدات البث والموجز)
+
+نفس قرارات الطريقة القديمة (مقارنة كل عنوان مع كل عنوان محفوظ):
+- التنظيف: lower → حذف الرموز → كلمات أطول من حرفين وليست stop words
+- التشابه: الكلمات المشتركة (بدون تكرار) / min(عدد كلمات العنوانين)
+- مكرر إذا التشابه > 0.5
+  أو (للموجز) إذا الكلمات المفتاحية المشتركة (أطول من 4 أحرف) >= 3
+
+بدل المقارنة مع كل عنوان محفوظ، نستخدم فهرس كلمة → العناوين المحفوظة
+فنحسب المشترك فقط مع العناوين اللي بتشارك كلمة وحدة على الأقل
+(العنوان اللي ما بيشارك ولا كلمة تشابهه 0 وما بيكون مكرر)
+"""
+
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+
+@dataclass(frozen=True)
+class DedupRule:
+    """قواعد التشابه"""
+    stop_words: FrozenSet[str]
+    overlap_threshold: float = 0.5
+    min_word_len: int = 2            # الكلمات الأطول من هذا فقط
+    key_word_len: Optional[int] = None   # الكلمات المفتاحية: أطول من هذا
+    key_common_min: Optional[int] = None # عدد الكلمات المفتاحية المشتركة ليُعتبر مكرر
+
+
+# BroadcastGenerator._remove_duplicates
+BROADCAST_RULE = DedupRule(
+    stop_words=frozenset({'في', 'من', 'على', 'إلى', 'عن', 'مع', 'أن', 'هذا', 'هذه'}),
+)
+
+# DigestGenerator._remove_duplicates
+DIGEST_RULE = DedupRule(
+    stop_words=frozenset({
+        'في', 'من', 'على', 'إلى', 'عن', 'مع', 'أن', 'ان', 'هذا', 'هذه',
+        'التي', 'الذي', 'بعد', 'قبل', 'خلال', 'حول', 'ضد', 'بين'
+    }),
+    key_word_len=4,
+    key_common_min=3,
+)
+
+
+def normalize_title(title: str, rule: DedupRule) -> List[str]:
+    """كلمات العنوان بعد التنظيف (مع التكرار، لأن الطول يدخل بالمقام)"""
+    clean = _PUNCTUATION_RE.sub('', (title or '').lower())
+    stop_words = rule.stop_words
+    min_len = rule.min_word_len
+    return [w for w in clean.split() if w not in stop_words and len(w) > min_len]
+
+
+class TitleIndex:
+    """فهرس العناوين المحفوظة: كلمة → أرقام العناوين اللي فيها"""
+
+    def __init__(self, rule: DedupRule):
+        self.rule = rule
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._lengths: List[int] = []
+
+    def is_duplicate(self, words: List[str]) -> bool:
+        """هل العنوان مكرر لعنوان محفوظ؟"""
+        if not words:
+            return False
+
+        rule = self.rule
+        check_keys = rule.key_word_len is not None and rule.key_common_min is not None
+        postings = self._postings
+
+        common: Dict[int, int] = {}
+        key_common: Dict[int, int] = {}
+
+        for word in set(words):
+            indices = postings.get(word)
+            if not indices:
+                continue
+            for idx in indices:
+                common[idx] = common.get(idx, 0) + 1
+            if check_keys and len(word) > rule.key_word_len:
+                for idx in indices:
+                    key_common[idx] = key_common.get(idx, 0) + 1
+
+        length = len(words)
+        lengths = self._lengths
+        threshold = rule.overlap_threshold
+
+        for idx, count in common.items():
+            if count / min(length, lengths[idx]) > threshold:
+                return True
+
+        if check_keys:
+            key_min = rule.key_common_min
+            for count in key_common.values():
+                if count >= key_min:
+                    return True
+
+        return False
+
+    def add(self, words: List[str]):
+        """حفظ عنوان بالفهرس"""
+        idx = len(self._lengths)
+        self._lengths.append(len(words))
+        for word in set(words):
+            self._postings[word].append(idx)
+
+
+def remove_duplicate_titles(
+    items: List,
+    rule: DedupRule,
+    title_of: Callable = lambda item: item.title
+) -> List:
+    """
+    إرجاع العناصر الفريدة بنفس الترتيب (أول ظهور يبقى)
+
+    Args:
+        items: عناصر (ReportItem أو غيره)
+        rule: BROADCAST_RULE أو DIGEST_RULE
+        title_of: دالة ترجع العنوان من العنصر
+    """
+    index = TitleIndex(rule)
+    unique = []
+
+    for item in items:
+        words = normalize_title(title_of(item), rule)
+        if not index.is_duplicate(words):
+            unique.append(item)
+            index.add(words)
+
+    return unique
@@ -46,6 +46,8 @@ S3_GENERATED_VIDEOS_FOLDER = os.getenv('S3_GENERATED_VIDEOS_FOLDER', 'generated/
 # ============================================
 MAX_AUDIO_SIZE_MB = int(os.getenv('MAX_AUDIO_SIZE_MB', 50))
 ALLOWED_AUDIO_FORMATS = os.getenv('ALLOWED_AUDIO_FORMATS', 'mp3,wav,ogg,m4a,webm').split(',')
+MAX_VIDEO_SIZE_MB = int(os.getenv('MAX_VIDEO_SIZE_MB', 500))
+ALLOWED_VIDEO_FORMATS = os.getenv('ALLOWED_VIDEO_FORMATS', 'mp4,mov,avi,webm,mkv').split(',')
 
 
 FB_ACCESS_TOKEN = os.getenv('FB_ACCESS_TOKEN')
@@ -67,7 +67,7 @@ def import_jobs():
     global scrape_news, cluster_news, generate_reports
     global generate_social_media_content, generate_images, generate_audio
     global generate_social_media_images, generate_reels, publish_to_social_media
-    global generate_all_broadcasts
+    global generate_all_broadcasts, precompute_broadcast_segments, precompute_publish_captions
     
     from app.jobs.scraper_job import scrape_news
     from app.jobs.clustering_job import cluster_news
@@ -79,6 +79,8 @@ def import_jobs():
     from app.jobs.reel_generation_job import generate_reels
     from app.jobs.publishers_job import publish_to_social_media
     from app.jobs.broadcast_job import generate_all_broadcasts
+    from app.jobs.broadcast_precompute_job import precompute_broadcast_segments
+    from app.jobs.caption_precompute_job import precompute_publish_captions
     
     logger.info("✅ All jobs imported successfully")
 
@@ -221,7 +223,9 @@ def run_cycle(cycle_number: int) -> Dict:
         results['processing'] = run_group('PROCESSING', [
             ('clustering', cluster_news),
             ('reports', generate_reports),
+            ('broadcast_segments', precompute_broadcast_segments),
             ('social_media_text', generate_social_media_content),
+            ('publish_captions', precompute_publish_captions),
         ])
     
     # ───────────────────────────────────────────────────────────
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🧪 Test STT Segmenter
+تقسيم الصوت عند السكتات وتجميع النص (app.services.generators.stt_segmenter)
+
+    python tests/test_stt_segmenter.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shutil
+import subprocess
+import tempfile
+
+from app.services.generators.stt_segmenter import (
+    SAMPLE_RATE,
+    detect_silences,
+    extract_segment,
+    parse_silences,
+    plan_segments,
+    probe_duration,
+    stitch_segments,
+)
+
+
+def test_parse_silences():
+    log = (
+        "[silencedetect @ 0x1] silence_start: 9.8\n"
+        "[silencedetect @ 0x1] silence_end: 10.6 | silence_duration: 0.8\n"
+        "[silencedetect @ 0x1] silence_start: -0.01\n"
+        "[silencedetect @ 0x1] silence_end: 0.5 | silence_duration: 0.51\n"
+    )
+    assert parse_silences(log) == [(9.8, 10.6), (0.0, 0.5)]
+
+
+def test_plan_short_audio_single_segment():
+    segments = plan_segments(40.0, [(10.0, 11.0)], max_seconds=55)
+    assert [(s.start, s.end) for s in segments] == [(0.0, 40.0)]
+
+
+def test_plan_cuts_at_last_pause_before_limit():
+    silences = [(20.0, 21.0), (50.0, 52.0), (90.0, 91.0), (140.0, 141.0)]
+    segments = plan_segments(150.0, silences, max_seconds=55, min_seconds=15)
+
+    assert [(s.start, s.end) for s in segments] == [(0.0, 51.0), (51.0, 90.5), (90.5, 140.5), (140.5, 150.0)]
+    assert [s.index for s in segments] == [0, 1, 2, 3]
+    assert all(s.duration <= 55 for s in segments)
+
+
+def test_plan_hard_cut_without_pauses():
+    segments = plan_segments(130.0, [(5.0, 6.0)], max_seconds=55, min_seconds=15)
+    assert [(s.start, s.end) for s in segments] == [(0.0, 55.0), (55.0, 110.0), (110.0, 130.0)]
+
+
+def test_stitch_orders_and_weights_confidence():
+    stitched = stitch_segments([
+        {'index': 1, 'start': 50.0, 'end': 60.0, 'text': 'عالم', 'confidence': 0.5},
+        {'index': 0, 'start': 0.0, 'end': 50.0, 'text': ' مرحبا ', 'confidence': 0.8},
+        {'index': 2, 'start': 60.0, 'end': 70.0, 'text': '', 'confidence': 0.0},
+    ])
+    assert stitched['text'] == 'مرحبا عالم'
+    assert abs(stitched['confidence'] - (50 * 0.8 + 10 * 0.5) / 60) < 1e-9
+    assert [s['index'] for s in stitched['segments']] == [0, 1, 2]
+
+
+def test_ffmpeg_segments():
+    if not shutil.which('ffmpeg'):
+        print("   ⏭️ ffmpeg not installed, skipping")
+        return
+
+    # 3 نغمات (20s) بينها سكتة ثانية وحدة
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'speech.wav')
+        subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error',
+             '-f', 'lavfi', '-i', 'sine=frequency=440:duration=20',
+             '-f', 'lavfi', '-i', 'anullsrc=r=16000:cl=mono', '-filter_complex',
+             '[0][1]concat=n=2:v=0:a=1,atrim=0:21[a];[a]asplit=3[a1][a2][a3];'
+             '[a1][a2][a3]concat=n=3:v=0:a=1', '-ar', '16000', '-ac', '1', path],
+            check=True
+        )
+
+        duration = probe_duration(path)
+        assert abs(duration - 63) < 0.5
+
+        silences = detect_silences(path)
+        assert len(silences) == 3
+
+        segments = plan_segments(duration, silences, max_seconds=55, min_seconds=15)
+        assert len(segments) == 2
+        assert abs(segments[0].end - 41.5) < 0.2
+
+        pcm = extract_segment(path, segments[1])
+        assert abs(len(pcm) / (2 * SAMPLE_RATE) - segments[1].duration) < 0.1
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f"✅ {name}")
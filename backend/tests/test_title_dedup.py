@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🧪 Test Title Dedup
+مقارنة app.utils.title_dedup مع الطريقة القديمة (O(n²)) + benchmark
+
+    python tests/test_title_dedup.py          # اختبارات + benchmark
+    python tests/test_title_dedup.py 5000     # benchmark بعدد تقارير مختلف
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import re
+import time
+from dataclasses import dataclass
+
+from app.utils.title_dedup import BROADCAST_RULE, DIGEST_RULE, remove_duplicate_titles
+
+
+@dataclass
+class Item:
+    id: int
+    title: str
+
+
+# ============================================
+# الطرق القديمة (منسوخة كما هي من المولدات)
+# ============================================
+
+def legacy_broadcast_dedup(reports):
+    unique = []
+    seen_titles = []
+    stop_words = {'في', 'من', 'على', 'إلى', 'عن', 'مع', 'أن', 'هذا', 'هذه'}
+
+    for report in reports:
+        clean = re.sub(r'[^\w\s]', '', report.title.lower())
+        words = [w for w in clean.split() if w not in stop_words and len(w) > 2]
+
+        is_dup = False
+        for seen in seen_titles:
+            if not words or not seen:
+                continue
+            common = len(set(words) & set(seen))
+            if common / min(len(words), len(seen)) > 0.5:
+                is_dup = True
+                break
+
+        if not is_dup:
+            unique.append(report)
+            seen_titles.append(words)
+
+    return unique
+
+
+def legacy_digest_dedup(reports):
+    unique_reports = []
+    seen_titles = []
+
+    stop_words = {'في', 'من', 'على', 'إلى', 'عن', 'مع', 'أن', 'ان', 'هذا', 'هذه', 'التي', 'الذي', 'بعد', 'قبل', 'خلال', 'حول', 'ضد', 'بين'}
+
+    for report in reports:
+        clean_title = report.title.lower().strip()
+        clean_title = re.sub(r'[^\w\s]', '', clean_title)
+
+        words = [w for w in clean_title.split() if w not in stop_words and len(w) > 2]
+
+        is_duplicate = False
+        for seen_words in seen_titles:
+            if not words or not seen_words:
+                continue
+
+            common = len(set(words) & set(seen_words))
+            similarity = common / min(len(words), len(seen_words))
+
+            key_words = [w for w in words if len(w) > 4]
+            seen_key = [w for w in seen_words if len(w) > 4]
+            key_common = len(set(key_words) & set(seen_key))
+
+            if similarity > 0.5 or (key_common >= 3):
+                is_duplicate = True
+                break
+
+        if not is_duplicate:
+            unique_reports.append(report)
+            seen_titles.append(words)
+
+    return unique_reports
+
+
+# ============================================
+# بيانات تجريبية
+# ============================================
+
+VOCABULARY = [
+    'غزة', 'الاحتلال', 'قصف', 'شهداء', 'الضفة', 'نابلس', 'جنين', 'القدس', 'الأقصى',
+    'اقتحام', 'مستوطنين', 'الأسرى', 'اعتقال', 'الحكومة', 'الرئيس', 'وزارة', 'الصحة',
+    'إصابات', 'مواجهات', 'مخيم', 'الخليل', 'رام', 'الله', 'مفاوضات', 'التهدئة',
+    'المساعدات', 'معبر', 'رفح', 'الأمم', 'المتحدة', 'مجلس', 'الأمن', 'قرار', 'إدانة',
+    'عاجل', 'تقرير', 'الاقتصاد', 'الأسعار', 'الطقس', 'منخفض', 'أمطار', 'هدم', 'منازل',
+]
+LETTERS = 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي'
+FILLERS = ['في', 'من', 'على', 'إلى', 'بعد', 'خلال', 'ضد', 'هذا', 'و', 'أن']
+PUNCTUATION = ['', '', '،', ':', '!', '..', '"', '-']
+
+
+def make_titles(count: int, seed: int = 7):
+    """عناوين عشوائية فيها نسبة تكرار/تشابه واقعية"""
+    rng = random.Random(seed)
+
+    # مفردات أوسع بتوزيع Zipf (كلمات شائعة كثير + ذيل طويل) مثل عناوين 24 ساعة
+    vocabulary = VOCABULARY + [
+        ''.join(rng.choice(LETTERS) for _ in range(rng.randint(3, 8)))
+        for _ in range(1500)
+    ]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    items = []
+    for i in range(count):
+        if items and rng.random() < 0.3:
+            # نسخة معدلة من عنوان سابق
+            base = rng.choice(items).title.split()
+            rng.shuffle(base)
+            base = base[:max(2, len(base) - rng.randint(0, 3))]
+            base.append(rng.choices(vocabulary, weights)[0])
+            title = ' '.join(base)
+        else:
+            words = []
+            for _ in range(rng.randint(4, 12)):
+                if rng.random() < 0.8:
+                    words.append(rng.choices(vocabulary, weights)[0])
+                else:
+                    words.append(rng.choice(FILLERS))
+            title = ' '.join(words) + rng.choice(PUNCTUATION)
+        items.append(Item(id=i, title=title))
+    return items
+
+
+# ============================================
+# الاختبارات
+# ============================================
+
+def test_broadcast_rule_matches_legacy():
+    for seed in range(5):
+        items = make_titles(1200, seed=seed)
+        assert [r.id for r in remove_duplicate_titles(items, BROADCAST_RULE)] == \
+               [r.id for r in legacy_broadcast_dedup(items)]
+
+
+def test_digest_rule_matches_legacy():
+    for seed in range(5):
+        items = make_titles(1200, seed=seed)
+        assert [r.id for r in remove_duplicate_titles(items, DIGEST_RULE)] == \
+               [r.id for r in legacy_digest_dedup(items)]
+
+
+def test_edge_cases():
+    items = [
+        Item(1, ''),
+        Item(2, 'في من على'),                     # كلها stop words
+        Item(3, 'قصف قصف قصف غزة'),               # كلمات مكررة (الطول يدخل بالمقام)
+        Item(4, 'غزة قصف مستمر اليوم'),
+        Item(5, '!!! ؟؟؟'),
+        Item(6, 'اقتحامات واسعة للمستوطنين بالأقصى'),
+        Item(7, 'المستوطنين اقتحامات واسعة جديدة متواصلة اليوم'),
+    ]
+    assert remove_duplicate_titles(items, BROADCAST_RULE) == legacy_broadcast_dedup(items)
+    assert remove_duplicate_titles(items, DIGEST_RULE) == legacy_digest_dedup(items)
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def benchmark(count: int = 2000):
+    items = make_titles(count)
+
+    print(f"\n📊 Benchmark: {count} reports")
+    for name, new_fn, legacy_fn in [
+        ('broadcast', lambda x: remove_duplicate_titles(x, BROADCAST_RULE), legacy_broadcast_dedup),
+        ('digest', lambda x: remove_duplicate_titles(x, DIGEST_RULE), legacy_digest_dedup),
+    ]:
+        start = time.perf_counter()
+        legacy = legacy_fn(items)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = new_fn(items)
+        new_time = time.perf_counter() - start
+
+        same = "✅" if [r.id for r in new] == [r.id for r in legacy] else "❌"
+        print(f"   {name:10s} legacy {legacy_time*1000:8.1f}ms | indexed {new_time*1000:7.1f}ms "
+              f"| x{legacy_time / max(new_time, 1e-9):.1f} | kept {len(new)} {same}")
+
+
+if __name__ == "__main__":
+    test_broadcast_rule_matches_legacy()
+    test_digest_rule_matches_legacy()
+    test_edge_cases()
+    print("✅ Title dedup matches legacy decisions")
+
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
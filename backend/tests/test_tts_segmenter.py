@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+🧪 Test TTS Segmenter
+مقارنة app.services.generators.tts_segmenter مع الطريقة القديمة (حرف بحرف) + benchmark
+
+    python tests/test_tts_segmenter.py          # اختبارات + benchmark
+    python tests/test_tts_segmenter.py 200000   # benchmark بطول نص مختلف
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import time
+
+from app.services.generators.tts_segmenter import (
+    TTS_MAX_INPUT_BYTES,
+    add_punctuation,
+    split_cacheable_sentences,
+    split_for_tts,
+    split_segment_sentences,
+    split_text_into_chunks,
+    utf8_len,
+)
+
+
+# ============================================
+# الطرق القديمة (منسوخة كما هي من BulletinAudioGenerator)
+# ============================================
+
+def legacy_add_punctuation(text):
+    text = text.replace('\n\n', '. ')
+    text = text.replace('\n', '. ')
+
+    text = text.replace(' - ', '. ')
+    text = text.replace(' – ', '. ')
+    text = text.replace(' : ', '. ')
+    text = text.replace(':', '. ')
+
+    result = ""
+    chars_since_punct = 0
+
+    for char in text:
+        result += char
+
+        if char in '.،؟!':
+            chars_since_punct = 0
+        else:
+            chars_since_punct += 1
+
+        if chars_since_punct > 150 and char == ' ':
+            result = result.rstrip() + '. '
+            chars_since_punct = 0
+
+    while '..' in result:
+        result = result.replace('..', '.')
+    while '. .' in result:
+        result = result.replace('. .', '.')
+    while '  ' in result:
+        result = result.replace('  ', ' ')
+
+    result = result.strip()
+    if result and result[-1] not in '.،؟!':
+        result += '.'
+
+    return result
+
+
+def legacy_split_text_into_chunks(text, max_size):
+    text = legacy_add_punctuation(text)
+
+    chunks = []
+    current_chunk = ""
+
+    sentences = []
+    temp = ""
+
+    for char in text:
+        temp += char
+        if char in '.،؟!\n' and len(temp.strip()) > 0:
+            sentences.append(temp)
+            temp = ""
+
+    if temp.strip():
+        sentences.append(temp)
+
+    for sentence in sentences:
+        if len(sentence) > max_size:
+            if current_chunk:
+                chunks.append(current_chunk)
+                current_chunk = ""
+
+            words = sentence.split()
+            temp_chunk = ""
+            for word in words:
+                if len(temp_chunk) + len(word) + 1 <= max_size:
+                    temp_chunk += word + " "
+                else:
+                    if temp_chunk:
+                        chunks.append(temp_chunk.strip() + ".")
+                    temp_chunk = word + " "
+            if temp_chunk:
+                chunks.append(temp_chunk.strip())
+
+        elif len(current_chunk) + len(sentence) > max_size:
+            chunks.append(current_chunk)
+            current_chunk = sentence
+        else:
+            current_chunk += sentence
+
+    if current_chunk:
+        chunks.append(current_chunk)
+
+    return chunks
+
+
+# ============================================
+# بيانات تجريبية
+# ============================================
+
+WORDS = [
+    'غزة', 'الاحتلال', 'قصف', 'شهداء', 'الضفة', 'نابلس', 'جنين', 'القدس', 'الأقصى',
+    'اقتحام', 'مستوطنين', 'الأسرى', 'اعتقال', 'الحكومة', 'الرئيس', 'وزارة', 'الصحة',
+    'درجة', '3.65', '25', 'news', 'UN', 'فلسطين', 'المساعدات', 'معبر', 'رفح',
+]
+# فواصل فيها كل الحالات اللي بيعالجها add_punctuation
+SEPARATORS = [
+    ' ', ' ', ' ', ' ', ' ', ' ', '  ', '، ', '. ', '.. ', '. . ', '؟ ', '! ',
+    '\n', '\n\n', ' - ', ' – ', ' : ', ':', '\t', ' \n ', '...', '. .. ', '   ',
+]
+
+
+def make_text(rng, words: int) -> str:
+    parts = []
+    for _ in range(words):
+        parts.append(rng.choice(WORDS))
+        # مقاطع طويلة بدون ترقيم حتى تنضاف نقاط كل 150 حرف
+        parts.append(' ' if rng.random() < 0.85 else rng.choice(SEPARATORS))
+    return ''.join(parts)
+
+
+# ============================================
+# الاختبارات
+# ============================================
+
+def test_add_punctuation_matches_legacy():
+    rng = random.Random(3)
+    for _ in range(400):
+        text = make_text(rng, rng.randint(0, 300))
+        assert add_punctuation(text) == legacy_add_punctuation(text), text
+
+
+def test_split_matches_legacy():
+    rng = random.Random(5)
+    for _ in range(300):
+        text = make_text(rng, rng.randint(0, 600))
+        for max_size in (20, 80, 300, 1500):
+            assert split_text_into_chunks(text, max_size) == \
+                   legacy_split_text_into_chunks(text, max_size), (max_size, text)
+
+
+def test_edge_cases():
+    for text in ['', ' ', '\n', '\n\n\n', '.', ':', ' - ', 'كلمة', 'كلمة\n\n', '...',
+                 '. . . .', 'a' * 400, ('كلمة ' * 200).strip(), '؟؟ !!', ' \t\n ']:
+        assert add_punctuation(text) == legacy_add_punctuation(text), repr(text)
+        for max_size in (3, 10, 1500):
+            assert split_text_into_chunks(text, max_size) == \
+                   legacy_split_text_into_chunks(text, max_size), (max_size, repr(text))
+
+
+def test_byte_limit():
+    rng = random.Random(11)
+    for _ in range(50):
+        text = make_text(rng, rng.randint(1000, 4000))
+        chunks = split_for_tts(text)
+        assert all(utf8_len(c) <= TTS_MAX_INPUT_BYTES for c in chunks)
+        # نفس الكلمات بنفس الترتيب (بدون الترقيم المضاف)
+        assert ' '.join(chunks).replace('.', ' ').split() == \
+               add_punctuation(text).replace('.', ' ').split()
+
+    for max_bytes in (60, 200):
+        text = make_text(rng, 500)
+        assert all(utf8_len(c) <= max_bytes for c in split_for_tts(text, max_bytes))
+        assert all(utf8_len(u) <= max_bytes for u in split_cacheable_sentences(text, max_bytes))
+
+
+def test_cacheable_sentences():
+    text = "درجة الحرارة 3.65 اليوم.  وفي غزة قصف، وشهداء؟\n\nعاجل!"
+    assert split_cacheable_sentences(text) == [
+        'درجة الحرارة 3.65 اليوم.', 'وفي غزة قصف، وشهداء؟', 'عاجل!'
+    ]
+
+
+def test_segment_sentences_match_script():
+    rng = random.Random(2)
+    for _ in range(200):
+        segments = [make_text(rng, rng.randint(5, 120)) for _ in range(3)]
+        lines = ["مقدمة النشرة", ""]
+        for i, segment in enumerate(segments):
+            lines += [f"(عنوان {i})", segment, ""]
+        lines.append("خاتمة")
+        script_units = set(split_cacheable_sentences(add_punctuation("\n".join(lines))))
+
+        for segment in segments:
+            assert set(split_segment_sentences(segment)) <= script_units, segment
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def benchmark(length: int = 60000):
+    rng = random.Random(1)
+    text = make_text(rng, length // 6)
+
+    print(f"\n📊 Benchmark: {len(text)} chars")
+    for name, new_fn, legacy_fn in [
+        ('punctuation', add_punctuation, legacy_add_punctuation),
+        ('chunks', lambda t: split_text_into_chunks(t, 1500),
+         lambda t: legacy_split_text_into_chunks(t, 1500)),
+    ]:
+        start = time.perf_counter()
+        legacy = legacy_fn(text)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = new_fn(text)
+        new_time = time.perf_counter() - start
+
+        same = "✅" if new == legacy else "❌"
+        print(f"   {name:12s} legacy {legacy_time*1000:8.1f}ms | linear {new_time*1000:7.1f}ms "
+              f"| x{legacy_time / max(new_time, 1e-9):.1f} {same}")
+
+
+if __name__ == "__main__":
+    test_add_punctuation_matches_legacy()
+    test_split_matches_legacy()
+    test_edge_cases()
+    test_byte_limit()
+    test_cacheable_sentences()
+    test_segment_sentences_match_script()
+    print("✅ Segmenter matches legacy output")
+
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 60000)
@@ -330,6 +330,8 @@ def import_job_functions():
         from app.jobs.image_generation_job import generate_images
         from app.jobs.audio_generation_job import generate_audio
         from app.jobs.broadcast_job import generate_all_broadcasts
+        from app.jobs.broadcast_precompute_job import precompute_broadcast_segments
+        from app.jobs.caption_precompute_job import precompute_publish_captions
         from app.jobs.audio_transcription_job import run_audio_transcription_job
         from app.jobs.processing_pipeline_job import run_processing_pipeline
         
@@ -343,6 +345,8 @@ def import_job_functions():
             'broadcast_generation': generate_all_broadcasts,
             'bulletin_generation': generate_all_broadcasts,  # alias
             'digest_generation': generate_all_broadcasts,    # alias
+            'broadcast_precompute': precompute_broadcast_segments,
+            'caption_precompute': precompute_publish_captions,
             'audio_transcription': run_audio_transcription_job,
             'processing_pipeline': run_processing_pipeline,
         }